@@ -25,6 +25,7 @@ import collections
 
 import numpy as np
 import paddle
+from paddlenlp.data import BlendableDataset, MMapIndexedDataset
 
 
 def get_local_rank():
@@ -54,64 +55,6 @@ def compile_helper():
         sys.exit(1)
 
 
-class BlendableDataset(paddle.io.Dataset):
-    """
-    The BlendableDataset is a wrapper which used to mix different dataset.
-    
-    The input is a list of dataset and corresponding weights for each dataset.
-    """
-
-    def __init__(self, datasets, weights):
-
-        self.datasets = datasets
-        num_datasets = len(datasets)
-        assert num_datasets == len(weights)
-
-        self.size = 0
-        for dataset in self.datasets:
-            self.size += len(dataset)
-
-        # Normalize weights.
-        weights = np.array(weights, dtype=np.float64)
-        sum_weights = np.sum(weights)
-        assert sum_weights > 0.0
-        weights /= sum_weights
-
-        # Build indecies.
-        start_time = time.time()
-        assert num_datasets < 255
-        self.dataset_index = np.zeros(self.size, dtype=np.uint8)
-        self.dataset_sample_index = np.zeros(self.size, dtype=np.int64)
-
-        local_rank = 0 if fleet.local_rank() is None else int(fleet.local_rank(
-        ))
-
-        while True:
-            try:
-                import data_tools.helpers as helpers
-                break
-            except Exception as e:
-                if local_rank == 0:
-                    compile_helper()
-                print_rank_0('> wait for hepers to be compiled!')
-                time.sleep(1)
-
-        import data_tools.helpers as helpers
-        helpers.build_blending_indices(self.dataset_index,
-                                       self.dataset_sample_index, weights,
-                                       num_datasets, self.size, local_rank == 0)
-        print_rank_0('> elapsed time for building blendable dataset indices: '
-                     '{:.2f} (sec)'.format(time.time() - start_time))
-
-    def __len__(self):
-        return self.size
-
-    def __getitem__(self, idx):
-        dataset_idx = self.dataset_index[idx]
-        sample_idx = self.dataset_sample_index[idx]
-        return self.datasets[dataset_idx][sample_idx]
-
-
 def get_datasets_weights_and_num_samples(data_prefix,
                                          train_valid_test_num_samples):
 
@@ -144,84 +87,6 @@ def get_datasets_weights_and_num_samples(data_prefix,
     return prefixes, weights, datasets_train_valid_test_num_samples
 
 
-class MMapIndexedDataset(paddle.io.Dataset):
-    def __init__(self, path, skip_warmup=False):
-        super().__init__()
-
-        self._path = path
-
-        # All documment ids, extend as 1-D array.
-
-        for suffix in ["_ids.npy", "_idx.npz"]:
-            if not os.path.isfile(path + suffix):
-                raise ValueError("File Not found, %s" % (path + suffix))
-
-        self._token_ids = np.load(
-            path + "_ids.npy", mmap_mode="r", allow_pickle=True)
-        process_datas = np.load(path + "_idx.npz")
-        self._sizes = process_datas["lens"]
-        self._pointers = np.empty(len(self._sizes) + 1, dtype=np.int64)
-        self._pointers[0] = 0
-        np.cumsum(self._sizes, out=self._pointers[1:])
-        self._doc_idx = process_datas["docs"]
-
-    def __getstate__(self):
-        return self._path
-
-    def __len__(self):
-        return len(self._sizes)
-
-    # @lru_cache(maxsize=8)
-    def __getitem__(self, idx):
-        if isinstance(idx, int):
-            size = self._sizes[idx]
-            ptr = self._pointers[idx]
-            np_array = self._token_ids[ptr:ptr + size]
-            return np_array
-
-        elif isinstance(idx, slice):
-            start, stop, step = idx.indices(len(self))
-            if step != 1:
-                raise ValueError(
-                    "Slices into indexed_dataset must be contiguous")
-            ptr = self._pointers[start]
-            sizes = self._sizes[idx]
-            offsets = list(accumulate(sizes))
-            total_size = sum(sizes)
-            np_array = self._token_ids[ptr:ptr + total_size]
-            sents = np.split(np_array, offsets[:-1])
-            return sents
-
-    def get(self, idx, offset=0, length=None):
-        """ Retrieves a single item from the dataset with the option to only
-        return a portion of the item.
-
-        get(idx) is the same as [idx] but get() does not support slicing.
-        """
-        size = self._sizes[idx]
-        ptr = self._pointers[idx]
-
-        if length is None:
-            length = size - offset
-        ptr += offset
-        np_array = self._token_ids[ptr:prt + length]
-        return np_array
-
-    @property
-    def sizes(self):
-        return self._sizes
-
-    @property
-    def doc_idx(self):
-        return self._doc_idx
-
-    def get_doc_idx(self):
-        return self._doc_idx
-
-    def set_doc_idx(self, doc_idx_):
-        self._doc_idx = doc_idx_
-
-
 def make_indexed_dataset(data_prefix, data_impl=None, skip_warmup=False):
     return MMapIndexedDataset(data_prefix)
 
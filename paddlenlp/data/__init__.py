@@ -17,3 +17,4 @@ from .data_collator import *
 from .vocab import *
 from .sampler import *
 from .tokenizer import *
+from .indexed_dataset import *
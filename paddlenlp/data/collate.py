@@ -13,6 +13,10 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import itertools
+import numbers
+from collections import OrderedDict
+
 import numpy as np
 import paddle
 
@@ -21,9 +25,66 @@ __all__ = [
     'Pad',
     'Tuple',
     'Dict',
+    'BufferPool',
 ]
 
 
+class BufferPool(object):
+    """
+    Caches output arrays of batchify functions keyed by their owner, shape
+    and dtype, so that batches with the same shape reuse one allocation
+    instead of creating a new array every time. Each `Pad` sharing a pool,
+    such as the fields of a `Tuple`, owns its buffers, thus the fields of a
+    batch never share one array.
+
+    Note that a buffer returned by the pool is overwritten by the next batch
+    of its owner with the same shape, thus the batch should be consumed (e.g.
+    converted to a Tensor, as `paddle.io.DataLoader` does) before the next
+    call.
+
+    Args:
+        max_size (int, optional): The maximum number of cached buffers. The
+            least recently used buffer is evicted when the pool is full.
+            Default: 16.
+    """
+
+    def __init__(self, max_size=16):
+        self._max_size = max_size
+        self._buffers = OrderedDict()
+
+    def get(self, shape, dtype, owner=None):
+        """
+        Returns an uninitialized array with the given shape and dtype, reusing
+        the cached one of the same owner if exists.
+
+        Args:
+            shape (tuple[int]): The shape of the array.
+            dtype (str|numpy.dtype): The data type of the array.
+            owner (hashable, optional): The consumer of the array. Consumers
+                never get the same array. Default: None.
+
+        Returns:
+            numpy.ndarray: The array with given shape and dtype.
+        """
+        key = (owner, tuple(shape), np.dtype(dtype))
+        buffer = self._buffers.pop(key, None)
+        if buffer is None:
+            buffer = np.empty(shape=key[1], dtype=key[2])
+            if len(self._buffers) >= self._max_size:
+                self._buffers.popitem(last=False)
+        self._buffers[key] = buffer
+        return buffer
+
+    def clear(self):
+        """
+        Releases all cached buffers.
+        """
+        self._buffers.clear()
+
+    def __len__(self):
+        return len(self._buffers)
+
+
 class Stack(object):
     """
     Stacks the input data samples to construct the batch. The N input samples
@@ -94,6 +155,9 @@ class Pad(object):
         pad_right (bool, optional): Whether the padding direction is right-side. 
             If True, it indicates we pad to the right side, while False indicates 
             we pad to the left side. Default: True.
+        buffer_pool (BufferPool, optional): If provided, the padded output is
+            written into a buffer taken from the pool instead of a newly 
+            allocated array. Default: None.
      """
 
     def __init__(self,
@@ -101,12 +165,60 @@ class Pad(object):
                  axis=0,
                  ret_length=None,
                  dtype=None,
-                 pad_right=True):
+                 pad_right=True,
+                 buffer_pool=None):
         self._pad_val = pad_val
         self._axis = axis
         self._ret_length = ret_length
         self._dtype = dtype
         self._pad_right = pad_right
+        self._buffer_pool = buffer_pool
+
+    def _full(self, shape, dtype):
+        if self._buffer_pool is None:
+            return np.full(shape=shape, fill_value=self._pad_val, dtype=dtype)
+        ret = self._buffer_pool.get(shape, dtype, owner=id(self))
+        ret.fill(self._pad_val)
+        return ret
+
+    def _is_flat(self, data):
+        # Samples are 1-D sequences of scalars, which is the most common case
+        # (e.g. token ids) and can be batchified without a per-sample loop.
+        if self._axis not in (0, -1):
+            return False
+        first = data[0]
+        if isinstance(first, np.ndarray):
+            return all(
+                isinstance(ele, np.ndarray) and ele.ndim == 1 for ele in data)
+        return len(first) > 0 and isinstance(
+            first[0], (numbers.Number, np.number)) and all(
+                isinstance(ele, list) for ele in data)
+
+    def _pad_flat(self, data):
+        lengths = np.fromiter(map(len, data), dtype=np.int64, count=len(data))
+        max_size = int(lengths.max())
+        dtype = self._dtype
+        if isinstance(data[0], np.ndarray):
+            if dtype is None:
+                dtype = data[0].dtype
+            values = np.concatenate(data)
+        else:
+            if dtype is None:
+                dtype = np.asarray(data[0]).dtype
+            values = np.fromiter(
+                itertools.chain.from_iterable(data),
+                dtype=dtype,
+                count=int(lengths.sum()))
+        ret = self._full((len(data), max_size), dtype)
+        positions = np.arange(max_size)
+        if self._pad_right:
+            mask = positions < lengths[:, None]
+        else:
+            mask = positions >= (max_size - lengths)[:, None]
+        # Boolean mask indexing visits elements in row-major order, which is
+        # exactly the order of the concatenated samples.
+        ret[mask] = values
+        return ret, lengths
 
     def __call__(self, data):
         """
@@ -148,16 +260,21 @@ class Pad(object):
                 data,
                 dtype=self._dtype if self._dtype is not None else np.int64)
 
+        if self._is_flat(data):
+            ret, original_length = self._pad_flat(data)
+            if self._ret_length:
+                return ret, original_length.astype(
+                    "int32" if self._ret_length == True else self._ret_length)
+            return ret
+
         arrs = [np.asarray(ele) for ele in data]
         original_length = [ele.shape[self._axis] for ele in arrs]
         max_size = max(original_length)
         ret_shape = list(arrs[0].shape)
         ret_shape[self._axis] = max_size
         ret_shape = (len(arrs), ) + tuple(ret_shape)
-        ret = np.full(
-            shape=ret_shape,
-            fill_value=self._pad_val,
-            dtype=arrs[0].dtype if self._dtype is None else self._dtype)
+        ret = self._full(ret_shape,
+                         arrs[0].dtype if self._dtype is None else self._dtype)
         for i, arr in enumerate(arrs):
             if arr.shape[self._axis] == max_size:
                 ret[i] = arr
@@ -251,8 +368,10 @@ class Tuple(object):
             'The number of attributes in each data sample should contain' \
             ' {} elements'.format(len(self._fn))
         ret = []
-        for i, ele_fn in enumerate(self._fn):
-            result = ele_fn([ele[i] for ele in data])
+        # Transpose samples into fields in a single pass.
+        fields = zip(*data)
+        for ele_fn, field in zip(self._fn, fields):
+            result = ele_fn(list(field))
             if isinstance(result, (tuple, list)):
                 ret.extend(result)
             else:
@@ -0,0 +1,600 @@
+# Copyright (c) 2020, NVIDIA CORPORATION.
+# Copyright (c) 2022 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Memory-mapped token datasets for pretraining, compatible with the files made by
+`examples/language_model/data_tools/create_pretraining_data.py`:
+
+- `<prefix>_ids.npy`: token ids of all sentences, concatenated as a 1-D array.
+- `<prefix>_idx.npz`: `lens`, the number of tokens of every sentence, and
+  `docs`, the cumulative number of sentences of every document (starting
+  with 0).
+
+The files can be built in parallel by:
+
+    python -m paddlenlp.data.indexed_dataset --model_name gpt2-en \\
+        --input_path ./corpus.jsonl --output_prefix ./corpus --workers 8
+"""
+
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+import paddle
+
+from ..utils.log import logger
+
+__all__ = [
+    'MMapIndexedDataset',
+    'MMapIndexedDatasetBuilder',
+    'build_indexed_dataset',
+    'BlendableDataset',
+    'PackedSequenceDataset',
+]
+
+_NPY_HEADER_SIZE = 128
+
+
+def _local_rank():
+    return int(os.getenv("PADDLE_RANK_IN_NODE", 0))
+
+
+def _save_npy_atomic(filename, array):
+    # Readers wait for the file to exist, so it only appears when complete.
+    tmp_filename = "{}.tmp.{}".format(filename, os.getpid())
+    with open(tmp_filename, "wb") as f:
+        np.save(f, array, allow_pickle=False)
+    os.replace(tmp_filename, filename)
+
+
+def _wait_for_files(filenames, interval=3):
+    while not all(os.path.isfile(filename) for filename in filenames):
+        time.sleep(interval)
+
+
+class MMapIndexedDataset(paddle.io.Dataset):
+    """
+    Reads the sentences saved under `prefix` without loading the token ids
+    into memory. Each item is a zero-copy `numpy.ndarray` of token ids of a
+    sentence.
+
+    Args:
+        prefix (str): The prefix of the `_ids.npy` and `_idx.npz` files.
+    """
+
+    def __init__(self, prefix):
+        super(MMapIndexedDataset, self).__init__()
+        for suffix in ["_ids.npy", "_idx.npz"]:
+            if not os.path.isfile(prefix + suffix):
+                raise ValueError("File Not found, %s" % (prefix + suffix))
+        self._prefix = prefix
+        self._token_ids = np.load(prefix + "_ids.npy", mmap_mode="r")
+        index = np.load(prefix + "_idx.npz")
+        self._sizes = index["lens"]
+        self._doc_idx = index["docs"]
+        self._pointers = np.zeros(len(self._sizes) + 1, dtype=np.int64)
+        np.cumsum(self._sizes, out=self._pointers[1:])
+
+    def __getstate__(self):
+        return self._prefix
+
+    def __setstate__(self, prefix):
+        self.__init__(prefix)
+
+    def __len__(self):
+        return len(self._sizes)
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            start, stop, step = idx.indices(len(self))
+            if step != 1:
+                raise ValueError(
+                    "Slices into indexed_dataset must be contiguous")
+            tokens = self._token_ids[self._pointers[start]:self._pointers[
+                stop]]
+            return np.split(tokens,
+                            self._pointers[start + 1:stop] -
+                            self._pointers[start])
+        return self._token_ids[self._pointers[idx]:self._pointers[idx + 1]]
+
+    def get(self, idx, offset=0, length=None):
+        """
+        Retrieves a part of the sentence at `idx`.
+
+        Args:
+            idx (int): The index of the sentence.
+            offset (int, optional): The start position in the sentence.
+                Defaults to 0.
+            length (int, optional): The number of tokens to retrieve. If None,
+                all tokens after `offset` are retrieved. Defaults to None.
+
+        Returns:
+            numpy.ndarray: The token ids.
+        """
+        ptr = self._pointers[idx] + offset
+        if length is None:
+            length = self._sizes[idx] - offset
+        return self._token_ids[ptr:ptr + length]
+
+    def get_tokens(self, start, end):
+        """
+        Returns the token ids in `[start, end)` counted over all sentences.
+        """
+        return self._token_ids[start:end]
+
+    @property
+    def prefix(self):
+        return self._prefix
+
+    @property
+    def sizes(self):
+        """
+        The number of tokens of every sentence.
+        """
+        return self._sizes
+
+    @property
+    def pointers(self):
+        """
+        The start position of every sentence in the token ids, with the total
+        number of tokens appended.
+        """
+        return self._pointers
+
+    @property
+    def doc_idx(self):
+        """
+        The cumulative number of sentences of every document.
+        """
+        return self._doc_idx
+
+    def get_doc_idx(self):
+        return self._doc_idx
+
+    def set_doc_idx(self, doc_idx):
+        self._doc_idx = doc_idx
+
+
+class MMapIndexedDatasetBuilder(object):
+    """
+    Writes documents to the files read by `MMapIndexedDataset`. Token ids are
+    streamed to disk, thus the memory usage does not grow with the corpus.
+
+    Args:
+        prefix (str): The prefix of the output files.
+        dtype (numpy.dtype, optional): The data type of token ids. Use
+            `numpy.uint16` if the vocabulary has less than 65535 tokens to
+            halve the file size. Defaults to `numpy.int32`.
+    """
+
+    def __init__(self, prefix, dtype=np.int32):
+        self._prefix = prefix
+        self._dtype = np.dtype(dtype)
+        self._ids_file = open(prefix + "_ids.npy", "wb")
+        # Reserve the header of the npy file, which is written at the end when
+        # the number of tokens is known.
+        self._ids_file.write(b"\x00" * _NPY_HEADER_SIZE)
+        self._num_tokens = 0
+        self._sizes = []
+        self._doc_idx = [0]
+
+    def add_document(self, sentences):
+        """
+        Appends a document.
+
+        Args:
+            sentences (list[list[int]]): The token ids of every sentence of the
+                document. Empty sentences are skipped.
+        """
+        for sentence in sentences:
+            if len(sentence) == 0:
+                continue
+            self._ids_file.write(
+                np.asarray(
+                    sentence, dtype=self._dtype).tobytes(order='C'))
+            self._sizes.append(len(sentence))
+            self._num_tokens += len(sentence)
+        self._doc_idx.append(len(self._sizes))
+
+    def finalize(self):
+        """
+        Writes the index and completes the files.
+        """
+        header = {
+            'descr': np.lib.format.dtype_to_descr(self._dtype),
+            'fortran_order': False,
+            'shape': (self._num_tokens, ),
+        }
+        header = repr(header).encode("latin1")
+        # Magic string, version 1.0 and the length of the header.
+        preamble = b"\x93NUMPY\x01\x00"
+        header_len = _NPY_HEADER_SIZE - len(preamble) - 2
+        header = header.ljust(header_len - 1) + b"\n"
+        self._ids_file.seek(0)
+        self._ids_file.write(preamble + np.uint16(header_len).tobytes() +
+                             header)
+        self._ids_file.close()
+        np.savez(
+            self._prefix + "_idx.npz",
+            lens=np.asarray(
+                self._sizes, dtype=np.int32),
+            docs=np.asarray(
+                self._doc_idx, dtype=np.int64))
+
+
+_worker_encode = None
+
+
+def _init_encode_worker(tokenizer, json_key, split_sentences, append_eos):
+    global _worker_encode
+
+    def encode(line):
+        text = json.loads(line)[json_key]
+        sentences = text.split("\n") if split_sentences else [text]
+        doc = [
+            tokenizer.convert_tokens_to_ids(tokenizer.tokenize(sentence))
+            for sentence in sentences if sentence.strip()
+        ]
+        doc = [sentence for sentence in doc if len(sentence) > 0]
+        if doc and append_eos:
+            doc[-1].append(tokenizer.eos_token_id)
+        return doc, len(line)
+
+    _worker_encode = encode
+
+
+def _encode_line(line):
+    return _worker_encode(line)
+
+
+def build_indexed_dataset(input_files,
+                          output_prefix,
+                          tokenizer,
+                          json_key="text",
+                          split_sentences=False,
+                          append_eos=False,
+                          workers=1,
+                          chunksize=256,
+                          log_interval=10000):
+    """
+    Tokenizes JSON lines files in parallel and writes the token ids to the
+    files read by `MMapIndexedDataset`.
+
+    Args:
+        input_files (list[str]): The input files. Each line is a JSON object
+            of a document.
+        output_prefix (str): The prefix of the output files.
+        tokenizer (PretrainedTokenizer): The tokenizer used to encode texts.
+        json_key (str, optional): The key of the text in the JSON objects.
+            Defaults to "text".
+        split_sentences (bool, optional): Whether to split documents into
+            sentences by line breaks. Defaults to False.
+        append_eos (bool, optional): Whether to append the eos token to the end
+            of each document. Defaults to False.
+        workers (int, optional): The number of tokenization processes.
+            Defaults to 1.
+        chunksize (int, optional): The number of lines sent to a process at
+            once. Defaults to 256.
+        log_interval (int, optional): The number of documents between progress
+            logs. Defaults to 10000.
+    """
+    from multiprocess import Pool
+
+    dtype = np.uint16 if len(tokenizer) < 2**16 - 1 else np.int32
+    builder = MMapIndexedDatasetBuilder(output_prefix, dtype=dtype)
+    initargs = (tokenizer, json_key, split_sentences, append_eos)
+    pool = Pool(workers, initializer=_init_encode_worker, initargs=initargs)
+    start_time = time.time()
+    num_docs, num_bytes = 0, 0
+    try:
+        for input_file in sorted(input_files):
+            with open(input_file, "r", encoding="utf-8") as f:
+                # imap keeps the order of documents and only a bounded number
+                # of chunks in flight.
+                for doc, doc_bytes in pool.imap(_encode_line, f, chunksize):
+                    num_docs += 1
+                    num_bytes += doc_bytes
+                    if doc:
+                        builder.add_document(doc)
+                    if num_docs % log_interval == 0:
+                        elapsed = time.time() - start_time
+                        logger.info(
+                            "Processed %d documents (%.2f docs/s, %.4f MB/s)." %
+                            (num_docs, num_docs / elapsed,
+                             num_bytes / elapsed / 1024 / 1024))
+    finally:
+        pool.close()
+        pool.join()
+    builder.finalize()
+    logger.info("Saved %d documents to %s_ids.npy and %s_idx.npz." %
+                (num_docs, output_prefix, output_prefix))
+
+
+def _blending_indices(weights, size):
+    # Every dataset gets its share of samples, rounded such that the total is
+    # `size`, and its samples are spread evenly in the blended order.
+    counts = np.floor(weights * size).astype(np.int64)
+    remainder = size - counts.sum()
+    if remainder > 0:
+        fractions = weights * size - counts
+        counts[np.argsort(-fractions, kind="stable")[:remainder]] += 1
+    dataset_index = np.repeat(
+        np.arange(
+            len(weights), dtype=np.uint8), counts)
+    dataset_sample_index = np.concatenate(
+        [np.arange(
+            count, dtype=np.int64) for count in counts])
+    positions = np.concatenate([(np.arange(count) + 0.5) / count
+                                for count in counts if count > 0] or
+                               [np.zeros(0)])
+    order = np.argsort(positions, kind="stable")
+    return dataset_index[order], dataset_sample_index[order]
+
+
+class BlendableDataset(paddle.io.Dataset):
+    """
+    Mixes several datasets by weights. Samples of each dataset are spread
+    evenly in the blended dataset, so that any contiguous range of it follows
+    the weights.
+
+    Args:
+        datasets (list[paddle.io.Dataset]): The datasets to mix.
+        weights (list[float]): The weight of each dataset, which will be
+            normalized.
+        size (int, optional): The number of samples of the blended dataset.
+            If None, it is the total size of all datasets. Datasets with less
+            samples than their share are iterated repeatedly. Defaults to None.
+    """
+
+    def __init__(self, datasets, weights, size=None):
+        assert len(datasets) == len(weights)
+        assert len(datasets) < 255
+        self.datasets = datasets
+        weights = np.array(weights, dtype=np.float64)
+        assert weights.sum() > 0.0
+        self.weights = weights / weights.sum()
+        self.size = sum(len(dataset) for dataset in datasets
+                        ) if size is None else size
+
+        start_time = time.time()
+        self.dataset_index, self.dataset_sample_index = _blending_indices(
+            self.weights, self.size)
+        logger.info('Elapsed time for building blendable dataset indices: '
+                    '{:.2f} (sec)'.format(time.time() - start_time))
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, idx):
+        dataset = self.datasets[self.dataset_index[idx]]
+        return dataset[self.dataset_sample_index[idx] % len(dataset)]
+
+
+def _num_epochs(tokens_per_epoch, seq_length, num_samples):
+    num_epochs = 0
+    total_tokens = 0
+    while True:
+        num_epochs += 1
+        total_tokens += tokens_per_epoch
+        if ((total_tokens - 1) // seq_length) >= num_samples:
+            return num_epochs
+
+
+def _build_doc_idx(documents, num_epochs, np_rng, separate_last_epoch):
+    if not separate_last_epoch or num_epochs == 1:
+        doc_idx = np.tile(
+            np.asarray(
+                documents, dtype=np.int32), num_epochs)
+        np_rng.shuffle(doc_idx)
+        return doc_idx
+    doc_idx_first = _build_doc_idx(documents, num_epochs - 1, np_rng, False)
+    doc_idx_last = _build_doc_idx(documents, 1, np_rng, False)
+    return np.concatenate((doc_idx_first, doc_idx_last))
+
+
+def build_sample_idx(sizes, doc_idx, seq_length, num_epochs, tokens_per_epoch):
+    """
+    Returns the `(num_samples + 1, 2)` array of the start `(index of doc_idx,
+    offset in the document)` of every sample, where samples are windows of
+    `seq_length + 1` tokens over the documents in `doc_idx`, overlapping by one
+    token.
+    """
+    num_samples = (num_epochs * tokens_per_epoch - 1) // seq_length
+    doc_ends = np.cumsum(sizes[doc_idx], dtype=np.int64)
+    positions = np.arange(num_samples + 1, dtype=np.int64) * seq_length
+    doc_index = np.searchsorted(doc_ends, positions, side="right")
+    # The last sample ends exactly at the end of the last document.
+    doc_index = np.minimum(doc_index, len(doc_idx) - 1)
+    doc_starts = doc_ends[doc_index] - sizes[doc_idx[doc_index]]
+    sample_idx = np.empty([num_samples + 1, 2], dtype=np.int32)
+    sample_idx[:, 0] = doc_index
+    sample_idx[:, 1] = positions - doc_starts
+    return sample_idx
+
+
+def _build_shuffle_idx(num_samples, total_size, np_rng):
+    dtype = np.uint32
+    if total_size >= (np.iinfo(np.uint32).max - 1):
+        dtype = np.int64
+    shuffle_idx_first = np.arange(num_samples, dtype=dtype)
+    np_rng.shuffle(shuffle_idx_first)
+    if num_samples == total_size:
+        return shuffle_idx_first
+    shuffle_idx_last = np.arange(num_samples, total_size, dtype=dtype)
+    np_rng.shuffle(shuffle_idx_last)
+    return np.concatenate((shuffle_idx_first, shuffle_idx_last))
+
+
+def build_index_mappings(name, indexed_dataset, documents, num_samples,
+                         seq_length, seed):
+    """
+    Builds the doc-idx, sample-idx and shuffle-idx mappings of
+    `PackedSequenceDataset` on the first local rank, caches them next to the
+    data files and memory-maps them on all ranks.
+    """
+    sizes = indexed_dataset.sizes
+    tokens_per_epoch = int(np.sum(sizes[documents]))
+    num_epochs = _num_epochs(tokens_per_epoch, seq_length, num_samples)
+
+    filename = indexed_dataset.prefix
+    filename += '_{}_indexmap'.format(name)
+    filename += '_{}ns'.format(num_samples)
+    filename += '_{}sl'.format(seq_length)
+    filename += '_{}s'.format(seed)
+    doc_idx_filename = filename + '_doc_idx.npy'
+    sample_idx_filename = filename + '_sample_idx.npy'
+    shuffle_idx_filename = filename + '_shuffle_idx.npy'
+    filenames = [doc_idx_filename, sample_idx_filename, shuffle_idx_filename]
+
+    if _local_rank() == 0 and not all(
+            os.path.isfile(filename) for filename in filenames):
+        np_rng = np.random.RandomState(seed=seed)
+        separate_last_epoch = False
+        if num_epochs > 1:
+            num_samples_from_epochs_minus_one = (
+                (num_epochs - 1) * tokens_per_epoch - 1) // seq_length
+            last_epoch_num_samples = num_samples - num_samples_from_epochs_minus_one
+            num_samples_per_epoch = (tokens_per_epoch - 1) // seq_length
+            separate_last_epoch = (
+                last_epoch_num_samples < int(0.80 * num_samples_per_epoch))
+
+        start_time = time.time()
+        doc_idx = _build_doc_idx(documents, num_epochs, np_rng,
+                                 separate_last_epoch)
+        sample_idx = build_sample_idx(sizes, doc_idx, seq_length, num_epochs,
+                                      tokens_per_epoch)
+        if separate_last_epoch:
+            num_samples_ = num_samples_from_epochs_minus_one
+        else:
+            num_samples_ = sample_idx.shape[0] - 1
+        shuffle_idx = _build_shuffle_idx(num_samples_, sample_idx.shape[0] - 1,
+                                         np_rng)
+        # The shuffle-idx is saved last, whose existence means all are saved.
+        _save_npy_atomic(doc_idx_filename, doc_idx)
+        _save_npy_atomic(sample_idx_filename, sample_idx)
+        _save_npy_atomic(shuffle_idx_filename, shuffle_idx)
+        logger.info('Elapsed time to build and save index mappings of {}: '
+                    '{:.2f} (sec)'.format(name, time.time() - start_time))
+    else:
+        _wait_for_files(filenames)
+
+    return [np.load(filename, mmap_mode='r') for filename in filenames]
+
+
+class PackedSequenceDataset(paddle.io.Dataset):
+    """
+    Packs the documents of a `MMapIndexedDataset` into fixed length samples for
+    language model pretraining, crossing document boundaries. The sample
+    mappings are cached as files, so later runs and other ranks load them
+    directly. Each item is a dict of `input_ids` and `labels`, which can be
+    used by `Trainer` with `default_data_collator`.
+
+    Args:
+        indexed_dataset (MMapIndexedDataset): The token ids of documents.
+        num_samples (int): The number of samples. Documents are repeated over
+            epochs if they are not enough.
+        seq_length (int): The length of every sample.
+        seed (int, optional): The random seed to shuffle documents and samples.
+            Defaults to 1234.
+        documents (numpy.ndarray, optional): The indices of sentences of
+            `indexed_dataset` to use, such as a train split. If None, all
+            sentences are used. Defaults to None.
+        name (str, optional): The name used in the cache file names.
+            Defaults to "train".
+    """
+
+    def __init__(self,
+                 indexed_dataset,
+                 num_samples,
+                 seq_length,
+                 seed=1234,
+                 documents=None,
+                 name="train"):
+        self.indexed_dataset = indexed_dataset
+        self.seq_length = seq_length
+        if documents is None:
+            documents = np.arange(len(indexed_dataset), dtype=np.int32)
+        self.doc_idx, self.sample_idx, self.shuffle_idx = build_index_mappings(
+            name, indexed_dataset, documents, num_samples, seq_length, seed)
+
+    def __len__(self):
+        return self.shuffle_idx.shape[0]
+
+    def get_tokens(self, index):
+        """
+        Returns the `seq_length + 1` token ids of the sample at `index`.
+        """
+        idx = self.shuffle_idx[index]
+        doc_index_f, offset_f = self.sample_idx[idx]
+        doc_index_l, offset_l = self.sample_idx[idx + 1]
+        pointers = self.indexed_dataset.pointers
+        if doc_index_f == doc_index_l:
+            start = pointers[self.doc_idx[doc_index_f]]
+            return np.array(
+                self.indexed_dataset.get_tokens(start + offset_f,
+                                                start + offset_l + 1),
+                dtype=np.int64)
+        tokens = [self.indexed_dataset.get(self.doc_idx[doc_index_f], offset_f)]
+        for i in range(doc_index_f + 1, doc_index_l):
+            tokens.append(self.indexed_dataset[self.doc_idx[i]])
+        tokens.append(
+            self.indexed_dataset.get(
+                self.doc_idx[doc_index_l], length=offset_l + 1))
+        return np.concatenate(tokens).astype(np.int64)
+
+    def __getitem__(self, index):
+        tokens = self.get_tokens(index)
+        return {"input_ids": tokens[:-1], "labels": tokens[1:]}
+
+
+def main():
+    # yapf: disable
+    parser = argparse.ArgumentParser(description="Tokenizes JSON lines files into memory-mapped indexed datasets.")
+    parser.add_argument("--model_name", type=str, required=True, help="The name or path of the pretrained tokenizer.")
+    parser.add_argument("--input_path", type=str, required=True, help="Path to an input file or a directory of input files.")
+    parser.add_argument("--output_prefix", type=str, required=True, help="Output prefix of the dataset files.")
+    parser.add_argument("--json_key", type=str, default="text", help="The key of the text in the JSON objects.")
+    parser.add_argument("--split_sentences", action="store_true", help="Split documents into sentences by line breaks.")
+    parser.add_argument("--append_eos", action="store_true", help="Append an <eos> token to the end of a document.")
+    parser.add_argument("--workers", type=int, default=1, help="Number of worker processes to launch.")
+    parser.add_argument("--log_interval", type=int, default=10000, help="Interval between progress updates.")
+    args = parser.parse_args()
+    # yapf: enable
+
+    from ..transformers import AutoTokenizer
+
+    if os.path.isfile(args.input_path):
+        input_files = [args.input_path]
+    else:
+        input_files = [
+            os.path.join(root, f)
+            for root, _, files in os.walk(args.input_path) for f in files
+            if f.endswith(".jsonl") or f.endswith(".json")
+        ]
+    tokenizer = AutoTokenizer.from_pretrained(args.model_name)
+    build_indexed_dataset(
+        input_files,
+        args.output_prefix,
+        tokenizer,
+        json_key=args.json_key,
+        split_sentences=args.split_sentences,
+        append_eos=args.append_eos,
+        workers=args.workers,
+        log_interval=args.log_interval)
+
+
+if __name__ == "__main__":
+    main()
@@ -13,6 +13,7 @@
 # limitations under the License.
 
 from .dataset import *
+from .feature_cache import *
 from .chnsenticorp import *
 from .cmrc2018 import *
 from .drcd import *
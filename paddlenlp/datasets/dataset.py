@@ -17,6 +17,7 @@ import collections
 import io
 import math
 import os
+import queue
 import warnings
 import sys
 import inspect
@@ -36,6 +37,9 @@ from paddle.io import Dataset, IterableDataset
 from paddle.dataset.common import md5file
 from paddle.utils.download import get_path_from_url, _get_unique_endpoints
 from paddlenlp.utils.env import DATA_HOME
+from .feature_cache import (MMapFeatures, commit_features, fingerprint_data,
+                            fingerprint_file, fingerprint_update, is_committed,
+                            save_features)
 from typing import Iterable, Iterator, Optional, List, Any, Callable, Union
 import importlib
 from functools import partial
@@ -244,6 +248,8 @@ class MapDataset(Dataset):
         data (list|Dataset): An object with `__getitem__` and `__len__` methods. It could 
             be a list or a subclass of `paddle.io.Dataset`.
         kwargs (dict, optional): Other information to be passed to the dataset. 
+            `fingerprint` can be given to identify the data when caching the
+            results of `map`, otherwise it is computed from the data on demand.
 
     For examples of this class, please see `dataset_self_defined 
     <https://paddlenlp.readthedocs.io/zh/latest/data_prepare/dataset_self_defined.html>`__.
@@ -257,6 +263,20 @@ class MapDataset(Dataset):
         self.info = kwargs
         self.label_list = self.info.pop('label_list', None)
         self.vocab_info = self.info.pop('vocab_info', None)
+        self._fingerprint = self.info.pop('fingerprint', None)
+
+    @property
+    def fingerprint(self):
+        """
+        The fingerprint identifying the current data (excluding lazy
+        transformations), which is updated by `filter`, `shard` and `map`.
+        """
+        if self._fingerprint is None:
+            if isinstance(self.new_data, MMapFeatures):
+                self._fingerprint = self.new_data.fingerprint
+            else:
+                self._fingerprint = fingerprint_data(self.new_data)
+        return self._fingerprint
 
     def _transform(self, data):
         for fn in self._transform_pipline:
@@ -289,6 +309,9 @@ class MapDataset(Dataset):
                 set to 0, it doesn't use multiprocessing. Defaults to `0`.
         """
         assert num_workers >= 0, "num_workers should be a non-negative value"
+        if self._fingerprint is not None:
+            self._fingerprint = fingerprint_update(self._fingerprint, "filter",
+                                                   fn)
         if num_workers > 1:
             shards = [
                 self._shard(
@@ -325,6 +348,9 @@ class MapDataset(Dataset):
         return self
 
     def shard(self, num_shards=None, index=None, contiguous=False):
+        if self._fingerprint is not None:
+            self._fingerprint = fingerprint_update(
+                self._fingerprint, "shard", num_shards, index, contiguous)
         self.new_data = self._shard(
             num_shards=num_shards, index=index, contiguous=contiguous).data
         return self
@@ -366,7 +392,12 @@ class MapDataset(Dataset):
 
         return MapDataset(new_data)
 
-    def map(self, fn, lazy=True, batched=False, num_workers=0):
+    def map(self,
+            fn,
+            lazy=True,
+            batched=False,
+            num_workers=0,
+            cache_dir=None):
         """
         Performs specific function on the dataset to transform and update every sample.
 
@@ -383,9 +414,22 @@ class MapDataset(Dataset):
             num_workers(int, optional): Number of processes for multiprocessing. If 
                 set to 0, it doesn't use multiprocessing. Note that if set to positive
                 value, `lazy` option would be ignored. Defaults to 0.
+            cache_dir (str, optional): If set, the transformed samples are saved
+                to a columnar file under `cache_dir`, keyed by the fingerprint of
+                the data and `fn`, and memory-mapped back instead of being held
+                in memory. Later calls with the same data and `fn` reopen the
+                file without transforming again. Numeric sequence fields are
+                returned as `numpy.ndarray`. Note that if set, `lazy` option
+                would be ignored. Defaults to None.
         """
 
         assert num_workers >= 0, "num_workers should be a non-negative value"
+        if cache_dir is not None:
+            return self._map_with_cache(fn, batched, num_workers, cache_dir)
+        if self._fingerprint is not None and (batched or not lazy or
+                                              num_workers > 1):
+            self._fingerprint = fingerprint_update(self._fingerprint, "map",
+                                                   fn, batched)
         if num_workers > 1:
             shards = [
                 self._shard(
@@ -412,6 +456,56 @@ class MapDataset(Dataset):
         else:
             return self._map(fn, lazy=lazy, batched=batched)
 
+    def _map_with_cache(self, fn, batched, num_workers, cache_dir):
+        fingerprint = fingerprint_update(self.fingerprint, "map", fn, batched)
+        cache_dir = os.path.expanduser(cache_dir)
+        path = os.path.join(cache_dir, fingerprint)
+        if not is_committed(path):
+            # Write to a private directory first, so that concurrent processes
+            # never read partially written features.
+            tmp_path = "{}.tmp.{}.{}".format(path, os.getpid(),
+                                             int(time.time() * 1000))
+            num_shards = max(num_workers, 1)
+            shard_names = [
+                "shard-{:05d}".format(index) for index in range(num_shards)
+            ]
+            if num_shards > 1:
+                shards = [
+                    self._shard(
+                        num_shards=num_shards, index=index, contiguous=True)
+                    for index in range(num_shards)
+                ]
+                pool = Pool(num_shards, initargs=(RLock(), ))
+                # Each worker writes its own shard, so that transformed samples
+                # never go back through the parent process.
+                results = [
+                    pool.apply_async(
+                        self.__class__._map_and_save,
+                        kwds=dict(
+                            self=shards[index],
+                            fn=fn,
+                            batched=batched,
+                            path=os.path.join(tmp_path, shard_names[index])))
+                    for index in range(num_shards)
+                ]
+                shard_sizes = [r.get() for r in results]
+                pool.close()
+                pool.join()
+            else:
+                shard_sizes = [
+                    MapDataset(self.new_data)._map_and_save(
+                        fn, batched, os.path.join(tmp_path, shard_names[0]))
+                ]
+            commit_features(tmp_path, path, shard_names, shard_sizes,
+                            fingerprint)
+        self.new_data = MMapFeatures(path)
+        self._fingerprint = fingerprint
+        return self
+
+    def _map_and_save(self, fn, batched, path):
+        self._map(fn, lazy=False, batched=batched)
+        return save_features(self.new_data, path)
+
     def _map(self, fn, lazy=True, batched=False):
         if batched:
             self.new_data = fn(self.new_data)
@@ -447,11 +541,6 @@ class IterDataset(IterableDataset):
         self.label_list = kwargs.pop('label_list', None)
         self.vocab_info = kwargs.pop('vocab_info', None)
 
-    def _transform(self, data):
-        for fn in self._transform_pipline:
-            data = fn(data)
-        return data
-
     def _shard_filter(self, num_samples):
         return True
 
@@ -461,31 +550,48 @@ class IterDataset(IterableDataset):
                 return False
         return True
 
-    def __iter__(self):
-        """
-        yields sample sequentially.
-        """
+    def _read_examples(self):
         num_samples = 0
         if inspect.isfunction(self.data):
-            for example in self.data():
-                if (not self._filter_pipline or
-                        self._filter(self._filter_pipline)
-                    ) and self._shard_filter(num_samples=num_samples):
-                    yield self._transform(
-                        example) if self._transform_pipline else example
-                num_samples += 1
+            data = self.data()
         else:
             if inspect.isgenerator(self.data):
                 warnings.warn(
                     'Reciving generator as data source, data can only be iterated once'
                 )
-            for example in self.data:
-                if (not self._filter_pipline or
-                        self._filter(self._filter_pipline)
-                    ) and self._shard_filter(num_samples=num_samples):
-                    yield self._transform(
-                        example) if self._transform_pipline else example
-                num_samples += 1
+            data = self.data
+        for example in data:
+            if (not self._filter_pipline or self._filter(example)
+                ) and self._shard_filter(num_samples=num_samples):
+                yield example
+            num_samples += 1
+
+    def __iter__(self):
+        """
+        yields sample sequentially.
+        """
+        examples = self._read_examples()
+        fns = []
+        for fn in self._transform_pipline:
+            if isinstance(fn, _StreamingMap):
+                # Per-sample transformations before a streaming map are applied
+                # in the reading process, then fed to the streaming map.
+                examples = fn(self._apply_fns(examples, fns))
+                fns = []
+            else:
+                fns.append(fn)
+        for example in self._apply_fns(examples, fns):
+            yield example
+
+    def _apply_fns(self, examples, fns):
+        if not fns:
+            return examples
+        return (self._transform_fns(example, fns) for example in examples)
+
+    def _transform_fns(self, example, fns):
+        for fn in fns:
+            example = fn(example)
+        return example
 
     def filter(self, fn):
         """
@@ -528,20 +634,145 @@ class IterDataset(IterableDataset):
         self._shard_filter = fn
         return self
 
-    def map(self, fn):
+    def map(self,
+            fn,
+            batched=False,
+            num_workers=0,
+            batch_size=64,
+            max_in_flight=None,
+            ordered=True):
         """
         Performs specific function on the dataset to transform and update every sample.
 
         Args:
             fn (callable): Transformations to be performed. It receives single
-                sample as argument.
+                sample as argument if batched is False. Else it receives a list
+                of at most `batch_size` samples and returns a list of
+                transformed samples.
+            batched (bool, optional): If True, transformations would take a
+                batch of samples as input. Defaults to False.
+            num_workers (int, optional): Number of processes to perform the
+                transformation in parallel while streaming. If set to 0 or 1, it
+                transforms samples in the reading process. Note that the worker
+                processes can not be created inside the worker processes of
+                `paddle.io.DataLoader`. Defaults to 0.
+            batch_size (int, optional): Number of samples sent to a worker
+                process at once, and the batch size of `fn` if `batched` is
+                True. Defaults to 64.
+            max_in_flight (int, optional): Maximum number of batches being
+                transformed or waiting to be consumed, which bounds the memory
+                usage. If None, it is `2 * num_workers`. Defaults to None.
+            ordered (bool, optional): Whether to yield the transformed samples
+                in the order of the source. If False, batches are yielded as
+                soon as they are transformed. Defaults to True.
         """
-
+        assert num_workers >= 0, "num_workers should be a non-negative value"
+        if batched or num_workers > 1:
+            fn = _StreamingMap(
+                fn,
+                batched=batched,
+                num_workers=num_workers,
+                batch_size=batch_size,
+                max_in_flight=max_in_flight,
+                ordered=ordered)
         self._transform_pipline.append(fn)
 
         return self
 
 
+_worker_transform = None
+
+
+def _init_streaming_worker(transform):
+    global _worker_transform
+    _worker_transform = transform
+
+
+def _transform_in_worker(examples):
+    return _worker_transform(examples)
+
+
+class _StreamingMap(object):
+    """
+    Transforms a stream of samples batch by batch, optionally in a process pool
+    with a bounded number of batches in flight.
+    """
+
+    def __init__(self, fn, batched, num_workers, batch_size, max_in_flight,
+                 ordered):
+        assert batch_size > 0, "batch_size should be a positive value"
+        self.fn = fn
+        self.batched = batched
+        self.num_workers = num_workers
+        self.batch_size = batch_size
+        self.max_in_flight = max_in_flight or 2 * max(num_workers, 1)
+        self.ordered = ordered
+
+    def _transform(self, examples):
+        if self.batched:
+            return self.fn(examples)
+        return [self.fn(example) for example in examples]
+
+    def _batches(self, examples):
+        batch = []
+        for example in examples:
+            batch.append(example)
+            if len(batch) == self.batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def _submit(self, pool, batch, done):
+        if self.ordered:
+            return pool.apply_async(_transform_in_worker, (batch, ))
+        # The transformed batch, or the error raised, is put into `done` as
+        # soon as it is ready.
+        return pool.apply_async(
+            _transform_in_worker, (batch, ),
+            callback=done.put,
+            error_callback=done.put)
+
+    def _pop(self, pending, done):
+        # If not ordered, `pending` only counts the batches in flight, and the
+        # first batch done is returned.
+        result = pending.popleft()
+        if self.ordered:
+            return result.get()
+        result = done.get()
+        if isinstance(result, BaseException):
+            raise result
+        return result
+
+    def __call__(self, examples):
+        if self.num_workers <= 1:
+            for batch in self._batches(examples):
+                for example in self._transform(batch):
+                    yield example
+            return
+
+        # `fn` is sent to each worker once when it starts, and only samples are
+        # sent for each batch.
+        pool = Pool(
+            self.num_workers,
+            initializer=_init_streaming_worker,
+            initargs=(self._transform, ))
+        pending = collections.deque()
+        done = queue.Queue()
+        try:
+            for batch in self._batches(examples):
+                pending.append(self._submit(pool, batch, done))
+                if len(pending) >= self.max_in_flight:
+                    for example in self._pop(pending, done):
+                        yield example
+            while pending:
+                for example in self._pop(pending, done):
+                    yield example
+        finally:
+            pool.terminate()
+            pool.join()
+
+
 class DatasetBuilder:
     """
     A base class for all DatasetBuilder. It provides a `read()` function to turn 
@@ -771,8 +1002,15 @@ class DatasetBuilder:
                         examples[idx][label_col] = _convert_label_to_id(
                             examples[idx][label_col], label_dict)
 
+            fingerprint = None
+            if isinstance(filename, str) and os.path.isfile(filename):
+                fingerprint = fingerprint_file(
+                    filename, self.__class__.__name__, self.name, split)
             return MapDataset(
-                examples, label_list=label_list, vocab_info=vocab_info)
+                examples,
+                label_list=label_list,
+                vocab_info=vocab_info,
+                fingerprint=fingerprint)
 
     def _read(self, filename: str, *args):
         """
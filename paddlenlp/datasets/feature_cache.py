@@ -0,0 +1,303 @@
+# Copyright (c) 2022 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import bisect
+import hashlib
+import itertools
+import json
+import os
+import pickle
+import shutil
+import uuid
+import warnings
+
+import numpy as np
+
+__all__ = ['MMapFeatures', 'save_features']
+
+META_FILE = "meta.json"
+COLUMNS_FILE = "columns.json"
+FORMAT_VERSION = 1
+
+
+def fingerprint_update(fingerprint, *items):
+    """
+    Derives a new fingerprint from `fingerprint` and `items`. Callables are
+    hashed by their serialized code and closure.
+    """
+    hasher = hashlib.md5()
+    hasher.update(str(fingerprint).encode("utf-8"))
+    for item in items:
+        if callable(item):
+            try:
+                import dill
+                item = dill.dumps(item, recurse=True)
+            except Exception:
+                warnings.warn(
+                    "Transform {} can not be serialized, its results would "
+                    "not be reused by other runs.".format(item))
+                item = uuid.uuid4().hex
+        if not isinstance(item, bytes):
+            item = repr(item).encode("utf-8")
+        hasher.update(item)
+    return hasher.hexdigest()
+
+
+def fingerprint_data(data):
+    """
+    Computes the fingerprint of in-memory samples.
+    """
+    hasher = hashlib.md5()
+    for example in data:
+        hasher.update(pickle.dumps(example, protocol=4))
+    return hasher.hexdigest()
+
+
+def fingerprint_file(filename, *items):
+    """
+    Computes the fingerprint of a data file from its path, size and
+    modification time, without reading the content.
+    """
+    stat = os.stat(filename)
+    return fingerprint_update(
+        os.path.abspath(filename), stat.st_size, stat.st_mtime_ns, *items)
+
+
+def _is_number(value):
+    return isinstance(value, (int, float, np.number)) and not isinstance(
+        value, bool)
+
+
+def _build_column(values):
+    """
+    Returns `(kind, arrays)` of the column, where `arrays` maps suffixes of the
+    files to the numpy arrays to be saved.
+    """
+    first = values[0]
+    try:
+        if _is_number(first) or isinstance(first, bool):
+            data = np.asarray(values)
+            if data.dtype == object or data.ndim != 1:
+                raise TypeError("Column is not made of scalars.")
+            return "scalar", {"data": data}
+        if isinstance(first, (list, tuple, np.ndarray)) and all(
+                _is_number(v) for v in first) and np.ndim(first) == 1:
+            lengths = np.fromiter(
+                map(len, values), dtype=np.int64, count=len(values))
+            # The dtype is inferred from the values of all the samples, so
+            # that a float after ints of the first sample is never truncated.
+            data = np.asarray(list(itertools.chain.from_iterable(values)))
+            if len(data) == 0:
+                data = data.astype(np.int64)
+            if data.ndim != 1 or data.dtype.kind not in "biuf":
+                raise TypeError("Column is not made of number sequences.")
+            return "sequence", {"data": data, "offsets": _offsets(lengths)}
+        if isinstance(first, str):
+            encoded = [value.encode("utf-8") for value in values]
+            return "str", _flatten_bytes(encoded)
+    except (TypeError, ValueError, AttributeError):
+        # Samples of the column do not share one type, store them as objects.
+        pass
+    return "object", _flatten_bytes(
+        [pickle.dumps(
+            value, protocol=4) for value in values])
+
+
+def _offsets(lengths):
+    offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    return offsets
+
+
+def _flatten_bytes(blobs):
+    lengths = np.fromiter(map(len, blobs), dtype=np.int64, count=len(blobs))
+    data = np.frombuffer(b"".join(blobs), dtype=np.uint8)
+    return {"data": data, "offsets": _offsets(lengths)}
+
+
+def save_features(features, path):
+    """
+    Saves the samples in `features` as a columnar shard under directory `path`.
+    Every column is stored as flat numpy arrays (plus offsets for variable
+    length columns), which can be memory-mapped by `MMapFeatures`.
+
+    Args:
+        features (list): The samples to save. Samples should be dicts, lists or
+            tuples sharing the same keys or length.
+        path (str): The directory of the shard.
+
+    Returns:
+        int: The number of saved samples.
+    """
+    os.makedirs(path, exist_ok=True)
+    num_samples = len(features)
+    columns = []
+    if num_samples > 0:
+        first = features[0]
+        if isinstance(first, dict):
+            sample_type, keys = "dict", list(first.keys())
+        elif isinstance(first, (list, tuple)):
+            sample_type = type(first).__name__
+            keys = list(range(len(first)))
+        else:
+            sample_type, keys = "value", [None]
+        for i, key in enumerate(keys):
+            values = features if key is None else [
+                example[key] for example in features
+            ]
+            kind, arrays = _build_column(values)
+            for suffix, array in arrays.items():
+                np.save(
+                    os.path.join(path, "{}.{}.npy".format(i, suffix)),
+                    array,
+                    allow_pickle=False)
+            columns.append({"key": key, "kind": kind})
+    else:
+        sample_type = "value"
+    with open(os.path.join(path, COLUMNS_FILE), "w", encoding="utf-8") as f:
+        json.dump(
+            {
+                "num_samples": num_samples,
+                "sample_type": sample_type,
+                "columns": columns
+            }, f)
+    return num_samples
+
+
+def commit_features(tmp_path, path, shard_names, shard_sizes, fingerprint):
+    """
+    Writes the meta file of the shards in `tmp_path` and atomically moves it
+    to `path`. If another process has already committed `path`, `tmp_path` is
+    removed and the existing one is kept.
+    """
+    with open(os.path.join(tmp_path, META_FILE), "w", encoding="utf-8") as f:
+        json.dump(
+            {
+                "version": FORMAT_VERSION,
+                "fingerprint": fingerprint,
+                "shards": [{
+                    "name": name,
+                    "num_samples": size
+                } for name, size in zip(shard_names, shard_sizes)]
+            }, f)
+    try:
+        os.rename(tmp_path, path)
+    except OSError:
+        if not is_committed(path):
+            raise
+        shutil.rmtree(tmp_path, ignore_errors=True)
+
+
+def is_committed(path):
+    """
+    Returns whether features have been completely saved under `path`.
+    """
+    return os.path.isfile(os.path.join(path, META_FILE))
+
+
+class _Shard(object):
+    def __init__(self, path):
+        with open(os.path.join(path, COLUMNS_FILE), encoding="utf-8") as f:
+            meta = json.load(f)
+        self.num_samples = meta["num_samples"]
+        self.sample_type = meta["sample_type"]
+        self.columns = []
+        for i, column in enumerate(meta["columns"]):
+            data = np.load(
+                os.path.join(path, "{}.data.npy".format(i)), mmap_mode="r")
+            offsets = None
+            if column["kind"] != "scalar":
+                offsets = np.load(
+                    os.path.join(path, "{}.offsets.npy".format(i)),
+                    mmap_mode="r")
+            self.columns.append((column["key"], column["kind"], data, offsets))
+
+    def _get_value(self, kind, data, offsets, idx):
+        if kind == "scalar":
+            return data[idx].item()
+        start, end = offsets[idx], offsets[idx + 1]
+        if kind == "sequence":
+            return data[start:end]
+        value = data[start:end].tobytes()
+        return value.decode("utf-8") if kind == "str" else pickle.loads(value)
+
+    def __getitem__(self, idx):
+        values = [(key, self._get_value(kind, data, offsets, idx))
+                  for key, kind, data, offsets in self.columns]
+        if self.sample_type == "dict":
+            return dict(values)
+        if self.sample_type == "value":
+            return values[0][1]
+        values = [value for _, value in values]
+        return tuple(values) if self.sample_type == "tuple" else values
+
+
+class MMapFeatures(object):
+    """
+    A read-only sequence of samples saved by `save_features`, whose columns are
+    memory-mapped from disk instead of being loaded into memory. Variable
+    length numeric columns (such as `input_ids`) are returned as zero-copy
+    `numpy.ndarray` views of the file.
+
+    Instances are pickled by path, thus they are cheap to pass to DataLoader
+    workers, which map the same files again.
+
+    Args:
+        path (str): The directory containing the committed features.
+    """
+
+    def __init__(self, path):
+        if not is_committed(path):
+            raise ValueError("No committed features found in {}.".format(
+                path))
+        self.path = path
+        with open(os.path.join(path, META_FILE), encoding="utf-8") as f:
+            meta = json.load(f)
+        self.fingerprint = meta["fingerprint"]
+        self._shard_names = [shard["name"] for shard in meta["shards"]]
+        self._cumulative_sizes = list(
+            itertools.accumulate(shard["num_samples"]
+                                 for shard in meta["shards"]))
+        self._shards = None
+
+    def _get_shards(self):
+        if self._shards is None:
+            self._shards = [
+                _Shard(os.path.join(self.path, name))
+                for name in self._shard_names
+            ]
+        return self._shards
+
+    def __len__(self):
+        return self._cumulative_sizes[-1] if self._cumulative_sizes else 0
+
+    def __getitem__(self, idx):
+        if idx < 0:
+            idx += len(self)
+        if idx < 0 or idx >= len(self):
+            raise IndexError("Index {} out of range.".format(idx))
+        shard_idx = bisect.bisect_right(self._cumulative_sizes, idx)
+        if shard_idx > 0:
+            idx -= self._cumulative_sizes[shard_idx - 1]
+        return self._get_shards()[shard_idx][idx]
+
+    def __iter__(self):
+        for shard in self._get_shards():
+            for idx in range(shard.num_samples):
+                yield shard[idx]
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_shards"] = None
+        return state
@@ -12,38 +12,146 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import paddle
+
+__all__ = ['ExponentialMovingAverage', ]
+
 
 class ExponentialMovingAverage(object):
-    def __init__(self, model, decay=0.999):
+    r"""
+    Keeps the exponential moving average (EMA) of the trainable parameters of
+    a model, which usually evaluates better than the parameters themselves.
+
+    .. math::
+        shadow = decay * shadow + (1 - decay) * param
+
+    The average (shadow) of each parameter is a float32 tensor updated in
+    place by a single `lerp_`, so that an update allocates no tensors for
+    float32 parameters, instead of a few ops and a new tensor per parameter.
+
+    Args:
+        model (paddle.nn.Layer): The model whose parameters are averaged.
+        decay (float, optional): The decay of the average for each update.
+            Defaults to 0.999.
+        update_every (int, optional): The shadows are only updated every
+            `update_every` calls of `update`, with the decay
+            `decay ** update_every`, so that the horizon of the average in
+            steps stays the same. Defaults to 1.
+
+    Example:
+        .. code-block::
+
+            ema = ExponentialMovingAverage(model, decay=0.999)
+            ema.register()
+            for batch in train_data_loader:
+                ...
+                optimizer.step()
+                ema.update()
+            # Evaluate with the averaged parameters.
+            ema.apply_shadow()
+            evaluate(model)
+            ema.restore()
+    """
+
+    def __init__(self, model, decay=0.999, update_every=1):
         self.model = model
         self.decay = decay
-        self.shadow = {}
-        self.backup = {}
+        self.update_every = update_every
+        self.num_updates = 0
+        # The names, parameters and shadows of the trainable parameters.
+        self._names = []
+        self._params = []
+        self._shadows = []
+        self._backup = None
 
+    @property
+    def registered(self):
+        return len(self._shadows) > 0
+
+    @paddle.no_grad()
     def register(self):
+        """
+        Initializes the shadows with the current parameters.
+        """
+        self._names, self._params, self._shadows = [], [], []
         for name, param in self.model.named_parameters():
             if not param.stop_gradient:
-                self.shadow[name] = param.clone()
+                shadow = param.clone() if param.dtype == paddle.float32 else (
+                    param.astype("float32"))
+                shadow.stop_gradient = True
+                self._names.append(name)
+                self._params.append(param)
+                self._shadows.append(shadow)
+        self.num_updates = 0
 
+    @paddle.no_grad()
     def update(self):
-        for name, param in self.model.named_parameters():
-            if not param.stop_gradient:
-                assert name in self.shadow
-                new_average = (1.0 - self.decay
-                               ) * param + self.decay + self.shadow[name]
-                self.shadow[name] = new_average.clone()
+        """
+        Moves the shadows towards the current parameters. Registers the
+        shadows first if `register` hasn't been called.
+        """
+        if not self.registered:
+            self.register()
+        self.num_updates += 1
+        if self.num_updates % self.update_every != 0:
+            return
+        weight = 1.0 - self.decay**self.update_every
+        for param, shadow in zip(self._params, self._shadows):
+            if param.dtype != shadow.dtype:
+                param = param.astype(shadow.dtype)
+            shadow.lerp_(param, weight)
 
-    def apply_shadow(self):
-        for name, param in self.model.named_parameters():
-            if not param.stop_gradient:
-                assert name in self.shadow
-                self.backup[name] = param
-                # TODO(huijuan): paddle中parameters赋值方式不是param.data，这样改不了模型参数
-                param.data = self.shadow[name]
+    @paddle.no_grad()
+    def apply_shadow(self, backup=True):
+        """
+        Copies the shadows into the parameters in place.
 
+        Args:
+            backup (bool, optional): Whether to keep the parameters to be
+                restored by `restore`. Defaults to True.
+        """
+        assert self.registered, "`register` should be called first."
+        assert self._backup is None, "The shadows have already been applied."
+        if backup:
+            self._backup = [param.clone() for param in self._params]
+        for param, shadow in zip(self._params, self._shadows):
+            paddle.assign(shadow.astype(param.dtype), param)
+
+    @paddle.no_grad()
     def restore(self):
-        for name, param in self.model.named_parameters():
-            if not param.stop_gradient:
-                assert name in self.backup
-                param = self.backup[name]
-        self.backup = {}
+        """
+        Copies back the parameters kept by `apply_shadow`.
+        """
+        assert self._backup is not None, (
+            "`apply_shadow` should be called first.")
+        for param, backup in zip(self._params, self._backup):
+            paddle.assign(backup, param)
+        self._backup = None
+
+    @property
+    def applied(self):
+        return self._backup is not None
+
+    def state_dict(self):
+        """
+        Returns the shadows by parameter name, in the dtype of the
+        parameters, which can be loaded into the model with
+        `set_state_dict`.
+        """
+        return {
+            name: shadow.astype(param.dtype)
+            for name, param, shadow in zip(self._names, self._params,
+                                           self._shadows)
+        }
+
+    @paddle.no_grad()
+    def set_state_dict(self, state_dict):
+        """
+        Loads the shadows returned by `state_dict`.
+        """
+        if not self.registered:
+            self.register()
+        for name, shadow in zip(self._names, self._shadows):
+            paddle.assign(
+                paddle.to_tensor(state_dict[name]).astype(shadow.dtype),
+                shadow)
@@ -20,6 +20,9 @@ import numpy as np
 import paddle
 
 from ..transformers import UnifiedTransformerLMHeadModel, UnifiedTransformerTokenizer
+from ..transformers.generation_engine import ContinuousBatchingEngine
+from ..transformers.generation_prefix_cache import PrefixCacheStore
+from ..transformers.generation_streamer import IncrementalDetokenizer, stream_generate
 from ..datasets import load_dataset
 from ..data import Pad
 from .utils import dygraph_mode_guard
@@ -89,11 +92,93 @@ class DialogueTask(Task):
         self._batch_size = batch_size
         self._max_seq_len = max_seq_len
         self._interactive_mode = False
+        self._engine = None
+        self._prefix_cache_store = None
         if self._static_mode:
             self._get_inference_model()
         else:
             self._construct_model(model)
 
+    def enable_continuous_batching(self, max_batch_size=8):
+        """
+        Generates the responses by a `ContinuousBatchingEngine` of
+        `max_batch_size` slots, which decodes the inputs of concurrent calls
+        in the same batch.
+        """
+        self.disable_continuous_batching()
+        self._engine = ContinuousBatchingEngine(
+            self._model,
+            max_batch_size=max_batch_size,
+            max_length=self._max_seq_len + 64,
+            decode_strategy='sampling',
+            top_k=5)
+
+    def disable_continuous_batching(self):
+        if self._engine is not None:
+            engine, self._engine = self._engine, None
+            engine.close()
+
+    def enable_prefix_cache(self, max_memory=1 << 30):
+        """
+        Reuses the self attention cache of the conversations generated
+        before, which are kept in a `PrefixCacheStore` of at most
+        `max_memory` bytes. Since the context of PLATO is encoded
+        bidirectionally, only the cache of a whole context is reusable, such
+        as the context of which the responses are generated again.
+        """
+        self._prefix_cache_store = PrefixCacheStore(max_memory)
+
+    def disable_prefix_cache(self):
+        self._prefix_cache_store = None
+
+    def stream_generate(self, inputs):
+        """
+        Yields the response to a single conversation piece by piece as its
+        tokens are generated.
+        """
+        inputs = self._check_input_text(inputs)
+        if len(inputs) != 1:
+            raise ValueError("Only one conversation can be streamed at a time.")
+        if self._engine is not None:
+            example = self._convert_text_to_input(inputs[0], self._max_seq_len)
+            token_ids = self._engine.submit(
+                example['input_ids'],
+                max_new_tokens=64,
+                min_new_tokens=1,
+                token_type_ids=example['token_type_ids'],
+                position_ids=example['position_ids'],
+                role_ids=example.get('role_ids', None),
+                attention_mask=example['attention_mask'])
+        else:
+            input_ids, token_type_ids, position_ids, attention_mask = map(
+                paddle.to_tensor,
+                next(self._batchify(inputs, self._max_seq_len, 1)))
+            token_ids = (step_ids[0] for step_ids in stream_generate(
+                self._model,
+                input_ids=input_ids,
+                token_type_ids=token_type_ids,
+                position_ids=position_ids,
+                attention_mask=attention_mask,
+                max_length=64,
+                min_length=1,
+                decode_strategy='sampling',
+                top_k=5,
+                prefix_cache_store=self._prefix_cache_store))
+        tokenizer = self._tokenizer
+        detokenizer = IncrementalDetokenizer(decode_fn=lambda ids: "".join(
+            tokenizer.merge_subword(tokenizer.convert_ids_to_tokens(ids))))
+        for token_id in token_ids:
+            if token_id == tokenizer.sep_token_id:
+                break
+            text = detokenizer.add(token_id)
+            if text:
+                yield text
+        text = detokenizer.flush()
+        if text:
+            yield text
+        if self._interactive_mode:
+            self.context.append(detokenizer.text.strip())
+
     def _construct_input_spec(self):
         """
         Construct the input spec for the convert dygraph model to static model.
@@ -255,10 +340,16 @@ class DialogueTask(Task):
         lazy_load = self.kwargs[
             'lazy_load'] if 'lazy_load' in self.kwargs else False
 
-        batches = self._batchify(inputs, self._max_seq_len, self._batch_size)
-
         outputs = {}
-        outputs['batches'] = batches
+        if self._engine is not None:
+            # The engine batches the examples by itself.
+            outputs['examples'] = [
+                self._convert_text_to_input(texts, self._max_seq_len)
+                for texts in inputs
+            ]
+        else:
+            outputs['batches'] = self._batchify(inputs, self._max_seq_len,
+                                                self._batch_size)
         outputs['text'] = inputs
         return outputs
 
@@ -269,6 +360,26 @@ class DialogueTask(Task):
         all_ids = []
         all_scores = []
 
+        if self._engine is not None:
+            requests = [
+                self._engine.submit(
+                    example['input_ids'],
+                    max_new_tokens=64,
+                    min_new_tokens=1,
+                    token_type_ids=example['token_type_ids'],
+                    position_ids=example['position_ids'],
+                    role_ids=example.get('role_ids', None),
+                    attention_mask=example['attention_mask'])
+                for example in inputs['examples']
+            ]
+            for request in requests:
+                ids, score = request.result()
+                all_ids.append(paddle.to_tensor([ids], dtype='int64'))
+                all_scores.append(paddle.to_tensor([[score]]))
+            inputs['ids'] = all_ids
+            inputs['scores'] = all_scores
+            return inputs
+
         for batch in inputs["batches"]:
             input_ids, token_type_ids, position_ids, attention_mask = map(
                 paddle.to_tensor, batch)
@@ -287,7 +398,8 @@ class DialogueTask(Task):
                 length_penalty=1.0,
                 early_stopping=False,
                 use_faster=False,
-                num_return_sequences=1)
+                num_return_sequences=1,
+                prefix_cache_store=self._prefix_cache_store)
             all_ids.extend([ids])
             all_scores.extend([scores])
         inputs['ids'] = all_ids
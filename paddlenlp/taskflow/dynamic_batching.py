@@ -0,0 +1,179 @@
+# coding:utf-8
+# Copyright (c) 2022  PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from ..utils.log import logger
+
+_STOP = object()
+
+
+class _Request(object):
+    def __init__(self, inputs):
+        self.inputs = inputs
+        texts = inputs[0] if len(inputs) > 0 else None
+        self.texts = [texts] if isinstance(texts, str) else texts
+        self.future = Future()
+
+    @property
+    def size(self):
+        return len(self.texts) if isinstance(self.texts, list) else 0
+
+
+class DynamicBatcher(object):
+    """
+    Coalesces the requests of concurrent callers of a task into batches, so
+    that the predictor runs on large batches instead of the tiny batch of each
+    caller. A background thread takes queued requests until the batch has
+    `max_batch_size` inputs or `max_wait_time` seconds have passed since the
+    first request of the batch, runs the task once on the merged inputs and
+    scatters the results back to the callers.
+
+    The batcher is the only user of the task predictor while it runs. If a
+    merged batch fails, its requests are retried one by one so that an invalid
+    request only fails its own caller.
+
+    Args:
+        task (Task): The task instance whose results are one per input, such as
+            the sentiment analysis, ner, information extraction and text
+            similarity tasks.
+        max_batch_size (int, optional): The max number of inputs in a batch.
+            Set `batch_size` of the task to the same value to run the
+            predictor once per batch. Defaults to 32.
+        max_wait_time (float, optional): The max seconds to wait for more
+            requests after the first request of a batch. Defaults to 0.005.
+        max_queue_size (int, optional): The max number of waiting requests,
+            beyond which `submit` blocks. 0 means no limit. Defaults to 0.
+    """
+
+    def __init__(self,
+                 task,
+                 max_batch_size=32,
+                 max_wait_time=0.005,
+                 max_queue_size=0):
+        self._task = task
+        self.max_batch_size = max_batch_size
+        self.max_wait_time = max_wait_time
+        self.num_requests = 0
+        self.num_batches = 0
+        self._queue = queue.Queue(max_queue_size)
+        self._pending = None
+        self._closed = False
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+
+    def submit(self, inputs):
+        """
+        Queues the inputs of a task call.
+
+        Args:
+            inputs (tuple): The positional arguments of the task call, whose
+                first element is a text or a list of texts (pairs of texts for
+                text similarity).
+
+        Returns:
+            concurrent.futures.Future: The future of the results. Use
+            `asyncio.wrap_future` to await it in asyncio code.
+        """
+        if self._closed:
+            raise RuntimeError("The dynamic batcher has been closed.")
+        request = _Request(inputs)
+        self._queue.put(request)
+        return request.future
+
+    def __call__(self, inputs):
+        return self.submit(inputs).result()
+
+    def close(self):
+        """
+        Stops the background thread after the queued requests are done.
+        """
+        if not self._closed:
+            self._closed = True
+            self._queue.put(_STOP)
+            self._thread.join()
+
+    def _next_batch(self):
+        if self._pending is not None:
+            first, self._pending = self._pending, None
+        else:
+            first = self._queue.get()
+            if first is _STOP:
+                return None
+        requests, num_inputs = [first], first.size
+        deadline = time.monotonic() + self.max_wait_time
+        while num_inputs < self.max_batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                request = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if request is _STOP:
+                # Serve the queued requests before stopping.
+                self._queue.put(_STOP)
+                break
+            if num_inputs + request.size > self.max_batch_size:
+                self._pending = request
+                break
+            requests.append(request)
+            num_inputs += request.size
+        return requests
+
+    def _loop(self):
+        while True:
+            requests = self._next_batch()
+            if requests is None:
+                break
+            self.num_requests += len(requests)
+            self.num_batches += 1
+            if len(requests) == 1 or any(r.size == 0 for r in requests):
+                self._run_separately(requests)
+            else:
+                self._run_merged(requests)
+
+    def _run_separately(self, requests):
+        for request in requests:
+            try:
+                request.future.set_result(self._task(request.inputs))
+            except Exception as e:
+                request.future.set_exception(e)
+
+    def _run_merged(self, requests):
+        texts = [text for request in requests for text in request.texts]
+        try:
+            results = self._task((texts, ))
+        except Exception as e:
+            logger.warning(
+                "Failed to run a batch of %d requests (%s), run them "
+                "separately." % (len(requests), e))
+            self._run_separately(requests)
+            return
+        if not isinstance(results, list) or len(results) != len(texts):
+            # Some inputs are skipped by the task, such as empty texts, thus
+            # the results can not be aligned with the requests.
+            self._run_separately(requests)
+            return
+        start = 0
+        for request in requests:
+            request_results = results[start:start + request.size]
+            start += request.size
+            if self._task._squeeze_single_result and request.size == 1:
+                request_results = request_results[0]
+            request.future.set_result(request_results)
@@ -17,7 +17,6 @@ import os
 
 import numpy as np
 import paddle
-from ..datasets import load_dataset
 from ..transformers import AutoTokenizer
 from .models import UIE
 from .task import Task
@@ -77,6 +76,10 @@ class UIETask(Task):
         kwargs (dict, optional): Additional keyword arguments passed along to the specific task. 
     """
 
+    # The inputs are padded to the shortest of these lengths which fits them,
+    # instead of `max_seq_len`.
+    _default_seq_len_buckets = [32, 64, 128, 256, 512]
+
     resource_files_names = {"model_state": "model_state.pdparams", }
     resource_files_urls = {
         "uie-base": {
@@ -121,6 +124,8 @@ class UIETask(Task):
             'split_sentence'] if 'split_sentence' in self.kwargs else False
         self._position_prob = self.kwargs[
             'position_prob'] if 'position_prob' in self.kwargs else 0.5
+        if 'warmup' in self.kwargs and self.kwargs['warmup']:
+            self._warmup_seq_len_buckets(self._batch_size, self._max_seq_len)
 
     def set_schema(self, schema):
         if isinstance(schema, dict) or isinstance(schema, str):
@@ -128,6 +133,11 @@ class UIETask(Task):
         self._schema = schema
         self._build_tree(self._schema)
 
+    def _get_cache_config(self):
+        config = super()._get_cache_config()
+        config["schema"] = self._schema
+        return config
+
     def _construct_input_spec(self):
         """
         Construct the input spec for the convert dygraph model to static model.
@@ -173,69 +183,128 @@ class UIETask(Task):
         outputs['text'] = inputs
         return outputs
 
-    def _single_stage_predict(self, inputs):
-        input_texts = []
-        prompts = []
-        for i in range(len(inputs)):
-            input_texts.append(inputs[i]["text"])
-            prompts.append(inputs[i]["prompt"])
-        # max predict length should exclude the length of prompt and summary tokens
-        max_predict_len = self._max_seq_len - len(max(prompts)) - 3
-
-        short_input_texts, self.input_mapping = self._auto_splitter(
-            input_texts, max_predict_len, split_sentence=self._split_sentence)
-
-        short_texts_prompts = []
-        for k, v in self.input_mapping.items():
-            short_texts_prompts.extend([prompts[k] for i in range(len(v))])
-        short_inputs = [{
-            "text": short_input_texts[i],
-            "prompt": short_texts_prompts[i]
-        } for i in range(len(short_input_texts))]
-
-        def read(inputs):
-            for example in inputs:
-                encoded_inputs = self._tokenizer(
-                    text=[example["prompt"]],
-                    text_pair=[example["text"]],
-                    stride=len(example["prompt"]),
-                    truncation=True,
-                    max_seq_len=self._max_seq_len,
-                    pad_to_max_seq_len=True,
-                    return_attention_mask=True,
-                    return_position_ids=True,
-                    return_dict=False)
-                encoded_inputs = encoded_inputs[0]
-
-                tokenized_output = [
+    def _encode(self, text, cache):
+        """
+        Returns the token ids and offset mapping of `text`, which are cached
+        in `cache` since the same text is paired with many prompts.
+        """
+        if text not in cache:
+            cache[text] = (self._tokenizer.convert_tokens_to_ids(
+                self._tokenizer.tokenize(text)),
+                           self._tokenizer.get_offset_mapping(text))
+        return cache[text]
+
+    def _encode_pair(self, prompt, text, cache):
+        """
+        Encodes the prompt and the first `max_seq_len` window of the text in
+        the same way as the tokenizer with `stride`, reusing the cached
+        encodings of the prompt and the text. The encoded inputs are not
+        padded.
+        """
+        prompt_ids, prompt_mapping = self._encode(prompt, cache)
+        text_ids, text_mapping = self._encode(text, cache)
+        max_len_for_pair = self._max_seq_len - len(
+            prompt_ids) - self._tokenizer.num_special_tokens_to_add(pair=True)
+        if len(text_ids) == 0 or max_len_for_pair <= 0:
+            encoded_inputs = self._tokenizer(
+                text=[prompt],
+                text_pair=[text],
+                stride=len(prompt),
+                truncation=True,
+                max_seq_len=self._max_seq_len,
+                return_attention_mask=True,
+                return_position_ids=True,
+                return_dict=False)
+            return encoded_inputs[0]
+        text_ids = text_ids[:max_len_for_pair]
+        text_mapping = text_mapping[:max_len_for_pair]
+        input_ids = self._tokenizer.build_inputs_with_special_tokens(prompt_ids,
+                                                                    text_ids)
+        return {
+            "input_ids": input_ids,
+            "token_type_ids":
+            self._tokenizer.create_token_type_ids_from_sequences(prompt_ids,
+                                                                 text_ids),
+            "position_ids": list(range(len(input_ids))),
+            "attention_mask": [1] * len(input_ids),
+            "offset_mapping":
+            self._tokenizer.build_offset_mapping_with_special_tokens(
+                prompt_mapping, text_mapping),
+        }
+
+    def _single_stage_predict(self, inputs_list, cache=None):
+        """
+        Predicts the examples of several schema nodes in the same batches.
+
+        Args:
+            inputs_list (list[list[dict]]): The examples of each node, each of
+                which has the `text` and the `prompt`.
+            cache (dict, optional): The cache of text encodings shared by the
+                calls on the same texts. Defaults to None.
+
+        Returns:
+            list[list]: The results of the examples of each node.
+        """
+        cache = {} if cache is None else cache
+        groups = []
+        short_inputs = []
+        for inputs in inputs_list:
+            if len(inputs) == 0:
+                groups.append(None)
+                continue
+            input_texts = [example["text"] for example in inputs]
+            prompts = [example["prompt"] for example in inputs]
+            # max predict length should exclude the length of prompt and
+            # summary tokens
+            max_predict_len = self._max_seq_len - len(max(prompts)) - 3
+
+            short_input_texts, input_mapping = self._auto_splitter(
+                input_texts,
+                max_predict_len,
+                split_sentence=self._split_sentence)
+
+            short_texts_prompts = []
+            for k, v in input_mapping.items():
+                short_texts_prompts.extend([prompts[k] for i in range(len(v))])
+            groups.append((len(short_inputs), short_input_texts,
+                           input_mapping))
+            short_inputs.extend([{
+                "text": short_input_texts[i],
+                "prompt": short_texts_prompts[i]
+            } for i in range(len(short_input_texts))])
+
+        encoded_inputs_list = [
+            self._encode_pair(example["prompt"], example["text"], cache)
+            for example in short_inputs
+        ]
+        sentence_ids = [None] * len(short_inputs)
+        probs = [None] * len(short_inputs)
+        for indices, seq_len in self._batchify_by_seq_len(
+            [len(encoded_inputs["input_ids"])
+             for encoded_inputs in encoded_inputs_list], self._batch_size,
+                self._max_seq_len):
+            batch = []
+            for i in indices:
+                encoded_inputs = self._tokenizer.pad(
+                    encoded_inputs_list[i],
+                    padding="max_length",
+                    max_length=seq_len,
+                    return_attention_mask=True)
+                batch.append([
                     encoded_inputs["input_ids"],
                     encoded_inputs["token_type_ids"],
                     encoded_inputs["position_ids"],
                     encoded_inputs["attention_mask"],
                     encoded_inputs["offset_mapping"]
-                ]
-                tokenized_output = [
-                    np.array(
-                        x, dtype="int64") for x in tokenized_output
-                ]
-
-                yield tuple(tokenized_output)
-
-        infer_ds = load_dataset(read, inputs=short_inputs, lazy=False)
-        batch_sampler = paddle.io.BatchSampler(
-            dataset=infer_ds, batch_size=self._batch_size, shuffle=False)
-
-        infer_data_loader = paddle.io.DataLoader(
-            dataset=infer_ds, batch_sampler=batch_sampler, return_list=True)
-
-        sentence_ids = []
-        probs = []
-        for batch in infer_data_loader:
-            input_ids, token_type_ids, pos_ids, att_mask, offset_maps = batch
-            self.input_handles[0].copy_from_cpu(input_ids.numpy())
-            self.input_handles[1].copy_from_cpu(token_type_ids.numpy())
-            self.input_handles[2].copy_from_cpu(pos_ids.numpy())
-            self.input_handles[3].copy_from_cpu(att_mask.numpy())
+                ])
+            input_ids, token_type_ids, pos_ids, att_mask, offset_maps = [
+                np.array(
+                    x, dtype="int64") for x in zip(*batch)
+            ]
+            self.input_handles[0].copy_from_cpu(input_ids)
+            self.input_handles[1].copy_from_cpu(token_type_ids)
+            self.input_handles[2].copy_from_cpu(pos_ids)
+            self.input_handles[3].copy_from_cpu(att_mask)
             self.predictor.run()
             start_prob = self.output_handle[0].copy_to_cpu().tolist()
             end_prob = self.output_handle[1].copy_to_cpu().tolist()
@@ -245,22 +314,25 @@ class UIETask(Task):
             end_ids_list = get_bool_ids_greater_than(
                 end_prob, limit=self._position_prob, return_prob=True)
 
-            for start_ids, end_ids, ids, offset_map in zip(
-                    start_ids_list, end_ids_list,
-                    input_ids.tolist(), offset_maps.tolist()):
-                for i in reversed(range(len(ids))):
-                    if ids[i] != 0:
-                        ids = ids[:i]
-                        break
+            for i, start_ids, end_ids, offset_map in zip(
+                    indices, start_ids_list, end_ids_list,
+                    offset_maps.tolist()):
                 span_list = get_span(start_ids, end_ids, with_prob=True)
-                sentence_id, prob = get_id_and_prob(span_list, offset_map)
-                sentence_ids.append(sentence_id)
-                probs.append(prob)
-        results = self._convert_ids_to_results(short_inputs, sentence_ids,
-                                               probs)
-        results = self._auto_joiner(results, short_input_texts,
-                                    self.input_mapping)
-        return results
+                sentence_ids[i], probs[i] = get_id_and_prob(span_list,
+                                                            offset_map)
+        short_results = self._convert_ids_to_results(short_inputs,
+                                                     sentence_ids, probs)
+
+        results_list = []
+        for group in groups:
+            if group is None:
+                results_list.append([])
+                continue
+            start, short_input_texts, input_mapping = group
+            results_list.append(
+                self._auto_joiner(short_results[start:start + len(
+                    short_input_texts)], short_input_texts, input_mapping))
+        return results_list
 
     def _auto_joiner(self, short_results, short_inputs, input_mapping):
         concat_results = []
@@ -325,94 +397,102 @@ class UIETask(Task):
 
     def _multi_stage_predict(self, datas, schema_tree):
         """
-        Traversal the schema tree and do multi-stage prediction.
+        Traversal the schema tree and do multi-stage prediction. The nodes of
+        the same depth are predicted in the same batches, and the encodings of
+        the texts are shared by all prompts.
         """
         results = [{} for i in range(len(datas))]
-        schema_list = schema_tree.children
+        cache = {}
+        schema_list = schema_tree.children[:]
         while len(schema_list) > 0:
-            node = schema_list.pop(0)
-            examples = []
-            input_map = {}
-            cnt = 0
-            id = 0
-            if not node.prefix:
-                for data in datas:
-                    examples.append({
-                        "text": data,
-                        "prompt": dbc2sbc(node.name)
-                    })
-                    input_map[cnt] = [id]
-                    id += 1
-                    cnt += 1
-            else:
-                for pre, data in zip(node.prefix, datas):
-                    if len(pre) == 0:
-                        input_map[cnt] = []
-                    else:
-                        for p in pre:
-                            examples.append({
-                                "text": data,
-                                "prompt": dbc2sbc(p + node.name)
-                            })
-                        input_map[cnt] = [i + id for i in range(len(pre))]
-                        id += len(pre)
-                    cnt += 1
-            if len(examples) == 0:
-                result_list = []
-            else:
-                result_list = self._single_stage_predict(examples)
-
-            if not node.parent_relations:
-                relations = [[] for i in range(len(datas))]
-                for k, v in input_map.items():
-                    for id in v:
-                        if len(result_list[id]) == 0:
-                            continue
-                        if node.name not in results[k].keys():
-                            results[k][node.name] = result_list[id]
+            nodes, schema_list = schema_list, []
+            examples_list = []
+            input_maps = []
+            for node in nodes:
+                examples = []
+                input_map = {}
+                cnt = 0
+                id = 0
+                if not node.prefix:
+                    for data in datas:
+                        examples.append({
+                            "text": data,
+                            "prompt": dbc2sbc(node.name)
+                        })
+                        input_map[cnt] = [id]
+                        id += 1
+                        cnt += 1
+                else:
+                    for pre, data in zip(node.prefix, datas):
+                        if len(pre) == 0:
+                            input_map[cnt] = []
                         else:
-                            results[k][node.name].extend(result_list[id])
-                    if node.name in results[k].keys():
-                        relations[k].extend(results[k][node.name])
-            else:
-                relations = node.parent_relations
+                            for p in pre:
+                                examples.append({
+                                    "text": data,
+                                    "prompt": dbc2sbc(p + node.name)
+                                })
+                            input_map[cnt] = [i + id for i in range(len(pre))]
+                            id += len(pre)
+                        cnt += 1
+                examples_list.append(examples)
+                input_maps.append(input_map)
+            result_lists = self._single_stage_predict(examples_list, cache)
+
+            for node, input_map, result_list in zip(nodes, input_maps,
+                                                    result_lists):
+                if not node.parent_relations:
+                    relations = [[] for i in range(len(datas))]
+                    for k, v in input_map.items():
+                        for id in v:
+                            if len(result_list[id]) == 0:
+                                continue
+                            if node.name not in results[k].keys():
+                                results[k][node.name] = result_list[id]
+                            else:
+                                results[k][node.name].extend(result_list[id])
+                        if node.name in results[k].keys():
+                            relations[k].extend(results[k][node.name])
+                else:
+                    relations = node.parent_relations
+                    for k, v in input_map.items():
+                        for i in range(len(v)):
+                            if len(result_list[v[i]]) == 0:
+                                continue
+                            if "relations" not in relations[k][i].keys():
+                                relations[k][i]["relations"] = {
+                                    node.name: result_list[v[i]]
+                                }
+                            elif node.name not in relations[k][i][
+                                    "relations"].keys():
+                                relations[k][i]["relations"][
+                                    node.name] = result_list[v[i]]
+                            else:
+                                relations[k][i]["relations"][node.name].extend(
+                                    result_list[v[i]])
+                    new_relations = [[] for i in range(len(datas))]
+                    for i in range(len(relations)):
+                        for j in range(len(relations[i])):
+                            if "relations" in relations[i][j].keys(
+                            ) and node.name in relations[i][j][
+                                    "relations"].keys():
+                                for k in range(
+                                        len(relations[i][j]["relations"][
+                                            node.name])):
+                                    new_relations[i].append(relations[i][j][
+                                        "relations"][node.name][k])
+                    relations = new_relations
+
+                prefix = [[] for i in range(len(datas))]
                 for k, v in input_map.items():
-                    for i in range(len(v)):
-                        if len(result_list[v[i]]) == 0:
-                            continue
-                        if "relations" not in relations[k][i].keys():
-                            relations[k][i]["relations"] = {
-                                node.name: result_list[v[i]]
-                            }
-                        elif node.name not in relations[k][i]["relations"].keys(
-                        ):
-                            relations[k][i]["relations"][
-                                node.name] = result_list[v[i]]
-                        else:
-                            relations[k][i]["relations"][node.name].extend(
-                                result_list[v[i]])
-                new_relations = [[] for i in range(len(datas))]
-                for i in range(len(relations)):
-                    for j in range(len(relations[i])):
-                        if "relations" in relations[i][j].keys(
-                        ) and node.name in relations[i][j]["relations"].keys():
-                            for k in range(
-                                    len(relations[i][j]["relations"][
-                                        node.name])):
-                                new_relations[i].append(relations[i][j][
-                                    "relations"][node.name][k])
-                relations = new_relations
-
-            prefix = [[] for i in range(len(datas))]
-            for k, v in input_map.items():
-                for id in v:
-                    for i in range(len(result_list[id])):
-                        prefix[k].append(result_list[id][i]["text"] + "的")
-
-            for child in node.children:
-                child.prefix = prefix
-                child.parent_relations = relations
-                schema_list.append(child)
+                    for id in v:
+                        for i in range(len(result_list[id])):
+                            prefix[k].append(result_list[id][i]["text"] + "的")
+
+                for child in node.children:
+                    child.prefix = prefix
+                    child.parent_relations = relations
+                    schema_list.append(child)
         return results
 
     def _convert_ids_to_results(self, examples, sentence_ids, probs):
@@ -39,7 +39,7 @@ from ..data import Stack, Pad, Tuple
 from ..transformers import ErnieCtmWordtagModel, ErnieCtmNptagModel, ErnieCtmTokenizer
 from .utils import download_file, add_docstrings, static_mode_guard, dygraph_mode_guard
 from .utils import TermTree, BurkhardKellerTree
-from .utils import Customization
+from .utils import get_customization
 from .task import Task
 
 LABEL_TO_SCHEMA = {
@@ -214,8 +214,11 @@ class WordTagTask(Task):
         self._get_inference_model()
 
         if self._user_dict:
-            self._custom = Customization()
-            self._custom.load_customization(self._user_dict)
+            self._custom = get_customization(
+                self._user_dict,
+                cache_path=self.kwargs['user_dict_cache']
+                if 'user_dict_cache' in self.kwargs else None)
+            self._hash_user_dict()
         else:
             self._custom = None
         self._num_workers = self.kwargs[
@@ -287,7 +290,7 @@ class WordTagTask(Task):
             filter_input_texts.append(input_text)
         input_texts = filter_input_texts
 
-        short_input_texts, self.input_mapping = self._auto_splitter(
+        short_input_texts, input_mapping = self._auto_splitter(
             input_texts, max_predict_len, split_sentence=self._split_sentence)
 
         def read(inputs):
@@ -311,17 +314,28 @@ class WordTagTask(Task):
             Stack(dtype='int64'), # seq_len
         ): fn(samples)
 
+        if self._lazy_load:
+            # The lazy dataset can only be read in order.
+            batch_indices = None
+            batch_kwargs = {"batch_size": self._batch_size, "shuffle": False}
+        else:
+            # Each character is a token, following the summary tokens.
+            batch_indices = self._get_length_sorted_batches([
+                len(text) + self.summary_num + 1 for text in short_input_texts
+            ], self._batch_size)
+            batch_kwargs = {"batch_sampler": batch_indices}
         infer_data_loader = paddle.io.DataLoader(
             infer_ds,
             collate_fn=batchify_fn,
             num_workers=self._num_workers,
-            batch_size=self._batch_size,
-            shuffle=False,
-            return_list=True)
+            return_list=True,
+            **batch_kwargs)
 
         outputs = {}
         outputs['data_loader'] = infer_data_loader
+        outputs['batch_indices'] = batch_indices
         outputs['short_input_texts'] = short_input_texts
+        outputs['input_mapping'] = input_mapping
         return outputs
 
     def _reset_offset(self, pred_words):
@@ -473,9 +487,12 @@ class WordTagTask(Task):
         """
         The model output is the tag ids, this function will convert the model output to raw text.
         """
-        results = self._decode(inputs['short_input_texts'],
-                               inputs['all_pred_tags'])
-        results = self._auto_joiner(results, self.input_mapping, is_dict=True)
+        results = self._decode(
+            inputs['short_input_texts'],
+            self._restore_order(inputs['all_pred_tags'],
+                                inputs['batch_indices']))
+        results = self._auto_joiner(
+            results, inputs['input_mapping'], is_dict=True)
         for result in results:
             pred_words = result['items']
             pred_words = self._reset_offset(pred_words)
@@ -27,7 +27,7 @@ import paddle.nn.functional as F
 from ..datasets import load_dataset, MapDataset
 from ..data import Stack, Pad, Tuple, Vocab, JiebaTokenizer
 from .utils import download_file, add_docstrings, static_mode_guard, dygraph_mode_guard
-from .utils import Customization
+from .utils import get_customization
 from .task import Task
 from .models import BiGruCrf
 
@@ -83,6 +83,8 @@ class LacTask(Task):
         model(string): The model name in the task.
         user_dict(string): The user-defined dictionary, default to None.
         kwargs (dict, optional): Additional keyword arguments passed along to the specific task. 
+            The binary cache of the user dict can be set by `user_dict_cache`, which is built 
+            on the first load and loads much faster than the user dict for large dictionaries.
     """
 
     resource_files_names = {
@@ -121,8 +123,11 @@ class LacTask(Task):
         self._get_inference_model()
         self._max_seq_len = 512
         if self._user_dict:
-            self._custom = Customization()
-            self._custom.load_customization(self._user_dict)
+            self._custom = get_customization(
+                self._user_dict,
+                cache_path=self.kwargs['user_dict_cache']
+                if 'user_dict_cache' in self.kwargs else None)
+            self._hash_user_dict()
         else:
             self._custom = None
 
@@ -192,7 +197,7 @@ class LacTask(Task):
                 continue
             filter_inputs.append(input)
 
-        short_input_texts, self.input_mapping = self._auto_splitter(
+        short_input_texts, input_mapping = self._auto_splitter(
             filter_inputs,
             self._max_seq_len,
             split_sentence=self._split_sentence)
@@ -222,6 +227,7 @@ class LacTask(Task):
         outputs = {}
         outputs['text'] = short_input_texts
         outputs['data_loader'] = infer_data_loader
+        outputs['input_mapping'] = input_mapping
         return outputs
 
     def _run_model(self, inputs):
@@ -284,5 +290,5 @@ class LacTask(Task):
             single_result['tags'] = tags_out
             final_results.append(single_result)
         final_results = self._auto_joiner(
-            final_results, self.input_mapping, is_dict=True)
+            final_results, inputs['input_mapping'], is_dict=True)
         return final_results
@@ -25,7 +25,6 @@ from .utils import download_file
 from .utils import TermTree
 from .knowledge_mining import WordTagTask
 from .lexical_analysis import LacTask
-from .utils import Customization
 
 POS_LABEL_WORDTAG = [
     "介词", "介词_方位介词", "助词", "代词", "连词", "副词", "疑问词", "肯定词", "否定词", "数量词", "叹词",
@@ -79,6 +78,8 @@ class NERWordTagTask(WordTagTask):
 
     """
 
+    _squeeze_single_result = True
+
     resource_files_names = {
         "model_state": "model_state.pdparams",
         "model_config": "model_config.json",
@@ -104,11 +105,6 @@ class NERWordTagTask(WordTagTask):
     def __init__(self, model, task, entity_only=False, **kwargs):
         super().__init__(model="wordtag", task=task, **kwargs)
         self.entity_only = entity_only
-        if self._user_dict:
-            self._custom = Customization()
-            self._custom.load_customization(self._user_dict)
-        else:
-            self._custom = None
 
     def _decode(self, batch_texts, batch_pred_tags):
         batch_results = []
@@ -165,9 +161,12 @@ class NERWordTagTask(WordTagTask):
         """
         The model output is the tag ids, this function will convert the model output to raw text.
         """
-        results = self._decode(inputs['short_input_texts'],
-                               inputs['all_pred_tags'])
-        results = self._auto_joiner(results, self.input_mapping, is_dict=True)
+        results = self._decode(
+            inputs['short_input_texts'],
+            self._restore_order(inputs['all_pred_tags'],
+                                inputs['batch_indices']))
+        results = self._auto_joiner(
+            results, inputs['input_mapping'], is_dict=True)
         results = self._simplify_result(results)
         return results
 
@@ -181,6 +180,8 @@ class NERLACTask(LacTask):
         kwargs (dict, optional): Additional keyword arguments passed along to the specific task. 
     """
 
+    _squeeze_single_result = True
+
     def __init__(self, model, task, entity_only=False, **kwargs):
         super().__init__(task=task, model="lac", **kwargs)
         self.entity_only = entity_only
@@ -227,7 +228,8 @@ class NERLACTask(LacTask):
                     continue
                 result.append((s, t))
             final_results.append(result)
-        final_results = self._auto_joiner(final_results, self.input_mapping)
+        final_results = self._auto_joiner(final_results,
+                                          inputs['input_mapping'])
         final_results = final_results if len(
             final_results) > 1 else final_results[0]
         return final_results
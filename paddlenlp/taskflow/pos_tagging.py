@@ -49,6 +49,8 @@ class POSTaggingTask(LacTask):
         kwargs (dict, optional): Additional keyword arguments passed along to the specific task. 
     """
 
+    _squeeze_single_result = True
+
     def __init__(self, task, model, **kwargs):
         super().__init__(task=task, model=model, **kwargs)
 
@@ -90,7 +92,8 @@ class POSTaggingTask(LacTask):
 
             result = list(zip(sent_out, tags_out))
             final_results.append(result)
-        final_results = self._auto_joiner(final_results, self.input_mapping)
+        final_results = self._auto_joiner(final_results,
+                                          inputs['input_mapping'])
         final_results = final_results if len(
             final_results) > 1 else final_results[0]
         return final_results
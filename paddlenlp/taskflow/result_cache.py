@@ -0,0 +1,170 @@
+# coding:utf-8
+# Copyright (c) 2022  PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import hashlib
+import json
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+class ResultCache(object):
+    """
+    The cache of task results of single inputs. Results are kept in an
+    in-process LRU of at most `max_size` entries, and optionally in a sqlite
+    database shared by the processes on the same machine. Results are stored
+    serialized, thus the results returned to callers are always new objects.
+
+    Args:
+        max_size (int, optional): The max number of results kept in memory.
+            Defaults to 1024.
+        ttl (float, optional): The seconds after which a result expires. If
+            None, results never expire. Defaults to None.
+        db_path (str, optional): The path of the sqlite database of the
+            on-disk tier. If None, only the in-memory tier is used.
+            Defaults to None.
+        normalize_fn (callable, optional): The function to normalize the input
+            before computing the key, such as stripping the spaces of texts.
+            It should only merge inputs whose results are the same. If None,
+            inputs are used as they are. Defaults to None.
+    """
+
+    def __init__(self, max_size=1024, ttl=None, db_path=None,
+                 normalize_fn=None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.normalize_fn = normalize_fn
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        if db_path is not None:
+            db_dir = os.path.dirname(os.path.abspath(db_path))
+            os.makedirs(db_dir, exist_ok=True)
+            self._db = sqlite3.connect(
+                db_path,
+                timeout=30,
+                isolation_level=None,
+                check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, "
+                "value BLOB NOT NULL, expire_time REAL)")
+
+    def make_key(self, config, inputs):
+        """
+        Returns the key of the result of `inputs` computed by a task whose
+        configuration is identified by the string `config`.
+        """
+        if self.normalize_fn is not None:
+            inputs = self.normalize_fn(inputs)
+        hasher = hashlib.md5(config.encode("utf-8"))
+        hasher.update(b"\0")
+        hasher.update(json.dumps(inputs, ensure_ascii=False).encode("utf-8"))
+        return hasher.hexdigest()
+
+    def get(self, key):
+        """
+        Returns `(found, result)` of `key`.
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expire_time = entry
+                if expire_time is None or expire_time > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return True, pickle.loads(value)
+                del self._entries[key]
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT value, expire_time FROM results WHERE key = ?",
+                    (key, )).fetchone()
+                if row is not None and (row[1] is None or row[1] > now):
+                    self._put_memory(key, row[0], row[1])
+                    self.hits += 1
+                    return True, pickle.loads(row[0])
+            self.misses += 1
+            return False, None
+
+    def set(self, key, result):
+        """
+        Caches `result` as the result of `key`.
+        """
+        value = pickle.dumps(result, protocol=4)
+        expire_time = None if self.ttl is None else time.time() + self.ttl
+        with self._lock:
+            self._put_memory(key, value, expire_time)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO results VALUES (?, ?, ?)",
+                    (key, value, expire_time))
+
+    def _put_memory(self, key, value, expire_time):
+        self._entries[key] = (value, expire_time)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        """
+        Removes all results, including the ones on disk, and resets the
+        counters.
+        """
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+            if self._db is not None:
+                self._db.execute("DELETE FROM results")
+
+    def evict_expired(self):
+        """
+        Removes the expired results.
+        """
+        now = time.time()
+        with self._lock:
+            for key in [
+                    key for key, (_, expire_time) in self._entries.items()
+                    if expire_time is not None and expire_time <= now
+            ]:
+                del self._entries[key]
+            if self._db is not None:
+                self._db.execute(
+                    "DELETE FROM results WHERE expire_time IS NOT NULL AND "
+                    "expire_time <= ?", (now, ))
+
+    def info(self):
+        """
+        Returns the counters of the cache.
+        """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl": self.ttl
+            }
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
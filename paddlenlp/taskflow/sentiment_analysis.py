@@ -169,12 +169,12 @@ class SentaTask(Task):
             Pad(axis=0, pad_val=self._tokenizer.vocab.token_to_idx.get('[PAD]', 0)),  # input_ids
             Stack(dtype='int64'),  # seq_len
         ): fn(samples)
-        batches = [
-            examples[idx:idx + batch_size]
-            for idx in range(0, len(examples), batch_size)
-        ]
+        batch_indices = self._get_length_sorted_batches(
+            [lens for _, lens in examples], batch_size)
+        batches = [[examples[i] for i in indices] for indices in batch_indices]
         outputs = {}
         outputs['data_loader'] = batches
+        outputs['batch_indices'] = batch_indices
         outputs['text'] = filter_inputs
         self.batchify_fn = batchify_fn
         return outputs
@@ -207,8 +207,9 @@ class SentaTask(Task):
         This function will convert the model output to raw text.
         """
         final_results = []
-        for text, label, score in zip(inputs['text'], inputs['result'],
-                                      inputs['score']):
+        labels = self._restore_order(inputs['result'], inputs['batch_indices'])
+        scores = self._restore_order(inputs['score'], inputs['batch_indices'])
+        for text, label, score in zip(inputs['text'], labels, scores):
             result = {}
             result['text'] = text
             result['label'] = label
@@ -312,13 +313,13 @@ class SkepTask(Task):
             Pad(axis=0, pad_val=self._tokenizer.pad_token_id),  # input ids
             Pad(axis=0, pad_val=self._tokenizer.pad_token_type_id),  # token type ids
         ): [data for data in fn(samples)]
-        batches = [
-            examples[idx:idx + batch_size]
-            for idx in range(0, len(examples), batch_size)
-        ]
+        batch_indices = self._get_length_sorted_batches(
+            [len(ids) for ids, _ in examples], batch_size)
+        batches = [[examples[i] for i in indices] for indices in batch_indices]
         outputs = {}
         outputs['text'] = filter_inputs
         outputs['data_loader'] = batches
+        outputs['batch_indices'] = batch_indices
         self._batchify_fn = batchify_fn
         return outputs
 
@@ -350,8 +351,9 @@ class SkepTask(Task):
         The model output is tag ids, this function will convert the model output to raw text.
         """
         final_results = []
-        for text, label, score in zip(inputs['text'], inputs['result'],
-                                      inputs['score']):
+        labels = self._restore_order(inputs['result'], inputs['batch_indices'])
+        scores = self._restore_order(inputs['score'], inputs['batch_indices'])
+        for text, label, score in zip(inputs['text'], labels, scores):
             result = {}
             result['text'] = text
             result['label'] = label
@@ -15,12 +15,93 @@
 
 import os
 import abc
+import asyncio
+import bisect
+import copy
+import hashlib
+import itertools
+import json
 import math
+import queue
+import threading
 from abc import abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
 import paddle
 from ..utils.env import PPNLP_HOME
 from ..utils.log import logger
 from .utils import download_check, static_mode_guard, dygraph_mode_guard, download_file, cut_chinese_sent
+from .result_cache import ResultCache
+
+
+_STREAM_END = object()
+
+
+class _StageError(object):
+    def __init__(self, error):
+        self.error = error
+
+
+def _put_until(q, item, stop_event):
+    """
+    Puts `item` into the bounded queue `q`, giving up when `stop_event` is
+    set by the consumer.
+    """
+    while not stop_event.is_set():
+        try:
+            q.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _get_until(q, stop_event):
+    """
+    Gets an item from the queue `q`, returning None when `stop_event` is set.
+    """
+    while not stop_event.is_set():
+        try:
+            return q.get(timeout=0.1)
+        except queue.Empty:
+            continue
+    return None
+
+
+class _RecordingInputHandle(object):
+    """
+    Records the inputs copied to an input handle of the predictor.
+    """
+
+    def __init__(self, handle, name, feeds):
+        self._handle = handle
+        self._name = name
+        self._feeds = feeds
+
+    def copy_from_cpu(self, data):
+        self._feeds[self._name] = np.array(data)
+        self._handle.copy_from_cpu(data)
+
+    def __getattr__(self, name):
+        return getattr(self._handle, name)
+
+
+class _RecordingPredictor(object):
+    """
+    Records the inputs of each run of the predictor.
+    """
+
+    def __init__(self, predictor, feeds, batches):
+        self._predictor = predictor
+        self._feeds = feeds
+        self._batches = batches
+
+    def run(self, *args):
+        self._batches.append(dict(self._feeds))
+        return self._predictor.run(*args)
+
+    def __getattr__(self, name):
+        return getattr(self._predictor, name)
 
 
 class Task(metaclass=abc.ABCMeta):
@@ -31,8 +112,50 @@ class Task(metaclass=abc.ABCMeta):
         task(string): The name of task.
         model(string): The model name in the task.
         kwargs (dict, optional): Additional keyword arguments passed along to the specific task. 
+            The options of the static mode predictor are also passed by kwargs:
+
+            - cpu_threads (int): The number of math library threads of each
+              predictor on CPU. Defaults to the number of CPU cores divided by
+              `predictor_pool_size`.
+            - enable_mkldnn (bool): Whether to run the predictor with oneDNN
+              (MKLDNN) kernels on CPU. Defaults to None, which keeps the
+              default of Paddle Inference.
+            - mkldnn_cache_capacity (int): The number of input shapes whose
+              oneDNN kernels are cached. Defaults to 10.
+            - switch_ir_optim (bool): Whether to run the IR optimization
+              passes on the inference program. Defaults to True.
+            - delete_passes (list[str]): The names of the IR passes to skip.
+              Defaults to None.
+            - predictor_pool_size (int): The number of threads which run the
+              predictor concurrently in `__acall__`. Each thread other than
+              the one creating the task runs its own clone of the predictor,
+              which shares the weights. Defaults to 1.
+            - precision (str): The precision of the static model, "fp32" or
+              "int8". The int8 model is quantized by `quantize` and served
+              with oneDNN on CPU. Defaults to "fp32".
+            - seq_len_buckets (list[int]): The lengths which the inputs are
+              padded to, so that the predictor only runs a few input shapes.
+              Used by the tasks padding to a fixed length. Defaults to the
+              buckets of the task, such as [32, 64, 128, 256, 512] of
+              information_extraction.
+            - warmup (bool): Whether to run the predictor on each of the
+              `seq_len_buckets` at the construction, so that the first calls
+              are not slowed down by creating the kernels. Defaults to False.
+            - sort_by_length (bool): Whether to batch the inputs of a call in
+              the order of their lengths, so that the inputs of a batch are
+              padded to similar lengths. The results are still returned in
+              the order of the inputs. Defaults to True.
+            - max_batch_tokens (int): The max number of tokens of a batch,
+              including the paddings, besides the batch size. Defaults to
+              None, which only limits the batch size.
     """
 
+    # Whether the result of a single input is returned without the list.
+    _squeeze_single_result = False
+    # The default lengths which the inputs of the task are padded to, see
+    # `_batchify_by_seq_len`. None pads each batch to its longest input.
+    _default_seq_len_buckets = None
+
     def __init__(self, model, task, priority_path=None, **kwargs):
         self.model = model
         self.task = task
@@ -58,6 +181,47 @@ class Task(metaclass=abc.ABCMeta):
             self._task_path = os.path.join(self._home_path, "taskflow",
                                            self.task, self.model)
         download_check(self._task_flag)
+        # The executors of `__acall__`, created on the first call.
+        self._cpu_executor = None
+        self._predictor_executor = None
+        self._executor_lock = threading.Lock()
+        self._result_cache = None
+        # The options of the static mode predictor.
+        self._predictor_pool_size = max(
+            self.kwargs['predictor_pool_size']
+            if 'predictor_pool_size' in self.kwargs else 1, 1)
+        self._cpu_threads = self.kwargs[
+            'cpu_threads'] if 'cpu_threads' in self.kwargs else max(
+                (os.cpu_count() or 1) // self._predictor_pool_size, 1)
+        self._enable_mkldnn = self.kwargs[
+            'enable_mkldnn'] if 'enable_mkldnn' in self.kwargs else None
+        self._mkldnn_cache_capacity = self.kwargs[
+            'mkldnn_cache_capacity'] if 'mkldnn_cache_capacity' in self.kwargs else 10
+        self._switch_ir_optim = self.kwargs[
+            'switch_ir_optim'] if 'switch_ir_optim' in self.kwargs else True
+        self._delete_passes = self.kwargs[
+            'delete_passes'] if 'delete_passes' in self.kwargs else None
+        self._precision = self.kwargs[
+            'precision'] if 'precision' in self.kwargs else 'fp32'
+        assert self._precision in [
+            'fp32', 'int8'
+        ], "The precision should be fp32 or int8, but {} received.".format(
+            self._precision)
+        # Whether the predictor runs the int8 model.
+        self._quantized = False
+        self._seq_len_buckets = self.kwargs[
+            'seq_len_buckets'] if 'seq_len_buckets' in self.kwargs else self._default_seq_len_buckets
+        self._sort_by_length = self.kwargs[
+            'sort_by_length'] if 'sort_by_length' in self.kwargs else True
+        self._max_batch_tokens = self.kwargs[
+            'max_batch_tokens'] if 'max_batch_tokens' in self.kwargs else None
+        # The predictor of the thread creating it, and the clones of the other
+        # threads.
+        self._predictor = None
+        self._predictor_owner = None
+        self._input_handles = None
+        self._output_handle = None
+        self._predictor_local = threading.local()
 
     @abstractmethod
     def _construct_model(self, model):
@@ -114,10 +278,40 @@ class Task(metaclass=abc.ABCMeta):
         place = paddle.get_device()
         if place == 'cpu':
             self._config.disable_gpu()
+            self._config.set_cpu_math_library_num_threads(self._cpu_threads)
+            if self._quantized:
+                # The quantized ops only run as int8 kernels of oneDNN,
+                # otherwise they are slower than the float32 ops.
+                self._config.enable_mkldnn()
+                self._config.set_mkldnn_cache_capacity(
+                    self._mkldnn_cache_capacity)
+                if hasattr(self._config, "enable_mkldnn_int8"):
+                    self._config.enable_mkldnn_int8()
+                else:
+                    logger.warning(
+                        "The int8 kernels of oneDNN are not supported by "
+                        "this version of Paddle, please upgrade Paddle to "
+                        "speed up the int8 model.")
+            elif self._enable_mkldnn:
+                if paddle.fluid.core.is_compiled_with_mkldnn():
+                    self._config.enable_mkldnn()
+                    # The shapes of the inputs change with the text lengths,
+                    # so the kernels of the recent shapes are cached.
+                    self._config.set_mkldnn_cache_capacity(
+                        self._mkldnn_cache_capacity)
+                else:
+                    logger.warning(
+                        "Paddle is not compiled with MKLDNN, `enable_mkldnn` "
+                        "is ignored.")
+            elif self._enable_mkldnn is not None:
+                self._config.disable_mkldnn()
         else:
             self._config.enable_use_gpu(100, self.kwargs['device_id'])
             # TODO(linjieccc): enable embedding_eltwise_layernorm_fuse_pass after fixed
             self._config.delete_pass("embedding_eltwise_layernorm_fuse_pass")
+        self._config.switch_ir_optim(self._switch_ir_optim)
+        for pass_name in self._delete_passes or []:
+            self._config.delete_pass(pass_name)
         self._config.switch_use_feed_fetch_ops(False)
         self._config.disable_glog_info()
         self._config.enable_memory_optim()
@@ -131,6 +325,68 @@ class Task(metaclass=abc.ABCMeta):
             for name in self.predictor.get_output_names()
         ]
 
+    @property
+    def predictor(self):
+        return self._get_thread_predictor()[0]
+
+    @predictor.setter
+    def predictor(self, predictor):
+        self._predictor = predictor
+        self._predictor_owner = threading.get_ident()
+        # Drop the clones of the previous predictor.
+        self._predictor_local = threading.local()
+
+    @property
+    def input_handles(self):
+        return self._get_thread_predictor()[1]
+
+    @input_handles.setter
+    def input_handles(self, input_handles):
+        self._input_handles = input_handles
+
+    @property
+    def output_handle(self):
+        return self._get_thread_predictor()[2]
+
+    @output_handle.setter
+    def output_handle(self, output_handle):
+        self._output_handle = output_handle
+
+    def _get_thread_predictor(self):
+        """
+        Returns the predictor and its input and output handles for the current
+        thread. The predictor is not thread-safe, so each thread other than
+        the one creating the predictor runs its own clone, created on the
+        first use.
+        """
+        if self._predictor is None or threading.get_ident(
+        ) == self._predictor_owner:
+            return self._predictor, self._input_handles, self._output_handle
+        local = self._predictor_local
+        if not hasattr(local, "predictor"):
+            local.predictor = self._predictor.clone()
+            local.input_handles = [
+                local.predictor.get_input_handle(name)
+                for name in local.predictor.get_input_names()
+            ]
+            local.output_handle = [
+                local.predictor.get_output_handle(name)
+                for name in local.predictor.get_output_names()
+            ]
+        return local.predictor, local.input_handles, local.output_handle
+
+    def _set_thread_predictor(self, predictor, input_handles):
+        """
+        Replaces the predictor and the input handles which
+        `_get_thread_predictor` returns for the current thread.
+        """
+        if self._predictor is None or threading.get_ident(
+        ) == self._predictor_owner:
+            self._predictor, self._input_handles = predictor, input_handles
+        else:
+            self._predictor_local.predictor = predictor
+            self._predictor_local.input_handles = input_handles
+
     def _get_inference_model(self):
         """
         Return the inference program, inputs and outputs in static mode. 
@@ -143,11 +399,126 @@ class Task(metaclass=abc.ABCMeta):
                 self._construct_input_spec()
                 self._convert_dygraph_to_static()
 
+        if self._precision == 'int8':
+            int8_model_path = self._get_int8_model_path()
+            if paddle.get_device() != 'cpu':
+                logger.warning(
+                    "The int8 precision is only supported on CPU, the float32 "
+                    "model is used.")
+            elif os.path.exists(int8_model_path + ".pdiparams"):
+                inference_model_path = int8_model_path
+                self._quantized = True
+
         model_file = inference_model_path + ".pdmodel"
         params_file = inference_model_path + ".pdiparams"
         self._config = paddle.inference.Config(model_file, params_file)
         self._prepare_static_mode()
 
+    def _get_int8_model_path(self):
+        return os.path.join(self._task_path, "static", "int8", "inference")
+
+    @property
+    def quantized(self):
+        return self._quantized
+
+    def quantize(self, calibration_data, algo="hist", batch_nums=None):
+        """
+        Quantizes the weights and activations of the matmuls of the static
+        model to int8 by post-training quantization, and serves the quantized
+        model on CPU. The scales of the activations are calibrated on the
+        model inputs of `calibration_data`, which are generated by the
+        preprocessing of the task itself, so a few hundred inputs like the
+        real ones are usually enough. The quantized model is saved into
+        `static/int8` of the task path and loaded by later tasks created with
+        `precision="int8"`; delete it to calibrate again.
+
+        Args:
+            calibration_data (list): The inputs of the task to calibrate on,
+                such as a list of texts.
+            algo (str, optional): The algorithm to calibrate the scales of
+                the activations, such as "hist", "KL", "mse" and "avg".
+                Defaults to "hist".
+            batch_nums (int, optional): The max number of batches to
+                calibrate on. Defaults to None, which uses all of the batches
+                of `calibration_data`.
+        """
+        if self._config is None:
+            raise ValueError(
+                "The task {} does not run a static model, which can not be "
+                "quantized.".format(self.task))
+        if paddle.get_device() != 'cpu':
+            raise ValueError("The int8 precision is only supported on CPU.")
+        if not calibration_data:
+            raise ValueError(
+                "The calibration data should not be empty, please pass some "
+                "inputs of the task by `calibration_data`.")
+        if self._quantized:
+            logger.info("The model has already been quantized.")
+            return
+
+        batches = self._record_calibration_batches(calibration_data)
+        if batch_nums is not None:
+            batches = batches[:batch_nums]
+
+        def data_loader():
+            for batch in batches:
+                yield batch
+
+        from paddle.fluid.contrib.slim.quantization import PostTrainingQuantization
+        logger.info("Quantizing the model on {} batches, which cost a little "
+                    "time.".format(len(batches)))
+        model_dir = os.path.join(self._task_path, "static")
+        int8_model_path = self._get_int8_model_path()
+        with static_mode_guard():
+            ptq = PostTrainingQuantization(
+                executor=paddle.static.Executor(paddle.CPUPlace()),
+                model_dir=model_dir,
+                model_filename="inference.pdmodel",
+                params_filename="inference.pdiparams",
+                data_loader=data_loader,
+                batch_nums=len(batches),
+                algo=algo,
+                quantizable_op_type=["matmul", "matmul_v2"],
+                weight_quantize_type="channel_wise_abs_max",
+                optimize_model=False)
+            ptq.quantize()
+            ptq.save_quantized_model(
+                save_model_path=os.path.dirname(int8_model_path),
+                model_filename="inference.pdmodel",
+                params_filename="inference.pdiparams")
+        logger.info("The quantized model save in the path:{}".format(
+            int8_model_path))
+
+        self._quantized = True
+        self._config = paddle.inference.Config(
+            int8_model_path + ".pdmodel", int8_model_path + ".pdiparams")
+        self._prepare_static_mode()
+
+    def _record_calibration_batches(self, calibration_data):
+        """
+        Runs the task on `calibration_data` and returns the model inputs of
+        each run of the predictor, which are fed to the static program in the
+        calibration. The inputs are recorded through the predictor of the
+        current thread, which is the one the task runs.
+        """
+        feeds, batches = {}, []
+        predictor, input_handles, _ = self._get_thread_predictor()
+        self._set_thread_predictor(
+            _RecordingPredictor(predictor, feeds, batches), [
+                _RecordingInputHandle(handle, name, feeds)
+                for handle, name in zip(input_handles,
+                                        predictor.get_input_names())
+            ])
+        try:
+            self._run((calibration_data, ))
+        finally:
+            self._set_thread_predictor(predictor, input_handles)
+        if not batches:
+            raise ValueError(
+                "The predictor was not run on the calibration data, please "
+                "pass some valid inputs of the task by `calibration_data`.")
+        return batches
+
     def _convert_dygraph_to_static(self):
         """
         Convert the dygraph model to static model.
@@ -161,6 +532,117 @@ class Task(metaclass=abc.ABCMeta):
         paddle.jit.save(static_model, save_path)
         logger.info("The inference model save in the path:{}".format(save_path))
 
+    def _get_seq_len_buckets(self, max_seq_len):
+        """
+        Returns the sorted bucket lengths shorter than `max_seq_len`, followed
+        by `max_seq_len`.
+        """
+        buckets = sorted(
+            set(seq_len for seq_len in self._seq_len_buckets or []
+                if seq_len < max_seq_len))
+        return buckets + [max_seq_len]
+
+    def _batchify_by_seq_len(self, seq_lens, batch_size, max_seq_len):
+        """
+        Splits the inputs into batches by their lengths. With the sequence
+        length buckets, each input is routed to the shortest bucket which fits
+        it, and each batch holds the inputs of one bucket, padded to the
+        bucket length, so that short inputs do not pay for the computation of
+        long paddings, while the predictor only sees a few input shapes.
+        Otherwise, the batches follow the order of the inputs and are padded
+        to their longest inputs.
+
+        Args:
+            seq_lens (list[int]): The lengths of the inputs, not longer than
+                `max_seq_len`.
+            batch_size (int): The max number of inputs in a batch.
+            max_seq_len (int): The max length of the inputs.
+
+        Returns:
+            list[tuple]: The indices of the inputs of each batch and the
+            length which the batch is padded to.
+        """
+        if not self._seq_len_buckets:
+            return [(list(range(start, min(start + batch_size, len(seq_lens)))),
+                     max(seq_lens[start:start + batch_size]))
+                    for start in range(0, len(seq_lens), batch_size)]
+        buckets = self._get_seq_len_buckets(max_seq_len)
+        bucket_indices = {}
+        for i, seq_len in enumerate(seq_lens):
+            bucket = buckets[min(
+                bisect.bisect_left(buckets, seq_len), len(buckets) - 1)]
+            bucket_indices.setdefault(bucket, []).append(i)
+        batches = []
+        for bucket in sorted(bucket_indices):
+            indices = bucket_indices[bucket]
+            for start in range(0, len(indices), batch_size):
+                batches.append((indices[start:start + batch_size], bucket))
+        return batches
+
+    def _get_length_sorted_batches(self, lengths, batch_size):
+        """
+        Splits the inputs of a call into batches of at most `batch_size`
+        inputs and, if `max_batch_tokens` is set, at most `max_batch_tokens`
+        padded tokens. With `sort_by_length`, the inputs are batched from the
+        shortest to the longest, so that one long input does not make all the
+        other inputs of its batch padded to its length. Use `_restore_order`
+        to put the results back in the order of the inputs.
+
+        Args:
+            lengths (list[int]): The tokenized lengths of the inputs.
+            batch_size (int): The max number of inputs in a batch.
+
+        Returns:
+            list[list[int]]: The indices of the inputs of each batch.
+        """
+        order = range(len(lengths))
+        if self._sort_by_length:
+            order = sorted(order, key=lambda i: lengths[i])
+        batches = []
+        batch = []
+        batch_len = 0
+        for i in order:
+            new_batch_len = max(batch_len, lengths[i])
+            if batch and (len(batch) >= batch_size or
+                          (self._max_batch_tokens and new_batch_len *
+                           (len(batch) + 1) > self._max_batch_tokens)):
+                batches.append(batch)
+                batch = []
+                new_batch_len = lengths[i]
+            batch.append(i)
+            batch_len = new_batch_len
+        if batch:
+            batches.append(batch)
+        return batches
+
+    def _restore_order(self, results, batches):
+        """
+        Puts the results of the inputs, which are in the order of the batches
+        returned by `_get_length_sorted_batches`, back in the order of the
+        inputs. The results are returned as they are if `batches` is None.
+        """
+        if batches is None:
+            return results
+        ordered_results = [None] * len(results)
+        indices = itertools.chain.from_iterable(batches)
+        for i, result in zip(indices, results):
+            ordered_results[i] = result
+        return ordered_results
+
+    def _warmup_seq_len_buckets(self, batch_size, max_seq_len):
+        """
+        Runs the predictor on a batch of each sequence length bucket, so that
+        the kernels of these input shapes are created and cached before the
+        first call. Only for the models whose inputs are all int64 tensors of
+        shape [batch_size, seq_len].
+        """
+        for seq_len in self._get_seq_len_buckets(max_seq_len):
+            for input_handle in self.input_handles:
+                input_handle.copy_from_cpu(
+                    np.ones(
+                        [batch_size, seq_len], dtype="int64"))
+            self.predictor.run()
+
     def _check_input_text(self, inputs):
         inputs = inputs[0]
         if isinstance(inputs, str):
@@ -266,8 +748,250 @@ class Task(metaclass=abc.ABCMeta):
         """
         print("Examples:\n{}".format(self._usage))
 
-    def __call__(self, *args):
+    def _run(self, *args):
         inputs = self._preprocess(*args)
         outputs = self._run_model(inputs)
         results = self._postprocess(outputs)
         return results
+
+    def __call__(self, *args):
+        if self._result_cache is not None and len(args) == 1 and isinstance(
+                args[0], tuple) and len(args[0]) == 1:
+            return self._run_with_cache(args[0])
+        return self._run(*args)
+
+    def enable_result_cache(self,
+                            max_size=1024,
+                            ttl=None,
+                            db_path=None,
+                            normalize_fn=None):
+        """
+        Caches the result of each input, so that repeated inputs are not
+        computed again. The key of a result is made of the input and the task
+        config returned by `_get_cache_config`, thus changing the config, such
+        as the schema of UIE, never returns stale results. See `ResultCache`
+        for the arguments.
+        """
+        self.disable_result_cache()
+        self._result_cache = ResultCache(
+            max_size=max_size,
+            ttl=ttl,
+            db_path=db_path,
+            normalize_fn=normalize_fn)
+
+    def disable_result_cache(self):
+        if self._result_cache is not None:
+            self._result_cache.close()
+            self._result_cache = None
+
+    def _get_cache_config(self):
+        """
+        Returns the config which the results of the task depend on. Tasks
+        whose results depend on states changed after the construction should
+        override it.
+        """
+        config = {"task": self.task, "model": self.model}
+        for key, value in self.kwargs.items():
+            if key in [
+                    "device_id", "batch_size", "num_workers", "lazy_load",
+                    "cpu_threads", "enable_mkldnn", "mkldnn_cache_capacity",
+                    "switch_ir_optim", "predictor_pool_size", "warmup",
+                    "sort_by_length", "max_batch_tokens", "user_dict_cache"
+            ]:
+                continue
+            if value is None or isinstance(value, (str, int, float, bool)):
+                config[key] = value
+        user_dict_md5 = getattr(self, "_user_dict_md5", None)
+        if user_dict_md5:
+            config["user_dict"] = user_dict_md5
+        return config
+
+    def _hash_user_dict(self):
+        """
+        Records the md5 of the user dict when it is loaded, since the results
+        depend on the content loaded at the construction rather than the path
+        or later content of the user dict.
+        """
+        user_dict = self._user_dict
+        if not os.path.exists(user_dict):
+            # Loaded from the binary cache of the user dict.
+            user_dict = self.kwargs['user_dict_cache']
+        with open(user_dict, "rb") as f:
+            self._user_dict_md5 = hashlib.md5(f.read()).hexdigest()
+
+    def _run_with_cache(self, inputs):
+        texts = inputs[0]
+        texts_list = [texts] if isinstance(texts, str) else texts
+        if not isinstance(texts_list, list) or len(texts_list) == 0:
+            return self._run(inputs)
+        cache = self._result_cache
+        config = json.dumps(
+            self._get_cache_config(), sort_keys=True, ensure_ascii=False)
+        results = [None] * len(texts_list)
+        missed_positions = {}
+        for i, text in enumerate(texts_list):
+            key = cache.make_key(config, text)
+            found, result = cache.get(key)
+            if found:
+                results[i] = result
+            else:
+                missed_positions.setdefault(key, []).append(i)
+
+        if missed_positions:
+            missed_texts = [
+                texts_list[positions[0]]
+                for positions in missed_positions.values()
+            ]
+            missed_results = self._run((missed_texts, ))
+            if self._squeeze_single_result and len(missed_texts) == 1:
+                missed_results = [missed_results]
+            if not isinstance(missed_results, list) or len(
+                    missed_results) != len(missed_texts):
+                # Some inputs are skipped by the task, such as empty texts,
+                # thus the results can not be aligned with the inputs.
+                return self._run(inputs)
+            for (key, positions), result in zip(missed_positions.items(),
+                                                missed_results):
+                cache.set(key, result)
+                results[positions[0]] = result
+                for i in positions[1:]:
+                    results[i] = copy.deepcopy(result)
+
+        if self._squeeze_single_result and len(results) == 1:
+            return results[0]
+        return results
+
+    def stream(self, inputs, chunk_size=None, max_pending_chunks=2):
+        """
+        Runs the task on a large or lazy sequence of inputs and yields the
+        result of each input as soon as its chunk is done. The inputs are
+        split into chunks of `chunk_size`, and the three stages are pipelined:
+        a background thread preprocesses chunk k+1 while another thread runs
+        the predictor on chunk k and the caller postprocesses chunk k-1. At
+        most `max_pending_chunks` chunks wait between two stages, thus the
+        memory usage does not grow with the number of inputs.
+
+        Args:
+            inputs (tuple): The positional arguments of the task call, whose
+                first element is a text or an iterable of inputs, such as a
+                generator reading a file.
+            chunk_size (int, optional): The number of inputs of a chunk. If
+                None, the batch size of the task is used. Defaults to None.
+            max_pending_chunks (int, optional): The max number of chunks
+                waiting between two stages. Defaults to 2.
+
+        Yields:
+            The result of each input, in the order of inputs. A ValueError
+            is raised if the task skips some inputs, such as empty texts, as
+            the results can not be aligned with the inputs then.
+        """
+        texts = inputs[0]
+        if isinstance(texts, str):
+            texts = [texts]
+        if chunk_size is None:
+            chunk_size = self._batch_size if hasattr(
+                self, '_batch_size') else self.kwargs[
+                    'batch_size'] if 'batch_size' in self.kwargs else 1
+        chunk_size = max(chunk_size, 1)
+        stop_event = threading.Event()
+        preprocessed = queue.Queue(max_pending_chunks)
+        predicted = queue.Queue(max_pending_chunks)
+
+        def preprocess():
+            try:
+                texts_iter = iter(texts)
+                while True:
+                    chunk = list(itertools.islice(texts_iter, chunk_size))
+                    if not chunk:
+                        break
+                    item = (len(chunk), self._preprocess(
+                        (chunk, ) + tuple(inputs[1:])))
+                    if not _put_until(preprocessed, item, stop_event):
+                        return
+            except Exception as e:
+                _put_until(preprocessed, _StageError(e), stop_event)
+                return
+            _put_until(preprocessed, _STREAM_END, stop_event)
+
+        def run_model():
+            while True:
+                item = _get_until(preprocessed, stop_event)
+                if item is None:
+                    return
+                is_last = item is _STREAM_END or isinstance(item, _StageError)
+                if not is_last:
+                    try:
+                        item = (item[0], self._run_model(item[1]))
+                    except Exception as e:
+                        item, is_last = _StageError(e), True
+                if not _put_until(predicted, item, stop_event) or is_last:
+                    return
+
+        threads = [
+            threading.Thread(
+                target=preprocess, daemon=True), threading.Thread(
+                    target=run_model, daemon=True)
+        ]
+        for thread in threads:
+            thread.start()
+        try:
+            while True:
+                item = predicted.get()
+                if item is _STREAM_END:
+                    break
+                if isinstance(item, _StageError):
+                    raise item.error
+                num_inputs, outputs = item
+                results = self._postprocess(outputs)
+                if self._squeeze_single_result and num_inputs == 1:
+                    results = [results]
+                if not isinstance(results,
+                                  list) or len(results) != num_inputs:
+                    # Some inputs are skipped by the task, such as empty
+                    # texts, thus the results can not be aligned with the
+                    # inputs.
+                    raise ValueError(
+                        "The task returned {} results for a chunk of {} "
+                        "inputs, please check that the inputs are non-empty "
+                        "texts.".format(
+                            len(results) if isinstance(results, list) else 1,
+                            num_inputs))
+                for result in results:
+                    yield result
+        finally:
+            # Stop the stage threads when the caller stops early.
+            stop_event.set()
+            for thread in threads:
+                thread.join()
+
+    def _get_async_executors(self):
+        with self._executor_lock:
+            if self._predictor_executor is None:
+                num_workers = self.kwargs[
+                    'num_async_workers'] if 'num_async_workers' in self.kwargs else min(
+                        4, os.cpu_count() or 1)
+                self._cpu_executor = ThreadPoolExecutor(
+                    num_workers, thread_name_prefix="taskflow_cpu")
+                # Each thread of the pool runs its own predictor clone.
+                self._predictor_executor = ThreadPoolExecutor(
+                    self._predictor_pool_size,
+                    thread_name_prefix="taskflow_predictor")
+        return self._cpu_executor, self._predictor_executor
+
+    async def __acall__(self, *args):
+        """
+        The coroutine version of `__call__`. The preprocessing and
+        postprocessing run in a pool of `num_async_workers` threads, and the
+        predictor runs in a pool of `predictor_pool_size` threads, thus the
+        tokenization of a call overlaps with the model run of another when
+        calls are awaited concurrently.
+        """
+        cpu_executor, predictor_executor = self._get_async_executors()
+        loop = asyncio.get_running_loop()
+        inputs = await loop.run_in_executor(cpu_executor, self._preprocess,
+                                            *args)
+        outputs = await loop.run_in_executor(predictor_executor,
+                                             self._run_model, inputs)
+        results = await loop.run_in_executor(cpu_executor, self._postprocess,
+                                             outputs)
+        return results
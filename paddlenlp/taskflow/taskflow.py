@@ -13,6 +13,7 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import asyncio
 import contextlib
 from collections import deque
 import warnings
@@ -36,9 +37,18 @@ from .text_correction import CSCTask
 from .text_similarity import TextSimilarityTask
 from .dialogue import DialogueTask
 from .information_extraction import UIETask
+from .dynamic_batching import DynamicBatcher
 
 warnings.simplefilter(action='ignore', category=Warning, lineno=0, append=False)
 
+DYNAMIC_BATCHING_TASKS = [
+    "sentiment_analysis", "ner", "information_extraction", "text_similarity"
+]
+
+GENERATION_TASKS = [
+    "dialogue", "question_answering", "poetry_generation"
+]
+
 TASKS = {
     'dependency_parsing': {
         "models": {
@@ -257,6 +267,9 @@ class Taskflow(object):
             If set None, will use the default mode.
         device_id (int, optional): The device id for the gpu, xpu and other devices, the defalut value is 0.
         kwargs (dict, optional): Additional keyword arguments passed along to the specific task. 
+            The predictor options, such as `cpu_threads`, `enable_mkldnn` and `predictor_pool_size`,
+            are listed in `Task`. With `precision="int8"`, the static model is quantized on the inputs
+            of `calibration_data` the first time, see `Task.quantize`.
 
     """
 
@@ -304,16 +317,211 @@ class Taskflow(object):
             task=self.task,
             priority_path=self.priority_path,
             **self.kwargs)
+        if self.kwargs.get('precision') == 'int8' and paddle.get_device(
+        ) == 'cpu' and not self.task_instance.quantized:
+            self.task_instance.quantize(self.kwargs.get('calibration_data'))
         task_list = TASKS.keys()
         Taskflow.task_list = task_list
+        self._batcher = None
 
     def __call__(self, *inputs):
         """
         The main work function in the taskflow.
         """
+        if self._batcher is not None:
+            return self._batcher(inputs)
         results = self.task_instance(inputs)
         return results
 
+    def stream(self, *inputs, chunk_size=None):
+        """
+        Runs the task on a large or lazy sequence of inputs chunk by chunk and
+        yields the result of each input incrementally. The preprocessing, the
+        model run and the postprocessing of successive chunks are pipelined,
+        and the memory usage is bounded by a few chunks.
+
+        Example:
+            .. code-block::
+
+                ie = Taskflow("information_extraction", schema=["时间", "地点"])
+                with open("docs.txt") as f:
+                    for result in ie.stream(line.strip() for line in f):
+                        print(result)
+        """
+        return self.task_instance.stream(inputs, chunk_size=chunk_size)
+
+    async def acall(self, *inputs):
+        """
+        The coroutine version of `__call__`, which runs the task without
+        blocking the event loop. Concurrent calls are pipelined, so that the
+        preprocessing of a call overlaps with the model run of another. In the
+        serving mode enabled by `enable_dynamic_batching`, the call is batched
+        with other calls.
+
+        Example:
+            .. code-block::
+
+                senta = Taskflow("sentiment_analysis")
+                results = await asyncio.gather(
+                    senta.acall("这个产品用起来真的很流畅"),
+                    senta.acall("作为老的四星酒店，房间依然很整洁"))
+        """
+        if self._batcher is not None:
+            return await asyncio.wrap_future(self._batcher.submit(inputs))
+        return await self.task_instance.__acall__(inputs)
+
+    def enable_dynamic_batching(self,
+                                max_batch_size=32,
+                                max_wait_time=0.005,
+                                max_queue_size=0):
+        """
+        Enables the serving mode, in which the calls from many threads are
+        queued and coalesced into batches of up to `max_batch_size` inputs,
+        waiting at most `max_wait_time` seconds for a batch to fill. Each batch
+        runs the task once and the results are scattered back to the callers.
+        Supported by the sentiment_analysis, ner, information_extraction and
+        text_similarity tasks.
+
+        Args:
+            max_batch_size (int, optional): The max number of inputs in a
+                batch. Create the task with the same `batch_size` to run the
+                predictor once per batch. Defaults to 32.
+            max_wait_time (float, optional): The max seconds to wait for more
+                requests after the first request of a batch. Defaults to 0.005.
+            max_queue_size (int, optional): The max number of waiting requests.
+                0 means no limit. Defaults to 0.
+        """
+        assert self.task in DYNAMIC_BATCHING_TASKS, \
+            'Dynamic batching can only used for the tasks: {}.'.format(
+                ", ".join(DYNAMIC_BATCHING_TASKS))
+        self.disable_dynamic_batching()
+        self._batcher = DynamicBatcher(
+            self.task_instance,
+            max_batch_size=max_batch_size,
+            max_wait_time=max_wait_time,
+            max_queue_size=max_queue_size)
+
+    def disable_dynamic_batching(self):
+        """
+        Disables the serving mode after the queued requests are done.
+        """
+        if self._batcher is not None:
+            batcher, self._batcher = self._batcher, None
+            batcher.close()
+
+    def submit(self, *inputs):
+        """
+        Queues the inputs in the serving mode and returns a
+        `concurrent.futures.Future` of the results without blocking, which can
+        be awaited in asyncio code by `asyncio.wrap_future`.
+        """
+        assert self._batcher is not None, \
+            'Please call `enable_dynamic_batching` first.'
+        return self._batcher.submit(inputs)
+
+    def enable_continuous_batching(self, max_batch_size=8):
+        """
+        Runs the generation of the task with continuous batching: the inputs
+        of all the calls, including the concurrent calls from many threads,
+        share a batch of `max_batch_size` slots, and a new input takes the
+        slot of a finished one between the decoding steps. Supported by the
+        dialogue, question_answering and poetry_generation tasks.
+
+        Args:
+            max_batch_size (int, optional): The number of sequences decoded
+                together. Defaults to 8.
+        """
+        assert self.task in GENERATION_TASKS, \
+            'Continuous batching can only used for the tasks: {}.'.format(
+                ", ".join(GENERATION_TASKS))
+        self.task_instance.enable_continuous_batching(
+            max_batch_size=max_batch_size)
+
+    def disable_continuous_batching(self):
+        if self.task in GENERATION_TASKS:
+            self.task_instance.disable_continuous_batching()
+
+    def enable_prefix_cache(self, max_memory=1 << 30):
+        """
+        Reuses the self attention cache of the prompt prefixes shared by the
+        inputs, such as the few-shot prompt of the question_answering and
+        poetry_generation tasks and the repeated contexts of the dialogue
+        task, instead of encoding them for every input. Supported by the
+        dialogue, question_answering and poetry_generation tasks, and not
+        used with continuous batching.
+
+        Args:
+            max_memory (int, optional): The max bytes of the caches kept.
+                Defaults to 1 << 30.
+        """
+        assert self.task in GENERATION_TASKS, \
+            'Prefix cache can only used for the tasks: {}.'.format(
+                ", ".join(GENERATION_TASKS))
+        self.task_instance.enable_prefix_cache(max_memory=max_memory)
+
+    def disable_prefix_cache(self):
+        if self.task in GENERATION_TASKS:
+            self.task_instance.disable_prefix_cache()
+
+    def stream_generate(self, *inputs):
+        """
+        Yields the generated text of a single input piece by piece as soon as
+        its tokens are generated, instead of waiting for the whole text.
+        Supported by the dialogue, question_answering and poetry_generation
+        tasks, with or without continuous batching.
+
+        Example:
+            .. code-block::
+
+                dialogue = Taskflow("dialogue")
+                for text in dialogue.stream_generate(["吃饭了吗"]):
+                    print(text, end="", flush=True)
+        """
+        assert self.task in GENERATION_TASKS, \
+            'Streaming generation can only used for the tasks: {}.'.format(
+                ", ".join(GENERATION_TASKS))
+        return self.task_instance.stream_generate(inputs)
+
+    def enable_result_cache(self,
+                            max_size=1024,
+                            ttl=None,
+                            db_path=None,
+                            normalize_fn=None):
+        """
+        Caches the result of each input text, so that repeated texts are not
+        computed again. The results depend on the task config, such as the
+        model, the schema and the user dict, thus changing the config never
+        returns stale results. Works with the serving mode as well.
+
+        Args:
+            max_size (int, optional): The max number of results kept in
+                memory. Defaults to 1024.
+            ttl (float, optional): The seconds after which a result expires.
+                If None, results never expire. Defaults to None.
+            db_path (str, optional): The path of a sqlite database to keep
+                the results on disk, which can be shared by the processes on
+                the same machine. Defaults to None.
+            normalize_fn (callable, optional): The function to normalize an
+                input before looking it up. Only use it for the changes which
+                do not change the results. Defaults to None.
+        """
+        self.task_instance.enable_result_cache(
+            max_size=max_size,
+            ttl=ttl,
+            db_path=db_path,
+            normalize_fn=normalize_fn)
+
+    def disable_result_cache(self):
+        self.task_instance.disable_result_cache()
+
+    def cache_info(self):
+        """
+        Return the hits, misses and size of the result cache.
+        """
+        assert self.task_instance._result_cache is not None, \
+            'Please call `enable_result_cache` first.'
+        return self.task_instance._result_cache.info()
+
     def help(self):
         """
         Return the task usage message.
@@ -344,8 +552,10 @@ class Taskflow(object):
                 human = input("[Human]:").strip()
                 if human.lower() == "exit":
                     exit()
-                robot = self.task_instance(human)[0]
-                print("[Bot]:%s" % robot)
+                print("[Bot]:", end="", flush=True)
+                for text in self.task_instance.stream_generate(human):
+                    print(text, end="", flush=True)
+                print()
 
     def set_schema(self, schema):
         assert self.task_instance.model in [
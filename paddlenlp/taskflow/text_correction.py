@@ -161,7 +161,7 @@ class CSCTask(Task):
         examples = []
         texts = []
         max_predict_len = self._max_seq_len - 2
-        short_input_texts, self.input_mapping = self._auto_splitter(
+        short_input_texts, input_mapping = self._auto_splitter(
             input_texts, max_predict_len, split_sentence=self._split_sentence)
         for text in short_input_texts:
             if not (isinstance(text, str) and len(text) > 0):
@@ -183,6 +183,7 @@ class CSCTask(Task):
         outputs = {}
         outputs['batch_examples'] = batch_examples
         outputs['batch_texts'] = batch_texts
+        outputs['input_mapping'] = input_mapping
         return outputs
 
     def _run_model(self, inputs):
@@ -225,7 +226,8 @@ class CSCTask(Task):
                 result['source'] = texts[i]
                 result['target'] = ''.join(pred_result)
                 results.append(result)
-        results = self._auto_joiner(results, self.input_mapping, is_dict=True)
+        results = self._auto_joiner(
+            results, inputs['input_mapping'], is_dict=True)
         for result in results:
             errors_result = []
             for i, (source_token, target_token
@@ -24,7 +24,10 @@ import numpy as np
 import paddle
 import paddle.nn as nn
 import paddle.nn.functional as F
-from ..transformers import GPTForGreedyGeneration
+from ..transformers import GPTForGreedyGeneration, GPTLMHeadModel
+from ..transformers.generation_engine import ContinuousBatchingEngine
+from ..transformers.generation_prefix_cache import PrefixCacheStore
+from ..transformers.generation_streamer import IncrementalDetokenizer, stream_generate
 from ..transformers import GPTChineseTokenizer, GPTTokenizer
 from ..datasets import load_dataset
 from ..data import Stack, Pad, Tuple
@@ -42,6 +45,18 @@ URLS = {
 }
 
 
+def select_few_shot_input(model_name, generation_task):
+    pre_input = ""
+    if generation_task not in ['question_answering', 'poetry_generation']:
+        raise ValueError("The generation task must be question or poetry")
+    if model_name == "gpt-cpm-large-cn":
+        if generation_task == "question_answering":
+            pre_input = '问题：中国的首都是哪里？答案：北京。\n问题：{} 答案：'
+        else:
+            pre_input = '默写古诗: 大漠孤烟直，长河落日圆。\n{}'
+    return pre_input
+
+
 class TextGenerationTask(Task):
     """
     The text generation model to predict the question or chinese  poetry. 
@@ -64,6 +79,90 @@ class TextGenerationTask(Task):
             self._construct_model(model)
         self._construct_tokenizer(model)
         self.kwargs['generation_task'] = task
+        self._engine = None
+        self._dygraph_model = None
+        self._prefix_cache_store = None
+
+    def enable_continuous_batching(self, max_batch_size=8):
+        """
+        Generates the answers by a `ContinuousBatchingEngine` of
+        `max_batch_size` slots running the dygraph model, which decodes the
+        inputs of concurrent calls in the same batch.
+        """
+        self.disable_continuous_batching()
+        model = self._get_dygraph_model()
+        self._engine = ContinuousBatchingEngine(
+            model,
+            max_batch_size=max_batch_size,
+            max_length=model.max_position_embeddings,
+            eos_token_id=self._tokenizer.eol_token_id)
+
+    def disable_continuous_batching(self):
+        if self._engine is not None:
+            engine, self._engine = self._engine, None
+            engine.close()
+
+    def enable_prefix_cache(self, max_memory=1 << 30):
+        """
+        Generates the answers by the dygraph model one input at a time, and
+        reuses the self attention cache of the few-shot prompt shared by all
+        the inputs, as well as the caches of the repeated inputs, which are
+        kept in a `PrefixCacheStore` of at most `max_memory` bytes.
+        """
+        model = self._get_dygraph_model()
+        self._prefix_cache_store = PrefixCacheStore(max_memory)
+        pre_input = select_few_shot_input(self.model,
+                                          self.kwargs['generation_task'])
+        # The last token of the few-shot prompt may be merged with the input.
+        ids = self._tokenizer(pre_input.split("{}")[0])["input_ids"][:-1]
+        if len(ids) > 0:
+            self._prefix_cache_store.put(
+                model.build_prefix_cache(paddle.to_tensor([ids],
+                                                          dtype="int64")))
+
+    def disable_prefix_cache(self):
+        self._prefix_cache_store = None
+
+    def _get_dygraph_model(self):
+        # The dygraph model for the generation modes which the exported
+        # static model does not support.
+        if self._dygraph_model is None:
+            self._dygraph_model = GPTLMHeadModel.from_pretrained(self.model)
+            self._dygraph_model.eval()
+        return self._dygraph_model
+
+    def stream_generate(self, inputs):
+        """
+        Yields the answer to a single input piece by piece as its tokens are
+        generated.
+        """
+        data_loader = self._preprocess(inputs)['data_loader']
+        if len(data_loader) != 1 or len(data_loader[0]) != 1:
+            raise ValueError("Only one input can be streamed at a time.")
+        ids = data_loader[0][0][0]
+        eol_token_id = self._tokenizer.eol_token_id
+        # Generate `max_predict_len` tokens like the static model.
+        if self._engine is not None:
+            token_ids = self._engine.submit(ids, max_new_tokens=32)
+        else:
+            token_ids = (step_ids[0] for step_ids in stream_generate(
+                self._get_dygraph_model(),
+                input_ids=paddle.to_tensor(
+                    [ids], dtype="int64"),
+                max_length=32,
+                decode_strategy="greedy_search",
+                eos_token_id=eol_token_id,
+                prefix_cache_store=self._prefix_cache_store))
+        detokenizer = IncrementalDetokenizer(self._tokenizer)
+        for token_id in token_ids:
+            if token_id == eol_token_id:
+                break
+            text = detokenizer.add(token_id)
+            if text:
+                yield text
+        text = detokenizer.flush()
+        if text:
+            yield text
 
     def _construct_input_spec(self):
         """
@@ -111,20 +210,6 @@ class TextGenerationTask(Task):
             'generation_task'] if 'generation_task' in self.kwargs else 'question_answering'
         max_seq_len = 32
 
-        def select_few_shot_input(model_name, generation_task):
-            pre_input = ""
-            if generation_task not in [
-                    'question_answering', 'poetry_generation'
-            ]:
-                raise ValueError(
-                    "The generation task must be question or poetry")
-            if model_name == "gpt-cpm-large-cn":
-                if generation_task == "question_answering":
-                    pre_input = '问题：中国的首都是哪里？答案：北京。\n问题：{} 答案：'
-                else:
-                    pre_input = '默写古诗: 大漠孤烟直，长河落日圆。\n{}'
-            return pre_input
-
         pre_input = select_few_shot_input(self.model, generation_task)
 
         infer_data = []
@@ -160,6 +245,43 @@ class TextGenerationTask(Task):
         """
         results = []
         lens = []
+        if self._engine is not None:
+            # Generate `max_predict_len + 1` tokens like the static model.
+            requests = []
+            for batch in inputs['data_loader']:
+                for ids, seq_len in batch:
+                    requests.append(
+                        self._engine.submit(
+                            ids, max_new_tokens=33))
+                    results.append(ids)
+                    lens.append(seq_len)
+            for i, request in enumerate(requests):
+                results[i] = results[i] + request.result()[0]
+            inputs['results'] = results
+            inputs['lens'] = lens
+            return inputs
+        if self._prefix_cache_store is not None:
+            model = self._get_dygraph_model()
+            eol_token_id = self._tokenizer.eol_token_id
+            for batch in inputs['data_loader']:
+                for ids, seq_len in batch:
+                    # Generate `max_predict_len + 1` tokens like the static
+                    # model, which stops after the first eol.
+                    output_ids, _ = model.generate(
+                        input_ids=paddle.to_tensor([ids], dtype="int64"),
+                        max_length=33,
+                        decode_strategy="greedy_search",
+                        eos_token_id=eol_token_id,
+                        prefix_cache_store=self._prefix_cache_store)
+                    output_ids = output_ids[0].numpy().tolist()
+                    if eol_token_id in output_ids:
+                        output_ids = output_ids[:output_ids.index(
+                            eol_token_id) + 1]
+                    results.append(ids + output_ids)
+                    lens.append(seq_len)
+            inputs['results'] = results
+            inputs['lens'] = lens
+            return inputs
         with static_mode_guard():
             for batch in inputs['data_loader']:
                 ids, seq_len = self._batchify_fn(batch)
@@ -133,10 +133,11 @@ class TextSimilarityTask(Task):
             examples.append((text1_input_ids, text1_token_type_ids,
                              text2_input_ids, text2_token_type_ids))
 
-        batches = [
-            examples[idx:idx + self._batch_size]
-            for idx in range(0, len(examples), self._batch_size)
-        ]
+        # Both texts of a pair are padded to the longest of the batch.
+        batch_indices = self._get_length_sorted_batches(
+            [max(len(example[0]), len(example[2])) for example in examples],
+            self._batch_size)
+        batches = [[examples[i] for i in indices] for indices in batch_indices]
 
         batchify_fn = lambda samples, fn=Tuple(
             Pad(axis=0, pad_val=self._tokenizer.pad_token_id, dtype='int64'),  # text1_input_ids
@@ -147,6 +148,7 @@ class TextSimilarityTask(Task):
 
         outputs = {}
         outputs['data_loader'] = batches
+        outputs['batch_indices'] = batch_indices
         outputs['text'] = inputs
         self._batchify_fn = batchify_fn
         return outputs
@@ -184,7 +186,9 @@ class TextSimilarityTask(Task):
         The model output is tag ids, this function will convert the model output to raw text.
         """
         final_results = []
-        for text, similarity in zip(inputs['text'], inputs['result']):
+        similarities = self._restore_order(inputs['result'],
+                                           inputs['batch_indices'])
+        for text, similarity in zip(inputs['text'], similarities):
             result = {}
             result['text1'] = text[0]
             result['text2'] = text[1]
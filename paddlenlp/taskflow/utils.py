@@ -15,6 +15,9 @@
 
 import os
 import re
+import array
+import bisect
+import weakref
 import csv
 import json
 import warnings
@@ -635,40 +638,179 @@ class BurkhardKellerTree(object):
         return res
 
 
-class TriedTree(object):
-    """Implementataion of TriedTree
+class AhoCorasick(object):
     """
+    The Aho-Corasick automaton of a set of words, which finds the words in a
+    text in one pass over the text.
 
-    def __init__(self):
-        self.tree = {}
+    The states are the prefixes of the words, numbered in breadth-first order
+    of the sorted words, so that the children of a state are consecutive
+    states sorted by their chars. Each state keeps a few integers in flat
+    arrays, instead of a dict entry per prefix, which takes about a third of
+    the memory, and the automaton can be saved with `np.savez` by `to_numpy`
+    and restored by `from_numpy`.
 
-    def add_word(self, word):
-        """add single word into TriedTree"""
-        self.tree[word] = len(word)
-        for i in range(1, len(word)):
-            wfrag = word[:i]
-            self.tree[wfrag] = self.tree.get(wfrag, None)
+    Args:
+        words (list[str], optional): The words, whose ids are their indices in
+            the list. The id of a repeated word is its last index. Defaults to
+            None, which builds an empty automaton.
+    """
 
-    def search(self, content):
-        """Backward maximum matching
+    _ARRAY_NAMES = [
+        "chars", "child_begin", "child_end", "fail", "output", "depth",
+        "word_id"
+    ]
+
+    def __init__(self, words=None):
+        word_ids = {}
+        for i, word in enumerate(words or []):
+            if word:
+                word_ids[word] = i
+        self._build(sorted(word_ids), word_ids)
+
+    def _build(self, words, word_ids):
+        # The incoming char, the parent, the depth and the word id (-1 for
+        # none) of each state. State 0 is the root.
+        chars, parents, depth, word_id = [0], [0], [0], [-1]
+        # Adds the states of depth d + 1 from the words longer than d, which
+        # are still sorted, thus the prefixes sharing a parent are adjacent.
+        active = [(0, word) for word in words]
+        d = 0
+        while active:
+            next_active = []
+            last_parent, last_char, state = -1, -1, 0
+            for parent, word in active:
+                char = ord(word[d])
+                if char != last_char or parent != last_parent:
+                    state = len(chars)
+                    chars.append(char)
+                    parents.append(parent)
+                    depth.append(d + 1)
+                    word_id.append(-1)
+                    last_parent, last_char = parent, char
+                if len(word) == d + 1:
+                    word_id[state] = word_ids[word]
+                else:
+                    next_active.append((state, word))
+            active = next_active
+            d += 1
+
+        # The children of each state are the consecutive states
+        # [child_begin, child_end), as the parents are in ascending order.
+        num_states = len(chars)
+        child_begin = [0] * num_states
+        child_end = [0] * num_states
+        for state in range(num_states - 1, 0, -1):
+            parent = parents[state]
+            child_begin[parent] = state
+            if child_end[parent] == 0:
+                child_end[parent] = state + 1
+
+        # The failure state, and the longest word state on the failure path
+        # (0 for none) of each state. The parents come before their children.
+        fail = [0] * num_states
+        output = [0] * num_states
+        bisect_left = bisect.bisect_left
+        for state in range(1, num_states):
+            parent = parents[state]
+            if parent == 0:
+                continue
+            char = chars[state]
+            f = fail[parent]
+            while True:
+                begin, end = child_begin[f], child_end[f]
+                i = bisect_left(chars, char, begin, end)
+                if i < end and chars[i] == char:
+                    fail[state] = i
+                    break
+                if f == 0:
+                    break
+                f = fail[f]
+            f = fail[state]
+            output[state] = f if word_id[f] >= 0 else output[f]
+
+        self.chars = array.array("I", chars)
+        self.child_begin = array.array("i", child_begin)
+        self.child_end = array.array("i", child_end)
+        self.fail = array.array("i", fail)
+        self.output = array.array("i", output)
+        self.depth = array.array("i", depth)
+        self.word_id = array.array("i", word_id)
+
+    def search(self, text):
+        """
+        Finds the words in the text by leftmost-longest matching: of the words
+        starting at the leftmost position, the longest one is taken, then the
+        search goes on after it, so that the matches never overlap.
 
         Args:
-            content (str): string to be searched
+            text (str): The text to search.
+
         Returns:
-            List[Tuple]: list of maximum matching words, each element represents 
-                the starting and ending position of the matching string.
+            list[tuple]: The start, end and word id of each match.
         """
-        result = []
-        length = len(content)
-        for start in range(length):
-            for end in range(start + 1, length + 1):
-                pos = self.tree.get(content[start:end], -1)
-                if pos == -1:
+        chars, fail, output = self.chars, self.fail, self.output
+        depth, word_id = self.depth, self.word_id
+        child_begin, child_end = self.child_begin, self.child_end
+        bisect_left = bisect.bisect_left
+        # The end of the longest word at each start (0 for none), and its id.
+        longest_end = [0] * len(text)
+        longest_id = [0] * len(text)
+        state = 0
+        for end, char in enumerate(text, 1):
+            char = ord(char)
+            while True:
+                begin, stop = child_begin[state], child_end[state]
+                i = bisect_left(chars, char, begin, stop)
+                if i < stop and chars[i] == char:
+                    state = i
                     break
-                if pos and (len(result) == 0 or end > result[-1][1]):
-                    result.append((start, end))
+                if state == 0:
+                    break
+                state = fail[state]
+            matched = state if word_id[state] >= 0 else output[state]
+            while matched:
+                # A word ending later is longer than the previous ones of
+                # the same start.
+                start = end - depth[matched]
+                longest_end[start] = end
+                longest_id[start] = word_id[matched]
+                matched = output[matched]
+        result = []
+        start = 0
+        while start < len(text):
+            end = longest_end[start]
+            if end:
+                result.append((start, end, longest_id[start]))
+                start = end
+            else:
+                start += 1
         return result
 
+    def to_numpy(self):
+        """
+        Returns the arrays of the automaton as numpy arrays by name, which
+        can be saved by `np.savez` and restored by `from_numpy`.
+        """
+        return {
+            name: np.frombuffer(
+                getattr(self, name),
+                dtype=np.uint32 if name == "chars" else np.int32)
+            for name in self._ARRAY_NAMES
+        }
+
+    @classmethod
+    def from_numpy(cls, arrays):
+        """
+        Restores the automaton from the arrays returned by `to_numpy`.
+        """
+        automaton = cls.__new__(cls)
+        for name in cls._ARRAY_NAMES:
+            arr = array.array("I" if name == "chars" else "i")
+            arr.frombytes(np.asarray(arrays[name]).tobytes())
+            setattr(automaton, name, arr)
+        return automaton
+
 
 class Customization(object):
     """
@@ -676,18 +818,35 @@ class Customization(object):
     """
 
     def __init__(self):
-        self.dictitem = {}
         self.ac = None
+        # The tags and offsets of the segments of each phrase, flattened. The
+        # segments of phrase i are in [item_begin[i], item_begin[i + 1]).
+        self.item_begin = array.array("i", [0])
+        self.item_tags = array.array("i")
+        self.item_offsets = array.array("i")
+        self.tag_names = []
+
+    def load_customization(self, filename, sep=None, cache_path=None):
+        """
+        Load the custom vocab. If `cache_path` is given, the parsed vocab
+        and its automaton are saved to it in binary, and loaded from it
+        instead of the vocab next time, unless the vocab is modified later,
+        which speeds up the loading of large vocabs. The cache file is loaded
+        if the vocab does not exist.
+        """
+        if cache_path and os.path.exists(cache_path) and (
+                not os.path.exists(filename) or
+                os.path.getmtime(cache_path) >= os.path.getmtime(filename)):
+            self._load_cache(cache_path)
+            return
 
-    def load_customization(self, filename, sep=None):
-        """Load the custom vocab"""
-        self.ac = TriedTree()
+        tag_ids = {}
+        phrases = []
         with open(filename, 'r', encoding='utf8') as f:
             for line in f:
                 if sep == None:
                     words = line.strip().split()
                 else:
-                    sep = strdecode(sep)
                     words = line.strip().split(sep)
 
                 if len(words) == 0:
@@ -708,21 +867,60 @@ class Customization(object):
                 if len(phrase) < 2 and tags[0] == '':
                     continue
 
-                self.dictitem[phrase] = (tags, offset)
-                self.ac.add_word(phrase)
+                phrases.append(phrase)
+                for tag in tags:
+                    self.item_tags.append(tag_ids.setdefault(tag, len(tag_ids)))
+                self.item_offsets.extend(offset)
+                self.item_begin.append(len(self.item_tags))
+        self.tag_names = list(tag_ids)
+        self.ac = AhoCorasick(phrases)
+        if cache_path:
+            self._save_cache(cache_path)
+
+    def _save_cache(self, cache_path):
+        arrays = {
+            "ac_" + name: value
+            for name, value in self.ac.to_numpy().items()
+        }
+        for name in ["item_begin", "item_tags", "item_offsets"]:
+            arrays[name] = np.frombuffer(getattr(self, name), dtype=np.int32)
+        arrays["tag_names"] = np.array(self.tag_names, dtype=str)
+        # Written to a file object, which keeps np.savez from appending .npz
+        # to the path, then renamed, so that a crash never leaves a
+        # truncated cache.
+        tmp_path = cache_path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(f, **arrays)
+        os.replace(tmp_path, cache_path)
+
+    def _load_cache(self, cache_path):
+        with np.load(cache_path, allow_pickle=False) as data:
+            for name in ["item_begin", "item_tags", "item_offsets"]:
+                arr = array.array("i")
+                arr.frombytes(data[name].tobytes())
+                setattr(self, name, arr)
+            self.tag_names = data["tag_names"].tolist()
+            self.ac = AhoCorasick.from_numpy({
+                name: data["ac_" + name]
+                for name in AhoCorasick._ARRAY_NAMES
+            })
 
     def parse_customization(self, query, lac_tags, prefix=False):
         """Use custom vocab to modify the lac results"""
-        if not self.ac:
-            logging.warning("customization dict is not load")
+        if self.ac is None:
+            logger.warning("customization dict is not load")
             return
         ac_res = self.ac.search(query)
 
-        for begin, end in ac_res:
-            phrase = query[begin:end]
+        for begin, end, phrase_id in ac_res:
             index = begin
 
-            tags, offsets = self.dictitem[phrase]
+            item_begin = self.item_begin[phrase_id]
+            item_end = self.item_begin[phrase_id + 1]
+            tags = [
+                self.tag_names[i] for i in self.item_tags[item_begin:item_end]
+            ]
+            offsets = self.item_offsets[item_begin:item_end]
 
             if prefix:
                 for tag, offset in zip(tags, offsets):
@@ -752,6 +950,28 @@ class Customization(object):
                         lac_tags[index] = lac_tags[index][:-1] + "B"
 
 
+# The loaded custom vocabs, shared by the tasks loading the same file.
+_customizations = weakref.WeakValueDictionary()
+
+
+def get_customization(filename, cache_path=None):
+    """
+    Returns the `Customization` loaded from the custom vocab `filename`, or
+    from `cache_path` as in `Customization.load_customization`. The tasks
+    loading the same unchanged file share one `Customization`, which is read
+    only after loading.
+    """
+    path = filename if os.path.exists(filename) or not cache_path else cache_path
+    key = (os.path.abspath(filename), cache_path and
+           os.path.abspath(cache_path), os.path.getmtime(path))
+    custom = _customizations.get(key)
+    if custom is None:
+        custom = Customization()
+        custom.load_customization(filename, cache_path=cache_path)
+        _customizations[key] = custom
+    return custom
+
+
 class SchemaTree(object):
     """
     Implementataion of SchemaTree
@@ -68,11 +68,14 @@ class SegJiebaTask(Task):
         kwargs (dict, optional): Additional keyword arguments passed along to the specific task. 
     """
 
+    _squeeze_single_result = True
+
     def __init__(self, task, model, user_dict=None, **kwargs):
         super().__init__(task=task, model=model, **kwargs)
         self._user_dict = user_dict
         if self._user_dict:
             jieba.load_userdict(user_dict)
+            self._hash_user_dict()
 
     def _construct_input_spec(self):
         """
@@ -117,6 +120,8 @@ class SegLACTask(LacTask):
         kwargs (dict, optional): Additional keyword arguments passed along to the specific task. 
     """
 
+    _squeeze_single_result = True
+
     def __init__(self, task, model, **kwargs):
         super().__init__(task=task, model="lac", **kwargs)
 
@@ -156,7 +161,8 @@ class SegLACTask(LacTask):
             if len(sent_out) < len(tags_out):
                 sent_out.append(parital_word)
             final_results.append(sent_out)
-        final_results = self._auto_joiner(final_results, self.input_mapping)
+        final_results = self._auto_joiner(final_results,
+                                          inputs['input_mapping'])
         final_results = final_results if len(
             final_results) > 1 else final_results[0]
         return final_results
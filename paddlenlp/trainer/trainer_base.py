@@ -18,6 +18,7 @@
 
 import collections
 import contextlib
+import copy
 import inspect
 import math
 import os
@@ -25,6 +26,7 @@ import random
 import re
 import shutil
 import sys
+import tempfile
 import time
 import types
 from collections.abc import Mapping
@@ -73,11 +75,21 @@ from .trainer_callback import (
     TrainerControl,
     TrainerState, )
 from .utils.helper import (
+    LengthGroupedBatchSampler,
     distributed_concat,
     nested_concat,
     nested_detach,
     nested_numpify,
-    nested_truncate, )
+    nested_truncate,
+    PredictionBuffer, )
+from .utils.checkpoint import (
+    AsyncCheckpointWriter,
+    is_checkpoint_committed,
+    load_state_dict,
+    mark_checkpoint_committed,
+    save_state_dict,
+    snapshot_state_dict,
+    state_dict_exists, )
 
 DEFAULT_CALLBACKS = [DefaultFlowCallback]
 DEFAULT_PROGRESS_CALLBACK = ProgressCallback
@@ -140,7 +152,9 @@ class Trainer:
             interrupted training or reuse the fine-tuned model.
         compute_metrics (`Callable[[EvalPrediction], Dict]`, *optional*):
             The function that will be used to compute metrics at evaluation. Must take a [`EvalPrediction`] and return
-            a dictionary string to metric values.
+            a dictionary string to metric values. With `args.streaming_eval`, it can also be an object with an
+            `update` method taking the [`EvalPrediction`] of each batch, an `accumulate` method returning the
+            dictionary of metric values, and optionally a `reset` method called before each evaluation.
         optimizers (`Tuple[paddle.optimizer.Optimizer, paddle.optimizer.lr.LRScheduler]`, *optional*): A tuple
             containing the optimizer and the scheduler to use. Will default to an instance of [`AdamW`] on your model
             and a scheduler given by [`get_linear_schedule_with_warmup`] controlled by `args`.
@@ -187,6 +201,7 @@ class Trainer:
         self.args = args
         self.is_in_train = False
         self.do_grad_scaling = args.fp16
+        self._checkpoint_writer = AsyncCheckpointWriter()
 
         # Seed must be set before instantiating the model when using model
         set_seed(self.args.seed)
@@ -302,7 +317,7 @@ class Trainer:
                 )
 
         if resume_from_checkpoint is not None:
-            if not os.path.isfile(
+            if not state_dict_exists(
                     os.path.join(resume_from_checkpoint, WEIGHTS_NAME)):
                 raise ValueError(
                     f"Can't find a valid checkpoint at {resume_from_checkpoint}")
@@ -310,7 +325,7 @@ class Trainer:
             logger.info(f"Loading model from {resume_from_checkpoint} .")
 
             # We load the model state dict on the CPU to avoid an OOM error.
-            state_dict = paddle.load(
+            state_dict = load_state_dict(
                 os.path.join(resume_from_checkpoint, WEIGHTS_NAME))
             # If the model is on the GPU, it still works!
             self._set_state_dict_in_model(state_dict)
@@ -444,7 +459,8 @@ class Trainer:
             if isinstance(train_dataloader,
                           paddle.io.DataLoader) and isinstance(
                               train_dataloader.batch_sampler,
-                              DistributedBatchSampler):
+                              (DistributedBatchSampler,
+                               LengthGroupedBatchSampler)):
                 train_dataloader.batch_sampler.set_epoch(epoch)
 
             step = -1
@@ -541,6 +557,9 @@ class Trainer:
             # Clean the state at the end of training
             delattr(self, "_past")
 
+        # Make sure the last checkpoint is committed before it is used.
+        self._checkpoint_writer.wait()
+
         logger.info("\nTraining completed. \n")
         if args.load_best_model_at_end and self.state.best_model_checkpoint is not None:
             if args.local_rank != -1:
@@ -552,9 +571,9 @@ class Trainer:
 
             best_model_path = os.path.join(self.state.best_model_checkpoint,
                                            WEIGHTS_NAME)
-            if os.path.exists(best_model_path):
+            if state_dict_exists(best_model_path):
                 # We load the model state dict on the CPU to avoid an OOM error.
-                state_dict = paddle.load(best_model_path)
+                state_dict = load_state_dict(best_model_path)
                 # If the model is on the GPU, it still works!
                 self._set_state_dict_in_model(state_dict)
             else:
@@ -587,6 +606,21 @@ class Trainer:
         if not isinstance(self.train_dataset, collections.abc.Sized):
             return None
 
+        if self.args.group_by_length:
+            model_input_name = self.tokenizer.model_input_names[
+                0] if self.tokenizer is not None else "input_ids"
+            return LengthGroupedBatchSampler(
+                self.train_dataset,
+                batch_size=self.args.per_device_train_batch_size,
+                length_column_name=self.args.length_column_name,
+                model_input_name=model_input_name,
+                max_tokens_per_batch=self.args.max_tokens_per_batch,
+                num_replicas=self.args.world_size,
+                rank=self.args.process_index,
+                shuffle=True,
+                drop_last=self.args.dataloader_drop_last,
+                seed=self.args.seed)
+
         if self.args.world_size <= 1:
             return paddle.io.BatchSampler(
                 dataset=self.train_dataset,
@@ -1038,6 +1072,7 @@ class Trainer:
             output_dir = self.args.output_dir
 
         if load_best_model and self.state.best_model_checkpoint is not None:
+            self._checkpoint_writer.wait()
             if self.args.local_rank != -1:
                 dist.barrier()
 
@@ -1047,9 +1082,9 @@ class Trainer:
 
             best_model_path = os.path.join(self.state.best_model_checkpoint,
                                            WEIGHTS_NAME)
-            if os.path.exists(best_model_path):
+            if state_dict_exists(best_model_path):
                 # We load the model state dict on the CPU to avoid an OOM error.
-                state_dict = paddle.load(best_model_path)
+                state_dict = load_state_dict(best_model_path)
                 # If the model is on the GPU, it still works!
                 self._set_state_dict_in_model(state_dict)
             else:
@@ -1092,16 +1127,25 @@ class Trainer:
 
         output_dir = os.path.join(run_dir, checkpoint_folder)
 
-        self.save_model(output_dir)
+        states = {}
+        if self.args.save_async or self.args.save_shard_size:
+            # The weights are saved with the other states, only the config,
+            # tokenizer and arguments are saved here.
+            if self.args.should_save:
+                self._save(output_dir, save_weights=False)
+                states[WEIGHTS_NAME] = self.model.state_dict()
+        else:
+            self.save_model(output_dir)
 
         if self.args.should_save:
-            paddle.save(self.optimizer.state_dict(),
-                        os.path.join(output_dir, OPTIMIZER_NAME))
-            paddle.save(self.lr_scheduler.state_dict(),
-                        os.path.join(output_dir, SCHEDULER_NAME))
+            states[OPTIMIZER_NAME] = self.optimizer.state_dict()
+            states[SCHEDULER_NAME] = self.lr_scheduler.state_dict()
             if self.do_grad_scaling:
-                paddle.save(self.scaler.state_dict(),
-                            os.path.join(output_dir, SCALER_NAME))
+                states[SCALER_NAME] = self.scaler.state_dict()
+            # The states of the callbacks, such as the averaged parameters of
+            # `EMACallback`, are committed with the checkpoint.
+            for callback in self.callback_handler.callbacks:
+                states.update(callback.checkpoint_states())
 
         # Determine the new best metric / best model checkpoint
         if metrics is not None and self.args.metric_for_best_model is not None:
@@ -1117,11 +1161,6 @@ class Trainer:
                 self.state.best_metric = metric_value
                 self.state.best_model_checkpoint = output_dir
 
-        # Save the Trainer state
-        if self.args.should_save:
-            self.state.save_to_json(
-                os.path.join(output_dir, TRAINER_STATE_NAME))
-
         # Save RNG state in non-distributed training
         rng_states = {
             "python": random.getstate(),
@@ -1134,6 +1173,37 @@ class Trainer:
         # A process can arrive here before the process 0 has a chance to save the model, in which case output_dir may
         # not yet exist.
         os.makedirs(output_dir, exist_ok=True)
+
+        if self.args.save_async:
+            # Copy the states to host memory, so that training can go on
+            # while they are written in the background.
+            states = snapshot_state_dict(states)
+            trainer_state = copy.deepcopy(self.state)
+            self._checkpoint_writer.submit(
+                lambda: self._write_checkpoint(
+                    output_dir, states, trainer_state, rng_states))
+        else:
+            self._write_checkpoint(output_dir, states, self.state,
+                                   rng_states)
+
+    def _write_checkpoint(self, output_dir, states, trainer_state,
+                          rng_states):
+        # Writes the states of a checkpoint, then marks it as committed. It
+        # runs in the background if `save_async` is set.
+        max_shard_size = self.args.save_shard_size * 1024 * 1024 if (
+            self.args.save_shard_size) else None
+        if self.args.should_save:
+            for name, state in states.items():
+                save_state_dict(
+                    state,
+                    os.path.join(output_dir, name),
+                    max_shard_size=max_shard_size
+                    if name in (WEIGHTS_NAME, OPTIMIZER_NAME) else None)
+
+            # Save the Trainer state
+            trainer_state.save_to_json(
+                os.path.join(output_dir, TRAINER_STATE_NAME))
+
         local_rank = self.args.local_rank
 
         if local_rank == -1:
@@ -1142,9 +1212,11 @@ class Trainer:
             paddle.save(rng_states,
                         os.path.join(output_dir, f"rng_state_{local_rank}.pth"))
 
-        # Maybe delete some older checkpoints.
         if self.args.should_save:
-            self._rotate_checkpoints(use_mtime=True, output_dir=run_dir)
+            mark_checkpoint_committed(output_dir)
+            # Maybe delete some older checkpoints.
+            self._rotate_checkpoints(
+                use_mtime=True, output_dir=self.args.output_dir)
 
     def _sorted_checkpoints(self,
                             output_dir=None,
@@ -1152,8 +1224,10 @@ class Trainer:
                             use_mtime=False) -> List[str]:
         ordering_and_checkpoint_path = []
 
+        # Only the checkpoints whose files have all been saved are listed.
         glob_checkpoints = [
             str(x) for x in Path(output_dir).glob(f"{checkpoint_prefix}-*")
+            if is_checkpoint_committed(str(x))
         ]
 
         for path in glob_checkpoints:
@@ -1171,7 +1245,9 @@ class Trainer:
             checkpoint[1] for checkpoint in checkpoints_sorted
         ]
         # Make sure we don't delete the best model.
-        if self.state.best_model_checkpoint is not None:
+        if (self.state.best_model_checkpoint is not None and
+                str(Path(self.state.best_model_checkpoint)) in
+                checkpoints_sorted):
             best_model_index = checkpoints_sorted.index(
                 str(Path(self.state.best_model_checkpoint)))
             for i in range(best_model_index, len(checkpoints_sorted) - 2):
@@ -1207,14 +1283,21 @@ class Trainer:
             )
             shutil.rmtree(checkpoint)
 
-    def _save(self, output_dir: Optional[str]=None, state_dict=None):
+    def _save(self,
+              output_dir: Optional[str]=None,
+              state_dict=None,
+              save_weights=True):
         # If we are executing this function, we are the process zero, so we don't check for that.
         output_dir = output_dir if output_dir is not None else self.args.output_dir
         os.makedirs(output_dir, exist_ok=True)
         logger.info(f"Saving model checkpoint to {output_dir}")
         # Save a trained model and configuration using `save_pretrained()`.
         # They can then be reloaded using `from_pretrained()`
-        if not isinstance(self.model, PretrainedModel):
+        if not save_weights:
+            # Only save the config, the weights are saved by the caller.
+            if isinstance(unwrap_model(self.model), PretrainedModel):
+                unwrap_model(self.model).save_model_config(output_dir)
+        elif not isinstance(self.model, PretrainedModel):
             if isinstance(unwrap_model(self.model), PretrainedModel):
                 if state_dict is None:
                     state_dict = self.model.state_dict()
@@ -1241,12 +1324,12 @@ class Trainer:
         if checkpoint is None:
             return
 
-        if os.path.isfile(os.path.join(
+        if state_dict_exists(os.path.join(
                 checkpoint, OPTIMIZER_NAME)) and os.path.isfile(
                     os.path.join(checkpoint, SCHEDULER_NAME)):
             # Load in optimizer and scheduler states
             self.optimizer.set_state_dict(
-                paddle.load(os.path.join(checkpoint, OPTIMIZER_NAME)))
+                load_state_dict(os.path.join(checkpoint, OPTIMIZER_NAME)))
             self.lr_scheduler.set_state_dict(
                 paddle.load(os.path.join(checkpoint, SCHEDULER_NAME)))
             if self.do_grad_scaling and os.path.isfile(
@@ -1313,7 +1396,8 @@ class Trainer:
             # self.args.prediction_loss_only
             prediction_loss_only=True if self.compute_metrics is None else None,
             ignore_keys=ignore_keys,
-            metric_key_prefix=metric_key_prefix, )
+            metric_key_prefix=metric_key_prefix,
+            keep_predictions=False, )
 
         total_batch_size = self.args.eval_batch_size * self.args.world_size
         output.metrics.update(
@@ -1337,11 +1421,13 @@ class Trainer:
             prediction_loss_only: Optional[bool]=None,
             ignore_keys: Optional[List[str]]=None,
             metric_key_prefix: str="eval",
-            max_eval_iters: Optional[int]=-1, ) -> EvalLoopOutput:
+            max_eval_iters: Optional[int]=-1,
+            keep_predictions: bool=True, ) -> EvalLoopOutput:
         """
         Prediction/evaluation loop, shared by `Trainer.evaluate()` and `Trainer.predict()`.
 
-        Works both with or without labels.
+        Works both with or without labels. With `args.streaming_eval`, the predictions are not returned if
+        `keep_predictions` is False and `compute_metrics` is incremental.
         """
         args = self.args
 
@@ -1390,6 +1476,12 @@ class Trainer:
         if args.past_index >= 0:
             self._past = None
 
+        if args.streaming_eval:
+            return self._streaming_evaluation_loop(
+                dataloader, model, batch_size, num_samples,
+                prediction_loss_only, ignore_keys, metric_key_prefix,
+                max_eval_iters, keep_predictions)
+
         # Initialize containers
         # losses/preds/labels on GPU (accumulated for eval_accumulation_steps)
         losses_host = None
@@ -1477,6 +1569,123 @@ class Trainer:
             metrics=metrics,
             num_samples=num_samples)
 
+    def _streaming_evaluation_loop(self, dataloader, model, batch_size,
+                                   num_samples, prediction_loss_only,
+                                   ignore_keys, metric_key_prefix,
+                                   max_eval_iters, keep_predictions):
+        # The evaluation loop of `streaming_eval`: each batch is moved to
+        # host memory and written into `PredictionBuffer`, and incremental
+        # metrics are updated with it, so the memory doesn't grow with the
+        # number of batches.
+        args = self.args
+        incremental_metrics = hasattr(self.compute_metrics,
+                                      "update") and hasattr(
+                                          self.compute_metrics, "accumulate")
+        if incremental_metrics and hasattr(self.compute_metrics, "reset"):
+            self.compute_metrics.reset()
+        memmap_dir = None
+        if args.eval_memmap_dir is not None:
+            os.makedirs(args.eval_memmap_dir, exist_ok=True)
+            memmap_dir = tempfile.mkdtemp(
+                prefix=f"{metric_key_prefix}_", dir=args.eval_memmap_dir)
+        # A non-incremental `compute_metrics` needs all the predictions, even
+        # if the caller doesn't, and then they are dropped after it.
+        return_predictions = keep_predictions
+        keep_predictions = keep_predictions or (
+            self.compute_metrics is not None and not incremental_metrics)
+        if keep_predictions:
+            preds_buffer = PredictionBuffer(
+                num_samples,
+                padding_index=-100,
+                memmap_dir=memmap_dir and os.path.join(memmap_dir,
+                                                       "predictions"))
+            labels_buffer = PredictionBuffer(
+                num_samples,
+                padding_index=-100,
+                memmap_dir=memmap_dir and os.path.join(memmap_dir, "labels"))
+
+        losses_sum = 0.0
+        num_losses = 0
+        num_observed = 0
+        metrics_updated = False
+        for step, inputs in enumerate(dataloader):
+            loss, logits, labels = self.prediction_step(
+                model, inputs, prediction_loss_only, ignore_keys=ignore_keys)
+            if loss is not None:
+                losses = nested_numpify(
+                    self._nested_gather(
+                        paddle.tile(
+                            loss, repeat_times=[batch_size, 1])))
+                losses = losses[:num_samples - num_losses]
+                losses_sum += float(losses.sum())
+                num_losses += losses.shape[0]
+            # Drop the samples added by the distributed sampler.
+            num_remaining = num_samples - num_observed
+            if labels is not None:
+                labels = nested_truncate(
+                    nested_numpify(
+                        self._nested_gather(
+                            self._pad_across_processes(labels))),
+                    num_remaining)
+            if logits is not None:
+                logits = nested_truncate(
+                    nested_numpify(
+                        self._nested_gather(
+                            self._pad_across_processes(logits))),
+                    num_remaining)
+            if keep_predictions:
+                if logits is not None:
+                    preds_buffer.add(logits)
+                if labels is not None:
+                    labels_buffer.add(labels)
+            if (incremental_metrics and logits is not None and
+                    labels is not None and num_remaining > 0):
+                self.compute_metrics.update(
+                    EvalPrediction(
+                        predictions=logits, label_ids=labels))
+                metrics_updated = True
+            num_observed += min(batch_size * args.world_size, num_remaining)
+            self.control = self.callback_handler.on_prediction_step(
+                args, self.state, self.control)
+            if max_eval_iters > 0 and step >= max_eval_iters - 1:
+                break
+
+        model.train()
+
+        all_preds = preds_buffer.get() if keep_predictions else None
+        all_labels = labels_buffer.get() if keep_predictions else None
+
+        # Metrics!
+        if incremental_metrics:
+            metrics = self.compute_metrics.accumulate(
+            ) if metrics_updated else {}
+        elif (self.compute_metrics is not None and all_preds is not None and
+              all_labels is not None):
+            metrics = self.compute_metrics(
+                EvalPrediction(
+                    predictions=all_preds, label_ids=all_labels))
+        else:
+            metrics = {}
+
+        if num_losses > 0:
+            metrics[f"{metric_key_prefix}_loss"] = losses_sum / num_losses
+
+        # Prefix all keys with metric_key_prefix + '_'
+        for key in list(metrics.keys()):
+            if not key.startswith(f"{metric_key_prefix}_"):
+                metrics[f"{metric_key_prefix}_{key}"] = metrics.pop(key)
+
+        if not return_predictions:
+            all_preds, all_labels = None, None
+            if memmap_dir is not None:
+                shutil.rmtree(memmap_dir, ignore_errors=True)
+
+        return EvalLoopOutput(
+            predictions=all_preds,
+            label_ids=all_labels,
+            metrics=metrics,
+            num_samples=num_samples)
+
     def predict(self,
                 test_dataset: Dataset,
                 ignore_keys: Optional[List[str]]=None,
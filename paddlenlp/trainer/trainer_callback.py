@@ -20,8 +20,9 @@ Callbacks to use with the Trainer class and customize the training loop.
 """
 import dataclasses
 import json
+import os
 from dataclasses import dataclass
-from typing import Dict, List, Optional, Union
+from typing import Any, Dict, List, Optional, Union
 
 import numpy as np
 from tqdm.auto import tqdm
@@ -39,6 +40,7 @@ __all__ = [
     "ProgressCallback",
     "PrinterCallback",
     "EarlyStoppingCallback",
+    "EMACallback",
 ]
 
 
@@ -336,6 +338,13 @@ class TrainerCallback:
         """
         pass
 
+    def checkpoint_states(self) -> Dict[str, Any]:
+        """
+        Returns the states of the callback to save with each checkpoint, by file name. They are written with the
+        model and optimizer states, before the checkpoint is marked as committed.
+        """
+        return {}
+
 
 class CallbackHandler(TrainerCallback):
     """Internal class that just calls the list of callbacks in order."""
@@ -673,3 +682,77 @@ class EarlyStoppingCallback(TrainerCallback):
         self.check_metric_value(args, state, control, metric_value)
         if self.early_stopping_patience_counter >= self.early_stopping_patience:
             control.should_training_stop = True
+
+
+# The file of the averaged parameters of `EMACallback` in a checkpoint.
+EMA_STATE_NAME = "ema_state.pdparams"
+
+
+class EMACallback(TrainerCallback):
+    """
+    A [`TrainerCallback`] that keeps the exponential moving average (EMA) of the model parameters with
+    [`~ops.optimizer.ExponentialMovingAverage`]. The model is evaluated with the averaged parameters, which are
+    swapped in place before each evaluation during training and swapped back right after it. The checkpoints keep the
+    trained parameters, and the averaged ones are saved with them as `ema_state.pdparams`.
+
+    Args:
+        decay (`float`, *optional*, defaults to 0.999):
+            The decay of the average for each update.
+        update_every (`int`, *optional*, defaults to 1):
+            The number of optimization steps between two updates of the average.
+        apply_at_end (`bool`, *optional*, defaults to `True`):
+            Whether to copy the averaged parameters into the model at the end of training. With
+            `load_best_model_at_end`, the averaged parameters of the best checkpoint are loaded.
+    """
+
+    def __init__(self,
+                 decay: float=0.999,
+                 update_every: int=1,
+                 apply_at_end: bool=True):
+        self.decay = decay
+        self.update_every = update_every
+        self.apply_at_end = apply_at_end
+        self.ema = None
+
+    def on_train_begin(self, args, state, control, model=None, **kwargs):
+        from ..ops.optimizer.ema import ExponentialMovingAverage
+
+        self.ema = ExponentialMovingAverage(
+            model, decay=self.decay, update_every=self.update_every)
+        self.ema.register()
+
+    def on_step_end(self, args, state, control, **kwargs):
+        self.ema.update()
+        # The callbacks after `DefaultFlowCallback` know whether the model is
+        # evaluated after this step.
+        if control.should_evaluate:
+            self.ema.apply_shadow()
+
+    def on_epoch_end(self, args, state, control, **kwargs):
+        if control.should_evaluate and not self.ema.applied:
+            self.ema.apply_shadow()
+
+    def on_evaluate(self, args, state, control, **kwargs):
+        if self.ema is not None and self.ema.applied:
+            self.ema.restore()
+
+    def checkpoint_states(self):
+        if self.ema is None:
+            return {}
+        return {EMA_STATE_NAME: self.ema.state_dict()}
+
+    def on_train_end(self, args, state, control, model=None, **kwargs):
+        if not self.apply_at_end:
+            return
+        ema_path = None
+        if args.load_best_model_at_end and state.best_model_checkpoint:
+            ema_path = os.path.join(state.best_model_checkpoint,
+                                    EMA_STATE_NAME)
+        if ema_path is not None and os.path.isfile(ema_path):
+            # The best checkpoint was chosen by evaluating its averaged
+            # parameters.
+            import paddle
+
+            model.set_state_dict(paddle.load(ema_path))
+        else:
+            self.ema.apply_shadow(backup=False)
@@ -29,6 +29,8 @@ from typing import Dict, NamedTuple, Optional, Tuple, Union
 
 import numpy as np
 
+from .utils.checkpoint import is_checkpoint_committed
+
 __all__ = [
     "TrainOutput",
     "PredictionOutput",
@@ -303,6 +305,15 @@ def get_last_checkpoint(folder):
         if _re_checkpoint.search(path) is not None and os.path.isdir(
             os.path.join(folder, path))
     ]
+    # Skip the checkpoints which are still being saved, or whose saving was
+    # interrupted. The ones saved before the commit markers were introduced
+    # have none, so they are kept if no checkpoint is committed.
+    committed = [
+        path for path in checkpoints
+        if is_checkpoint_committed(os.path.join(folder, path))
+    ]
+    if len(committed) > 0:
+        checkpoints = committed
     if len(checkpoints) == 0:
         return
     return os.path.join(
@@ -91,6 +91,13 @@ class TrainingArguments:
 
         prediction_loss_only (`bool`, *optional*, defaults to `False`):
             When performing evaluation and generating predictions, only returns the loss.
+        streaming_eval (`bool`, *optional*, defaults to `False`):
+            Whether to evaluate batch by batch. The predictions and labels are written into arrays preallocated from
+            the number of examples instead of being concatenated, and a `compute_metrics` with `update` and
+            `accumulate` methods is updated with each batch, in which case `evaluate()` doesn't keep the predictions.
+        eval_memmap_dir (`str`, *optional*):
+            With `streaming_eval`, the directory to store the predictions and labels as memory mapped files, which is
+            useful when they don't fit in memory. They are removed after `evaluate()`. Default keeps them in memory.
         per_device_train_batch_size (`int`, *optional*, defaults to 8):
             The batch size per GPU core/CPU for training.
         per_device_eval_batch_size (`int`, *optional*, defaults to 8):
@@ -164,6 +171,13 @@ class TrainingArguments:
 
             This should not be activated when the different nodes use the same storage as the files will be saved with
             the same names for each node.
+        save_async (`bool`, *optional*, defaults to `False`):
+            Whether to save checkpoints in the background. The states are copied to host memory, training resumes, and
+            a background thread writes the files, then marks the checkpoint as committed. Only committed checkpoints
+            are rotated or resumed from.
+        save_shard_size (`int`, *optional*):
+            The max size in MB of each file of the model and optimizer states in checkpoints. Larger states are split
+            into shard files, which are loaded in parallel when resuming. Default is one file per state.
         no_cuda (`bool`, *optional*, defaults to `False`):
             Whether to not use CUDA even when it is available or not.
         seed (`int`, *optional*, defaults to 42):
@@ -232,10 +246,17 @@ class TrainingArguments:
             can take a long time) but will not yield the same results as the interrupted training would have.
         optim (`str` or [`training_args.OptimizerNames`], *optional*, defaults to `"adamw"`):
             The optimizer to use: adamw, or adafactor.
+        group_by_length (`bool`, *optional*, defaults to `False`):
+            Whether or not to group together samples of roughly the same length in the training dataset (to minimize
+            padding applied and be more efficient). Only useful if applying dynamic padding.
         length_column_name (`str`, *optional*, defaults to `"length"`):
             Column name for precomputed lengths. If the column exists, grouping by length will use these values rather
             than computing them on train startup. Ignored unless `group_by_length` is `True` and the dataset is an
             instance of `Dataset`.
+        max_tokens_per_batch (`int`, *optional*):
+            If set with `group_by_length`, the training batch size varies so that the number of tokens in a batch,
+            padding included, stays under this budget. `per_device_train_batch_size` is then the maximum number of
+            samples in a batch.
         report_to (`str` or `List[str]`, *optional*, defaults to `"visualdl"`):
             The list of integrations to report the results and logs to. Supported platforms is `"visualdl"`.
             `"none"` for no integrations.
@@ -278,6 +299,18 @@ class TrainingArguments:
             "help":
             "When performing evaluation and predictions, only returns the loss."
         }, )
+    streaming_eval: bool = field(
+        default=False,
+        metadata={
+            "help":
+            "Whether to evaluate batch by batch, with preallocated predictions and incremental metrics."
+        }, )
+    eval_memmap_dir: Optional[str] = field(
+        default=None,
+        metadata={
+            "help":
+            "With streaming_eval, the directory to store the predictions and labels as memory mapped files."
+        }, )
 
     per_device_train_batch_size: int = field(
         default=8,
@@ -364,6 +397,18 @@ class TrainingArguments:
             "help":
             "When doing multi-node distributed training, whether to save models and checkpoints on each node, or only on the main one"
         }, )
+    save_async: bool = field(
+        default=False,
+        metadata={
+            "help":
+            "Whether to save checkpoints in a background thread while training goes on."
+        }, )
+    save_shard_size: Optional[int] = field(
+        default=None,
+        metadata={
+            "help":
+            "The max size in MB of each file of the model and optimizer states in checkpoints. Default is one file per state."
+        }, )
     no_cuda: bool = field(
         default=False,
         metadata={"help": "Do not use CUDA even when it is available"})
@@ -473,6 +518,24 @@ class TrainingArguments:
     optim: str = field(
         default="adamw",
         metadata={"help": "The optimizer to use."}, )
+    group_by_length: bool = field(
+        default=False,
+        metadata={
+            "help":
+            "Whether or not to group samples of roughly the same length together when batching."
+        }, )
+    length_column_name: Optional[str] = field(
+        default="length",
+        metadata={
+            "help":
+            "Column name with precomputed lengths to use when grouping by length."
+        }, )
+    max_tokens_per_batch: Optional[int] = field(
+        default=None,
+        metadata={
+            "help":
+            "The maximum number of tokens (padding included) per training batch when grouping by length."
+        }, )
     report_to: Optional[List[str]] = field(
         default=None,
         metadata={
@@ -554,6 +617,10 @@ class TrainingArguments:
                     f"steps, but found {self.save_steps}, which is not a round multiple of {self.eval_steps}."
                 )
 
+        if self.max_tokens_per_batch is not None and not self.group_by_length:
+            raise ValueError(
+                "--max_tokens_per_batch requires --group_by_length to be set.")
+
         if self.load_best_model_at_end and self.metric_for_best_model is None:
             self.metric_for_best_model = "loss"
         if self.greater_is_better is None and self.metric_for_best_model is not None:
@@ -12,4 +12,6 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from .helper import *
\ No newline at end of file
+from .helper import *
+from .checkpoint import *
+
@@ -0,0 +1,246 @@
+# Copyright (c) 2022 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Sharded state dict files and the background writer of the asynchronous
+checkpoints of the Trainer.
+"""
+
+import copy
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+import numpy as np
+import paddle
+from paddle.fluid.data_feeder import convert_dtype
+
+from ...utils.log import logger
+
+__all__ = [
+    "COMMIT_MARKER_NAME",
+    "snapshot_state_dict",
+    "save_state_dict",
+    "load_state_dict",
+    "state_dict_exists",
+    "mark_checkpoint_committed",
+    "is_checkpoint_committed",
+    "AsyncCheckpointWriter",
+]
+
+# Written last into a checkpoint folder, once all its files are complete.
+COMMIT_MARKER_NAME = "checkpoint_committed"
+
+SHARD_INDEX_SUFFIX = ".index.json"
+
+
+def snapshot_state_dict(state_dict: Any) -> Any:
+    """
+    Returns a copy of a (nested) state dict in host memory, with the tensors
+    copied to numpy arrays, which stays unchanged while training goes on.
+    """
+    if isinstance(state_dict, paddle.Tensor):
+        return state_dict.numpy()
+    elif isinstance(state_dict, np.ndarray):
+        return state_dict.copy()
+    elif isinstance(state_dict, dict):
+        return type(state_dict)(
+            (k, snapshot_state_dict(v)) for k, v in state_dict.items())
+    elif isinstance(state_dict, (list, tuple)):
+        return type(state_dict)(snapshot_state_dict(v) for v in state_dict)
+    return copy.deepcopy(state_dict)
+
+
+def _nbytes(value):
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    elif isinstance(value, paddle.Tensor):
+        return int(np.prod(value.shape)) * np.dtype(
+            convert_dtype(value.dtype)).itemsize
+    elif isinstance(value, dict):
+        return sum(_nbytes(v) for v in value.values())
+    elif isinstance(value, (list, tuple)):
+        return sum(_nbytes(v) for v in value)
+    return 0
+
+
+def _atomic_save(obj, path):
+    # A crash leaves either the previous file or no file, but never a
+    # truncated one.
+    tmp_path = path + ".tmp"
+    paddle.save(obj, tmp_path)
+    os.replace(tmp_path, path)
+
+
+def save_state_dict(state_dict: Dict[str, Any],
+                    path: str,
+                    max_shard_size: Optional[int]=None):
+    """
+    Saves a state dict to `path`. If `max_shard_size` is given, the entries
+    are split into shard files of at most `max_shard_size` bytes each (an
+    entry larger than it gets its own shard), named after `path`, and the
+    shard of each entry is listed in `path + ".index.json"`.
+
+    Args:
+        state_dict (dict): The state dict to save.
+        path (str): The file path to save to.
+        max_shard_size (int, optional): The max bytes of each shard file.
+            Defaults to None, which saves the state dict into one file.
+    """
+    index_path = path + SHARD_INDEX_SUFFIX
+    if not max_shard_size or _nbytes(state_dict) <= max_shard_size:
+        _atomic_save(state_dict, path)
+        if os.path.isfile(index_path):
+            os.remove(index_path)
+        return
+
+    shards = [{}]
+    shard_size = 0
+    for key, value in state_dict.items():
+        size = _nbytes(value)
+        if shards[-1] and shard_size + size > max_shard_size:
+            shards.append({})
+            shard_size = 0
+        shards[-1][key] = value
+        shard_size += size
+
+    root, ext = os.path.splitext(path)
+    weight_map = {}
+    for i, shard in enumerate(shards):
+        shard_name = os.path.basename(
+            f"{root}-{i + 1:05d}-of-{len(shards):05d}{ext}")
+        _atomic_save(shard, os.path.join(os.path.dirname(path), shard_name))
+        weight_map.update((key, shard_name) for key in shard)
+
+    tmp_path = index_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(
+            {
+                "metadata": {
+                    "total_size": _nbytes(state_dict)
+                },
+                "weight_map": weight_map
+            },
+            f,
+            indent=2)
+    os.replace(tmp_path, index_path)
+    if os.path.isfile(path):
+        os.remove(path)
+
+
+def state_dict_exists(path: str) -> bool:
+    """
+    Returns whether a state dict saved by `save_state_dict` exists at `path`.
+    """
+    return os.path.isfile(path) or os.path.isfile(path + SHARD_INDEX_SUFFIX)
+
+
+def load_state_dict(path: str,
+                    num_workers: Optional[int]=None,
+                    **kwargs) -> Dict[str, Any]:
+    """
+    Loads a state dict saved by `save_state_dict`, reading the shard files,
+    if any, in parallel.
+
+    Args:
+        path (str): The file path the state dict was saved to.
+        num_workers (int, optional): The number of threads reading the
+            shards. Defaults to None, which uses one thread per shard up to
+            the number of CPUs.
+        kwargs (dict): The other arguments of `paddle.load`.
+    """
+    index_path = path + SHARD_INDEX_SUFFIX
+    if not os.path.isfile(index_path):
+        return paddle.load(path, **kwargs)
+
+    with open(index_path, "r", encoding="utf-8") as f:
+        weight_map = json.load(f)["weight_map"]
+    shard_files = [
+        os.path.join(os.path.dirname(path), shard_name)
+        for shard_name in sorted(set(weight_map.values()))
+    ]
+    if num_workers is None:
+        num_workers = min(len(shard_files), os.cpu_count() or 1)
+    state_dict = {}
+    with ThreadPoolExecutor(max_workers=max(num_workers, 1)) as executor:
+        for shard in executor.map(lambda f: paddle.load(f, **kwargs),
+                                  shard_files):
+            state_dict.update(shard)
+    # Keep the order of the entries when saved.
+    return {key: state_dict[key] for key in weight_map}
+
+
+def mark_checkpoint_committed(checkpoint_dir: str):
+    """
+    Marks a checkpoint folder as complete by writing its commit marker.
+    """
+    tmp_path = os.path.join(checkpoint_dir, COMMIT_MARKER_NAME + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write("committed\n")
+    os.replace(tmp_path, os.path.join(checkpoint_dir, COMMIT_MARKER_NAME))
+
+
+def is_checkpoint_committed(checkpoint_dir: str) -> bool:
+    """
+    Returns whether all the files of a checkpoint folder have been saved.
+    """
+    return os.path.isfile(os.path.join(checkpoint_dir, COMMIT_MARKER_NAME))
+
+
+class AsyncCheckpointWriter(object):
+    """
+    Runs the saving of checkpoints in a background thread, one checkpoint at
+    a time. Submitting a checkpoint waits for the previous one to finish, so
+    that at most one snapshot of the states is held in host memory. An error
+    raised while saving is raised again by the following `submit` or `wait`.
+    """
+
+    def __init__(self):
+        self._thread = None
+        self._error = None
+
+    def submit(self, save_fn: Callable[[], None]):
+        """
+        Waits for the pending checkpoint, then runs `save_fn` in the
+        background.
+        """
+        self.wait()
+
+        def run():
+            try:
+                save_fn()
+            except Exception as e:
+                logger.error(f"Failed to save checkpoint: {e}")
+                self._error = e
+
+        # Not a daemon thread, so that the interpreter waits for the pending
+        # checkpoint before exiting.
+        self._thread = threading.Thread(target=run)
+        self._thread.start()
+
+    def wait(self):
+        """
+        Waits for the pending checkpoint, if any, to be saved.
+        """
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+
+    @property
+    def pending(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
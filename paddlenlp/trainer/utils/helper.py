@@ -16,7 +16,8 @@
 # This file is modified from
 #  https://github.com/huggingface/transformers/blob/main/src/transformers
 
-from typing import Any, Optional
+import os
+from typing import Any, List, Optional
 
 import numpy as np
 import paddle
@@ -29,6 +30,8 @@ __all__ = [
     "nested_detach",
     "nested_numpify",
     "nested_truncate",
+    "PredictionBuffer",
+    "LengthGroupedBatchSampler",
 ]
 
 
@@ -134,3 +137,290 @@ def nested_truncate(tensors, limit):
     if isinstance(tensors, (list, tuple)):
         return type(tensors)(nested_truncate(t, limit) for t in tensors)
     return tensors[:limit]
+
+
+class PredictionBuffer(object):
+    """
+    Collects the predictions (or labels) of the evaluation batches into arrays
+    allocated once for `num_samples` samples, instead of concatenating each
+    batch to the previous ones. The arrays are padded on the second axis with
+    `padding_index` like `nested_concat`, and their second axis grows (by
+    doubling) when a batch has longer sequences. The samples beyond
+    `num_samples`, which are added by the distributed sampler, are dropped.
+
+    Args:
+        num_samples (int): The number of samples to collect.
+        padding_index (int, optional): The value to pad with. Defaults to -100.
+        memmap_dir (str, optional): The directory to store the arrays as
+            memory mapped `.npy` files, which are kept after evaluation.
+            Defaults to None, which keeps the arrays in memory.
+    """
+
+    def __init__(self, num_samples, padding_index=-100, memmap_dir=None):
+        self.num_samples = num_samples
+        self.padding_index = padding_index
+        self.memmap_dir = memmap_dir
+        self.num_added = 0
+        self._structure = None
+        self._buffers = []
+        self._lengths = []
+        self._num_files = 0
+
+    def _allocate(self, shape, dtype):
+        if self.memmap_dir is None:
+            return np.empty(shape, dtype=dtype)
+        os.makedirs(self.memmap_dir, exist_ok=True)
+        path = os.path.join(self.memmap_dir, f"array_{self._num_files}.npy")
+        self._num_files += 1
+        return np.lib.format.open_memmap(
+            path, mode="w+", dtype=dtype, shape=shape)
+
+    def _free(self, buffer):
+        if isinstance(buffer, np.memmap):
+            os.remove(buffer.filename)
+
+    def _write(self, index, array, offset):
+        buffer = self._buffers[index]
+        if buffer is None:
+            buffer = self._allocate(
+                (self.num_samples, ) + array.shape[1:], array.dtype)
+        elif array.ndim > 1 and array.shape[1] > buffer.shape[1]:
+            new_buffer = self._allocate(
+                (self.num_samples, max(array.shape[1], 2 * buffer.shape[1])) +
+                buffer.shape[2:], buffer.dtype)
+            new_buffer[:offset, :buffer.shape[1]] = buffer[:offset]
+            new_buffer[:offset, buffer.shape[1]:] = self.padding_index
+            self._free(buffer)
+            buffer = new_buffer
+        end = offset + array.shape[0]
+        if array.ndim > 1:
+            buffer[offset:end, :array.shape[1]] = array
+            buffer[offset:end, array.shape[1]:] = self.padding_index
+            self._lengths[index] = max(self._lengths[index], array.shape[1])
+        else:
+            buffer[offset:end] = array
+        self._buffers[index] = buffer
+
+    def add(self, arrays):
+        """
+        Adds the numpy arrays (or nested list/tuples of numpy arrays) of a
+        batch.
+        """
+        leaves = _flatten(arrays)
+        if self._structure is None:
+            self._structure = arrays
+            self._buffers = [None] * len(leaves)
+            self._lengths = [0] * len(leaves)
+        num_samples = min(leaves[0].shape[0],
+                          self.num_samples - self.num_added)
+        if num_samples <= 0:
+            return
+        for i, array in enumerate(leaves):
+            self._write(i, array[:num_samples], self.num_added)
+        self.num_added += num_samples
+
+    def get(self):
+        """
+        Returns the arrays of the samples added, in the structure of the
+        batches, or None if no batch was added.
+        """
+        if self._structure is None:
+            return None
+        leaves = [
+            buffer[:self.num_added, :length]
+            if buffer.ndim > 1 else buffer[:self.num_added]
+            for buffer, length in zip(self._buffers, self._lengths)
+        ]
+        return _pack(self._structure, iter(leaves))
+
+
+def _flatten(tensors):
+    if isinstance(tensors, (list, tuple)):
+        return [leaf for t in tensors for leaf in _flatten(t)]
+    return [tensors]
+
+
+def _pack(structure, leaves):
+    if isinstance(structure, (list, tuple)):
+        return type(structure)(_pack(s, leaves) for s in structure)
+    return next(leaves)
+
+
+class LengthGroupedBatchSampler(paddle.io.BatchSampler):
+    """
+    Batch sampler that groups together samples of roughly the same length to
+    minimize padding, while keeping a bit of randomness.
+
+    With `max_tokens_per_batch=None`, every batch holds `batch_size` samples:
+    indices are shuffled, split into mega-batches of
+    `batch_size * num_replicas * megabatch_mult` samples and each mega-batch is
+    sorted by length. Otherwise, the batch size varies so that
+    `batch_size x padded_length` stays under `max_tokens_per_batch`: indices
+    are sorted by length (ties are broken randomly) and greedily packed, so the
+    number of batches is the same for every epoch.
+
+    In both cases the batch order is shuffled each epoch, and every rank builds
+    the same batches from the same seed and takes one out of `num_replicas`
+    consecutive batches.
+
+    Args:
+        dataset (paddle.io.Dataset): The dataset to sample from.
+        batch_size (int): The number of samples per batch. It is an upper bound
+            of the batch size if `max_tokens_per_batch` is set.
+        lengths (List[int], optional): The precomputed lengths of the samples.
+            If None, they are read from the `length_column_name` column of the
+            dataset if exists, otherwise computed once from the first
+            input of each sample. Defaults to None.
+        length_column_name (str, optional): The column name of precomputed
+            lengths. Defaults to "length".
+        model_input_name (str, optional): The input whose length is used when
+            no precomputed lengths are available. Defaults to "input_ids".
+        max_tokens_per_batch (int, optional): The maximum number of tokens,
+            including padding, in a batch. Defaults to None.
+        num_replicas (int, optional): The number of processes in distributed
+            training. Defaults to 1.
+        rank (int, optional): The rank of the current process. Defaults to 0.
+        shuffle (bool, optional): Whether to shuffle the samples and batches.
+            Defaults to True.
+        drop_last (bool, optional): Whether to drop the last batches which can
+            not be evenly assigned to all ranks, or the last incomplete batch
+            of fixed size. Defaults to False.
+        seed (int, optional): The random seed shared by all ranks. Defaults to 0.
+        megabatch_mult (int, optional): The size of the mega-batches in units
+            of global batches. Defaults to 50.
+    """
+
+    def __init__(self,
+                 dataset,
+                 batch_size: int,
+                 lengths: Optional[List[int]]=None,
+                 length_column_name: str="length",
+                 model_input_name: str="input_ids",
+                 max_tokens_per_batch: Optional[int]=None,
+                 num_replicas: int=1,
+                 rank: int=0,
+                 shuffle: bool=True,
+                 drop_last: bool=False,
+                 seed: int=0,
+                 megabatch_mult: int=50):
+        assert isinstance(batch_size, int) and batch_size > 0, \
+            "batch_size should be a positive integer"
+        self.dataset = dataset
+        self.batch_size = batch_size
+        self.length_column_name = length_column_name
+        self.model_input_name = model_input_name
+        self.max_tokens_per_batch = max_tokens_per_batch
+        self.nranks = num_replicas
+        self.local_rank = rank
+        self.shuffle = shuffle
+        self.drop_last = drop_last
+        self.seed = seed
+        self.megabatch_mult = megabatch_mult
+        self.epoch = 0
+        self._lengths = None if lengths is None else np.asarray(
+            lengths, dtype="int64")
+        self._batches = None
+        self._batches_epoch = None
+
+    @property
+    def lengths(self):
+        """
+        The lengths of all samples, computed at the first access if not given.
+        """
+        if self._lengths is None:
+            self._lengths = np.asarray(self._compute_lengths(), dtype="int64")
+        return self._lengths
+
+    def _compute_lengths(self):
+        column_names = getattr(self.dataset, "column_names", None)
+        if column_names is not None and self.length_column_name in column_names:
+            # `datasets.Dataset` reads a whole column without decoding rows.
+            return self.dataset[self.length_column_name]
+        lengths = []
+        for i in range(len(self.dataset)):
+            example = self.dataset[i]
+            if isinstance(example, dict):
+                if self.length_column_name in example:
+                    lengths.append(example[self.length_column_name])
+                else:
+                    lengths.append(len(example[self.model_input_name]))
+            elif isinstance(example, (list, tuple)):
+                lengths.append(len(example[0]))
+            else:
+                raise ValueError(
+                    "Can only automatically infer lengths for datasets whose items are dictionaries with an "
+                    f"'{self.model_input_name}' key or lists/tuples whose first element is the input ids."
+                )
+        return lengths
+
+    def _build_batches(self, rng):
+        lengths = self.lengths
+        num_samples = len(lengths)
+        if self.max_tokens_per_batch is None:
+            indices = rng.permutation(
+                num_samples) if self.shuffle else np.arange(num_samples)
+            megabatch_size = self.batch_size * self.nranks * self.megabatch_mult
+            batches = []
+            for start in range(0, num_samples, megabatch_size):
+                megabatch = indices[start:start + megabatch_size]
+                megabatch = megabatch[np.argsort(
+                    -lengths[megabatch], kind="stable")]
+                batches.extend(
+                    megabatch[i:i + self.batch_size]
+                    for i in range(0, len(megabatch), self.batch_size))
+            if self.drop_last and batches and len(
+                    batches[-1]) < self.batch_size:
+                batches.pop()
+        else:
+            indices = rng.permutation(
+                num_samples) if self.shuffle else np.arange(num_samples)
+            # Sorted in descending order, the first sample of a batch holds the
+            # padded length of the batch.
+            indices = indices[np.argsort(-lengths[indices], kind="stable")]
+            batches = []
+            start = 0
+            while start < num_samples:
+                padded_len = max(int(lengths[indices[start]]), 1)
+                size = max(
+                    min(self.max_tokens_per_batch // padded_len,
+                        self.batch_size), 1)
+                batches.append(indices[start:start + size])
+                start += size
+        if self.shuffle:
+            batches = [batches[i] for i in rng.permutation(len(batches))]
+        return [batch.tolist() for batch in batches]
+
+    def _get_batches(self):
+        if self._batches_epoch != self.epoch:
+            rng = np.random.RandomState(self.seed + self.epoch)
+            batches = self._build_batches(rng)
+            remainder = len(batches) % self.nranks
+            if remainder > 0:
+                if self.drop_last:
+                    batches = batches[:len(batches) - remainder]
+                else:
+                    # Pad with the first batches so that every rank runs the
+                    # same number of steps.
+                    batches += [
+                        batches[i % len(batches)]
+                        for i in range(self.nranks - remainder)
+                    ]
+            self._batches = batches[self.local_rank::self.nranks]
+            self._batches_epoch = self.epoch
+        return self._batches
+
+    def __iter__(self):
+        return iter(self._get_batches())
+
+    def __len__(self):
+        return len(self._get_batches())
+
+    def set_epoch(self, epoch=0):
+        """
+        Sets the epoch number, which is used as the seed of random numbers
+        together with `seed`.
+
+        Args:
+            epoch (int): Epoch number.
+        """
+        self.epoch = epoch
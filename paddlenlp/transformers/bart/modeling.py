@@ -22,6 +22,7 @@ import paddle.tensor as tensor
 from paddle.nn import Layer, Embedding
 
 from .. import PretrainedModel, register_base_model
+from ..generation_utils import PreallocatedCache
 
 __all__ = [
     'BartModel', 'BartPretrainedModel', 'BartEncoder', 'BartDecoder',
@@ -289,7 +290,20 @@ class BartDecoder(BartPretrainedModel):
             Its data type should be float32 and has a shape of [batch_size, sequence_length, hidden_size].
 
         """
-        if decoder_attention_mask is None:
+        use_preallocated_cache = cache is not None and isinstance(
+            cache[0][0], PreallocatedCache)
+        if decoder_attention_mask is None and use_preallocated_cache:
+            # Mask the positions of the cache not filled yet.
+            capacity = cache[0][0].capacity
+            decoder_length = cache[0][0].length + paddle.shape(
+                decoder_input_ids)[-1]
+            decoder_attention_mask = paddle.where(
+                paddle.arange(capacity) < decoder_length,
+                paddle.zeros(
+                    [capacity], dtype=paddle.get_default_dtype()),
+                paddle.full(
+                    [capacity], -np.inf, dtype=paddle.get_default_dtype()))
+        elif decoder_attention_mask is None:
             decoder_length = paddle.shape(decoder_input_ids)[-1]
             decoder_attention_mask = paddle.tensor.triu(
                 (paddle.full(
@@ -298,8 +312,11 @@ class BartDecoder(BartPretrainedModel):
                     dtype=paddle.get_default_dtype())),
                 1)
         decoder_inputs_embeds = self.embed_tokens(decoder_input_ids)
-        past_key_values_length = paddle.shape(cache[0][0].k)[
-            2] if cache is not None else 0
+        if use_preallocated_cache:
+            past_key_values_length = cache[0][0].length
+        else:
+            past_key_values_length = paddle.shape(cache[0][0].k)[
+                2] if cache is not None else 0
         decoder_inputs_embed_pos = self.decoder_embed_positions(
             decoder_input_ids.shape, past_key_values_length)
         hidden_states = decoder_inputs_embeds + decoder_inputs_embed_pos
@@ -740,6 +757,8 @@ class BartForConditionalGeneration(BartPretrainedModel):
             An instance of BartModel.
     """
 
+    _supports_preallocated_cache = True
+
     def __init__(self, bart):
         super().__init__()
         self.bart = bart
@@ -0,0 +1,479 @@
+# Copyright (c) 2022 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import queue
+import threading
+
+import numpy as np
+import paddle
+import paddle.nn.functional as F
+
+from paddlenlp.utils.log import logger
+from .generation_utils import PreallocatedCache, TopKProcess, TopPProcess
+
+__all__ = ["ContinuousBatchingEngine", "GenerationRequest"]
+
+_STOP = object()
+
+
+class _SlotCache(PreallocatedCache):
+    # The cache of all the slots of the engine. The positions are used as a
+    # ring: every step writes the new keys and values of all the slots at the
+    # same position `length`, and each slot attends to the positions of its
+    # own sequence, which are selected by the attention mask. Since the models
+    # add the position embeddings to the inputs, the order of the positions in
+    # the cache does not matter.
+    def __init__(self, shape, dtype, capacity):
+        self.k = paddle.zeros(shape[:2] + [capacity] + shape[3:], dtype=dtype)
+        self.v = paddle.zeros(shape[:2] + [capacity] + shape[3:], dtype=dtype)
+        self.length = 0
+        self.capacity = capacity
+
+
+class GenerationRequest(object):
+    """
+    A request submitted to :class:`ContinuousBatchingEngine`. Iterating over
+    the request yields the ids of the generated tokens as soon as they are
+    generated, and `result` waits for the whole sequence. A request can only
+    be iterated once.
+    """
+
+    def __init__(self, inputs, max_new_tokens, min_new_tokens):
+        self.inputs = inputs
+        self.max_new_tokens = max_new_tokens
+        self.min_new_tokens = min_new_tokens
+        self.token_ids = []
+        self._sum_logprobs = 0.0
+        self._position = None
+        self._extra_ids = {}
+        self._tokens = queue.Queue()
+        self._done = threading.Event()
+        self._error = None
+
+    @property
+    def done(self):
+        return self._done.is_set()
+
+    @property
+    def score(self):
+        """
+        The average log probability of the generated tokens.
+        """
+        return self._sum_logprobs / max(len(self.token_ids), 1)
+
+    def __iter__(self):
+        while True:
+            token_id = self._tokens.get()
+            if token_id is _STOP:
+                break
+            yield token_id
+        if self._error is not None:
+            raise self._error
+
+    def result(self, timeout=None):
+        """
+        Waits for the request to finish.
+
+        Returns:
+            tuple: The ids of the generated tokens, including the eos token if
+            generated, and the average log probability of them.
+        """
+        if not self._done.wait(timeout):
+            raise TimeoutError("The generation request is not finished.")
+        if self._error is not None:
+            raise self._error
+        return self.token_ids, self.score
+
+    def _append(self, token_id, logprob):
+        self.token_ids.append(token_id)
+        self._sum_logprobs += logprob
+        self._tokens.put(token_id)
+
+    def _finish(self, error=None):
+        self._error = error
+        self._done.set()
+        self._tokens.put(_STOP)
+
+
+class ContinuousBatchingEngine(object):
+    """
+    Serves the generation requests of many callers with continuous (in-flight)
+    batching. The engine decodes a batch of `max_batch_size` slots one token
+    per step in a background thread. A sequence leaves its slot as soon as it
+    is finished, and the waiting requests are admitted into the free slots
+    between steps, so the batch is not held back by its longest sequence as
+    in `generate`.
+
+    Each slot keeps its own length and positions. The keys and values of all
+    the slots are kept in caches preallocated for `max_length` positions, thus
+    only the decoder-only models supporting the preallocated cache of
+    `generate`, such as :class:`GPTLMHeadModel` and
+    :class:`UnifiedTransformerLMHeadModel`, are supported. The engine should
+    be the only user of the model while it runs.
+
+    Args:
+        model (PretrainedModel): The model to generate with.
+        max_batch_size (int, optional): The number of slots. Defaults to 8.
+        max_length (int, optional): The max total length of the prompt and
+            the generated tokens of a request. Defaults to 512.
+        decode_strategy (str, optional): The decoding strategy, either
+            "greedy_search" or "sampling". Defaults to "greedy_search".
+        top_k (int, optional): The number of highest probability tokens to
+            keep for sampling. Defaults to 0, which means no limit.
+        top_p (float, optional): The cumulative probability for top-p
+            sampling. Defaults to 1.0, which means no limit.
+        temperature (float, optional): The value used to module the next
+            token probabilities for sampling. Defaults to 1.0.
+        eos_token_id (int, optional): The id of the end token. If None, the
+            `eos_token_id` of the model is used. Defaults to None.
+        max_queue_size (int, optional): The max number of waiting requests,
+            beyond which `submit` blocks. 0 means no limit. Defaults to 0.
+
+    Example:
+        .. code-block::
+
+            from paddlenlp.transformers import GPTLMHeadModel, GPTTokenizer
+            from paddlenlp.transformers.generation_engine import \\
+                ContinuousBatchingEngine
+
+            model = GPTLMHeadModel.from_pretrained('gpt2-en')
+            model.eval()
+            tokenizer = GPTTokenizer.from_pretrained('gpt2-en')
+            engine = ContinuousBatchingEngine(model, max_batch_size=8)
+
+            request = engine.submit(
+                tokenizer("Welcome to use PaddlePaddle")["input_ids"],
+                max_new_tokens=32)
+            for token_id in request:
+                print(tokenizer.convert_ids_to_tokens(token_id))
+            engine.close()
+    """
+
+    def __init__(self,
+                 model,
+                 max_batch_size=8,
+                 max_length=512,
+                 decode_strategy="greedy_search",
+                 top_k=0,
+                 top_p=1.0,
+                 temperature=1.0,
+                 eos_token_id=None,
+                 max_queue_size=0):
+        is_encoder_decoder = hasattr(model, 'encoder') and hasattr(model,
+                                                                   'decoder')
+        if is_encoder_decoder or not getattr(
+                model, "_supports_preallocated_cache", False):
+            raise ValueError(
+                "{} is not supported by the continuous batching engine, which "
+                "only supports the decoder-only models supporting the "
+                "preallocated cache.".format(model.__class__.__name__))
+        if decode_strategy not in ["greedy_search", "sampling"]:
+            raise ValueError(
+                "`decode_strategy` must be one of 'greedy_search' and "
+                "'sampling' but received {}.".format(decode_strategy))
+        self._model = model
+        self.max_batch_size = max_batch_size
+        self.max_length = max_length
+        self.decode_strategy = decode_strategy
+        self.top_k = top_k
+        self.top_p = top_p
+        self.temperature = temperature
+        self.eos_token_id = eos_token_id if eos_token_id is not None else getattr(
+            model, 'eos_token_id', None)
+        self.num_requests = 0
+        self.num_steps = 0
+
+        self._slots = [None] * max_batch_size
+        self._caches = None
+        self._attention_mask = paddle.full(
+            [max_batch_size, 1, 1, max_length],
+            -1e4,
+            dtype=paddle.get_default_dtype())
+        # The position of the cache written by the next step.
+        self._cursor = 0
+        self._waiting = []
+        self._queue = queue.Queue(max_queue_size)
+        self._closed = False
+        self._stopping = False
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+
+    def submit(self,
+               input_ids,
+               max_new_tokens=64,
+               min_new_tokens=0,
+               token_type_ids=None,
+               position_ids=None,
+               role_ids=None,
+               attention_mask=None):
+        """
+        Queues a generation request.
+
+        Args:
+            input_ids (list): The token ids of the prompt.
+            max_new_tokens (int, optional): The max number of tokens to
+                generate. Defaults to 64.
+            min_new_tokens (int, optional): The min number of tokens to
+                generate before the eos token. Defaults to 0.
+            token_type_ids (list, optional): The token type ids of the prompt.
+                The generated tokens have the token type of the last token of
+                the prompt. Defaults to None.
+            position_ids (list, optional): The position ids of the prompt. The
+                generated tokens continue from the last position of the
+                prompt. If None, the positions start from 0. Defaults to None.
+            role_ids (list, optional): The role ids of the prompt for
+                :class:`UnifiedTransformerLMHeadModel`. Defaults to None.
+            attention_mask (list|numpy.ndarray, optional): The attention mask
+                of the prompt with shape `[seq_len, seq_len]`, whose values
+                are added to the attention scores, such as the one returned by
+                `UnifiedTransformerTokenizer.dialogue_encode`. If None, the
+                causal mask is used. Defaults to None.
+
+        Returns:
+            GenerationRequest: The request, which yields the generated tokens.
+        """
+        if self._closed:
+            raise RuntimeError("The generation engine has been closed.")
+        input_ids = list(input_ids)
+        if len(input_ids) == 0 or max_new_tokens < 1:
+            raise ValueError(
+                "The prompt must not be empty and `max_new_tokens` must be "
+                "positive.")
+        if len(input_ids) + max_new_tokens > self.max_length:
+            raise ValueError(
+                "The length of the prompt ({}) plus `max_new_tokens` ({}) "
+                "exceeds the `max_length` of the engine ({}).".format(
+                    len(input_ids), max_new_tokens, self.max_length))
+        inputs = {"input_ids": input_ids}
+        if position_ids is None:
+            position_ids = range(len(input_ids))
+        inputs["position_ids"] = list(position_ids)
+        if token_type_ids is not None:
+            inputs["token_type_ids"] = list(token_type_ids)
+        if role_ids is not None:
+            inputs["role_ids"] = list(role_ids)
+        if attention_mask is not None:
+            inputs["attention_mask"] = np.asarray(
+                attention_mask, dtype="float32")
+        request = GenerationRequest(inputs, max_new_tokens, min_new_tokens)
+        self._queue.put(request)
+        return request
+
+    def generate(self, input_ids, **kwargs):
+        """
+        Submits a request and waits for the result. See `submit` for the
+        arguments.
+
+        Returns:
+            tuple: The ids of the generated tokens and their average log
+            probability.
+        """
+        return self.submit(input_ids, **kwargs).result()
+
+    def close(self):
+        """
+        Stops the background thread after the queued requests are done.
+        """
+        if not self._closed:
+            self._closed = True
+            self._queue.put(_STOP)
+            self._thread.join()
+
+    def _poll(self, block):
+        while True:
+            try:
+                request = self._queue.get(block=block)
+            except queue.Empty:
+                return
+            block = False
+            if request is _STOP:
+                self._stopping = True
+            else:
+                self._waiting.append(request)
+
+    def _loop(self):
+        while True:
+            num_active = sum(slot is not None for slot in self._slots)
+            if self._stopping and num_active == 0 and not self._waiting:
+                break
+            # Blocks until there are requests if no slot is active.
+            self._poll(block=num_active == 0 and not self._waiting and
+                       not self._stopping)
+            if num_active == 0 and not self._waiting:
+                continue
+            try:
+                self._step()
+            except Exception as e:
+                logger.warning("Failed to run a generation step (%s)." % e)
+                for i, request in enumerate(self._slots):
+                    if request is not None:
+                        request._finish(e)
+                        self._slots[i] = None
+
+    @paddle.no_grad()
+    def _step(self):
+        free_slots = [i for i, slot in enumerate(self._slots) if slot is None]
+        admitted = self._waiting[:len(free_slots)]
+        self._waiting = self._waiting[len(admitted):]
+        with self._model._preallocated_cache_guard(True):
+            if admitted:
+                self._prefill(list(zip(free_slots, admitted)))
+            if any(slot is not None for slot in self._slots):
+                self._decode()
+        self.num_steps += 1
+
+    def _prefill(self, slot_requests):
+        # Runs the prompts of the admitted requests in one batch padded on the
+        # right, and copies their caches into the slots.
+        for slot, request in slot_requests:
+            self._slots[slot] = request
+            self.num_requests += 1
+        requests = [request for _, request in slot_requests]
+        lengths = [len(request.inputs["input_ids"]) for request in requests]
+        max_len = max(lengths)
+        keys = set(
+            key for request in requests for key in request.inputs
+            if key.endswith("_ids"))
+        model_inputs = {}
+        for key in keys:
+            ids = np.zeros([len(requests), max_len], dtype="int64")
+            for i, request in enumerate(requests):
+                if key in request.inputs:
+                    ids[i, :lengths[i]] = request.inputs[key]
+            model_inputs[key] = paddle.to_tensor(ids)
+        attention_mask = np.full(
+            [len(requests), 1, max_len, max_len], -1e4, dtype="float32")
+        for i, request in enumerate(requests):
+            length = lengths[i]
+            if "attention_mask" in request.inputs:
+                attention_mask[i, 0, :length, :length] = request.inputs[
+                    "attention_mask"]
+            else:
+                attention_mask[i, 0, :length, :length] = np.triu(
+                    np.full(
+                        [length, length], -1e4, dtype="float32"), 1)
+        model_inputs["attention_mask"] = paddle.to_tensor(
+            attention_mask, dtype=paddle.get_default_dtype())
+        logits, caches = self._model(**model_inputs, use_cache=True)
+        if self._caches is None:
+            self._caches = [
+                _SlotCache([self.max_batch_size] + cache.k.shape[1:],
+                           cache.k.dtype, self.max_length) for cache in caches
+            ]
+
+        for i, (slot, request) in enumerate(slot_requests):
+            # The prompt takes the positions right before the cursor.
+            start = (self._cursor - lengths[i]) % self.max_length
+            spans = [(start, min(start + lengths[i], self.max_length))]
+            if spans[0][1] - start < lengths[i]:
+                spans.append((0, lengths[i] - (spans[0][1] - start)))
+            self._attention_mask[slot] = -1e4
+            offset = 0
+            for begin, end in spans:
+                size = end - begin
+                for slot_cache, cache in zip(self._caches, caches):
+                    slot_cache.k[slot, :, begin:end] = cache.k[i, :, offset:
+                                                               offset + size]
+                    slot_cache.v[slot, :, begin:end] = cache.v[i, :, offset:
+                                                               offset + size]
+                self._attention_mask[slot, :, :, begin:end] = 0
+                offset += size
+            request._position = request.inputs["position_ids"][-1] + 1
+            request._extra_ids = {
+                key: request.inputs[key][-1]
+                for key in ["token_type_ids", "role_ids"]
+                if key in request.inputs
+            }
+
+        logits = paddle.gather(
+            logits.reshape([-1, logits.shape[-1]]),
+            paddle.to_tensor(
+                [i * max_len + length - 1 for i, length in enumerate(lengths)],
+                dtype="int64"))
+        self._append_tokens([slot for slot, _ in slot_requests], logits)
+
+    def _decode(self):
+        requests = self._slots
+        input_ids = [[r.token_ids[-1] if r else 0] for r in requests]
+        position_ids = [[r._position if r else 0] for r in requests]
+        model_inputs = {
+            "input_ids": paddle.to_tensor(
+                input_ids, dtype="int64"),
+            "position_ids": paddle.to_tensor(
+                position_ids, dtype="int64")
+        }
+        for key in ["token_type_ids", "role_ids"]:
+            if any(r is not None and key in r._extra_ids for r in requests):
+                model_inputs[key] = paddle.to_tensor(
+                    [[r._extra_ids.get(key, 0) if r else 0] for r in requests],
+                    dtype="int64")
+        for cache in self._caches:
+            cache.length = self._cursor
+        self._attention_mask[:, :, :, self._cursor] = 0
+        logits, _ = self._model(
+            **model_inputs,
+            attention_mask=self._attention_mask,
+            use_cache=True,
+            cache=self._caches)
+        self._cursor = (self._cursor + 1) % self.max_length
+        for request in requests:
+            if request is not None:
+                request._position += 1
+
+        active_slots = [i for i, r in enumerate(requests) if r is not None]
+        logits = logits[:, -1, :]
+        if len(active_slots) < len(requests):
+            logits = paddle.gather(
+                logits, paddle.to_tensor(
+                    active_slots, dtype="int64"))
+        self._append_tokens(active_slots, logits)
+
+    def _append_tokens(self, slots, logits):
+        # Chooses the next tokens of the requests in `slots` from `logits` and
+        # releases the slots of the finished requests.
+        requests = [self._slots[slot] for slot in slots]
+        logits = self._model.adjust_logits_during_generation(logits)
+        if self.eos_token_id is not None:
+            block_eos = [
+                len(r.token_ids) < r.min_new_tokens for r in requests
+            ]
+            if any(block_eos):
+                logits[:, self.eos_token_id] = paddle.where(
+                    paddle.to_tensor(block_eos),
+                    paddle.full(
+                        [len(requests)], -1e9, dtype=logits.dtype),
+                    logits[:, self.eos_token_id])
+        logprobs = F.log_softmax(logits)
+        if self.decode_strategy == "greedy_search":
+            next_tokens = paddle.argmax(logits, axis=-1).unsqueeze(-1)
+        else:
+            if self.temperature != 1.0:
+                logits = logits / self.temperature
+            probs = F.softmax(logits)
+            if self.top_k:
+                probs = TopKProcess(probs, self.top_k, 1)
+            if self.top_p < 1.0:
+                probs = TopPProcess(probs, self.top_p, 1)
+            next_tokens = paddle.multinomial(probs)
+        next_logprobs = paddle.index_sample(logprobs, next_tokens)
+
+        for slot, request, token_id, logprob in zip(
+                slots, requests,
+                next_tokens.numpy()[:, 0].tolist(),
+                next_logprobs.numpy()[:, 0].tolist()):
+            request._append(token_id, logprob)
+            if token_id == self.eos_token_id or len(
+                    request.token_ids) >= request.max_new_tokens:
+                request._finish()
+                self._slots[slot] = None
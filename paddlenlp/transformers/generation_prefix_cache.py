@@ -0,0 +1,218 @@
+# Copyright (c) 2022 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import paddle
+from paddle.fluid.data_feeder import convert_dtype
+
+__all__ = ["PrefixCache", "PrefixCacheStore", "prefix_cache_key"]
+
+
+def map_cache(fn, cache):
+    """
+    Applies `fn` to the keys and values of the incremental caches of self
+    attention, which are `MultiHeadAttention.Cache` instances, in the cache
+    returned by the model, and returns the cache of the results.
+    """
+    if isinstance(cache, tuple) and type(cache).__name__ == "Cache":
+        return type(cache)(fn(cache.k), fn(cache.v))
+    elif isinstance(cache, (list, tuple)) and not hasattr(cache, "_fields"):
+        return type(cache)(map_cache(fn, c) for c in cache)
+    return cache
+
+
+def prefix_cache_key(length, input_ids, attention_mask=None, **kwargs):
+    """
+    Returns the key identifying the first `length` positions of a prompt,
+    whose self attention cache is the same for all the prompts of the same
+    key.
+
+    Args:
+        length (int): The number of positions.
+        input_ids (numpy.ndarray): The token ids of the prompt, with shape
+            `[sequence_length]`.
+        attention_mask (numpy.ndarray, optional): Whether the positions can
+            be attended, with shape `[sequence_length]` if it is the same for
+            all the positions, or `[sequence_length, sequence_length]`.
+            Defaults to None, which means all the previous positions can be
+            attended.
+        kwargs (dict): The other inputs of the prompt with shape
+            `[sequence_length]`, such as `token_type_ids`, `position_ids` and
+            `role_ids`. The ones which are None are ignored.
+
+    Returns:
+        str: The key.
+    """
+    hasher = hashlib.md5(str(length).encode("utf-8"))
+    arrays = [("input_ids", input_ids)]
+    arrays.extend(
+        (name, kwargs[name]) for name in sorted(kwargs)
+        if kwargs[name] is not None)
+    for name, array in arrays:
+        hasher.update(name.encode("utf-8"))
+        hasher.update(
+            np.ascontiguousarray(array[:length], dtype="int64").tobytes())
+    if attention_mask is not None:
+        if attention_mask.ndim == 2:
+            attention_mask = attention_mask[:length, :length]
+        else:
+            attention_mask = attention_mask[:length]
+            # The same as no attention mask if all positions can be attended.
+            if attention_mask.all():
+                attention_mask = None
+    if attention_mask is not None:
+        hasher.update(("attention_mask" + str(attention_mask.ndim)).encode(
+            "utf-8"))
+        hasher.update(np.packbits(attention_mask.astype("bool")).tobytes())
+    return hasher.hexdigest()
+
+
+class PrefixCache(object):
+    """
+    The self attention cache of the first `length` positions of a prompt.
+    `generate` reuses it for the prompts starting with the same positions,
+    and only encodes the positions following them. It is returned by
+    `GenerationMixin.build_prefix_cache`, and kept by `PrefixCacheStore`.
+
+    Args:
+        cache (list): The cache returned by the model for a batch of one
+            prompt, which holds `length` positions.
+        length (int): The number of positions.
+        key (str): The key of the positions returned by `prefix_cache_key`.
+    """
+
+    def __init__(self, cache, length, key):
+        self.cache = cache
+        self.length = length
+        self.key = key
+        self.nbytes = 0
+
+        def count(tensor):
+            self.nbytes += int(np.prod(tensor.shape)) * np.dtype(
+                convert_dtype(tensor.dtype)).itemsize
+            return tensor
+
+        map_cache(count, cache)
+
+    def expand(self, batch_size):
+        """
+        Returns the cache repeated for a batch of `batch_size` prompts.
+        """
+        if batch_size == 1:
+            return self.cache
+        return map_cache(
+            lambda x: paddle.expand(x, [batch_size] + x.shape[1:]),
+            self.cache)
+
+
+class PrefixCacheStore(object):
+    """
+    An LRU store of `PrefixCache`, which holds at most `max_memory` bytes of
+    caches. Pass it as the `prefix_cache_store` of `generate` to reuse the
+    cache of the longest stored prefix of the prompt, and to store the cache
+    of the prompt for the following calls. It is thread safe, and should only
+    be used with the model which computes the caches.
+
+    Args:
+        max_memory (int, optional): The max bytes of the caches kept.
+            Defaults to 1 << 30.
+    """
+
+    def __init__(self, max_memory=1 << 30):
+        self.max_memory = max_memory
+        self.memory = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        # The number of entries of each length, to only look up the prefixes
+        # of the lengths stored.
+        self._lengths = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """
+        Returns the `PrefixCache` of `key`, or None if it is not stored.
+        """
+        with self._lock:
+            prefix_cache = self._entries.get(key)
+            if prefix_cache is not None:
+                self._entries.move_to_end(key)
+            return prefix_cache
+
+    def match(self, key_fn, max_length):
+        """
+        Returns the stored `PrefixCache` of the longest prefix of a prompt of
+        at most `max_length` positions, or None if no prefix is stored.
+
+        Args:
+            key_fn (callable): The function which returns the key of the
+                first `length` positions of the prompt given `length`, or
+                None if the positions can not be reused.
+            max_length (int): The max number of positions to reuse.
+        """
+        with self._lock:
+            lengths = sorted(
+                (length for length in self._lengths if length <= max_length),
+                reverse=True)
+        for length in lengths:
+            prefix_cache = self.get(key_fn(length))
+            if prefix_cache is not None:
+                self.hits += 1
+                return prefix_cache
+        self.misses += 1
+        return None
+
+    def put(self, prefix_cache):
+        """
+        Stores `prefix_cache`, and removes the least recently used caches
+        until the caches fit in `max_memory`. A cache larger than
+        `max_memory` is not stored.
+        """
+        if prefix_cache.nbytes > self.max_memory:
+            return
+        with self._lock:
+            self._remove(prefix_cache.key)
+            self._entries[prefix_cache.key] = prefix_cache
+            self._lengths[prefix_cache.length] = self._lengths.get(
+                prefix_cache.length, 0) + 1
+            self.memory += prefix_cache.nbytes
+            while self.memory > self.max_memory:
+                self._remove(next(iter(self._entries)))
+
+    def _remove(self, key):
+        prefix_cache = self._entries.pop(key, None)
+        if prefix_cache is None:
+            return
+        self.memory -= prefix_cache.nbytes
+        self._lengths[prefix_cache.length] -= 1
+        if self._lengths[prefix_cache.length] == 0:
+            del self._lengths[prefix_cache.length]
+
+    def clear(self):
+        """
+        Removes all the caches and resets the counters.
+        """
+        with self._lock:
+            self._entries.clear()
+            self._lengths.clear()
+            self.memory = 0
+            self.hits = 0
+            self.misses = 0
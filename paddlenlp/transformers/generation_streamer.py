@@ -0,0 +1,179 @@
+# Copyright (c) 2022 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import queue
+import threading
+
+__all__ = ["TokenStreamer", "IncrementalDetokenizer", "stream_generate"]
+
+_END = object()
+
+
+class TokenStreamer(object):
+    """
+    Receives the tokens generated by `generate` step by step. Pass it as the
+    `streamer` argument of `generate`, and iterate over it in another thread
+    to get the tokens of each step as soon as they are generated. Each item
+    is a numpy array of shape `[batch_size]`, and the finished sequences get
+    the `pad_token_id`.
+
+    Args:
+        timeout (float, optional): The max seconds to wait for the tokens of
+            a step while iterating. If None, waits forever. Defaults to None.
+    """
+
+    def __init__(self, timeout=None):
+        self.timeout = timeout
+        self._queue = queue.Queue()
+        self._error = None
+        self._ended = False
+
+    def put(self, token_ids):
+        """
+        Receives the token ids generated by a step.
+        """
+        self._queue.put(token_ids)
+
+    def end(self, error=None):
+        """
+        Marks the end of the generation, with the error which stopped it if
+        any. Only the first call takes effect.
+        """
+        if self._ended:
+            return
+        self._ended = True
+        self._error = error
+        self._queue.put(_END)
+
+    def __iter__(self):
+        while True:
+            token_ids = self._queue.get(timeout=self.timeout)
+            if token_ids is _END:
+                break
+            yield token_ids
+        if self._error is not None:
+            raise self._error
+
+
+class IncrementalDetokenizer(object):
+    """
+    Converts the tokens of a sequence to text incrementally. Since a token may
+    join the previous one, such as the `##` subwords of WordPiece, and the
+    spaces of SentencePiece and BPE depend on the neighbouring tokens, each
+    new text is decoded together with a few previous tokens and only the text
+    following them is emitted. The text is held back while it ends with an
+    incomplete character, which happens with byte level BPE.
+
+    Args:
+        tokenizer (PretrainedTokenizer, optional): The tokenizer to decode
+            with. Its `convert_ids_to_string` is used if it has one, otherwise
+            its `convert_tokens_to_string`.
+        decode_fn (callable, optional): The function converting a list of
+            token ids to text, which overrides `tokenizer`. Defaults to None.
+        skip_special_tokens (bool, optional): Whether to drop the special
+            tokens of `tokenizer`. Defaults to False.
+
+    Example:
+        .. code-block::
+
+            detokenizer = IncrementalDetokenizer(tokenizer)
+            for token_ids in stream_generate(model, input_ids=input_ids):
+                print(detokenizer.add(token_ids[0]), end="")
+            print(detokenizer.flush())
+    """
+
+    def __init__(self, tokenizer=None, decode_fn=None,
+                 skip_special_tokens=False):
+        if decode_fn is None:
+            if tokenizer is None:
+                raise ValueError(
+                    "Either `tokenizer` or `decode_fn` should be given.")
+            if hasattr(tokenizer, "convert_ids_to_string"):
+                decode_fn = tokenizer.convert_ids_to_string
+            else:
+                decode_fn = lambda ids: tokenizer.convert_tokens_to_string(
+                    tokenizer.convert_ids_to_tokens(ids))
+        self._decode_fn = decode_fn
+        self._special_ids = set(tokenizer.all_special_ids) if (
+            skip_special_tokens and tokenizer is not None) else set()
+        self.token_ids = []
+        self.text = ""
+        # The tokens before `_prefix_offset` are no longer decoded, and the
+        # text of the tokens before `_read_offset` has been emitted.
+        self._prefix_offset = 0
+        self._read_offset = 0
+
+    def add(self, token_ids):
+        """
+        Adds a token id or a list of token ids.
+
+        Returns:
+            str: The new text, which may be empty.
+        """
+        if isinstance(token_ids, int) or not hasattr(token_ids, "__iter__"):
+            token_ids = [token_ids]
+        self.token_ids.extend(
+            int(token_id) for token_id in token_ids
+            if int(token_id) not in self._special_ids)
+        return self._decode(final=False)
+
+    def flush(self):
+        """
+        Returns the text held back, if any.
+        """
+        return self._decode(final=True)
+
+    def _decode(self, final):
+        if self._read_offset == len(self.token_ids):
+            return ""
+        prefix_text = self._decode_fn(
+            self.token_ids[self._prefix_offset:self._read_offset]
+        ) if self._read_offset > self._prefix_offset else ""
+        new_text = self._decode_fn(self.token_ids[self._prefix_offset:])
+        if len(new_text) <= len(prefix_text) or (
+                new_text.endswith("\ufffd") and not final):
+            return ""
+        delta = new_text[len(prefix_text):]
+        self._prefix_offset = self._read_offset
+        self._read_offset = len(self.token_ids)
+        self.text += delta
+        return delta
+
+
+def stream_generate(model, **kwargs):
+    """
+    Runs `model.generate` in a background thread and returns the
+    :class:`TokenStreamer` which yields the tokens of each step. The error
+    raised by `generate`, if any, is raised by the iteration. Only greedy
+    search and sampling can be streamed.
+
+    Args:
+        model (PretrainedModel): The model to generate with.
+        kwargs (dict): The arguments of `generate`.
+
+    Returns:
+        TokenStreamer: The streamer of the generated tokens.
+    """
+    streamer = TokenStreamer()
+
+    def run():
+        try:
+            model.generate(streamer=streamer, **kwargs)
+        except Exception as e:
+            # `generate` has ended the streamer unless the arguments are
+            # rejected before decoding.
+            streamer.end(e)
+
+    threading.Thread(target=run, daemon=True).start()
+    return streamer
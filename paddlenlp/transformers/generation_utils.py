@@ -16,70 +16,29 @@
 from typing import List
 import inspect
 from abc import ABC
+from contextlib import contextmanager
 
+import numpy as np
 import paddle
 import paddle.nn as nn
 import paddle.nn.functional as F
 from paddle.fluid.data_feeder import convert_dtype
 from paddle.fluid.layers.utils import map_structure
 from paddlenlp.utils.log import logger
+from .generation_prefix_cache import PrefixCache, map_cache, prefix_cache_key
 
 __all__ = ["GenerationMixin"]
 
 
-class BeamHypotheses:
-    def __init__(self, num_beams, length_penalty, early_stopping):
-        """
-        Initialize n-best list of hypotheses.
-        """
-        self.length_penalty = length_penalty
-        self.early_stopping = early_stopping
-        self.num_beams = num_beams
-        self.beams = []
-        self.worst_score = 1e9
-
-    def __len__(self):
-        """
-        Number of hypotheses in the list.
-        """
-        return len(self.beams)
-
-    def add(self, hyp, sum_logprobs, origin_len=0):
-        """
-        Add a new hypothesis to the list.
-        """
-        score = sum_logprobs / (((hyp.shape[-1] - origin_len + 5) / 6)
-                                **self.length_penalty)
-        if len(self) < self.num_beams or score > self.worst_score:
-            self.beams.append((score, hyp))
-            if len(self) > self.num_beams:
-                sorted_next_scores = sorted(
-                    [(s, idx) for idx, (s, _) in enumerate(self.beams)])
-                del self.beams[sorted_next_scores[0][1]]
-                self.worst_score = sorted_next_scores[1][0]
-            else:
-                self.worst_score = min(score, self.worst_score)
-
-    def is_done(self, best_sum_logprobs, cur_len, origin_len=0):
-        """
-        If there are enough hypotheses and that none of the hypotheses being 
-        generated can become better than the worst one in the heap, then we 
-        are done with this sentence.
-        """
-        if len(self) < self.num_beams:
-            return False
-        elif self.early_stopping:
-            return True
-        else:
-            cur_score = best_sum_logprobs / (
-                (cur_len - origin_len + 5) / 6)**self.length_penalty
-            ret = self.worst_score >= cur_score
-            return ret
-
-
 class BeamSearchScorer(object):
     """
     implementing standard beam search decoding.
+
+    The finished hypotheses of all the sentences are kept in arrays of shape
+    `[batch_size, num_beams]`, and each step processes the candidates of the
+    whole batch at once. For every sentence, at most `num_beams` hypotheses
+    with the highest scores are kept, and the ties of scores are broken by the
+    order in which the hypotheses are added.
     """
 
     def __init__(self,
@@ -90,6 +49,7 @@ class BeamSearchScorer(object):
                  do_early_stopping=False,
                  num_beam_hyps_to_keep=1,
                  num_beam_groups=1):
+        self.batch_size = batch_size
         self.max_length = max_length
         self.num_beams = num_beams
         self.length_penalty = length_penalty
@@ -99,15 +59,14 @@ class BeamSearchScorer(object):
         self.group_size = self.num_beams // self.num_beam_groups
 
         self._is_init = False
-        self._beam_hyps = [
-            BeamHypotheses(
-                num_beams=self.num_beams,
-                length_penalty=self.length_penalty,
-                early_stopping=self.do_early_stopping)
-            for _ in range(batch_size)
-        ]
-        self._done = paddle.to_tensor(
-            [0 for _ in range(batch_size)], dtype='int64')
+        # The token ids are allocated when the first hypothesis is added.
+        self._hyp_ids = None
+        self._hyp_lengths = np.zeros([batch_size, num_beams], dtype="int64")
+        self._hyp_scores = np.zeros([batch_size, num_beams], dtype="float64")
+        self._hyp_orders = np.zeros([batch_size, num_beams], dtype="int64")
+        self._num_hyps = np.zeros([batch_size], dtype="int64")
+        self._num_added = 0
+        self._done = np.zeros([batch_size], dtype="bool")
 
         if not isinstance(num_beams, int) or num_beams <= 1:
             raise ValueError(
@@ -126,7 +85,41 @@ class BeamSearchScorer(object):
 
     @property
     def is_done(self):
-        return paddle.min(self._done) == 1
+        return self._done.all()
+
+    def _add_hyps(self, batch_indices, hyps, sum_logprobs, origin_len):
+        # Adds the hypothesis `hyps[i]` to the sentence `batch_indices[i]`.
+        # A hypothesis replaces the worst one of a full sentence if its score
+        # is higher.
+        if self._hyp_ids is None:
+            self._hyp_ids = np.zeros(
+                [self.batch_size, self.num_beams, self.max_length],
+                dtype=hyps.dtype)
+        length = hyps.shape[-1]
+        scores = sum_logprobs / ((
+            (length - origin_len + 5) / 6)**self.length_penalty)
+        num_hyps = self._num_hyps[batch_indices]
+        worst_scores = self._hyp_scores[batch_indices].min(axis=-1)
+        accepted = (num_hyps < self.num_beams) | (scores > worst_scores)
+        batch_indices, hyps, scores, num_hyps = (batch_indices[accepted],
+                                                 hyps[accepted],
+                                                 scores[accepted],
+                                                 num_hyps[accepted])
+        slots = num_hyps.copy()
+        is_full = num_hyps >= self.num_beams
+        if is_full.any():
+            full_indices = batch_indices[is_full]
+            slots[is_full] = np.lexsort(
+                (self._hyp_orders[full_indices],
+                 self._hyp_scores[full_indices]),
+                axis=-1)[:, 0]
+        self._hyp_ids[batch_indices, slots, :length] = hyps
+        self._hyp_lengths[batch_indices, slots] = length
+        self._hyp_scores[batch_indices, slots] = scores
+        self._hyp_orders[batch_indices, slots] = self._num_added
+        self._num_added += 1
+        self._num_hyps[batch_indices] = np.minimum(num_hyps + 1,
+                                                   self.num_beams)
 
     def process(self,
                 input_ids,
@@ -137,79 +130,79 @@ class BeamSearchScorer(object):
                 pad_token_id=None,
                 eos_token_id=None):
         cur_len = input_ids.shape[-1]
-        batch_size = len(self._beam_hyps)
-        assert batch_size == (input_ids.shape[0] // self.group_size)
-
-        next_beam_scores = paddle.zeros(
-            [batch_size, self.group_size], dtype=next_scores.dtype)
-        next_beam_tokens = paddle.zeros(
-            [batch_size, self.group_size], dtype=next_tokens.dtype)
-        next_beam_indices = paddle.zeros(
-            [batch_size, self.group_size], dtype=next_indices.dtype)
-
-        for batch_idx, beam_hyp in enumerate(self._beam_hyps):
-            if self._done[batch_idx] == 1:
-                assert (
-                    len(beam_hyp) >= self.num_beams
-                ), "Batch can only be done if at least {} beams have been generated".format(
-                    self.num_beams)
-                assert (
-                    eos_token_id is not None and pad_token_id is not None
-                ), "generated beams >= num_beams -> eos_token_id and pad_token have to be defined"
-                # pad the batch
-                next_beam_scores[batch_idx, :] = 0
-                next_beam_tokens[batch_idx, :] = pad_token_id
-                next_beam_indices[batch_idx, :] = 0
-                continue
-
-            # next tokens for this sentence
-            beam_idx = 0
-            for beam_token_rank, (next_token, next_score,
-                                  next_index) in enumerate(
-                                      zip(next_tokens[batch_idx], next_scores[
-                                          batch_idx], next_indices[batch_idx])):
-                batch_beam_idx = batch_idx * self.group_size + next_index
-                # add to generated hypotheses if end of sentence
-                if (eos_token_id is not None) and (
-                        next_token.numpy().item() == eos_token_id):
-                    # If beam_token does not belong to top num_beams tokens,
-                    # it should not be added
-                    is_beam_token_worse_than_top_num_beams = (
-                        beam_token_rank >= self.group_size)
-                    if is_beam_token_worse_than_top_num_beams:
-                        continue
-                    beam_hyp.add(
-                        input_ids[batch_beam_idx.numpy().item()].clone(),
-                        next_score.numpy().item(), origin_len)
-
-                else:
-                    # add next predicted token since it is not eos_token
-                    next_beam_scores[batch_idx, beam_idx] = next_score
-                    next_beam_tokens[batch_idx, beam_idx] = next_token.numpy(
-                    ).item()
-                    next_beam_indices[batch_idx,
-                                      beam_idx] = batch_beam_idx.numpy().item()
-                    beam_idx += 1
-
-                # once the beam for next step is full, don't add more tokens to it.
-                if beam_idx == self.group_size:
-                    break
-
-            if beam_idx < self.group_size:
-                raise ValueError(
-                    "At most {} tokens in `next_tokens[batch_idx]` can be equal "
-                    "to `eos_token_id: {}`. Make sure `next_tokens[batch_idx]` "
-                    "are corrected.".format(self.group_size, eos_token_id))
-
-            # Check if we are done so that we can save a pad step if all(done)
-            if beam_hyp.is_done(next_scores[batch_idx].max().numpy().item(),
-                                cur_len, origin_len):
-                self._done[batch_idx] = 1
+        batch_size = self.batch_size
+        group_size = self.group_size
+        assert batch_size == (input_ids.shape[0] // group_size)
+
+        done = self._done.copy()
+        if done.any():
+            assert (
+                self._num_hyps[done] >= self.num_beams
+            ).all(), "Batch can only be done if at least {} beams have been generated".format(
+                self.num_beams)
+            assert (
+                eos_token_id is not None and pad_token_id is not None
+            ), "generated beams >= num_beams -> eos_token_id and pad_token have to be defined"
+
+        next_scores = next_scores.numpy()
+        next_tokens = next_tokens.numpy()
+        next_indices = next_indices.numpy()
+        batch_beam_indices = (
+            next_indices + np.arange(batch_size)[:, None] * group_size)
+        if eos_token_id is not None:
+            is_eos = next_tokens == eos_token_id
+        else:
+            is_eos = np.zeros(next_tokens.shape, dtype="bool")
+
+        # The candidates ending with eos among the top `group_size` ones are
+        # added to the finished hypotheses.
+        is_finished = is_eos[:, :group_size] & ~done[:, None]
+        if is_finished.any():
+            input_ids = input_ids.numpy()
+            for rank in range(group_size):
+                batch_indices = np.nonzero(is_finished[:, rank])[0]
+                if len(batch_indices) > 0:
+                    self._add_hyps(
+                        batch_indices,
+                        input_ids[batch_beam_indices[batch_indices, rank]],
+                        next_scores[batch_indices, rank].astype("float64"),
+                        origin_len)
+
+        # The first `group_size` candidates not ending with eos are the beams
+        # of the next step.
+        is_selected = ~is_eos & (np.cumsum(~is_eos, axis=-1) <= group_size)
+        if (is_selected.sum(axis=-1) < group_size)[~done].any():
+            raise ValueError(
+                "At most {} tokens in `next_tokens[batch_idx]` can be equal "
+                "to `eos_token_id: {}`. Make sure `next_tokens[batch_idx]` "
+                "are corrected.".format(group_size, eos_token_id))
+        ranks = np.argsort(~is_selected, axis=-1, kind="stable")[:, :group_size]
+        next_beam_scores = np.take_along_axis(next_scores, ranks, axis=-1)
+        next_beam_tokens = np.take_along_axis(next_tokens, ranks, axis=-1)
+        next_beam_indices = np.take_along_axis(
+            batch_beam_indices, ranks, axis=-1)
+        if done.any():
+            # pad the batch
+            next_beam_scores[done] = 0
+            next_beam_tokens[done] = pad_token_id
+            next_beam_indices[done] = 0
+
+        # Check if we are done so that we can save a pad step if all(done)
+        if self.do_early_stopping:
+            is_done = np.ones([batch_size], dtype="bool")
+        else:
+            cur_scores = next_scores.max(axis=-1).astype("float64") / (
+                (cur_len - origin_len + 5) / 6)**self.length_penalty
+            is_done = self._hyp_scores.min(axis=-1) >= cur_scores
+        self._done |= (self._num_hyps >= self.num_beams) & is_done
 
         return {
-            "next_beam_scores": next_beam_scores.reshape([-1]),
-            "next_beam_tokens": next_beam_tokens.reshape([-1]),
-            "next_beam_indices": next_beam_indices.reshape([-1])
+            "next_beam_scores": paddle.to_tensor(next_beam_scores.reshape(
+                [-1])),
+            "next_beam_tokens": paddle.to_tensor(next_beam_tokens.reshape(
+                [-1])),
+            "next_beam_indices": paddle.to_tensor(next_beam_indices.reshape(
+                [-1]))
         }
 
     def finalize(self,
@@ -220,55 +213,160 @@ class BeamSearchScorer(object):
                  origin_len=0,
                  pad_token_id=None,
                  eos_token_id=None):
-        batch_size = len(self._beam_hyps)
+        batch_size = self.batch_size
 
         # finalize all open beam hypotheses and add to generated hypotheses
-        for batch_idx, beam_hyp in enumerate(self._beam_hyps):
-            if self._done[batch_idx] == 1:
-                continue
-
-            # all open beam hypotheses are added to the beam hypothesis
-            # beam hypothesis class automatically keeps the best beams
+        batch_indices = np.nonzero(~self._done)[0]
+        if len(batch_indices) > 0:
+            input_ids = input_ids.numpy()
+            final_beam_scores = final_beam_scores.numpy()
             for beam_id in range(self.num_beams):
-                batch_beam_idx = batch_idx * self.num_beams + beam_id
-                final_score = final_beam_scores[batch_beam_idx].numpy().item()
-                final_tokens = input_ids[batch_beam_idx]
-                beam_hyp.add(final_tokens, final_score, origin_len=origin_len)
+                batch_beam_indices = batch_indices * self.num_beams + beam_id
+                self._add_hyps(
+                    batch_indices, input_ids[batch_beam_indices],
+                    final_beam_scores[batch_beam_indices].astype("float64"),
+                    origin_len)
 
         # select the best hypotheses
-        sent_lengths = paddle.zeros(
-            [batch_size * self.num_beam_hyps_to_keep], dtype=input_ids.dtype)
-        best = []
-
-        # retrieve best hypotheses
-        for i, beam_hyp in enumerate(self._beam_hyps):
-            sorted_hyps = sorted(beam_hyp.beams, key=lambda x: x[0])
-            for j in range(self.num_beam_hyps_to_keep):
-                best_score, best_hyp = sorted_hyps.pop()
-                sent_lengths[self.num_beam_hyps_to_keep * i + j] = len(best_hyp)
-                best.append([best_hyp, best_score])
+        hyp_scores = np.where(
+            np.arange(self.num_beams) < self._num_hyps[:, None],
+            self._hyp_scores, -np.inf)
+        best = np.lexsort(
+            (self._hyp_orders, hyp_scores),
+            axis=-1)[:, ::-1][:, :self.num_beam_hyps_to_keep]
+        batch_indices = np.repeat(
+            np.arange(batch_size), self.num_beam_hyps_to_keep)
+        best = best.reshape([-1])
+        sent_lengths = self._hyp_lengths[batch_indices, best]
+        best_scores = self._hyp_scores[batch_indices, best]
 
         # prepare for adding eos
-        sent_max_len = min(sent_lengths.max().numpy().item() + 1,
-                           self.max_length)
-        decoded = paddle.zeros(
+        sent_max_len = min(sent_lengths.max() + 1, self.max_length)
+        decoded = np.zeros(
             [batch_size * self.num_beam_hyps_to_keep, sent_max_len],
-            dtype=input_ids.dtype)
+            dtype=self._hyp_ids.dtype)
         # shorter batches are padded if needed
-        if sent_lengths.min().numpy().item() != sent_lengths.max().numpy().item(
-        ):
+        if sent_lengths.min() != sent_lengths.max():
             assert pad_token_id is not None, "`pad_token_id` has to be defined"
             decoded[:, :] = pad_token_id
-        decoded_score = paddle.zeros(
-            [batch_size * self.num_beam_hyps_to_keep, 1])
 
         # fill with hypotheses and eos_token_id if the latter fits in
-        for i, (hypo, score) in enumerate(best):
-            decoded[i, :sent_lengths[i].numpy().item()] = hypo.numpy()
-            decoded_score[i] = score
-            if sent_lengths[i] < self.max_length:
-                decoded[i, sent_lengths[i].numpy().item()] = eos_token_id
-        return decoded, decoded_score
+        for i, length in enumerate(sent_lengths):
+            decoded[i, :length] = self._hyp_ids[batch_indices[i], best[i], :
+                                                length]
+            if length < self.max_length:
+                decoded[i, length] = eos_token_id
+        decoded_score = paddle.to_tensor(
+            best_scores[:, None], dtype=paddle.get_default_dtype())
+        return paddle.to_tensor(decoded), decoded_score
+
+
+class PreallocatedCache(object):
+    """
+    The key/value cache of a self attention layer preallocated for `capacity`
+    positions. During decoding, the keys and values of new positions are
+    written in place at `length` instead of concatenating a new cache every
+    step. The positions from `length` on are not filled yet and must be masked
+    by the attention mask.
+
+    Args:
+        k (Tensor): The keys of the filled positions, with shape
+            `[batch_size, num_heads, length, head_dim]`.
+        v (Tensor): The values of the filled positions, with shape
+            `[batch_size, num_heads, length, head_dim]`.
+        capacity (int): The max number of positions.
+    """
+
+    def __init__(self, k, v, capacity):
+        batch_size, num_heads, length, head_dim = k.shape
+        self.k = paddle.zeros(
+            [batch_size, num_heads, capacity, head_dim], dtype=k.dtype)
+        self.v = paddle.zeros(
+            [batch_size, num_heads, capacity, v.shape[-1]], dtype=v.dtype)
+        self.k[:, :, :length] = k
+        self.v[:, :, :length] = v
+        self.length = length
+        self.capacity = capacity
+
+    def update(self, k, v):
+        """
+        Writes the keys and values of new positions and returns the whole
+        buffers of keys and values.
+        """
+        start, end = self.length, self.length + k.shape[2]
+        if end > self.capacity:
+            raise ValueError(
+                "The preallocated cache can only hold {} positions, but "
+                "received {}.".format(self.capacity, end))
+        self.k[:, :, start:end] = k
+        self.v[:, :, start:end] = v
+        self.length = end
+        return self.k, self.v
+
+    def index_select(self, index):
+        """
+        Reorders the batch, such as the beams in beam search.
+        """
+        self.k = paddle.index_select(self.k, index)
+        self.v = paddle.index_select(self.v, index)
+        return self
+
+
+def TopKProcess(probs, top_k, min_tokens_to_keep):
+    top_k = min(max(top_k, min_tokens_to_keep), probs.shape[-1])
+    # Remove all tokens with a probability less than the last token of the top-k
+    topk_probs, _ = paddle.topk(probs, k=top_k)
+    probs = paddle.where(probs >= topk_probs[:, -1:], probs,
+                         paddle.full_like(probs, 0.0))
+    return probs
+
+
+def TopPProcess(probs, top_p, min_tokens_to_keep):
+    sorted_probs = paddle.sort(probs, descending=True)
+    sorted_indices = paddle.argsort(probs, descending=True)
+    cumulative_probs = paddle.cumsum(sorted_probs, axis=-1)
+
+    # Remove tokens with cumulative probs above the top_p, But keep at
+    # least min_tokens_to_keep tokens
+    sorted_indices_to_remove = cumulative_probs > top_p
+    if min_tokens_to_keep > 1:
+        # Set 'min_tokens_to_keep - 1' because the first token is kept
+        sorted_indices_to_remove[:, :min_tokens_to_keep - 1] = 0
+    # Keep the first token
+    sorted_indices_to_remove = paddle.cast(
+        sorted_indices_to_remove, dtype='int64')
+    sorted_indices_to_remove[:, 1:] = (
+        sorted_indices_to_remove[:, :-1].clone())
+    sorted_indices_to_remove[:, 0] = 0
+
+    # Scatter sorted tensors to original indexing
+    sorted_indices = sorted_indices + paddle.arange(probs.shape[
+        0]).unsqueeze(-1) * probs.shape[-1]
+    condition = paddle.scatter(sorted_indices_to_remove.flatten(),
+                               sorted_indices.flatten(),
+                               sorted_indices_to_remove.flatten())
+    condition = paddle.cast(condition, 'bool').reshape(probs.shape)
+    probs = paddle.where(condition, paddle.full_like(probs, 0.0), probs)
+    return probs
+
+
+def _prepare_qkv_with_preallocated_cache(layer, query, key, value, cache=None):
+    # `_prepare_qkv` of `paddle.nn.MultiHeadAttention` which also accepts
+    # `PreallocatedCache` as the cache of self attention.
+    if not isinstance(cache, PreallocatedCache):
+        return type(layer)._prepare_qkv(layer, query, key, value, cache)
+    q = layer.q_proj(query)
+    q = paddle.reshape(q, [0, 0, layer.num_heads, layer.head_dim])
+    q = paddle.transpose(q, [0, 2, 1, 3])
+    k, v = layer.compute_kv(key, value)
+    k, v = cache.update(k, v)
+    return q, k, v, cache
+
+
+def _index_select_cache(cache, index):
+    if isinstance(cache, PreallocatedCache):
+        return cache.index_select(index)
+    return paddle.index_select(cache, index)
 
 
 class GenerationMixin(object):
@@ -279,6 +377,10 @@ class GenerationMixin(object):
     <https://paddlenlp.readthedocs.io/zh/latest/source/paddlenlp.transformers.model_utils.html>`__.
     """
 
+    # Whether the model accepts `PreallocatedCache` as the cache of self
+    # attention, see `generate` for details.
+    _supports_preallocated_cache = False
+
     @staticmethod
     def prepare_input_ids_for_generation(bos_token_id, encoder_output=None):
         batch_size = 1
@@ -394,6 +496,11 @@ class GenerationMixin(object):
             role_ids = model_kwargs["role_ids"]
             model_kwargs["role_ids"] = paddle.gather(role_ids, index)
 
+        if "cache" in model_kwargs and model_kwargs["cache"] is not None:
+            # The cache of the prompt encoded on top of a prefix cache.
+            model_kwargs["cache"] = map_structure(
+                lambda x: paddle.gather(x, index), model_kwargs["cache"])
+
         return input_ids, model_kwargs
 
     @staticmethod
@@ -461,6 +568,270 @@ class GenerationMixin(object):
 
         return model_kwargs
 
+    def update_model_kwargs_for_preallocated_cache(self, outputs, model_kwargs,
+                                                   cur_len, max_length):
+        # Update the model inputs during generation with the preallocated
+        # cache. The cache returned by the first step is converted to
+        # `PreallocatedCache` of `max_length` positions, which is updated in
+        # place by the model afterwards. Since only the values of the last
+        # position are used once the cache is filled, `token_type_ids`,
+        # `position_ids` and `role_ids` keep the last position only, and the
+        # attention mask of decoder-only models is a buffer of `max_length`
+        # positions, whose position of the new token is unmasked every step.
+        is_first_step = model_kwargs.get("cache", None) is None
+        if is_first_step:
+            model_kwargs["cache"] = self.prepare_preallocated_cache(
+                outputs[1], max_length)
+
+        for name in ["token_type_ids", "role_ids"]:
+            if model_kwargs.get(name, None) is not None:
+                model_kwargs[name] = model_kwargs[name][:, -1:]
+
+        if model_kwargs.get("position_ids", None) is not None:
+            model_kwargs["position_ids"] = model_kwargs["position_ids"][:,
+                                                                        -1:] + 1
+
+        if not self.is_encoder_decoder and model_kwargs.get("attention_mask",
+                                                            None) is not None:
+            attention_mask = model_kwargs["attention_mask"]
+            if is_first_step:
+                attention_mask = self._preallocate_attention_mask(
+                    attention_mask, max_length)
+            dtype = convert_dtype(attention_mask.dtype)
+            attention_mask[:, :, :, cur_len - 1] = 1 if 'int' in dtype else 0.0
+            model_kwargs["attention_mask"] = attention_mask
+
+        return model_kwargs
+
+    @staticmethod
+    def _preallocate_attention_mask(attention_mask, max_length):
+        # Returns the attention mask of the last position with shape
+        # `[batch_size, 1, 1, max_length]`, in which the positions not filled
+        # yet are masked.
+        if convert_dtype(attention_mask.dtype) == 'bool':
+            attention_mask = paddle.cast(attention_mask, 'int64')
+        if len(attention_mask.shape) == 4:
+            attention_mask = attention_mask[:, :, -1:, :]
+        else:
+            attention_mask = attention_mask.unsqueeze([1, 2])
+        dtype = convert_dtype(attention_mask.dtype)
+        if 'int' in dtype:
+            masked_value = 0
+        elif 'float' in dtype:
+            masked_value = -1e4
+        else:
+            raise ValueError('The data type of input `attention_mask` must '
+                             'be bool, int or float')
+        length = attention_mask.shape[-1]
+        buffer = paddle.full(
+            [attention_mask.shape[0], 1, 1, max_length],
+            masked_value,
+            dtype=attention_mask.dtype)
+        buffer[:, :, :, :length] = attention_mask
+        return buffer
+
+    def prepare_preallocated_cache(self, cache, capacity):
+        """
+        Converts the incremental caches of self attention, which are
+        `MultiHeadAttention.Cache` instances, in the cache returned by the
+        model to `PreallocatedCache` of `capacity` positions. Override it if
+        the cache of the model is in other structure.
+        """
+        if isinstance(cache, tuple) and type(cache).__name__ == "Cache":
+            return PreallocatedCache(cache.k, cache.v, capacity)
+        elif hasattr(cache, "_fields"):
+            # Other namedtuples such as `MultiHeadAttention.StaticCache`.
+            return cache
+        elif isinstance(cache, (list, tuple)):
+            return type(cache)(
+                self.prepare_preallocated_cache(c, capacity) for c in cache)
+        return cache
+
+    @contextmanager
+    def _preallocated_cache_guard(self, use_preallocated_cache):
+        # `paddle.nn.MultiHeadAttention` only accepts its own caches, thus
+        # replaces its `_prepare_qkv` while decoding with the preallocated
+        # cache, in the same way `enable_faster_encoder` replaces `forward`.
+        layers = []
+        if use_preallocated_cache:
+            layers = [
+                layer for layer in self.sublayers(include_self=True)
+                if isinstance(layer, nn.MultiHeadAttention)
+            ]
+        for layer in layers:
+            layer._prepare_qkv = _prepare_qkv_with_preallocated_cache.__get__(
+                layer)
+        try:
+            yield
+        finally:
+            for layer in layers:
+                del layer._prepare_qkv
+
+    def _update_model_kwargs(self, outputs, model_kwargs, cur_len, max_length):
+        if model_kwargs.get("use_preallocated_cache", False):
+            return self.update_model_kwargs_for_preallocated_cache(
+                outputs, model_kwargs, cur_len, max_length)
+        return self.update_model_kwargs_for_generation(
+            outputs, model_kwargs, is_encoder_decoder=self.is_encoder_decoder)
+
+    def build_prefix_cache(self, input_ids, **model_kwargs):
+        """
+        Encodes a prompt prefix and returns its `PrefixCache`, which can be
+        passed as the `prefix_cache` of `generate` for the prompts starting
+        with the prefix, or put into a `PrefixCacheStore`.
+
+        Args:
+            input_ids (Tensor): The token ids of the prefix, with shape
+                [1, sequence_length].
+            model_kwargs (dict): The other inputs of the prefix, such as
+                `token_type_ids`, `position_ids`, `role_ids` and
+                `attention_mask`, which are the same as the ones of the
+                prompts passed to `generate` except for their length.
+
+        Returns:
+            PrefixCache: The cache of the prefix.
+        """
+        if input_ids.shape[0] != 1:
+            raise ValueError(
+                "The prefix cache is built for one prefix, but received a "
+                "batch of {}.".format(input_ids.shape[0]))
+        length = input_ids.shape[-1]
+        arrays = self._prefix_cache_arrays(input_ids, model_kwargs)
+        with paddle.no_grad():
+            cache = self._encode_prompt(input_ids, None, 0, length,
+                                        model_kwargs)[1]
+        return PrefixCache(cache, length,
+                           prefix_cache_key(length, **{
+                               name: array[0]
+                               for name, array in arrays.items()
+                           }))
+
+    @staticmethod
+    def _prefix_cache_arrays(input_ids, model_kwargs):
+        # Returns the numpy arrays identifying the positions of the prompts,
+        # with the attention mask converted to whether the positions can be
+        # attended.
+        arrays = {"input_ids": input_ids.numpy()}
+        for name in ["token_type_ids", "position_ids", "role_ids"]:
+            if model_kwargs.get(name, None) is not None:
+                arrays[name] = model_kwargs[name].numpy()
+        attention_mask = model_kwargs.get("attention_mask", None)
+        if attention_mask is None:
+            return arrays
+        dtype = convert_dtype(attention_mask.dtype)
+        attention_mask = attention_mask.numpy()
+        if 'float' in dtype:
+            attention_mask = attention_mask > -1.0
+        else:
+            attention_mask = attention_mask != 0
+        if attention_mask.ndim == 4 and attention_mask.shape[2] == 1:
+            attention_mask = attention_mask[:, 0, 0]
+        elif attention_mask.ndim == 4:
+            attention_mask = attention_mask[:, 0]
+        elif attention_mask.ndim != 2:
+            raise ValueError(
+                "The prefix cache only supports `attention_mask` of 2 or 4 "
+                "dimensions, but received {}.".format(attention_mask.ndim))
+        arrays["attention_mask"] = attention_mask
+        return arrays
+
+    def _encode_prompt(self, input_ids, cache, start, end, model_kwargs):
+        # Encodes the positions from `start` to `end` of the prompts on top of
+        # `cache`, which holds the positions before `start`, and returns the
+        # logits of the positions and the cache of the positions before `end`.
+        inputs = {"input_ids": input_ids[:, start:end]}
+        for name in ["token_type_ids", "position_ids", "role_ids"]:
+            if model_kwargs.get(name, None) is not None:
+                inputs[name] = model_kwargs[name][:, start:end]
+        attention_mask = model_kwargs.get("attention_mask", None)
+        if attention_mask is not None:
+            dtype = convert_dtype(attention_mask.dtype)
+            if 'float' not in dtype:
+                attention_mask = (1.0 - paddle.cast(
+                    attention_mask, paddle.get_default_dtype())) * -1e4
+            if len(attention_mask.shape) == 2:
+                attention_mask = attention_mask[:, None, None, :end]
+            elif attention_mask.shape[2] == 1:
+                attention_mask = attention_mask[:, :, :, :end]
+            else:
+                attention_mask = attention_mask[:, :, start:end, :end]
+            inputs["attention_mask"] = attention_mask
+        return self(use_cache=True, cache=cache, **inputs)
+
+    def _prefill_with_prefix_cache(self,
+                                   input_ids,
+                                   model_kwargs,
+                                   prefix_cache=None,
+                                   prefix_cache_store=None):
+        # Encodes the prompts except their last tokens, which are fed by the
+        # first decoding step, on top of the cache of their longest reusable
+        # prefix, and returns the cache of the encoded positions. Returns None
+        # if the prompts can not be encoded in this way.
+        batch_size, end = input_ids.shape[0], input_ids.shape[-1] - 1
+        arrays = self._prefix_cache_arrays(input_ids, model_kwargs)
+
+        # The prefix of a length is shared by the batch if its positions are
+        # the same, and reusable if they do not attend the following ones.
+        shared = end
+        positions = np.arange(end + 1)
+        for name, array in arrays.items():
+            diff = (array != array[:1]).any(axis=0)
+            if diff.ndim == 2:
+                # The mask differs for a prefix if it differs for a pair of
+                # its positions.
+                diff = np.where(diff,
+                                np.maximum(positions[:, None],
+                                           positions[None, :]), end + 1)
+                diff = positions == diff.min()
+            if diff[:shared].any():
+                shared = int(diff.argmax())
+        reusable = np.ones([end + 1], dtype="bool")
+        attention_mask = arrays.get("attention_mask", None)
+        if attention_mask is not None and attention_mask.ndim == 3:
+            last_attended = np.where(attention_mask, positions,
+                                     -1).max(axis=-1)
+            last_attended = np.maximum.accumulate(last_attended, axis=-1)
+            reusable[1:] = (last_attended[:, :end] < positions[1:]).all(
+                axis=0)
+        if end <= 0 or not reusable[end]:
+            if prefix_cache is not None:
+                raise ValueError(
+                    "The prefix cache can not be used since the prompt "
+                    "attends the following positions.")
+            return None
+        while not reusable[shared]:
+            shared -= 1
+
+        def key_fn(length):
+            if length > shared or not reusable[length]:
+                return None
+            return prefix_cache_key(
+                length, **{name: array[0]
+                           for name, array in arrays.items()})
+
+        prefix = None
+        if prefix_cache is not None:
+            if prefix_cache.length > end or key_fn(
+                    prefix_cache.length) != prefix_cache.key:
+                raise ValueError(
+                    "The prefix cache of {} positions does not match the "
+                    "prompts.".format(prefix_cache.length))
+            prefix = prefix_cache
+        elif prefix_cache_store is not None:
+            prefix = prefix_cache_store.match(key_fn, shared)
+
+        start = 0 if prefix is None else prefix.length
+        cache = None if prefix is None else prefix.expand(batch_size)
+        if start < end:
+            cache = self._encode_prompt(input_ids, cache, start, end,
+                                        model_kwargs)[1]
+            if prefix_cache_store is not None and shared > start:
+                prefix_cache_store.put(
+                    PrefixCache(
+                        map_cache(lambda x: x[:1, :, :shared].clone(),
+                                  cache), shared, key_fn(shared)))
+        return cache
+
     @staticmethod
     def update_scores_for_generation(scores, next_scores, length,
                                      unfinished_flag):
@@ -559,11 +930,18 @@ class GenerationMixin(object):
                  use_cache=True,
                  use_faster=False,
                  use_fp16_decoding=False,
+                 use_preallocated_cache=False,
+                 streamer=None,
+                 prefix_cache=None,
+                 prefix_cache_store=None,
+                 draft_model=None,
+                 num_speculative_tokens=4,
                  **model_kwargs):
         r"""
         The interface for generation task. This method can generate sequences 
-        by using decoding strategy. Currently, there are three decoding 
-        strategies supported: "greedy_search", "sampling" and "beam_search".
+        by using decoding strategy. Currently, there are four decoding 
+        strategies supported: "greedy_search", "sampling", "beam_search" and 
+        "speculative".
 
         Args:
             input_ids (Tensor, optional): The input sequence ids for the 
@@ -576,8 +954,12 @@ class GenerationMixin(object):
             min_length (int, optional): The minimum length of the sequence to 
                 be generated. Default to 0.
             decode_strategy (str, optional): The decoding strategy in generation.
-                Currently, there are three decoding strategies supported: 
-                "greedy_search", "sampling" and "beam_search". Default to 
+                Currently, there are four decoding strategies supported: 
+                "greedy_search", "sampling", "beam_search" and "speculative". 
+                "speculative" samples the tokens in the same distribution as 
+                "sampling", while `draft_model` proposes several tokens each 
+                step and the model verifies them in one forward pass. Set 
+                `top_k` to 1 to get the results of "greedy_search". Default to 
                 "greedy_search".
             temperature (float, optional): The value used to module the next 
                 token probabilities in the "sampling" strategy. Default to 1.0, 
@@ -630,6 +1012,42 @@ class GenerationMixin(object):
                 for FasterGeneration. Default to False.
             use_fp16_decoding: (bool, optional): Whether to use fp16 for decoding. 
                 Only works when faster entry is avalible. Default to False.
+            use_preallocated_cache: (bool, optional): Whether to preallocate 
+                the cache of self attention for `max_length` positions and 
+                update it in place, instead of concatenating a new cache and 
+                padding the attention mask every step. It avoids reallocating 
+                and copying the whole cache for each generated token. Only 
+                works when `use_cache` is True, and is supported by GPT, 
+                UnifiedTransformer, BART and T5. Default to False.
+            streamer (TokenStreamer, optional): The object whose `put` method
+                is called with the token ids generated by each step, as a 
+                numpy array of shape [batch_size], and whose `end` method is 
+                called when the generation ends. Use 
+                :class:`~paddlenlp.transformers.generation_streamer.TokenStreamer`
+                to iterate over the tokens in another thread. Only works for 
+                "greedy_search" and "sampling", and disables `use_faster`. 
+                Default to None.
+            prefix_cache (PrefixCache, optional): The cache of the first 
+                positions of the prompts returned by `build_prefix_cache`, 
+                which all the prompts in the batch start with. Only the 
+                positions following them are encoded. Only works for 
+                decoder-only models such as GPT and UnifiedTransformer, and 
+                disables `use_faster`. Default to None.
+            prefix_cache_store (PrefixCacheStore, optional): The store of 
+                prefix caches. The cache of the longest stored prefix shared 
+                by the prompts is reused like `prefix_cache`, and the cache of 
+                the shared prompt is stored for the following calls. A prefix 
+                is not reused if its positions attend the following ones, 
+                such as the bidirectional context of UnifiedTransformer. 
+                Default to None.
+            draft_model (PretrainedModel, optional): The smaller model sharing 
+                the vocabulary and the inputs of the model, which proposes 
+                the tokens in the "speculative" strategy. Only decoder-only 
+                models such as GPT and UnifiedTransformer are supported. 
+                Default to None.
+            num_speculative_tokens (int, optional): The number of tokens 
+                proposed by `draft_model` each step in the "speculative" 
+                strategy. Default to 4.
             model_kwargs (dict): It can be used to specify additional kwargs 
                 passed to the model.
 
@@ -730,8 +1148,9 @@ class GenerationMixin(object):
         """
 
         assert (
-            decode_strategy in ["greedy_search", "sampling", "beam_search"]
-        ), "`decode_strategy` must be one of 'greedy_search', 'sampling' or 'beam_search' but received {}.".format(
+            decode_strategy in
+            ["greedy_search", "sampling", "beam_search", "speculative"]
+        ), "`decode_strategy` must be one of 'greedy_search', 'sampling', 'beam_search' or 'speculative' but received {}.".format(
             decode_strategy)
 
         bos_token_id = bos_token_id if bos_token_id is not None else getattr(
@@ -747,6 +1166,20 @@ class GenerationMixin(object):
         decoder_start_token_id = decoder_start_token_id if decoder_start_token_id is not None else getattr(
             self, 'decoder_start_token_id', None)
 
+        if streamer is not None:
+            if decode_strategy not in [
+                    'greedy_search', 'sampling', 'speculative'
+            ]:
+                raise ValueError(
+                    "`streamer` only works for 'greedy_search', 'sampling' "
+                    "and 'speculative', but received `decode_strategy` "
+                    "{}.".format(decode_strategy))
+            use_faster = False
+        if prefix_cache is not None or prefix_cache_store is not None:
+            use_faster = False
+        if decode_strategy == 'speculative':
+            use_faster = False
+
         if getattr(self, '_faster_entry', None) is not False and use_faster:
             args = locals()
             args.pop('self')
@@ -816,6 +1249,26 @@ class GenerationMixin(object):
             pad_token_id = eos_token_id
 
         model_kwargs["use_cache"] = use_cache
+        if use_preallocated_cache:
+            if not use_cache:
+                raise ValueError(
+                    "`use_cache` should be True when `use_preallocated_cache` "
+                    "is True.")
+            if not self._supports_preallocated_cache:
+                raise ValueError(
+                    "{} does not support the preallocated cache.".format(
+                        self.__class__.__name__))
+            model_kwargs["use_preallocated_cache"] = True
+        if prefix_cache is not None or prefix_cache_store is not None:
+            if self.is_encoder_decoder:
+                raise ValueError(
+                    "The prefix cache only works for decoder-only models.")
+            if not use_cache or use_preallocated_cache:
+                raise ValueError(
+                    "The prefix cache only works when `use_cache` is True and "
+                    "`use_preallocated_cache` is False.")
+            model_kwargs["cache"] = self._prefill_with_prefix_cache(
+                input_ids, model_kwargs, prefix_cache, prefix_cache_store)
         max_length += input_ids.shape[-1]
         min_length += input_ids.shape[-1]
 
@@ -830,73 +1283,143 @@ class GenerationMixin(object):
             diversity_rate=diversity_rate,
             repetition_penalty=repetition_penalty)
 
-        if decode_strategy == 'greedy_search':
-            if num_return_sequences > 1:
-                raise ValueError(
-                    "`num_return_sequences` has to be 1, but is {} "
-                    "when doing greedy search.".format(num_return_sequences))
-
-            return self.greedy_search(input_ids, logits_processors, max_length,
-                                      pad_token_id, eos_token_id,
-                                      **model_kwargs)
-
-        elif decode_strategy == 'sampling':
-            if num_return_sequences > 1:
-                input_ids, model_kwargs = self.expand_inputs_for_generation(
-                    input_ids, expand_size=num_return_sequences, **model_kwargs)
-
-            return self.sample(input_ids, logits_processors, max_length,
-                               pad_token_id, eos_token_id, top_k, top_p,
-                               temperature, **model_kwargs)
-
-        elif decode_strategy == 'beam_search':
-            batch_size = input_ids.shape[0]
-            if num_return_sequences > num_beams:
-                raise ValueError(
-                    "`num_return_sequences` has to be smaller or equal to "
-                    "`num_beams`. But received `num_return_sequences` is {}, "
-                    "`num_beams` is {}".format(num_return_sequences, num_beams))
-            if num_beams <= 1:
-                raise ValueError(
-                    "`num_beams` has to be bigger than 1. But received "
-                    "`num_beams` is {}. If `num_beams` is 1, `decode_strategy` "
-                    "should be 'greedy_search'".format(num_beams))
-            if num_beam_groups > 1:
-                diverse_beam_scorer = BeamSearchScorer(
-                    batch_size=batch_size,
-                    max_length=max_length,
-                    num_beams=num_beams,
-                    length_penalty=length_penalty,
-                    do_early_stopping=early_stopping,
-                    num_beam_hyps_to_keep=num_return_sequences,
-                    num_beam_groups=num_beam_groups)
-
-                # interleave with `num_beams`
-                input_ids, model_kwargs = self.expand_inputs_for_generation(
-                    input_ids, expand_size=num_beams, **model_kwargs)
-
-                return self.group_beam_search(input_ids, diverse_beam_scorer,
-                                              logits_processors, max_length,
-                                              diversity_rate, pad_token_id,
-                                              eos_token_id, **model_kwargs)
-            else:
-                beam_scorer = BeamSearchScorer(
-                    batch_size=batch_size,
-                    max_length=max_length,
-                    num_beams=num_beams,
-                    length_penalty=length_penalty,
-                    do_early_stopping=early_stopping,
-                    num_beam_hyps_to_keep=num_return_sequences)
-
-                input_ids, model_kwargs = self.expand_inputs_for_generation(
-                    input_ids, expand_size=num_beams, **model_kwargs)
-
-                return self.beam_search(
-                    input_ids, beam_scorer, logits_processors, max_length,
-                    diversity_rate, pad_token_id, eos_token_id, **model_kwargs)
-
-    def greedy_search(self, input_ids, logits_processors, max_length,
-                      pad_token_id, eos_token_id, **model_kwargs):
+        error = None
+        try:
+            with self._preallocated_cache_guard(use_preallocated_cache):
+                if decode_strategy == 'greedy_search':
+                    if num_return_sequences > 1:
+                        raise ValueError(
+                            "`num_return_sequences` has to be 1, but is {} "
+                            "when doing greedy search.".format(
+                                num_return_sequences))
+
+                    return self.greedy_search(
+                        input_ids,
+                        logits_processors,
+                        max_length,
+                        pad_token_id,
+                        eos_token_id,
+                        streamer=streamer,
+                        **model_kwargs)
+
+                elif decode_strategy == 'sampling':
+                    if num_return_sequences > 1:
+                        input_ids, model_kwargs = self.expand_inputs_for_generation(
+                            input_ids,
+                            expand_size=num_return_sequences,
+                            **model_kwargs)
+
+                    return self.sample(
+                        input_ids,
+                        logits_processors,
+                        max_length,
+                        pad_token_id,
+                        eos_token_id,
+                        top_k,
+                        top_p,
+                        temperature,
+                        streamer=streamer,
+                        **model_kwargs)
+
+                elif decode_strategy == 'speculative':
+                    if draft_model is None:
+                        raise ValueError(
+                            "`draft_model` should be given for the "
+                            "'speculative' strategy.")
+                    if self.is_encoder_decoder or (hasattr(
+                            draft_model, 'encoder') and hasattr(draft_model,
+                                                                'decoder')):
+                        raise ValueError(
+                            "The 'speculative' strategy only works for "
+                            "decoder-only models.")
+                    if not use_cache or use_preallocated_cache:
+                        raise ValueError(
+                            "The 'speculative' strategy only works when "
+                            "`use_cache` is True and `use_preallocated_cache` "
+                            "is False.")
+                    if num_return_sequences > 1:
+                        input_ids, model_kwargs = self.expand_inputs_for_generation(
+                            input_ids,
+                            expand_size=num_return_sequences,
+                            **model_kwargs)
+
+                    return self.speculative_sample(
+                        input_ids,
+                        draft_model,
+                        logits_processors,
+                        max_length,
+                        pad_token_id,
+                        eos_token_id,
+                        num_speculative_tokens,
+                        top_k,
+                        top_p,
+                        temperature,
+                        streamer=streamer,
+                        **model_kwargs)
+
+                elif decode_strategy == 'beam_search':
+                    batch_size = input_ids.shape[0]
+                    if num_return_sequences > num_beams:
+                        raise ValueError(
+                            "`num_return_sequences` has to be smaller or equal to "
+                            "`num_beams`. But received `num_return_sequences` is "
+                            "{}, `num_beams` is {}".format(num_return_sequences,
+                                                          num_beams))
+                    if num_beams <= 1:
+                        raise ValueError(
+                            "`num_beams` has to be bigger than 1. But received "
+                            "`num_beams` is {}. If `num_beams` is 1, "
+                            "`decode_strategy` should be 'greedy_search'".format(
+                                num_beams))
+                    if num_beam_groups > 1:
+                        diverse_beam_scorer = BeamSearchScorer(
+                            batch_size=batch_size,
+                            max_length=max_length,
+                            num_beams=num_beams,
+                            length_penalty=length_penalty,
+                            do_early_stopping=early_stopping,
+                            num_beam_hyps_to_keep=num_return_sequences,
+                            num_beam_groups=num_beam_groups)
+
+                        # interleave with `num_beams`
+                        input_ids, model_kwargs = self.expand_inputs_for_generation(
+                            input_ids, expand_size=num_beams, **model_kwargs)
+
+                        return self.group_beam_search(
+                            input_ids, diverse_beam_scorer, logits_processors,
+                            max_length, diversity_rate, pad_token_id, eos_token_id,
+                            **model_kwargs)
+                    else:
+                        beam_scorer = BeamSearchScorer(
+                            batch_size=batch_size,
+                            max_length=max_length,
+                            num_beams=num_beams,
+                            length_penalty=length_penalty,
+                            do_early_stopping=early_stopping,
+                            num_beam_hyps_to_keep=num_return_sequences)
+
+                        input_ids, model_kwargs = self.expand_inputs_for_generation(
+                            input_ids, expand_size=num_beams, **model_kwargs)
+
+                        return self.beam_search(
+                            input_ids, beam_scorer, logits_processors, max_length,
+                            diversity_rate, pad_token_id, eos_token_id,
+                            **model_kwargs)
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            if streamer is not None:
+                streamer.end(error)
+
+    def greedy_search(self,
+                      input_ids,
+                      logits_processors,
+                      max_length,
+                      pad_token_id,
+                      eos_token_id,
+                      streamer=None,
+                      **model_kwargs):
         batch_size, cur_len = input_ids.shape
         origin_len = cur_len
         unfinished_flag = paddle.full([batch_size, 1], True, dtype='bool')
@@ -930,6 +1453,8 @@ class GenerationMixin(object):
 
             cur_len += 1
             input_ids = paddle.concat([input_ids, next_tokens], axis=1)
+            if streamer is not None:
+                streamer.put(next_tokens[:, 0].numpy())
 
             if eos_token_id is not None:
                 unfinished_flag = paddle.logical_and(
@@ -939,12 +1464,32 @@ class GenerationMixin(object):
             if not paddle.any(unfinished_flag):
                 break
 
-            model_kwargs = self.update_model_kwargs_for_generation(
-                outputs,
-                model_kwargs,
-                is_encoder_decoder=self.is_encoder_decoder)
+            model_kwargs = self._update_model_kwargs(outputs, model_kwargs,
+                                                     cur_len, max_length)
         return input_ids[:, origin_len:], scores
 
+    def _get_sampling_probs(self, logits, input_ids, logits_processors, top_k,
+                            top_p, temperature, min_tokens_to_keep):
+        # Returns the log probabilities of the next tokens used for the
+        # scores, and the probabilities to sample the next tokens from, which
+        # are not normalized after top-k and top-p filtering.
+
+        # pre-process distribution
+        logits = self.adjust_logits_during_generation(logits)
+        logits = logits_processors(input_ids, logits)
+
+        # sample
+        origin_probs = F.softmax(logits)
+        origin_probs = paddle.log(origin_probs)
+        if temperature is not None and temperature != 1.0:
+            logits = logits / temperature
+        probs = F.softmax(logits)
+        if top_k is not None and top_k != 0:
+            probs = TopKProcess(probs, top_k, min_tokens_to_keep)
+        if top_p is not None and top_p < 1.0:
+            probs = TopPProcess(probs, top_p, min_tokens_to_keep)
+        return origin_probs, probs
+
     def sample(self,
                input_ids,
                logits_processors,
@@ -955,43 +1500,8 @@ class GenerationMixin(object):
                top_p=None,
                temperature=None,
                min_tokens_to_keep=1,
+               streamer=None,
                **model_kwargs):
-        def TopKProcess(probs, top_k, min_tokens_to_keep):
-            top_k = min(max(top_k, min_tokens_to_keep), probs.shape[-1])
-            # Remove all tokens with a probability less than the last token of the top-k
-            topk_probs, _ = paddle.topk(probs, k=top_k)
-            probs = paddle.where(probs >= topk_probs[:, -1:], probs,
-                                 paddle.full_like(probs, 0.0))
-            return probs
-
-        def TopPProcess(probs, top_p, min_tokens_to_keep):
-            sorted_probs = paddle.sort(probs, descending=True)
-            sorted_indices = paddle.argsort(probs, descending=True)
-            cumulative_probs = paddle.cumsum(sorted_probs, axis=-1)
-
-            # Remove tokens with cumulative probs above the top_p, But keep at
-            # least min_tokens_to_keep tokens
-            sorted_indices_to_remove = cumulative_probs > top_p
-            if min_tokens_to_keep > 1:
-                # Set 'min_tokens_to_keep - 1' because the first token is kept
-                sorted_indices_to_remove[:, :min_tokens_to_keep - 1] = 0
-            # Keep the first token
-            sorted_indices_to_remove = paddle.cast(
-                sorted_indices_to_remove, dtype='int64')
-            sorted_indices_to_remove[:, 1:] = (
-                sorted_indices_to_remove[:, :-1].clone())
-            sorted_indices_to_remove[:, 0] = 0
-
-            # Scatter sorted tensors to original indexing
-            sorted_indices = sorted_indices + paddle.arange(probs.shape[
-                0]).unsqueeze(-1) * probs.shape[-1]
-            condition = paddle.scatter(sorted_indices_to_remove.flatten(),
-                                       sorted_indices.flatten(),
-                                       sorted_indices_to_remove.flatten())
-            condition = paddle.cast(condition, 'bool').reshape(probs.shape)
-            probs = paddle.where(condition, paddle.full_like(probs, 0.0), probs)
-            return probs
-
         batch_size, cur_len = input_ids.shape
         origin_len = cur_len
         unfinished_flag = paddle.full([batch_size, 1], True, dtype='bool')
@@ -1007,20 +1517,9 @@ class GenerationMixin(object):
             # [batch_size, vocab_size]
             logits = logits[:, -1, :]
 
-            # pre-process distribution
-            logits = self.adjust_logits_during_generation(logits)
-            logits = logits_processors(input_ids, logits)
-
-            # sample
-            origin_probs = F.softmax(logits)
-            origin_probs = paddle.log(origin_probs)
-            if temperature is not None and temperature != 1.0:
-                logits = logits / temperature
-            probs = F.softmax(logits)
-            if top_k is not None and top_k != 0:
-                probs = TopKProcess(probs, top_k, min_tokens_to_keep)
-            if top_p is not None and top_p < 1.0:
-                probs = TopPProcess(probs, top_p, min_tokens_to_keep)
+            origin_probs, probs = self._get_sampling_probs(
+                logits, input_ids, logits_processors, top_k, top_p,
+                temperature, min_tokens_to_keep)
             next_tokens = paddle.multinomial(probs)
 
             next_scores = paddle.index_sample(origin_probs, next_tokens)
@@ -1035,6 +1534,8 @@ class GenerationMixin(object):
 
             cur_len += 1
             input_ids = paddle.concat([input_ids, next_tokens], axis=1)
+            if streamer is not None:
+                streamer.put(next_tokens[:, 0].numpy())
 
             if eos_token_id is not None:
                 unfinished_flag = paddle.logical_and(
@@ -1043,15 +1544,228 @@ class GenerationMixin(object):
             # Stop when there is a </s> in all sentences
             if not paddle.any(unfinished_flag):
                 break
-            model_kwargs = self.update_model_kwargs_for_generation(
-                outputs,
-                model_kwargs,
-                is_encoder_decoder=self.is_encoder_decoder)
+            model_kwargs = self._update_model_kwargs(outputs, model_kwargs,
+                                                     cur_len, max_length)
+        return input_ids[:, origin_len:], scores
+
+    @staticmethod
+    def _resize_model_kwargs(model_kwargs, cur_len, length):
+        # Truncates or extends the inputs of all the positions, whose
+        # `attention_mask` is float and of shape `[batch_size, cur_len]` or
+        # `[batch_size, 1, cur_len, cur_len]`, to `length` positions. The
+        # extended positions are generated tokens, which attend the positions
+        # attended by the last one and the previous generated tokens.
+        model_kwargs = dict(model_kwargs)
+        num_extended = length - cur_len
+        for name in ["token_type_ids", "position_ids", "role_ids"]:
+            if model_kwargs.get(name, None) is None:
+                continue
+            value = model_kwargs[name]
+            if num_extended <= 0:
+                model_kwargs[name] = value[:, :length]
+            elif name == "position_ids":
+                model_kwargs[name] = paddle.concat(
+                    [
+                        value, value[:, -1:] + paddle.arange(
+                            1, num_extended + 1, dtype=value.dtype)
+                    ],
+                    axis=-1)
+            else:
+                model_kwargs[name] = paddle.concat(
+                    [value, paddle.tile(value[:, -1:], [1, num_extended])],
+                    axis=-1)
+        attention_mask = model_kwargs.get("attention_mask", None)
+        if attention_mask is None:
+            return model_kwargs
+        if num_extended <= 0:
+            if len(attention_mask.shape) == 2:
+                attention_mask = attention_mask[:, :length]
+            else:
+                attention_mask = attention_mask[:, :, :length, :length]
+        elif len(attention_mask.shape) == 2:
+            attention_mask = paddle.concat(
+                [
+                    attention_mask, paddle.zeros(
+                        [attention_mask.shape[0], num_extended],
+                        dtype=attention_mask.dtype)
+                ],
+                axis=-1)
+        else:
+            rows = paddle.concat(
+                [
+                    attention_mask, paddle.tile(attention_mask[:, :, -1:, :],
+                                                [1, 1, num_extended, 1])
+                ],
+                axis=2)
+            columns = paddle.concat(
+                [
+                    paddle.full(
+                        [cur_len, num_extended],
+                        -1e4,
+                        dtype=attention_mask.dtype), paddle.triu(
+                            paddle.full(
+                                [num_extended, num_extended],
+                                -1e4,
+                                dtype=attention_mask.dtype),
+                            diagonal=1)
+                ],
+                axis=0)
+            columns = paddle.expand(columns, [rows.shape[0], 1, length,
+                                              num_extended])
+            attention_mask = paddle.concat([rows, columns], axis=-1)
+        model_kwargs["attention_mask"] = attention_mask
+        return model_kwargs
+
+    def speculative_sample(self,
+                           input_ids,
+                           draft_model,
+                           logits_processors,
+                           max_length,
+                           pad_token_id,
+                           eos_token_id,
+                           num_speculative_tokens=4,
+                           top_k=None,
+                           top_p=None,
+                           temperature=None,
+                           min_tokens_to_keep=1,
+                           streamer=None,
+                           **model_kwargs):
+        # Each step, `draft_model` samples `num_speculative_tokens` tokens one
+        # by one, and the model computes the probabilities of them and of the
+        # token following them in one forward pass. A draft token `x` is
+        # accepted with the probability `min(1, p(x) / q(x))`, where `p` and
+        # `q` are the probabilities of the model and the draft model, and the
+        # token following the accepted ones is sampled from the normalized
+        # `max(p - q, 0)` if a draft token is rejected, otherwise from `p`.
+        # Thus the tokens are distributed the same as the ones of `sample`.
+        # In a batch, the tokens following the least accepted ones of all
+        # the sequences are dropped, which keeps the distribution as well.
+        batch_size, cur_len = input_ids.shape
+        origin_len = cur_len
+        unfinished_flag = paddle.full([batch_size, 1], True, dtype='bool')
+        scores = paddle.full(
+            [batch_size, 1], 0.0, dtype=paddle.get_default_dtype())
+
+        # The cache of the prompt encoded on top of a prefix cache, which
+        # holds all the positions but the last one.
+        cache = model_kwargs.pop("cache", None)
+        cache_len = 0 if cache is None else cur_len - 1
+        draft_cache, draft_cache_len = None, 0
+        attention_mask = model_kwargs.get("attention_mask", None)
+        if attention_mask is not None:
+            if 'float' not in convert_dtype(attention_mask.dtype):
+                attention_mask = (1.0 - paddle.cast(
+                    attention_mask, paddle.get_default_dtype())) * -1e4
+            if len(attention_mask.shape) == 4 and attention_mask.shape[2] == 1:
+                attention_mask = attention_mask[:, 0, 0, :]
+            model_kwargs["attention_mask"] = attention_mask
+        kwargs_len = cur_len
+
+        while cur_len < max_length:
+            num_draft = min(num_speculative_tokens, max_length - cur_len - 1)
+            model_kwargs = self._resize_model_kwargs(model_kwargs, kwargs_len,
+                                                     cur_len + num_draft)
+            kwargs_len = cur_len + num_draft
+
+            # propose draft tokens
+            prefix_ids, draft_probs = [input_ids], []
+            for _ in range(num_draft):
+                logits, draft_cache = draft_model._encode_prompt(
+                    input_ids, draft_cache, draft_cache_len,
+                    input_ids.shape[-1], model_kwargs)
+                draft_cache_len = input_ids.shape[-1]
+                _, probs = draft_model._get_sampling_probs(
+                    logits[:, -1, :], input_ids, logits_processors, top_k,
+                    top_p, temperature, min_tokens_to_keep)
+                probs = probs / probs.sum(axis=-1, keepdim=True)
+                draft_probs.append(probs)
+                input_ids = paddle.concat(
+                    [input_ids, paddle.multinomial(probs)], axis=1)
+                prefix_ids.append(input_ids)
+
+            # verify draft tokens
+            logits, cache = self._encode_prompt(input_ids, cache, cache_len,
+                                                cur_len + num_draft,
+                                                model_kwargs)
+            origin_probs, target_probs = [], []
+            for i in range(num_draft + 1):
+                log_probs, probs = self._get_sampling_probs(
+                    logits[:, i - num_draft - 1, :], prefix_ids[i],
+                    logits_processors, top_k, top_p, temperature,
+                    min_tokens_to_keep)
+                origin_probs.append(log_probs)
+                target_probs.append(probs / probs.sum(axis=-1, keepdim=True))
+
+            draft_ids = input_ids.numpy()[:, cur_len:]
+            num_accepted = num_draft
+            if num_draft > 0:
+                index = paddle.to_tensor(draft_ids[:, :, None])
+                p = paddle.take_along_axis(
+                    paddle.stack(target_probs[:-1], axis=1), index,
+                    axis=-1).squeeze(-1)
+                q = paddle.take_along_axis(
+                    paddle.stack(draft_probs, axis=1), index,
+                    axis=-1).squeeze(-1)
+                accepted = paddle.rand(p.shape, dtype=p.dtype) * q < p
+                accepted = paddle.logical_or(
+                    accepted, paddle.logical_not(unfinished_flag)).numpy()
+                row_accepted = np.where(accepted.all(axis=-1), num_draft,
+                                        accepted.argmin(axis=-1))
+                num_accepted = int(row_accepted.min())
+            if num_accepted < num_draft:
+                residual_probs = F.relu(target_probs[num_accepted] -
+                                        draft_probs[num_accepted])
+                residual_sum = residual_probs.sum(axis=-1, keepdim=True)
+                residual_probs = paddle.where(residual_sum > 0, residual_probs,
+                                              target_probs[num_accepted])
+                next_tokens = np.where(
+                    row_accepted[:, None] == num_accepted,
+                    paddle.multinomial(residual_probs).numpy(),
+                    draft_ids[:, num_accepted:num_accepted + 1])
+            else:
+                next_tokens = paddle.multinomial(target_probs[
+                    num_accepted]).numpy()
+            new_tokens = np.concatenate(
+                [draft_ids[:, :num_accepted], next_tokens], axis=-1)
+
+            input_ids = prefix_ids[0]
+            for i in range(num_accepted + 1):
+                next_tokens = paddle.to_tensor(new_tokens[:, i:i + 1])
+                next_scores = paddle.index_sample(origin_probs[i], next_tokens)
+
+                if eos_token_id is not None:
+                    next_tokens = paddle.where(unfinished_flag, next_tokens,
+                                               paddle.full_like(next_tokens,
+                                                                pad_token_id))
+
+                scores = self.update_scores_for_generation(
+                    scores, next_scores, cur_len - origin_len,
+                    unfinished_flag)
+
+                cur_len += 1
+                input_ids = paddle.concat([input_ids, next_tokens], axis=1)
+                if streamer is not None:
+                    streamer.put(next_tokens[:, 0].numpy())
+
+                if eos_token_id is not None:
+                    unfinished_flag = paddle.logical_and(
+                        unfinished_flag, next_tokens != eos_token_id)
+
+            # Stop when there is a </s> in all sentences
+            if not paddle.any(unfinished_flag):
+                break
+            # Drop the positions of the rejected tokens from the caches.
+            cache_len = cur_len - 1
+            cache = map_cache(lambda x: x[:, :, :cache_len], cache)
+            if draft_cache_len > cache_len:
+                draft_cache_len = cache_len
+                draft_cache = map_cache(lambda x: x[:, :, :cache_len],
+                                        draft_cache)
         return input_ids[:, origin_len:], scores
 
     def beam_search(self, input_ids, beam_scorer, logits_processors, max_length,
                     diversity_rate, pad_token_id, eos_token_id, **model_kwargs):
-        batch_size = len(beam_scorer._beam_hyps)
+        batch_size = beam_scorer.batch_size
         num_beams = beam_scorer.num_beams
         batch_beam_size, cur_len = input_ids.shape
         origin_len = cur_len
@@ -1116,16 +1830,8 @@ class GenerationMixin(object):
                 diversed_score, diversed_tokens = paddle.topk(
                     diversed_score, 2 * num_beams, axis=1)
 
-                # TODO
-                # Use gather_nd() to select origan token and score
-                next_scores = paddle.stack([
-                    paddle.index_select(next_scores[i], diversed_tokens[i])
-                    for i in range(next_scores.shape[0])
-                ])
-                next_tokens = paddle.stack([
-                    paddle.index_select(next_tokens[i], diversed_tokens[i])
-                    for i in range(next_tokens.shape[0])
-                ])
+                next_scores = paddle.index_sample(next_scores, diversed_tokens)
+                next_tokens = paddle.index_sample(next_tokens, diversed_tokens)
 
                 next_indices = diversed_tokens // (2 * num_beams)
 
@@ -1152,14 +1858,12 @@ class GenerationMixin(object):
 
             if beam_scorer.is_done:
                 break
-            model_kwargs = self.update_model_kwargs_for_generation(
-                outputs,
-                model_kwargs,
-                is_encoder_decoder=self.is_encoder_decoder)
+            model_kwargs = self._update_model_kwargs(outputs, model_kwargs,
+                                                     cur_len, max_length)
             if model_kwargs["cache"] is not None:
                 # reorder the cache
                 model_kwargs["cache"] = map_structure(
-                    lambda x: paddle.index_select(x, beam_idx),
+                    lambda x: _index_select_cache(x, beam_idx),
                     model_kwargs["cache"])
 
         pred_ids, scores = beam_scorer.finalize(
@@ -1176,7 +1880,7 @@ class GenerationMixin(object):
                           max_length, diversity_rate, pad_token_id,
                           eos_token_id, **model_kwargs):
 
-        batch_size = len(beam_scorer._beam_hyps)
+        batch_size = beam_scorer.batch_size
         num_beams = beam_scorer.num_beams
         num_beam_groups = beam_scorer.num_beam_groups
         num_sub_beams = num_beams // num_beam_groups
@@ -1196,6 +1900,17 @@ class GenerationMixin(object):
         beam_scores[:, ::num_sub_beams] = 0
         beam_scores = paddle.reshape(beam_scores, [-1])
 
+        # indices of beams of each group among all sentences in batch
+        batch_group_indices = [
+            paddle.to_tensor(
+                (np.arange(batch_size)[:, None] * num_beams + np.arange(
+                    group_start_idx,
+                    min(group_start_idx + num_sub_beams, num_beams))).reshape(
+                        [-1]),
+                dtype="int64")
+            for group_start_idx in range(0, num_beams, num_sub_beams)
+        ]
+
         while cur_len < max_length:
             # predicted tokens in cur_len step
             current_tokens = paddle.zeros(
@@ -1208,28 +1923,18 @@ class GenerationMixin(object):
             model_inputs = self.prepare_inputs_for_generation(input_ids,
                                                               **model_kwargs)
             outputs = self(**model_inputs)
+            all_logits = outputs[0] if isinstance(outputs, tuple) else outputs
+            all_logits = all_logits[:, -1, :]
 
             for beam_group_idx in range(num_beam_groups):
                 group_start_idx = beam_group_idx * num_sub_beams
                 group_end_idx = min(group_start_idx + num_sub_beams, num_beams)
                 group_size = group_end_idx - group_start_idx
+                group_indices = batch_group_indices[beam_group_idx]
 
-                # indices of beams of current group among all sentences in batch
-                batch_group_indices = []
-
-                for batch_idx in range(batch_size):
-                    batch_group_indices.extend([
-                        batch_idx * num_beams + idx
-                        for idx in range(group_start_idx, group_end_idx)
-                    ])
-
-                group_input_ids = input_ids[batch_group_indices]
-                logits = outputs[0] if isinstance(outputs, tuple) else outputs
+                group_input_ids = paddle.index_select(input_ids, group_indices)
                 # select outputs of beams of current group only
-
-                logits = logits[:, -1, :]
-                logits = paddle.index_select(
-                    logits, paddle.to_tensor(batch_group_indices))
+                logits = paddle.index_select(all_logits, group_indices)
                 logits = self.adjust_logits_during_generation(logits)
 
                 next_scores = F.softmax(logits)
@@ -1242,8 +1947,8 @@ class GenerationMixin(object):
                     current_tokens=current_tokens,
                     beam_group_idx=beam_group_idx)
 
-                next_scores = next_scores + beam_scores[
-                    batch_group_indices].unsqueeze(-1)
+                next_scores = next_scores + paddle.index_select(
+                    beam_scores, group_indices).unsqueeze(-1)
 
                 # reshape for beam search
                 next_scores = next_scores.reshape(
@@ -1264,22 +1969,19 @@ class GenerationMixin(object):
                     pad_token_id=pad_token_id,
                     eos_token_id=eos_token_id, )
 
-                beam_scores[batch_group_indices] = beam_outputs[
-                    "next_beam_scores"]
                 beam_next_tokens = beam_outputs["next_beam_tokens"]
                 beam_idx = beam_outputs["next_beam_indices"]
 
-                input_ids[batch_group_indices] = group_input_ids[beam_idx]
-                group_input_ids = paddle.concat(
-                    [
-                        paddle.index_select(
-                            group_input_ids, index=beam_idx),
-                        beam_next_tokens.unsqueeze(-1)
-                    ],
-                    axis=-1)
-                current_tokens[batch_group_indices] = beam_next_tokens
-
-                reordering_indices[batch_group_indices] = (
+                beam_scores = paddle.scatter(beam_scores, group_indices,
+                                             beam_outputs["next_beam_scores"])
+                input_ids = paddle.scatter(
+                    input_ids, group_indices,
+                    paddle.index_select(
+                        group_input_ids, index=beam_idx))
+                current_tokens = paddle.scatter(current_tokens, group_indices,
+                                                beam_next_tokens)
+                reordering_indices = paddle.scatter(
+                    reordering_indices, group_indices,
                     num_beams * (beam_idx // group_size) + group_start_idx +
                     (beam_idx % group_size))
 
@@ -1289,14 +1991,12 @@ class GenerationMixin(object):
             cur_len += 1
             if beam_scorer.is_done:
                 break
-            model_kwargs = self.update_model_kwargs_for_generation(
-                outputs,
-                model_kwargs,
-                is_encoder_decoder=self.is_encoder_decoder)
+            model_kwargs = self._update_model_kwargs(outputs, model_kwargs,
+                                                     cur_len, max_length)
             if model_kwargs["cache"] is not None:
                 # reorder the cache
                 model_kwargs["cache"] = map_structure(
-                    lambda x: paddle.index_select(x, reordering_indices),
+                    lambda x: _index_select_cache(x, reordering_indices),
                     model_kwargs["cache"])
 
         pred_ids, scores = beam_scorer.finalize(
@@ -1436,16 +2136,20 @@ class HammingDiversityLogitsProcessor(LogitsProcessor):
         if group_start_idx == 0:
             return scores
 
-        for batch_idx in range(batch_size):
-            previous_group_tokens = current_tokens[batch_idx * self._num_beams:
-                                                   batch_idx * self._num_beams +
-                                                   group_start_idx]
-            token_frequency = paddle.bincount(
-                previous_group_tokens, minlength=vocab_size)
-            scores[batch_idx * group_size:(batch_idx + 1) *
-                   group_size] -= self._diversity_rate * token_frequency
-
-        return scores
+        # Counts the tokens of the previous groups of all sentences at once,
+        # offsetting the tokens of each sentence by `vocab_size`.
+        previous_group_tokens = current_tokens.reshape(
+            [batch_size, self._num_beams])[:, :group_start_idx]
+        previous_group_tokens = previous_group_tokens + paddle.arange(
+            batch_size, dtype=current_tokens.dtype).unsqueeze(-1) * vocab_size
+        token_frequency = paddle.bincount(
+            previous_group_tokens.reshape([-1]),
+            minlength=batch_size * vocab_size).reshape(
+                [batch_size, 1, vocab_size])
+        scores = scores.reshape([batch_size, group_size, vocab_size])
+        scores = scores - self._diversity_rate * paddle.cast(token_frequency,
+                                                             scores.dtype)
+        return scores.reshape([batch_size * group_size, vocab_size])
 
 
 class ForcedBOSTokenLogitsProcessor(LogitsProcessor):
@@ -23,6 +23,7 @@ from paddle.fluid import layers
 from paddle.nn.layer.transformer import _convert_param_attr_to_list
 
 from .. import PretrainedModel, register_base_model
+from ..generation_utils import PreallocatedCache
 
 __all__ = [
     'GPTModel',
@@ -111,6 +112,10 @@ class MultiHeadAttention(nn.Layer):
         else:
             k, v = self.compute_kv(key, value)
 
+        if isinstance(cache, PreallocatedCache):
+            # for decoder self-attention in inference, updated in place
+            k, v = cache.update(k, v)
+            return q, k, v, cache
         if isinstance(cache, self.Cache):
             # for decoder self-attention in inference
             k = tensor.concat([cache.k, k], axis=2)
@@ -787,7 +792,9 @@ class GPTModel(GPTPretrainedModel):
         self.checkpoints = []
         if position_ids is None:
             past_length = 0
-            if cache is not None:
+            if cache is not None and isinstance(cache[0], PreallocatedCache):
+                past_length = cache[0].length
+            elif cache is not None:
                 past_length = paddle.shape(cache[0].k)[-2]
             position_ids = paddle.arange(
                 past_length,
@@ -805,6 +812,16 @@ class GPTModel(GPTPretrainedModel):
             paddle.ones((paddle.shape(input_ids)[-1],
                          paddle.shape(input_ids)[-1])) * -1e4,
             diagonal=1)
+        if cache is not None and not isinstance(
+                cache[0], PreallocatedCache) and input_ids.shape[-1] > 1:
+            # The positions encoded on top of the cache, such as the prompt
+            # following a prefix cache, attend all the cached positions.
+            causal_mask = paddle.concat(
+                [
+                    paddle.zeros([input_ids.shape[-1], cache[0].k.shape[-2]]),
+                    causal_mask
+                ],
+                axis=-1)
 
         if attention_mask is not None:
             if len(attention_mask.shape) == 2:
@@ -1062,6 +1079,8 @@ class GPTLMHeadModel(GPTPretrainedModel):
 
     """
 
+    _supports_preallocated_cache = True
+
     def __init__(self, gpt):
         super(GPTLMHeadModel, self).__init__()
         self.gpt = gpt
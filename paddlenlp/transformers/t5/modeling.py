@@ -23,6 +23,7 @@ import paddle.nn as nn
 import paddle.nn.functional as F
 
 from ..model_utils import PretrainedModel, register_base_model
+from ..generation_utils import PreallocatedCache
 from ..nezha.modeling import ACT2FN
 
 __all__ = [
@@ -250,16 +251,23 @@ class T5Attention(nn.Layer):
         batch_size, seq_length = hidden_states.shape[:2]
 
         real_seq_length = seq_length
+        use_preallocated_cache = isinstance(cache, PreallocatedCache)
 
-        if cache is not None:
+        if use_preallocated_cache:
+            real_seq_length += cache.length
+        elif cache is not None:
             assert (
                 len(cache) == 2
             ), f"cache should have 2 past states: keys and values. Got { len(cache)} past states"
             real_seq_length += (cache[0].shape[2]
                                 if query_length is None else query_length)
 
-        key_length = (real_seq_length if key_value_states is None else
-                      key_value_states.shape[1])
+        if use_preallocated_cache:
+            # The positions not filled yet are masked by `mask`.
+            key_length = cache.capacity
+        else:
+            key_length = (real_seq_length if key_value_states is None else
+                          key_value_states.shape[1])
 
         def shape(states):
             """projection"""
@@ -299,16 +307,20 @@ class T5Attention(nn.Layer):
             hidden_states))  # (batch_size, n_heads, seq_length, dim_per_head)
 
         # get key/value states
-        key_states = project(
-            hidden_states,
-            self.k,
-            key_value_states,
-            cache[0] if cache is not None else None, )
-        value_states = project(
-            hidden_states,
-            self.v,
-            key_value_states,
-            cache[1] if cache is not None else None, )
+        if use_preallocated_cache:
+            key_states, value_states = cache.update(
+                shape(self.k(hidden_states)), shape(self.v(hidden_states)))
+        else:
+            key_states = project(
+                hidden_states,
+                self.k,
+                key_value_states,
+                cache[0] if cache is not None else None, )
+            value_states = project(
+                hidden_states,
+                self.v,
+                key_value_states,
+                cache[1] if cache is not None else None, )
 
         # compute scores
         scores = paddle.matmul(query_states, key_states, transpose_y=True)
@@ -343,8 +355,12 @@ class T5Attention(nn.Layer):
             attn_weights, value_states))  # (batch_size, seq_length, dim)
         attn_output = self.o(attn_output)
 
-        present_key_value_state = ((key_states, value_states)
-                                   if (self.is_decoder and use_cache) else None)
+        if use_preallocated_cache:
+            present_key_value_state = (cache, )
+        else:
+            present_key_value_state = (
+                (key_states, value_states)
+                if (self.is_decoder and use_cache) else None)
         outputs = (attn_output, ) + (present_key_value_state, ) + (
             position_bias, )
 
@@ -484,7 +500,11 @@ class T5Block(nn.Layer):
             use_cache=False,
             output_attentions=False, ):
 
-        if cache is not None:
+        if cache is not None and isinstance(cache[0], PreallocatedCache):
+            assert self.is_decoder, "Only decoder can use `caches`"
+            self_attn_cache = cache[0]
+            cross_attn_cache = cache[1:]
+        elif cache is not None:
             assert self.is_decoder, "Only decoder can use `caches`"
             expected_num_caches = 2 if encoder_hidden_states is None else 4
 
@@ -522,7 +542,9 @@ class T5Block(nn.Layer):
         if do_cross_attention:
             # the actual query length is unknown for cross attention
             # if using past key value states. Need to inject it here
-            if present_key_value_state is not None:
+            if isinstance(self_attn_cache, PreallocatedCache):
+                query_length = self_attn_cache.length
+            elif present_key_value_state is not None:
                 query_length = present_key_value_state[0].shape[2]
             else:
                 query_length = None
@@ -913,16 +935,28 @@ class T5Stack(nn.Layer):
 
         batch_size, seq_length = input_shape
 
+        use_preallocated_cache = cache is not None and isinstance(
+            cache[0][0], PreallocatedCache)
         # required mask seq length can be calculated via length of past
-        mask_seq_length = (cache[0][0].shape[2] + seq_length
-                           if cache is not None else seq_length)
+        if use_preallocated_cache:
+            mask_seq_length = cache[0][0].capacity
+        else:
+            mask_seq_length = (cache[0][0].shape[2] + seq_length
+                               if cache is not None else seq_length)
 
         if use_cache is True:
             assert (
                 self.is_decoder
             ), f"`use_cache` can only be set to `True` if {self} is used as a decoder"
 
-        if attention_mask is None:
+        if attention_mask is None and use_preallocated_cache:
+            # Mask the positions of the cache not filled yet.
+            attention_mask = (paddle.arange(mask_seq_length) <
+                              cache[0][0].length + seq_length).astype(
+                                  paddle.get_default_dtype())
+            attention_mask = paddle.tile(
+                attention_mask.unsqueeze(0), [batch_size, 1])
+        elif attention_mask is None:
             attention_mask = paddle.ones(shape=[batch_size, mask_seq_length])
         if (self.is_decoder and encoder_attention_mask is None and
                 encoder_hidden_states is not None):
@@ -1372,6 +1406,8 @@ class T5ForConditionalGeneration(T5PretrainedModel):
 
     """
 
+    _supports_preallocated_cache = True
+
     def __init__(self, t5):
         super().__init__()
         self.t5 = t5
@@ -1587,6 +1623,13 @@ class T5ForConditionalGeneration(T5PretrainedModel):
             "use_cache": use_cache,
         }
 
+    def prepare_preallocated_cache(self, cache, capacity):
+        # The cache of each layer is a tuple of the keys and values of self
+        # attention and cross attention.
+        return tuple((PreallocatedCache(layer_cache[0], layer_cache[1],
+                                        capacity), ) + tuple(layer_cache[2:])
+                     for layer_cache in cache)
+
     @staticmethod
     def expand_inputs_for_generation(input_ids,
                                      expand_size,
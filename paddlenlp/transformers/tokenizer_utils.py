@@ -17,6 +17,7 @@
 
 import copy
 import bisect
+import functools
 import itertools
 import io
 import json
@@ -110,6 +111,22 @@ def _is_control(char):
     return False
 
 
+@functools.lru_cache(maxsize=65536)
+def _normalize_offset_char(char, do_lower_case):
+    """
+    Returns the normalized text of a character used to align the tokens in
+    `get_offset_mapping`, cached since texts repeat few distinct characters.
+    """
+    if do_lower_case:
+        char = char.lower()
+        char = unicodedata.normalize('NFD', char)
+        char = ''.join([c for c in char if unicodedata.category(c) != 'Mn'])
+    return ''.join([
+        c for c in char
+        if not (ord(c) == 0 or ord(c) == 0xfffd or _is_control(c))
+    ])
+
+
 def _is_punctuation(char):
     """Checks whether `chars` is a punctuation character."""
     cp = ord(char)
@@ -1315,29 +1332,22 @@ class PretrainedTokenizer(PretrainedTokenizerBase):
                 split_tokens.append(sub_token
                                     if sub_token != self.unk_token else token)
 
-        normalized_text, char_mapping = '', []
-
-        for i, ch in enumerate(text):
-            if self.do_lower_case:
-                ch = ch.lower()
-                ch = unicodedata.normalize('NFD', ch)
-                ch = ''.join([c for c in ch if unicodedata.category(c) != 'Mn'])
-
-            ch = ''.join([
-                c for c in ch
-                if not (ord(c) == 0 or ord(c) == 0xfffd or _is_control(c))
-            ])
-            normalized_text += ch
-
-            char_mapping.extend([i] * len(ch))
-        text, token_mapping, offset = normalized_text, [], 0
+        # Join the normalized characters at once rather than one by one, and
+        # search the tokens without slicing the text, so that the cost is
+        # linear in the length of the text.
+        do_lower_case = bool(self.do_lower_case)
+        normalized_chars = [
+            _normalize_offset_char(ch, do_lower_case) for ch in text
+        ]
+        char_mapping = [i for i, ch in enumerate(normalized_chars) for _ in ch]
+        text, token_mapping, offset = ''.join(normalized_chars), [], 0
 
         for token in split_tokens:
 
             if token[:2] == '##':
                 token = token[2:]
 
-            start = text[offset:].index(token) + offset
+            start = text.index(token, offset)
 
             end = start + len(token)
 
@@ -439,6 +439,8 @@ class UnifiedTransformerLMHeadModel(UnifiedTransformerPretrainedModel):
             An instance of :class:`UnifiedTransformerModel`.
     """
 
+    _supports_preallocated_cache = True
+
     def __init__(self, unified_transformer):
         super(UnifiedTransformerLMHeadModel, self).__init__()
         self.unified_transformer = unified_transformer
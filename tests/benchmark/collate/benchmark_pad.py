@@ -0,0 +1,91 @@
+# Copyright (c) 2022 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Compares the batchify speed of `paddlenlp.data.Pad`/`Tuple` against the
+per-sample padding loop.
+
+Usage: python benchmark_pad.py --batch_size 512 --max_seq_len 128
+"""
+
+import argparse
+import random
+import time
+
+import numpy as np
+
+from paddlenlp.data import Pad, Stack, Tuple, BufferPool
+
+# yapf: disable
+parser = argparse.ArgumentParser()
+parser.add_argument("--batch_size", default=512, type=int, help="Number of samples per batch.")
+parser.add_argument("--min_seq_len", default=8, type=int, help="Minimum length of the samples.")
+parser.add_argument("--max_seq_len", default=128, type=int, help="Maximum length of the samples.")
+parser.add_argument("--num_batches", default=200, type=int, help="Number of batches to batchify.")
+parser.add_argument("--seed", default=1000, type=int, help="Random seed.")
+args = parser.parse_args()
+# yapf: enable
+
+
+def loop_pad(data, pad_val=0):
+    # The per-sample padding loop used before the vectorized path.
+    arrs = [np.asarray(ele) for ele in data]
+    max_size = max(arr.shape[0] for arr in arrs)
+    ret = np.full(
+        shape=(len(arrs), max_size), fill_value=pad_val, dtype=arrs[0].dtype)
+    for i, arr in enumerate(arrs):
+        ret[i, :arr.shape[0]] = arr
+    return ret
+
+
+def loop_tuple(data):
+    return loop_pad([ele[0] for ele in data]), loop_pad(
+        [ele[1] for ele in data]), np.stack([ele[2] for ele in data])
+
+
+def timeit(fn, batches):
+    start = time.time()
+    for batch in batches:
+        fn(batch)
+    return (time.time() - start) / len(batches) * 1000
+
+
+def main():
+    random.seed(args.seed)
+    batches = []
+    for _ in range(args.num_batches):
+        batch = []
+        for _ in range(args.batch_size):
+            seq_len = random.randint(args.min_seq_len, args.max_seq_len)
+            input_ids = [random.randint(1, 30000) for _ in range(seq_len)]
+            batch.append((input_ids, [0] * seq_len, [random.randint(0, 1)]))
+        batches.append(batch)
+
+    pool = BufferPool()
+    fns = [
+        ("loop", loop_tuple),
+        ("vectorized", Tuple(Pad(), Pad(), Stack())),
+        ("vectorized+pool",
+         Tuple(
+             Pad(buffer_pool=pool), Pad(buffer_pool=pool),
+             Stack())),
+    ]
+    expected = loop_tuple(batches[0])
+    for name, fn in fns:
+        for result, target in zip(fn(batches[0]), expected):
+            assert np.array_equal(result, target), name
+        print("%-16s %.3f ms/batch" % (name, timeit(fn, batches)))
+
+
+if __name__ == "__main__":
+    main()
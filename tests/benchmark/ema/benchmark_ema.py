@@ -0,0 +1,107 @@
+# Copyright (c) 2022 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Compares the cost of an EMA update of the parameters of a Transformer encoder,
+relative to a training step of the encoder, between a loop over the
+parameters which creates a new shadow tensor per parameter and the in-place
+update of `ExponentialMovingAverage`, with and without `update_every`.
+
+Usage: python benchmark_ema.py --device gpu
+"""
+
+import argparse
+import time
+
+import numpy as np
+import paddle
+
+from paddlenlp.ops.optimizer import ExponentialMovingAverage
+
+# yapf: disable
+parser = argparse.ArgumentParser()
+parser.add_argument("--device", default="cpu", choices=["cpu", "gpu"], help="Device to run on.")
+parser.add_argument("--hidden_size", default=512, type=int, help="Hidden size of the encoder.")
+parser.add_argument("--num_layers", default=6, type=int, help="Number of layers of the encoder.")
+parser.add_argument("--batch_size", default=16, type=int, help="Batch size of the training steps.")
+parser.add_argument("--seq_len", default=128, type=int, help="Sequence length of the training steps.")
+parser.add_argument("--steps", default=20, type=int, help="Number of timed steps.")
+parser.add_argument("--update_every", default=4, type=int, help="The update_every of the amortized EMA.")
+args = parser.parse_args()
+# yapf: enable
+
+
+class LoopEMA(object):
+    # A new shadow tensor per parameter per update.
+    def __init__(self, model, decay=0.999):
+        self.decay = decay
+        self.params = [p for p in model.parameters() if not p.stop_gradient]
+        self.shadow = [p.clone() for p in self.params]
+
+    @paddle.no_grad()
+    def update(self):
+        self.shadow = [(1.0 - self.decay) * p + self.decay * s
+                       for p, s in zip(self.params, self.shadow)]
+
+
+def synchronize():
+    if args.device == "gpu":
+        paddle.device.cuda.synchronize()
+
+
+def timeit(fn):
+    fn()
+    synchronize()
+    start = time.time()
+    for _ in range(args.steps):
+        fn()
+    synchronize()
+    return (time.time() - start) / args.steps
+
+
+def main():
+    paddle.set_device(args.device)
+    model = paddle.nn.TransformerEncoder(
+        paddle.nn.TransformerEncoderLayer(
+            args.hidden_size,
+            args.hidden_size // 64,
+            args.hidden_size * 4,
+            dropout=0.0),
+        args.num_layers)
+    optimizer = paddle.optimizer.AdamW(parameters=model.parameters())
+    x = paddle.randn([args.batch_size, args.seq_len, args.hidden_size])
+
+    def train_step():
+        model(x).mean().backward()
+        optimizer.step()
+        optimizer.clear_grad()
+
+    step_time = timeit(train_step)
+    num_params = sum(int(np.prod(p.shape)) for p in model.parameters())
+    print(f"parameters: {num_params}, "
+          f"train step: {step_time * 1000:.2f} ms")
+    print("%-20s %12s %14s" % ("ema", "update (ms)", "of step (%)"))
+    emas = [("loop", LoopEMA(model)),
+            ("inplace", ExponentialMovingAverage(model)),
+            (f"inplace, every {args.update_every}", ExponentialMovingAverage(
+                model, update_every=args.update_every))]
+    for name, ema in emas:
+        if isinstance(ema, ExponentialMovingAverage):
+            ema.register()
+        update_time = timeit(ema.update)
+        print("%-20s %12.3f %14.2f" % (name, update_time * 1000,
+                                       update_time / step_time * 100))
+
+
+if __name__ == "__main__":
+    main()
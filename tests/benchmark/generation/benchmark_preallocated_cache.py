@@ -0,0 +1,154 @@
+# Copyright (c) 2022 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Compares the decoding speed (generated tokens per second) of `generate` on CPU
+with and without the preallocated cache, using randomly initialized models.
+
+Usage: python benchmark_preallocated_cache.py --model gpt --max_length 256
+"""
+
+import argparse
+import time
+
+import numpy as np
+import paddle
+
+from paddlenlp.transformers import (
+    BartForConditionalGeneration, BartModel, GPTLMHeadModel, GPTModel,
+    T5ForConditionalGeneration, T5Model, UnifiedTransformerLMHeadModel,
+    UnifiedTransformerModel)
+
+# yapf: disable
+parser = argparse.ArgumentParser()
+parser.add_argument("--model", default="gpt", choices=["gpt", "unified_transformer", "bart", "t5"], help="The model to benchmark.")
+parser.add_argument("--decode_strategy", default="greedy_search", choices=["greedy_search", "sampling", "beam_search"], help="The decoding strategy.")
+parser.add_argument("--num_beams", default=4, type=int, help="Number of beams for beam search.")
+parser.add_argument("--batch_size", default=4, type=int, help="Number of sequences per batch.")
+parser.add_argument("--prompt_len", default=32, type=int, help="Length of the prompts.")
+parser.add_argument("--max_length", default=256, type=int, help="Number of tokens to generate.")
+parser.add_argument("--hidden_size", default=256, type=int, help="Hidden size of the model.")
+parser.add_argument("--num_layers", default=4, type=int, help="Number of layers of the model.")
+parser.add_argument("--num_heads", default=4, type=int, help="Number of attention heads of the model.")
+parser.add_argument("--vocab_size", default=1000, type=int, help="Vocabulary size of the model.")
+parser.add_argument("--repeats", default=3, type=int, help="Number of timed runs of each mode.")
+args = parser.parse_args()
+# yapf: enable
+
+
+def build_model():
+    max_position = args.prompt_len + args.max_length + 2
+    if args.model == "gpt":
+        return GPTLMHeadModel(
+            GPTModel(
+                vocab_size=args.vocab_size,
+                hidden_size=args.hidden_size,
+                num_hidden_layers=args.num_layers,
+                num_attention_heads=args.num_heads,
+                intermediate_size=args.hidden_size * 4,
+                max_position_embeddings=max_position,
+                eos_token_id=args.vocab_size - 1))
+    elif args.model == "unified_transformer":
+        return UnifiedTransformerLMHeadModel(
+            UnifiedTransformerModel(
+                vocab_size=args.vocab_size,
+                hidden_size=args.hidden_size,
+                num_hidden_layers=args.num_layers,
+                num_attention_heads=args.num_heads,
+                intermediate_size=args.hidden_size * 4,
+                max_position_embeddings=max_position,
+                unk_token_id=0,
+                pad_token_id=0,
+                bos_token_id=1,
+                eos_token_id=args.vocab_size - 1,
+                mask_token_id=2))
+    elif args.model == "bart":
+        return BartForConditionalGeneration(
+            BartModel(
+                vocab_size=args.vocab_size,
+                d_model=args.hidden_size,
+                num_encoder_layers=args.num_layers,
+                num_decoder_layers=args.num_layers,
+                encoder_attention_heads=args.num_heads,
+                decoder_attention_heads=args.num_heads,
+                encoder_ffn_dim=args.hidden_size * 4,
+                decoder_ffn_dim=args.hidden_size * 4,
+                max_position_embeddings=max_position,
+                eos_token_id=args.vocab_size - 1,
+                forced_eos_token_id=None))
+    return T5ForConditionalGeneration(
+        T5Model(
+            vocab_size=args.vocab_size,
+            d_model=args.hidden_size,
+            d_kv=args.hidden_size // args.num_heads,
+            d_ff=args.hidden_size * 4,
+            num_layers=args.num_layers,
+            num_decoder_layers=args.num_layers,
+            num_heads=args.num_heads,
+            eos_token_id=args.vocab_size - 1))
+
+
+def build_inputs():
+    input_ids = np.random.randint(
+        5, args.vocab_size - 1, size=(args.batch_size, args.prompt_len))
+    inputs = {"input_ids": paddle.to_tensor(input_ids, dtype="int64")}
+    if args.model == "unified_transformer":
+        length = args.prompt_len
+        causal_mask = np.triu(
+            np.full(
+                (length, length), -1e4, dtype="float32"), 1)
+        inputs["token_type_ids"] = paddle.zeros_like(inputs["input_ids"])
+        inputs["position_ids"] = paddle.tile(
+            paddle.arange(length).unsqueeze(0), [args.batch_size, 1])
+        inputs["attention_mask"] = paddle.to_tensor(
+            np.tile(causal_mask[None, None], [args.batch_size, 1, 1, 1]))
+    return inputs
+
+
+def run(model, inputs, use_preallocated_cache):
+    kwargs = {}
+    if args.decode_strategy == "beam_search":
+        kwargs["num_beams"] = args.num_beams
+    # Disable early stop so that every run generates `max_length` tokens.
+    generate = lambda: model.generate(
+        **inputs,
+        max_length=args.max_length,
+        min_length=args.max_length,
+        decode_strategy=args.decode_strategy,
+        use_preallocated_cache=use_preallocated_cache,
+        **kwargs)
+    generate()
+    costs = []
+    for _ in range(args.repeats):
+        start = time.time()
+        ids, _ = generate()
+        costs.append(time.time() - start)
+    return ids.shape[0] * ids.shape[1] / np.median(costs)
+
+
+def main():
+    paddle.set_device("cpu")
+    paddle.seed(1000)
+    np.random.seed(1000)
+    model = build_model()
+    model.eval()
+    inputs = build_inputs()
+    print("%-22s %12s" % ("mode", "tokens/s"))
+    for use_preallocated_cache in [False, True]:
+        mode = "preallocated" if use_preallocated_cache else "concat"
+        print("%-22s %12.2f" % (mode, run(model, inputs,
+                                          use_preallocated_cache)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+# Copyright (c) 2022 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Compares the decoding speed (generated tokens per second) of `generate` on CPU
+at batch size 1 with and without speculative decoding. A GPT model is trained
+on sequences of a random sparse Markov chain, and a much smaller GPT draft
+model is distilled from it, so that the draft agrees with the model on most
+tokens like a distilled draft of a pretrained model.
+
+Usage: python benchmark_speculative_decoding.py --num_speculative_tokens 4
+"""
+
+import argparse
+import time
+
+import numpy as np
+import paddle
+import paddle.nn.functional as F
+
+from paddlenlp.transformers import GPTLMHeadModel, GPTModel
+
+# yapf: disable
+parser = argparse.ArgumentParser()
+parser.add_argument("--num_speculative_tokens", default=4, type=int, help="Number of tokens proposed by the draft model each step.")
+parser.add_argument("--prompt_len", default=16, type=int, help="Length of the prompts.")
+parser.add_argument("--max_length", default=64, type=int, help="Number of tokens to generate.")
+parser.add_argument("--hidden_size", default=256, type=int, help="Hidden size of the model.")
+parser.add_argument("--num_layers", default=6, type=int, help="Number of layers of the model.")
+parser.add_argument("--draft_hidden_size", default=64, type=int, help="Hidden size of the draft model.")
+parser.add_argument("--draft_num_layers", default=1, type=int, help="Number of layers of the draft model.")
+parser.add_argument("--vocab_size", default=256, type=int, help="Vocabulary size of the models.")
+parser.add_argument("--train_steps", default=150, type=int, help="Number of steps to train the model and to distill the draft model.")
+parser.add_argument("--repeats", default=3, type=int, help="Number of timed runs of each mode.")
+args = parser.parse_args()
+# yapf: enable
+
+
+def build_model(hidden_size, num_layers):
+    return GPTLMHeadModel(
+        GPTModel(
+            vocab_size=args.vocab_size,
+            hidden_size=hidden_size,
+            num_hidden_layers=num_layers,
+            num_attention_heads=hidden_size // 64,
+            intermediate_size=hidden_size * 4,
+            hidden_dropout_prob=0.0,
+            attention_probs_dropout_prob=0.0,
+            max_position_embeddings=args.prompt_len + args.max_length + 8,
+            eos_token_id=args.vocab_size - 1))
+
+
+def sample_corpus(transitions, batch_size, length):
+    # Each token is followed by one of its 4 successors.
+    seqs = np.zeros([batch_size, length], dtype="int64")
+    seqs[:, 0] = np.random.randint(0, args.vocab_size - 1, size=batch_size)
+    for i in range(1, length):
+        choices = np.random.choice(
+            transitions.shape[1], size=batch_size, p=[0.7, 0.2, 0.05, 0.05])
+        seqs[:, i] = transitions[seqs[:, i - 1], choices]
+    return paddle.to_tensor(seqs)
+
+
+def train(model, teacher, transitions):
+    # Trains `model` on the corpus, or distills it from `teacher`.
+    model.train()
+    optimizer = paddle.optimizer.AdamW(
+        learning_rate=1e-3, parameters=model.parameters())
+    for _ in range(args.train_steps):
+        seqs = sample_corpus(transitions, 32, args.prompt_len * 2)
+        logits = model(seqs[:, :-1])
+        if teacher is None:
+            loss = F.cross_entropy(logits, seqs[:, 1:].unsqueeze(-1))
+        else:
+            with paddle.no_grad():
+                target_probs = F.softmax(teacher(seqs[:, :-1]))
+            loss = F.cross_entropy(logits, target_probs, soft_label=True)
+        loss.mean().backward()
+        optimizer.step()
+        optimizer.clear_grad()
+    model.eval()
+
+
+def run(model, input_ids, **kwargs):
+    # Disable early stop so that every run generates `max_length` tokens.
+    generate = lambda: model.generate(
+        input_ids=input_ids,
+        max_length=args.max_length,
+        min_length=args.max_length,
+        **kwargs)
+    generate()
+    costs = []
+    for _ in range(args.repeats):
+        start = time.time()
+        ids, _ = generate()
+        costs.append(time.time() - start)
+    return ids.shape[0] * ids.shape[1] / np.median(costs)
+
+
+def main():
+    paddle.set_device("cpu")
+    paddle.seed(1000)
+    np.random.seed(1000)
+    transitions = np.random.randint(
+        0, args.vocab_size - 1, size=[args.vocab_size, 4])
+    model = build_model(args.hidden_size, args.num_layers)
+    train(model, None, transitions)
+    draft_model = build_model(args.draft_hidden_size, args.draft_num_layers)
+    train(draft_model, model, transitions)
+
+    input_ids = sample_corpus(transitions, 1, args.prompt_len)
+    speculative_kwargs = {
+        "decode_strategy": "speculative",
+        "draft_model": draft_model,
+        "num_speculative_tokens": args.num_speculative_tokens
+    }
+    print("%-22s %12s" % ("mode", "tokens/s"))
+    for mode, kwargs in [
+        ("greedy_search", {
+            "decode_strategy": "greedy_search"
+        }),
+        ("speculative top_k=1", dict(
+            speculative_kwargs, top_k=1)),
+        ("sampling", {
+            "decode_strategy": "sampling"
+        }),
+        ("speculative", speculative_kwargs),
+    ]:
+        print("%-22s %12.2f" % (mode, run(model, input_ids, **kwargs)))
+
+
+if __name__ == "__main__":
+    main()
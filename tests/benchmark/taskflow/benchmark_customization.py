@@ -0,0 +1,143 @@
+# Copyright (c) 2022 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Compares the memory, build time and search time of the Aho-Corasick automaton
+of the user dicts of Taskflow with the previous trie, which kept every prefix
+of the words in a dict and looked up every substring of the text, and the time
+of loading the user dict from its binary cache.
+
+Usage: python benchmark_customization.py --num_words 10000 100000 1000000
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+
+from paddlenlp.taskflow.utils import AhoCorasick, Customization
+
+# yapf: disable
+parser = argparse.ArgumentParser()
+parser.add_argument("--num_words", default=[10000, 100000, 1000000], type=int, nargs="+", help="Numbers of words of the dicts.")
+parser.add_argument("--text_len", default=100000, type=int, help="Length of the searched text.")
+args = parser.parse_args()
+# yapf: enable
+
+CHARS = [chr(c) for c in range(0x4e00, 0x4e00 + 3000)]
+
+
+class TriedTree(object):
+    # The previous implementation.
+    def __init__(self):
+        self.tree = {}
+
+    def add_word(self, word):
+        self.tree[word] = len(word)
+        for i in range(1, len(word)):
+            wfrag = word[:i]
+            self.tree[wfrag] = self.tree.get(wfrag, None)
+
+    def search(self, content):
+        result = []
+        length = len(content)
+        for start in range(length):
+            for end in range(start + 1, length + 1):
+                pos = self.tree.get(content[start:end], -1)
+                if pos == -1:
+                    break
+                if pos and (len(result) == 0 or end > result[-1][1]):
+                    result.append((start, end))
+        return result
+
+
+def build_words(num_words):
+    random.seed(num_words)
+    return [
+        "".join(random.choices(CHARS, k=random.randint(2, 8)))
+        for _ in range(num_words)
+    ]
+
+
+def build_text(words):
+    # Half dict words, half random chars.
+    random.seed(len(words))
+    pieces = []
+    while sum(len(piece) for piece in pieces) < args.text_len:
+        pieces.append(
+            random.choice(words)
+            if random.random() < 0.5 else "".join(random.choices(CHARS, k=4)))
+    return "".join(pieces)[:args.text_len]
+
+
+def measure(build):
+    tracemalloc.start()
+    start = time.time()
+    obj = build()
+    build_time = time.time() - start
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return obj, build_time, memory
+
+
+def build_trie(words):
+    trie = TriedTree()
+    for word in words:
+        trie.add_word(word)
+    return trie
+
+
+def timeit(fn, text):
+    start = time.time()
+    fn(text)
+    return time.time() - start
+
+
+def main():
+    print("%10s %-8s %12s %12s %12s %12s" % ("words", "impl", "memory (MB)",
+                                             "build (s)", "search (ms)",
+                                             "load (s)"))
+    for num_words in args.num_words:
+        words = build_words(num_words)
+        text = build_text(words)
+        trie, trie_build, trie_memory = measure(lambda: build_trie(words))
+        trie_search = timeit(trie.search, text)
+        del trie
+        ac, ac_build, ac_memory = measure(lambda: AhoCorasick(words))
+        ac_search = timeit(ac.search, text)
+        del ac
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            dict_path = os.path.join(tmp_dir, "user_dict.txt")
+            cache_path = os.path.join(tmp_dir, "user_dict.bin")
+            with open(dict_path, "w", encoding="utf-8") as f:
+                f.write("\n".join(words))
+            Customization().load_customization(
+                dict_path, cache_path=cache_path)
+            start = time.time()
+            Customization().load_customization(
+                dict_path, cache_path=cache_path)
+            load_time = time.time() - start
+
+        print("%10d %-8s %12.1f %12.2f %12.2f %12s" %
+              (num_words, "trie", trie_memory / 2**20, trie_build,
+               trie_search * 1000, "-"))
+        print("%10d %-8s %12.1f %12.2f %12.2f %12.2f" %
+              (num_words, "ac", ac_memory / 2**20, ac_build, ac_search * 1000,
+               load_time))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+# Copyright (c) 2022 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Compares the throughput and latency of concurrent single-text Taskflow calls
+with and without dynamic batching.
+
+Usage: python benchmark_dynamic_batching.py --task sentiment_analysis --num_threads 16
+"""
+
+import argparse
+import threading
+import time
+
+import numpy as np
+
+from paddlenlp import Taskflow
+
+# yapf: disable
+parser = argparse.ArgumentParser()
+parser.add_argument("--task", default="sentiment_analysis", choices=["sentiment_analysis", "ner", "information_extraction", "text_similarity"], help="The task to benchmark.")
+parser.add_argument("--num_threads", default=16, type=int, help="Number of concurrent callers.")
+parser.add_argument("--requests_per_thread", default=50, type=int, help="Number of requests sent by each caller.")
+parser.add_argument("--max_batch_size", default=32, type=int, help="Max number of inputs in a batch.")
+parser.add_argument("--max_wait_time", default=0.005, type=float, help="Max seconds to wait for a batch to fill.")
+parser.add_argument("--device_id", default=0, type=int, help="The device id, -1 for cpu.")
+args = parser.parse_args()
+# yapf: enable
+
+TEXTS = [
+    "这个产品用起来真的很流畅，我非常喜欢", "作为老的四星酒店，房间依然很整洁，相当不错。",
+    "2月8日上午北京冬奥会自由式滑雪女子大跳台决赛中中国选手谷爱凌以188.25分获得金牌！",
+    "《孤女》是2010年九州出版社出版的小说，作者是余兼羽。"
+]
+
+
+def make_input(i):
+    text = TEXTS[i % len(TEXTS)]
+    if args.task == "text_similarity":
+        return [[text, TEXTS[(i + 1) % len(TEXTS)]]]
+    return text
+
+
+def run(taskflow):
+    latencies = []
+    lock = threading.Lock()
+
+    def caller(tid):
+        for i in range(args.requests_per_thread):
+            start = time.time()
+            taskflow(make_input(tid + i))
+            with lock:
+                latencies.append(time.time() - start)
+
+    threads = [
+        threading.Thread(
+            target=caller, args=(i, )) for i in range(args.num_threads)
+    ]
+    start = time.time()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.time() - start
+    latencies = np.array(latencies) * 1000
+    return len(latencies) / elapsed, np.percentile(
+        latencies, 50), np.percentile(latencies, 99)
+
+
+def main():
+    kwargs = {"batch_size": args.max_batch_size, "device_id": args.device_id}
+    if args.task == "information_extraction":
+        kwargs["schema"] = ["时间", "选手", "赛事名称"]
+    taskflow = Taskflow(args.task, **kwargs)
+    # Warm up the predictor.
+    for i in range(len(TEXTS)):
+        taskflow(make_input(i))
+
+    # Without dynamic batching, the callers take turns to run the predictor.
+    lock = threading.Lock()
+
+    def locked_call(inputs):
+        with lock:
+            return taskflow(inputs)
+
+    print("%-20s %12s %10s %10s" % ("mode", "requests/s", "p50 ms", "p99 ms"))
+    print("%-20s %12.2f %10.2f %10.2f" % (("serial", ) + run(locked_call)))
+
+    taskflow.enable_dynamic_batching(
+        max_batch_size=args.max_batch_size, max_wait_time=args.max_wait_time)
+    print("%-20s %12.2f %10.2f %10.2f" % (("dynamic_batching", ) +
+                                          run(taskflow)))
+    batcher = taskflow._batcher
+    print("average requests per batch: %.2f" %
+          (batcher.num_requests / max(batcher.num_batches, 1)))
+    taskflow.disable_dynamic_batching()
+
+
+if __name__ == "__main__":
+    main()
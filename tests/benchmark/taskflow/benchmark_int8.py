@@ -0,0 +1,122 @@
+# Copyright (c) 2022 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Compares the latency of the float32 and the post-training quantized int8
+models of the information_extraction, sentiment_analysis and ner tasks on CPU,
+and how much the int8 results differ from the float32 ones. The first half of
+the texts is used for calibration, and the other half for evaluation.
+
+Usage: python benchmark_int8.py --tasks information_extraction sentiment_analysis ner --input_file texts.txt
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from paddlenlp import Taskflow
+
+# yapf: disable
+parser = argparse.ArgumentParser()
+parser.add_argument("--tasks", default=["information_extraction", "sentiment_analysis", "ner"], nargs="+", choices=["information_extraction", "sentiment_analysis", "ner"], help="The tasks to benchmark.")
+parser.add_argument("--input_file", default=None, type=str, help="The file of texts, one per line. Defaults to a few built-in texts.")
+parser.add_argument("--batch_size", default=16, type=int, help="The batch size of the tasks.")
+parser.add_argument("--cpu_threads", default=4, type=int, help="The number of math library threads.")
+parser.add_argument("--repeats", default=3, type=int, help="Number of timed runs.")
+args = parser.parse_args()
+# yapf: enable
+
+TEXTS = [
+    "2月8日上午北京冬奥会自由式滑雪女子大跳台决赛中中国选手谷爱凌以188.25分获得金牌！",
+    "这个产品用起来真的很流畅，我非常喜欢", "作为老的四星酒店，房间依然很整洁，相当不错。",
+    "《孤女》是2010年九州出版社出版的小说，作者是余兼羽。", "酒店的服务态度太差了，再也不会来了。",
+    "2022年7月，百度发布了新一代的文心大模型。", "屏幕很清晰，但是电池不太耐用，充电也慢。",
+    "北京时间3月3日，中国男篮在世预赛中以87比65战胜了哈萨克斯坦队。", "物流很快，包装也很用心，好评！",
+    "李白，字太白，号青莲居士，唐朝伟大的浪漫主义诗人。", "房间太小了，隔音效果也很差，晚上根本睡不好。",
+    "上海浦东发展银行于1993年1月9日在上海成立。", "这部电影的剧情太拖沓了，看得我都睡着了。",
+    "9月15日，苹果公司在加利福尼亚州库比蒂诺发布了新款手机。", "价格实惠，质量也不错，值得购买。",
+    "张伟出生于1985年，毕业于清华大学计算机系。"
+]
+
+SCHEMA = ["时间", "选手", "赛事名称", "人物", "组织机构", "地点"]
+
+
+def load_texts():
+    if args.input_file is None:
+        return TEXTS
+    with open(args.input_file, "r", encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def create_task(task, **kwargs):
+    kwargs.update(
+        device_id=-1, batch_size=args.batch_size, cpu_threads=args.cpu_threads)
+    if task == "information_extraction":
+        kwargs["schema"] = SCHEMA
+    return Taskflow(task, **kwargs)
+
+
+def timeit(taskflow, texts):
+    taskflow(texts)
+    start = time.time()
+    for _ in range(args.repeats):
+        results = taskflow(texts)
+    return (time.time() - start) / args.repeats, results
+
+
+def extraction_spans(result):
+    return {(key, span["text"], span["start"]): span["probability"]
+            for key, spans in result.items() for span in spans}
+
+
+def compare(task, fp32_results, int8_results):
+    # Returns the ratio of the texts with the same results, and the mean
+    # absolute difference of the scores of the same labels or spans.
+    same, diffs = 0, []
+    for fp32_result, int8_result in zip(fp32_results, int8_results):
+        if task == "sentiment_analysis":
+            same += fp32_result["label"] == int8_result["label"]
+            diffs.append(abs(fp32_result["score"] - int8_result["score"]))
+        elif task == "information_extraction":
+            fp32_spans = extraction_spans(fp32_result)
+            int8_spans = extraction_spans(int8_result)
+            same += fp32_spans.keys() == int8_spans.keys()
+            diffs.extend(
+                abs(prob - int8_spans[span])
+                for span, prob in fp32_spans.items() if span in int8_spans)
+        else:
+            same += fp32_result == int8_result
+    return same / max(len(fp32_results), 1), np.mean(diffs) if diffs else 0.0
+
+
+def main():
+    texts = load_texts()
+    calibration_texts = texts[:len(texts) // 2]
+    eval_texts = texts[len(texts) // 2:]
+    print("%-24s %12s %12s %8s %10s %12s" % ("task", "fp32 (ms)", "int8 (ms)",
+                                              "speedup", "same (%)",
+                                              "score diff"))
+    for task in args.tasks:
+        fp32_time, fp32_results = timeit(create_task(task), eval_texts)
+        int8_taskflow = create_task(
+            task, precision="int8", calibration_data=calibration_texts)
+        int8_time, int8_results = timeit(int8_taskflow, eval_texts)
+        same, diff = compare(task, fp32_results, int8_results)
+        print("%-24s %12.2f %12.2f %8.2f %10.2f %12.4f" %
+              (task, fp32_time * 1000, int8_time * 1000, fp32_time / int8_time,
+               same * 100, diff))
+
+
+if __name__ == "__main__":
+    main()
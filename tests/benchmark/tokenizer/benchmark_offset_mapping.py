@@ -0,0 +1,113 @@
+# Copyright (c) 2022 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Compares the time of `get_offset_mapping` on long documents with the previous
+implementation, which built the normalized text by concatenating the
+characters one by one and sliced the text to locate each token, and checks
+that both return the same offsets.
+
+Usage: python benchmark_offset_mapping.py --model_name ernie-3.0-medium-zh
+"""
+
+import argparse
+import random
+import time
+import unicodedata
+
+from paddlenlp.transformers import AutoTokenizer
+from paddlenlp.transformers.tokenizer_utils import _is_control
+
+# yapf: disable
+parser = argparse.ArgumentParser()
+parser.add_argument("--model_name", default="ernie-3.0-medium-zh", type=str, help="Name of the tokenizer to benchmark.")
+parser.add_argument("--num_chars", default=[1000, 10000, 100000], type=int, nargs="+", help="Lengths of the documents.")
+parser.add_argument("--repeats", default=3, type=int, help="Number of timed runs.")
+args = parser.parse_args()
+# yapf: enable
+
+
+def previous_get_offset_mapping(self, text):
+    split_tokens = []
+    for token in self.basic_tokenizer.tokenize(text):
+        for sub_token in self.wordpiece_tokenizer.tokenize(token):
+            split_tokens.append(sub_token
+                                if sub_token != self.unk_token else token)
+
+    normalized_text, char_mapping = '', []
+
+    for i, ch in enumerate(text):
+        if self.do_lower_case:
+            ch = ch.lower()
+            ch = unicodedata.normalize('NFD', ch)
+            ch = ''.join([c for c in ch if unicodedata.category(c) != 'Mn'])
+
+        ch = ''.join([
+            c for c in ch
+            if not (ord(c) == 0 or ord(c) == 0xfffd or _is_control(c))
+        ])
+        normalized_text += ch
+
+        char_mapping.extend([i] * len(ch))
+    text, token_mapping, offset = normalized_text, [], 0
+
+    for token in split_tokens:
+        if token[:2] == '##':
+            token = token[2:]
+        start = text[offset:].index(token) + offset
+        end = start + len(token)
+        token_mapping.append((char_mapping[start], char_mapping[end - 1] + 1))
+        offset = end
+
+    return token_mapping
+
+
+def build_document(num_chars):
+    # Mixed Chinese and English text, like the documents of UIE.
+    random.seed(num_chars)
+    pieces = [
+        "百度是一家高科技公司。", "PaddleNLP supports UIE, ", "2022年7月，",
+        "Information Extraction! ", "中华人民共和国", " Café résumé "
+    ]
+    text = ""
+    while len(text) < num_chars:
+        text += random.choice(pieces)
+    return text[:num_chars]
+
+
+def timeit(fn, text):
+    fn(text)
+    start = time.time()
+    for _ in range(args.repeats):
+        fn(text)
+    return (time.time() - start) / args.repeats
+
+
+def main():
+    tokenizer = AutoTokenizer.from_pretrained(args.model_name)
+    print("%10s %14s %14s %8s %6s" %
+          ("chars", "previous (ms)", "current (ms)", "speedup", "same"))
+    for num_chars in args.num_chars:
+        text = build_document(num_chars)
+        previous = timeit(lambda t: previous_get_offset_mapping(tokenizer, t),
+                          text)
+        current = timeit(tokenizer.get_offset_mapping, text)
+        same = previous_get_offset_mapping(
+            tokenizer, text) == tokenizer.get_offset_mapping(text)
+        print("%10d %14.2f %14.2f %8.2f %6s" % (num_chars, previous * 1000,
+                                                 current * 1000,
+                                                 previous / current, same))
+
+
+if __name__ == "__main__":
+    main()
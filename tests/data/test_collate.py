@@ -14,7 +14,7 @@
 
 import numpy as np
 
-from paddlenlp.data import Stack, Pad, Tuple, Dict
+from paddlenlp.data import Stack, Pad, Tuple, Dict, BufferPool
 from common_test import CpuCommonTest
 import util
 import unittest
@@ -64,6 +64,69 @@ class TestPadRetLength(CpuCommonTest):
         self.check_output_equal(length, np.array([4, 3, 2]))
 
 
+class TestPadNdarray(CpuCommonTest):
+    def setUp(self):
+        self.input = [
+            np.array([1, 2, 3, 4], dtype="int32"),
+            np.array([4, 5, 6], dtype="int32"),
+            np.array([8, 9], dtype="int32")
+        ]
+        self.expected_result = np.array(
+            [[1, 2, 3, 4], [4, 5, 6, 0], [8, 9, 0, 0]], dtype="int32")
+
+    def test_pad(self):
+        result = Pad()(self.input)
+        self.assertEqual(result.dtype, self.expected_result.dtype)
+        self.check_output_equal(self.expected_result, result)
+
+
+class TestPadDtype(CpuCommonTest):
+    def setUp(self):
+        self.input = [[1, 2, 3, 4], [4, 5, 6], [8, 9]]
+        self.expected_result = np.array(
+            [[1, 2, 3, 4], [-1, 4, 5, 6], [-1, -1, 8, 9]], dtype="float32")
+
+    def test_pad(self):
+        result = Pad(pad_val=-1, pad_right=False, dtype="float32")(self.input)
+        self.assertEqual(result.dtype, self.expected_result.dtype)
+        self.check_output_equal(self.expected_result, result)
+
+
+class TestPadBufferPool(CpuCommonTest):
+    def setUp(self):
+        self.input = [[1, 2, 3, 4], [4, 5, 6], [8, 9]]
+        self.expected_result = np.array(
+            [[1, 2, 3, 4], [4, 5, 6, 0], [8, 9, 0, 0]])
+
+    def test_pad(self):
+        pool = BufferPool(max_size=1)
+        pad = Pad(buffer_pool=pool)
+        result = pad(self.input)
+        self.check_output_equal(self.expected_result, result)
+        # Same shape reuses the cached buffer with stale values cleared.
+        result_reused = pad([[7], [8, 9, 1, 2], [3, 4]])
+        self.assertTrue(result_reused is result)
+        self.check_output_equal(
+            np.array([[7, 0, 0, 0], [8, 9, 1, 2], [3, 4, 0, 0]]),
+            result_reused)
+        # Different shape evicts the least recently used buffer.
+        pad([[1, 2]])
+        self.assertEqual(len(pool), 1)
+
+    def test_shared_pool(self):
+        pool = BufferPool()
+        batchify_fn = Tuple(
+            Pad(buffer_pool=pool), Pad(buffer_pool=pool, pad_val=9))
+        for _ in range(2):
+            result = batchify_fn([(sample, sample) for sample in self.input])
+            self.assertTrue(result[0] is not result[1])
+            self.check_output_equal(self.expected_result, result[0])
+            self.check_output_equal(
+                np.array([[1, 2, 3, 4], [4, 5, 6, 9], [8, 9, 9, 9]]),
+                result[1])
+        self.assertEqual(len(pool), 2)
+
+
 class TestTuple(CpuCommonTest):
     def setUp(self):
         self.input = [[[1, 2, 3, 4], [1, 2, 3, 4]], [[4, 5, 6, 8], [4, 5, 6]],
@@ -0,0 +1,82 @@
+# Copyright (c) 2022 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import pickle
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+from paddlenlp.data import (BlendableDataset, MMapIndexedDataset,
+                            MMapIndexedDatasetBuilder, PackedSequenceDataset)
+
+from common_test import CpuCommonTest
+
+
+class TestMMapIndexedDataset(CpuCommonTest):
+    def setUp(self):
+        self.data_dir = tempfile.mkdtemp()
+        self.prefix = os.path.join(self.data_dir, "corpus")
+        self.docs = [[[1, 2, 3], [4, 5]], [[6]], [[7, 8, 9, 10]]]
+        builder = MMapIndexedDatasetBuilder(self.prefix, dtype=np.uint16)
+        for doc in self.docs:
+            builder.add_document(doc)
+        builder.finalize()
+
+    def tearDown(self):
+        shutil.rmtree(self.data_dir)
+
+    def test_read(self):
+        ds = MMapIndexedDataset(self.prefix)
+        sentences = [s for doc in self.docs for s in doc]
+        self.check_output_equal(len(ds), len(sentences))
+        for i, sentence in enumerate(sentences):
+            self.check_output_equal(np.array(ds[i]), np.array(sentence))
+        self.check_output_equal(np.array(ds.doc_idx), np.array([0, 2, 3, 4]))
+        self.check_output_equal(np.array(ds.get(3, 1, 2)), np.array([8, 9]))
+        self.check_output_equal(len(ds[1:4]), 3)
+        ds = pickle.loads(pickle.dumps(ds))
+        self.check_output_equal(np.array(ds[3]), np.array([7, 8, 9, 10]))
+
+    def test_packed_sequence(self):
+        ds = MMapIndexedDataset(self.prefix)
+        packed = PackedSequenceDataset(ds, num_samples=4, seq_length=3)
+        # 10 tokens are repeated over 2 epochs to get 4 samples.
+        self.check_output_equal(len(packed), (2 * 10 - 1) // 3)
+        for i in range(len(packed)):
+            sample = packed[i]
+            self.check_output_equal(sample["input_ids"].shape[0], 3)
+            self.check_output_equal(sample["input_ids"][1:],
+                                    sample["labels"][:-1])
+        # The index mappings are cached and reused.
+        cached = PackedSequenceDataset(ds, num_samples=4, seq_length=3)
+        for i in range(len(packed)):
+            self.check_output_equal(packed[i]["input_ids"],
+                                    cached[i]["input_ids"])
+
+
+class TestBlendableDataset(CpuCommonTest):
+    def test_weights(self):
+        ds = BlendableDataset(
+            [list(range(10)), list(range(100, 105))], [2, 1], size=12)
+        samples = [ds[i] for i in range(len(ds))]
+        self.check_output_equal(sum(s >= 100 for s in samples), 4)
+        # Samples of each dataset are spread evenly.
+        self.check_output_equal(sum(s >= 100 for s in samples[:6]), 2)
+        self.assertEqual(samples[:3], [0, 100, 1])
+
+
+if __name__ == "__main__":
+    unittest.main()
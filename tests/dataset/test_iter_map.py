@@ -0,0 +1,83 @@
+# Copyright (c) 2022 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+
+from paddlenlp.datasets import IterDataset
+
+from common_test import CpuCommonTest
+
+
+def read_examples():
+    for i in range(100):
+        yield {'text': 'sample %d' % i, 'label': i % 2}
+
+
+def convert_example(example):
+    return {'input_ids': [ord(c) for c in example['text']]}
+
+
+def convert_batch(examples):
+    return [convert_example(example) for example in examples]
+
+
+def convert_batch_error(examples):
+    raise ValueError("invalid example")
+
+
+class TestIterDatasetMap(CpuCommonTest):
+    def setUp(self):
+        self.expected = [convert_example(e) for e in read_examples()]
+
+    def test_map(self):
+        ds = IterDataset(read_examples).map(convert_example)
+        self.assertEqual(list(iter(ds)), self.expected)
+
+    def test_map_parallel(self):
+        ds = IterDataset(read_examples).map(
+            convert_example, num_workers=2, batch_size=8, max_in_flight=2)
+        self.assertEqual(list(iter(ds)), self.expected)
+        # Iterating again restarts the stream.
+        self.assertEqual(list(iter(ds)), self.expected)
+
+    def test_map_batched_unordered(self):
+        ds = IterDataset(read_examples).map(
+            convert_batch,
+            batched=True,
+            num_workers=2,
+            batch_size=16,
+            ordered=False)
+        result = sorted(iter(ds), key=lambda e: e['input_ids'])
+        self.assertEqual(
+            result, sorted(
+                self.expected, key=lambda e: e['input_ids']))
+
+    def test_map_batched_unordered_error(self):
+        ds = IterDataset(read_examples).map(
+            convert_batch_error,
+            batched=True,
+            num_workers=2,
+            batch_size=16,
+            ordered=False)
+        with self.assertRaises(ValueError):
+            list(iter(ds))
+
+    def test_map_after_filter(self):
+        ds = IterDataset(read_examples).filter(lambda e: e['label'] == 0).map(
+            convert_example, num_workers=2)
+        self.assertEqual(list(iter(ds)), self.expected[::2])
+
+
+if __name__ == "__main__":
+    unittest.main()
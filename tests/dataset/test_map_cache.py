@@ -0,0 +1,103 @@
+# Copyright (c) 2022 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import pickle
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+from paddlenlp.datasets import MapDataset, MMapFeatures
+
+from common_test import CpuCommonTest
+
+
+def convert_example(example):
+    return {
+        'input_ids': [ord(c) for c in example['text']],
+        'label': example['label'],
+        'text': example['text']
+    }
+
+
+def select_scores(example):
+    return {'scores': example['scores']}
+
+
+class TestMapCache(CpuCommonTest):
+    def setUp(self):
+        self.examples = [{
+            'text': 'sample %d' % i,
+            'label': i % 2
+        } for i in range(10)]
+        self.cache_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir)
+
+    def check_dataset(self, ds):
+        self.assertTrue(isinstance(ds.new_data, MMapFeatures))
+        self.check_output_equal(len(ds), len(self.examples))
+        for example, feature in zip(self.examples, ds):
+            expected = convert_example(example)
+            self.check_output_equal(
+                np.array(expected['input_ids']), feature['input_ids'])
+            self.check_output_equal(expected['label'], feature['label'])
+            self.check_output_equal(expected['text'], feature['text'])
+
+    def test_map_cache(self):
+        ds = MapDataset(self.examples).map(convert_example,
+                                           cache_dir=self.cache_dir)
+        self.check_dataset(ds)
+        self.check_output_equal(len(os.listdir(self.cache_dir)), 1)
+
+        # The same data and transform reuse the cached features.
+        ds_reused = MapDataset(self.examples).map(
+            convert_example, cache_dir=self.cache_dir)
+        self.check_output_equal(ds.fingerprint, ds_reused.fingerprint)
+        self.check_output_equal(len(os.listdir(self.cache_dir)), 1)
+
+        # Features are pickled by path for DataLoader workers.
+        self.check_dataset(pickle.loads(pickle.dumps(ds_reused)))
+
+    def test_map_cache_multiprocess(self):
+        ds = MapDataset(self.examples).map(
+            convert_example, num_workers=2, cache_dir=self.cache_dir)
+        self.check_dataset(ds)
+
+    def test_fingerprint_changes(self):
+        ds = MapDataset(self.examples).map(convert_example,
+                                           cache_dir=self.cache_dir)
+        ds_filtered = MapDataset(self.examples).filter(
+            lambda example: example['label'] == 0)
+        ds_filtered.map(convert_example, cache_dir=self.cache_dir)
+        self.assertNotEqual(ds.fingerprint, ds_filtered.fingerprint)
+        self.check_output_equal(len(ds_filtered), 5)
+        self.check_output_equal(len(os.listdir(self.cache_dir)), 2)
+
+    def test_map_cache_mixed_sequences(self):
+        for scores in [[[1, 0], [0.25, 0.75], [2]],
+                       [[], [0.25, 0.75], [1, 0.5]]]:
+            examples = [{'scores': s} for s in scores]
+            ds = MapDataset(examples).map(select_scores,
+                                          cache_dir=self.cache_dir)
+            self.assertTrue(isinstance(ds.new_data, MMapFeatures))
+            for expected, feature in zip(scores, ds):
+                np.testing.assert_array_equal(feature['scores'],
+                                              np.array(expected, 'float64'))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,178 @@
+# Copyright (c) 2022 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import io
+import os
+import random
+import tempfile
+import unittest
+
+import numpy as np
+
+from paddlenlp.taskflow.utils import (AhoCorasick, Customization,
+                                      get_customization)
+
+from common_test import CpuCommonTest
+
+
+def brute_force_search(words, text):
+    # Leftmost-longest matching by trying every substring.
+    word_ids = {word: i for i, word in enumerate(words) if word}
+    result = []
+    start = 0
+    while start < len(text):
+        ends = [
+            end for end in range(start + 1, len(text) + 1)
+            if text[start:end] in word_ids
+        ]
+        if ends:
+            result.append((start, ends[-1], word_ids[text[start:ends[-1]]]))
+            start = ends[-1]
+        else:
+            start += 1
+    return result
+
+
+class TestAhoCorasick(CpuCommonTest):
+    def test_nested(self):
+        ac = AhoCorasick(["中国", "中国人", "国人", "人民"])
+        self.assertEqual(ac.search("中国人民"), [(0, 3, 1)])
+        self.assertEqual(ac.search("我是中国的"), [(2, 4, 0)])
+        self.assertEqual(ac.search("国人民"), [(0, 2, 2)])
+
+    def test_overlapping(self):
+        ac = AhoCorasick(["abc", "bcd"])
+        self.assertEqual(ac.search("abcd"), [(0, 3, 0)])
+        self.assertEqual(ac.search("xbcd"), [(1, 4, 1)])
+
+    def test_failure_links(self):
+        ac = AhoCorasick(["he", "she", "his", "hers"])
+        self.assertEqual(ac.search("ushers"), [(1, 4, 1)])
+        self.assertEqual(ac.search("ahishers"), [(1, 4, 2), (4, 8, 3)])
+
+    def test_duplicate_words(self):
+        # The id of a repeated word is its last index.
+        ac = AhoCorasick(["ab", "cd", "ab"])
+        self.assertEqual(ac.search("abcd"), [(0, 2, 2), (2, 4, 1)])
+
+    def test_empty(self):
+        self.assertEqual(AhoCorasick().search("abc"), [])
+        self.assertEqual(AhoCorasick(["", "a"]).search(""), [])
+        self.assertEqual(AhoCorasick(["", "a"]).search("bab"), [(1, 2, 1)])
+
+    def test_random(self):
+        rng = random.Random(0)
+        for _ in range(20):
+            words = [
+                "".join(rng.choices("abc", k=rng.randint(1, 4)))
+                for _ in range(rng.randint(1, 15))
+            ]
+            text = "".join(rng.choices("abcd", k=50))
+            self.assertEqual(
+                AhoCorasick(words).search(text),
+                brute_force_search(words, text))
+
+    def test_numpy(self):
+        words = ["he", "she", "his", "hers", "中国"]
+        ac = AhoCorasick(words)
+        f = io.BytesIO()
+        np.savez(f, **ac.to_numpy())
+        f.seek(0)
+        with np.load(f) as data:
+            restored = AhoCorasick.from_numpy(data)
+        for text in ["ushers", "ahishers", "中国he"]:
+            self.assertEqual(restored.search(text), ac.search(text))
+
+
+class TestCustomization(CpuCommonTest):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.dict_path = os.path.join(self.tmp_dir.name, "user_dict.txt")
+        self.cache_path = os.path.join(self.tmp_dir.name, "user_dict.npz")
+        self.write_dict(["的花", "花开/v 秋天/n"])
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def write_dict(self, lines, mtime=None):
+        with open(self.dict_path, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+        if mtime is not None:
+            os.utime(self.dict_path, (mtime, mtime))
+
+    def parse(self, custom, query, lac_tags, prefix=False):
+        lac_tags = list(lac_tags)
+        custom.parse_customization(query, lac_tags, prefix=prefix)
+        return lac_tags
+
+    def assert_parse(self, custom):
+        # A phrase without tags merges the chars into one word, keeping
+        # their tags.
+        self.assertEqual(
+            self.parse(custom, "春天的花", ["TIME-B", "TIME-I", "u-B", "n-B"]),
+            ["TIME-B", "TIME-I", "u-B", "n-I"])
+        # The segments of a phrase take their tags.
+        self.assertEqual(
+            self.parse(custom, "花开秋天", ["n-B", "n-I", "TIME-B", "TIME-I"]),
+            ["v-B", "v-I", "n-B", "n-I"])
+        self.assertEqual(
+            self.parse(
+                custom,
+                "花开秋天", ["B-n", "I-n", "B-TIME", "I-TIME"],
+                prefix=True), ["B-v", "I-v", "B-n", "I-n"])
+
+    def test_parse(self):
+        custom = Customization()
+        custom.load_customization(self.dict_path)
+        self.assert_parse(custom)
+
+    def test_cache(self):
+        custom = Customization()
+        custom.load_customization(self.dict_path, cache_path=self.cache_path)
+        self.assertTrue(os.path.isfile(self.cache_path))
+        self.assertFalse(os.path.exists(self.cache_path + ".tmp"))
+
+        # The cache is loaded, even without the vocab.
+        os.remove(self.dict_path)
+        cached = Customization()
+        cached.load_customization(self.dict_path, cache_path=self.cache_path)
+        self.assertEqual(cached.tag_names, custom.tag_names)
+        self.assertEqual(cached.item_begin, custom.item_begin)
+        self.assertEqual(cached.item_tags, custom.item_tags)
+        self.assertEqual(cached.item_offsets, custom.item_offsets)
+        self.assert_parse(cached)
+
+    def test_stale_cache(self):
+        custom = Customization()
+        custom.load_customization(self.dict_path, cache_path=self.cache_path)
+        cache_mtime = os.path.getmtime(self.cache_path)
+        # The vocab modified after the cache was saved is parsed again.
+        self.write_dict(["春天/n"], mtime=cache_mtime + 10)
+        custom = Customization()
+        custom.load_customization(self.dict_path, cache_path=self.cache_path)
+        self.assertEqual(
+            self.parse(custom, "春天的花", ["TIME-B", "TIME-I", "u-B", "n-B"]),
+            ["n-B", "n-I", "u-B", "n-B"])
+        self.assertGreater(os.path.getmtime(self.cache_path), cache_mtime)
+
+    def test_get_customization(self):
+        custom = get_customization(self.dict_path)
+        self.assertIs(get_customization(self.dict_path), custom)
+        self.write_dict(
+            ["春天/n"], mtime=os.path.getmtime(self.dict_path) + 10)
+        self.assertIsNot(get_customization(self.dict_path), custom)
+
+
+if __name__ == "__main__":
+    unittest.main()
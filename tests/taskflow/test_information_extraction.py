@@ -0,0 +1,126 @@
+# Copyright (c) 2022 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from paddlenlp.taskflow.information_extraction import UIETask
+from paddlenlp.taskflow.task import Task
+from paddlenlp.transformers import ErnieTokenizer
+
+from common_test import CpuCommonTest
+
+TEXTS = [
+    "2月8日上午北京冬奥会自由式滑雪女子大跳台决赛中中国选手谷爱凌以188.25分获得金牌",
+    "北京冬奥会",
+    "谷爱凌获得金牌" * 30,
+    "上午决赛",
+]
+PROMPTS = ["时间", "选手", "赛事名称"]
+
+
+class Handle(object):
+    def __init__(self):
+        self.data = None
+
+    def copy_from_cpu(self, data):
+        self.data = data
+
+    def copy_to_cpu(self):
+        return self.data
+
+
+class StandInPredictor(object):
+    # Gives each token a start and an end probability from its id and
+    # position only, and 0 to the paddings, like a model respecting the
+    # attention mask. Records the shapes of the batches.
+    def __init__(self):
+        self.input_handles = [Handle() for _ in range(4)]
+        self.output_handle = [Handle(), Handle()]
+        self.shapes = []
+
+    def run(self):
+        input_ids, token_type_ids, pos_ids, att_mask = [
+            handle.data for handle in self.input_handles
+        ]
+        self.shapes.append(input_ids.shape)
+        text = token_type_ids == 1
+        start_prob = np.where((input_ids + pos_ids) % 5 == 0, 0.9, 0.1)
+        end_prob = np.where((input_ids * 3 + pos_ids) % 4 == 0, 0.8, 0.2)
+        self.output_handle[0].data = (start_prob * text * att_mask).astype(
+            "float32")
+        self.output_handle[1].data = (end_prob * text * att_mask).astype(
+            "float32")
+
+
+class StandInUIETask(UIETask):
+    # UIE with a small vocab and the stand-in predictor, without the model
+    # files.
+    def __init__(self, vocab_file, **kwargs):
+        Task.__init__(self, task="information_extraction", model="uie-base",
+                      **kwargs)
+        self._tokenizer = ErnieTokenizer(vocab_file)
+        self._max_seq_len = self.kwargs['max_seq_len']
+        self._batch_size = self.kwargs['batch_size']
+        self._split_sentence = False
+        self._position_prob = 0.5
+        predictor = StandInPredictor()
+        self.predictor = predictor
+        self.input_handles = predictor.input_handles
+        self.output_handle = predictor.output_handle
+
+
+class TestUIESeqLenBuckets(CpuCommonTest):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.vocab_file = os.path.join(self.tmp_dir.name, "vocab.txt")
+        chars = sorted(set("".join(TEXTS + PROMPTS)))
+        with open(self.vocab_file, "w", encoding="utf-8") as f:
+            f.write("\n".join(["[PAD]", "[CLS]", "[SEP]", "[UNK]", "[MASK]"] +
+                              chars))
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def predict(self, seq_len_buckets):
+        task = StandInUIETask(
+            self.vocab_file,
+            max_seq_len=128,
+            batch_size=4,
+            seq_len_buckets=seq_len_buckets)
+        inputs_list = [[{
+            "text": text,
+            "prompt": prompt
+        } for text in TEXTS] for prompt in PROMPTS]
+        return task._single_stage_predict(inputs_list), task.predictor.shapes
+
+    def test_same_results(self):
+        # The single bucket of `max_seq_len` pads every input to it, as before
+        # the buckets.
+        expected, full_shapes = self.predict([128])
+        results, shapes = self.predict([16, 32, 64])
+        self.assertEqual(results, expected)
+        self.assertTrue(any(any(result) for result in results))
+        self.assertEqual(set(shape[1] for shape in full_shapes), {128})
+        self.assertEqual(set(shape[1] for shape in shapes), {16, 64, 128})
+        self.assertLess(
+            sum(np.prod(shape) for shape in shapes),
+            sum(np.prod(shape) for shape in full_shapes))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,467 @@
+# Copyright (c) 2022 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import tempfile
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from paddlenlp.taskflow.task import (Task, _RecordingInputHandle,
+                                     _RecordingPredictor)
+from paddlenlp.taskflow.pos_tagging import POSTaggingTask
+from paddlenlp.taskflow.word_segmentation import SegJiebaTask, SegLACTask
+
+from common_test import CpuCommonTest
+
+
+class WordTagTask(Task):
+    # Tags the words split by spaces, and returns the result of a single
+    # input without the list, like the pos_tagging task.
+    _squeeze_single_result = True
+
+    def __init__(self, **kwargs):
+        super().__init__(model="dummy", task="dummy", **kwargs)
+        self.num_runs = 0
+
+    def _construct_model(self, model):
+        pass
+
+    def _construct_tokenizer(self, model):
+        pass
+
+    def _construct_input_spec(self):
+        pass
+
+    def _preprocess(self, inputs):
+        # Skips the empty texts, like most tasks.
+        return [text for text in self._check_input_text(inputs) if text]
+
+    def _run_model(self, inputs):
+        self.num_runs += 1
+        return [[(word, "n") for word in text.split()] for text in inputs]
+
+    def _postprocess(self, inputs):
+        return inputs if len(inputs) > 1 else inputs[0]
+
+
+class TestTaskResultCache(CpuCommonTest):
+    def setUp(self):
+        self.task = WordTagTask()
+        self.task.enable_result_cache()
+
+    def test_squeeze_single_result(self):
+        for task_class in [POSTaggingTask, SegJiebaTask, SegLACTask]:
+            self.assertTrue(task_class._squeeze_single_result)
+
+    def test_single_text(self):
+        self.assertEqual(self.task(("你好 世界", )), [("你好", "n"), ("世界", "n")])
+        self.assertEqual(self.task(("你好 世界", )), [("你好", "n"), ("世界", "n")])
+        self.assertEqual(self.task.num_runs, 1)
+
+    def test_single_word(self):
+        self.assertEqual(self.task(("你好", )), [("你好", "n")])
+        self.assertEqual(
+            self.task((["你好", "世界 和平"], )),
+            [[("你好", "n")], [("世界", "n"), ("和平", "n")]])
+        self.assertEqual(self.task(("你好", )), [("你好", "n")])
+        self.assertEqual(self.task.num_runs, 2)
+
+    def test_user_dict_hashed_when_loaded(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            user_dict = os.path.join(tmp_dir, "user_dict.txt")
+            with open(user_dict, "w", encoding="utf-8") as f:
+                f.write("你好\n")
+            self.task._user_dict = user_dict
+            self.task._hash_user_dict()
+            config = self.task._get_cache_config()
+            with open(user_dict, "w", encoding="utf-8") as f:
+                f.write("世界\n")
+            self.assertEqual(self.task._get_cache_config(), config)
+
+
+class TestTaskStream(CpuCommonTest):
+    def setUp(self):
+        self.task = WordTagTask()
+        self.texts = ["你好", "世界 和平", "你好 世界"]
+        self.expected = [[("你好", "n")], [("世界", "n"), ("和平", "n")],
+                         [("你好", "n"), ("世界", "n")]]
+
+    def test_stream(self):
+        for chunk_size in [1, 2, 3]:
+            results = list(
+                self.task.stream(
+                    (iter(self.texts), ), chunk_size=chunk_size))
+            self.assertEqual(results, self.expected)
+
+    def test_stream_skipped_inputs(self):
+        with self.assertRaises(ValueError):
+            list(self.task.stream((["你好", "", "世界"], ), chunk_size=3))
+
+
+class LengthTask(Task):
+    # Runs a stand-in predictor, which returns the length and the first id of
+    # each padded input, on the batches of `_get_length_sorted_batches`.
+    def __init__(self, batch_size=2, **kwargs):
+        super().__init__(model="dummy", task="dummy", **kwargs)
+        self.batch_size = batch_size
+        self.batch_shapes = []
+
+    def _construct_model(self, model):
+        pass
+
+    def _construct_tokenizer(self, model):
+        pass
+
+    def _construct_input_spec(self):
+        pass
+
+    def _predict(self, ids):
+        self.batch_shapes.append(ids.shape)
+        return (ids != 0).sum(axis=1).tolist(), ids[:, 0].tolist()
+
+    def _preprocess(self, inputs):
+        examples = [[ord(char) for char in text]
+                    for text in self._check_input_text(inputs)]
+        batch_indices = self._get_length_sorted_batches(
+            [len(ids) for ids in examples], self.batch_size)
+        return {"examples": examples, "batch_indices": batch_indices}
+
+    def _run_model(self, inputs):
+        lengths, first_ids = [], []
+        for indices in inputs["batch_indices"]:
+            batch = [inputs["examples"][i] for i in indices]
+            ids = np.zeros(
+                [len(batch), max(len(ids) for ids in batch)], dtype="int64")
+            for i, example in enumerate(batch):
+                ids[i, :len(example)] = example
+            batch_lengths, batch_first_ids = self._predict(ids)
+            lengths.extend(batch_lengths)
+            first_ids.extend(batch_first_ids)
+        inputs["lengths"] = lengths
+        inputs["first_ids"] = first_ids
+        return inputs
+
+    def _postprocess(self, inputs):
+        return list(
+            zip(
+                self._restore_order(inputs["lengths"],
+                                    inputs["batch_indices"]),
+                self._restore_order(inputs["first_ids"],
+                                    inputs["batch_indices"])))
+
+
+class TestLengthSortedBatches(CpuCommonTest):
+    def setUp(self):
+        self.lengths = [5, 1, 8, 2, 5, 3]
+        self.texts = ["abcde", "b", "cdefghij", "de", "efghi", "fgh"]
+
+    def test_batch_size(self):
+        task = LengthTask()
+        self.assertEqual(
+            task._get_length_sorted_batches(self.lengths, 2),
+            [[1, 3], [5, 0], [4, 2]])
+        self.assertEqual(
+            task._get_length_sorted_batches(self.lengths, 4),
+            [[1, 3, 5, 0], [4, 2]])
+        self.assertEqual(task._get_length_sorted_batches([], 2), [])
+
+    def test_max_batch_tokens(self):
+        task = LengthTask(max_batch_tokens=10)
+        batches = task._get_length_sorted_batches(self.lengths, 4)
+        self.assertEqual(batches, [[1, 3, 5], [0, 4], [2]])
+        for batch in batches:
+            self.assertLessEqual(
+                max(self.lengths[i] for i in batch) * len(batch), 10)
+        # An input longer than `max_batch_tokens` gets its own batch.
+        task = LengthTask(max_batch_tokens=4)
+        self.assertEqual(
+            task._get_length_sorted_batches([5, 2, 1], 4), [[2, 1], [0]])
+
+    def test_no_sort(self):
+        task = LengthTask(sort_by_length=False)
+        self.assertEqual(
+            task._get_length_sorted_batches(self.lengths, 4),
+            [[0, 1, 2, 3], [4, 5]])
+        task = LengthTask(sort_by_length=False, max_batch_tokens=10)
+        self.assertEqual(
+            task._get_length_sorted_batches(self.lengths, 4),
+            [[0, 1], [2], [3, 4], [5]])
+
+    def test_restore_order(self):
+        task = LengthTask()
+        self.assertEqual(
+            task._restore_order(["b", "d", "a", "c"], [[1, 3], [0, 2]]),
+            ["a", "b", "c", "d"])
+        self.assertEqual(task._restore_order(["a", "b"], None), ["a", "b"])
+
+    def test_predict(self):
+        expected = [(len(text), ord(text[0])) for text in self.texts]
+        sorted_task = LengthTask()
+        self.assertEqual(sorted_task((self.texts, )), expected)
+        unsorted_task = LengthTask(sort_by_length=False)
+        self.assertEqual(unsorted_task((self.texts, )), expected)
+        # Sorting reduces the padded tokens.
+        self.assertEqual(sorted_task.batch_shapes, [(2, 2), (2, 5), (2, 8)])
+        self.assertLess(
+            sum(np.prod(shape) for shape in sorted_task.batch_shapes),
+            sum(np.prod(shape) for shape in unsorted_task.batch_shapes))
+
+
+class TestBatchifyBySeqLen(CpuCommonTest):
+    def setUp(self):
+        self.seq_lens = [10, 40, 16, 17, 100, 128, 5]
+
+    def test_buckets(self):
+        task = LengthTask(seq_len_buckets=[64, 16, 32, 16, 512])
+        self.assertEqual(task._get_seq_len_buckets(128), [16, 32, 64, 128])
+        # Each input goes to the shortest bucket which fits it, and the
+        # inputs longer than the largest bucket to `max_seq_len`.
+        self.assertEqual(
+            task._batchify_by_seq_len(self.seq_lens, 2, 128), [
+                ([0, 2], 16), ([6], 16), ([3], 32), ([1], 64), ([4, 5], 128)
+            ])
+
+    def test_overflow_bucket(self):
+        task = LengthTask(seq_len_buckets=[16, 256])
+        self.assertEqual(task._get_seq_len_buckets(128), [16, 128])
+        self.assertEqual(
+            task._batchify_by_seq_len([20, 8, 128], 4, 128),
+            [([1], 16), ([0, 2], 128)])
+
+    def test_no_buckets(self):
+        task = LengthTask()
+        self.assertEqual(task._get_seq_len_buckets(128), [128])
+        # The batches follow the order of the inputs, padded to their longest
+        # inputs.
+        self.assertEqual(
+            task._batchify_by_seq_len(self.seq_lens, 3, 128),
+            [([0, 1, 2], 40), ([3, 4, 5], 128), ([6], 5)])
+
+
+class Handle(object):
+    def __init__(self):
+        self.data = None
+
+    def copy_from_cpu(self, data):
+        self.data = data
+
+    def copy_to_cpu(self):
+        return self.data
+
+
+class StandInPredictor(object):
+    # A predictor summing the input ids of each input, which can be cloned.
+    def __init__(self):
+        self.input_handles = {"input_ids": Handle(), "seq_len": Handle()}
+        self.output_handles = {"sum": Handle()}
+        self.num_runs = 0
+        self.clones = []
+
+    def get_input_names(self):
+        return list(self.input_handles)
+
+    def get_input_handle(self, name):
+        return self.input_handles[name]
+
+    def get_output_names(self):
+        return list(self.output_handles)
+
+    def get_output_handle(self, name):
+        return self.output_handles[name]
+
+    def run(self):
+        self.num_runs += 1
+        self.output_handles["sum"].data = self.input_handles[
+            "input_ids"].data.sum(axis=1)
+
+    def clone(self):
+        predictor = StandInPredictor()
+        self.clones.append(predictor)
+        return predictor
+
+
+class StaticTask(Task):
+    # Runs the stand-in predictor on the char ids of the texts, one batch per
+    # call.
+    def __init__(self, **kwargs):
+        super().__init__(model="dummy", task="dummy", **kwargs)
+        self.set_predictor(StandInPredictor())
+
+    def set_predictor(self, predictor):
+        self.predictor = predictor
+        self.input_handles = [
+            predictor.get_input_handle(name)
+            for name in predictor.get_input_names()
+        ]
+        self.output_handle = [
+            predictor.get_output_handle(name)
+            for name in predictor.get_output_names()
+        ]
+
+    def _construct_model(self, model):
+        pass
+
+    def _construct_tokenizer(self, model):
+        pass
+
+    def _construct_input_spec(self):
+        pass
+
+    def _preprocess(self, inputs):
+        return [text for text in self._check_input_text(inputs) if text]
+
+    def _run_model(self, inputs):
+        if not inputs:
+            return []
+        ids = np.zeros(
+            [len(inputs), max(len(text) for text in inputs)], dtype="int64")
+        for i, text in enumerate(inputs):
+            ids[i, :len(text)] = [ord(char) for char in text]
+        self.input_handles[0].copy_from_cpu(ids)
+        self.input_handles[1].copy_from_cpu(
+            np.array(
+                [len(text) for text in inputs], dtype="int64"))
+        self.predictor.run()
+        return self.output_handle[0].copy_to_cpu().tolist()
+
+    def _postprocess(self, inputs):
+        return inputs
+
+
+class TestQuantizeCalibration(CpuCommonTest):
+    def setUp(self):
+        self.task = StaticTask()
+
+    def test_recording(self):
+        feeds, batches = {}, []
+        predictor = StandInPredictor()
+        recording = _RecordingPredictor(predictor, feeds, batches)
+        handles = [
+            _RecordingInputHandle(
+                predictor.get_input_handle(name), name, feeds)
+            for name in recording.get_input_names()
+        ]
+        for ids in [[[1, 2]], [[3, 4], [5, 6]]]:
+            handles[0].copy_from_cpu(np.array(ids))
+            handles[1].copy_from_cpu(np.array([2] * len(ids)))
+            recording.run()
+        self.assertEqual(predictor.num_runs, 2)
+        self.assertEqual(len(batches), 2)
+        np.testing.assert_array_equal(batches[1]["input_ids"],
+                                      [[3, 4], [5, 6]])
+        np.testing.assert_array_equal(batches[1]["seq_len"], [2, 2])
+        np.testing.assert_array_equal(
+            predictor.get_output_handle("sum").copy_to_cpu(), [7, 11])
+
+    def test_record_calibration_batches(self):
+        batches = self.task._record_calibration_batches(["ab", "c"])
+        self.assertEqual(len(batches), 1)
+        np.testing.assert_array_equal(batches[0]["input_ids"],
+                                      [[97, 98], [99, 0]])
+        # The predictor is restored.
+        self.assertIsInstance(self.task.predictor, StandInPredictor)
+        self.assertEqual(self.task((["ab"], )), [195])
+
+    def test_record_in_other_thread(self):
+        # The inputs are recorded through the predictor of the thread which
+        # runs the task.
+        results = []
+        thread = threading.Thread(
+            target=lambda: results.append(
+                self.task._record_calibration_batches(["ab", "c"])))
+        thread.start()
+        thread.join()
+        self.assertEqual(len(results[0]), 1)
+        self.assertEqual(self.task.predictor.num_runs, 0)
+        self.assertEqual(self.task.predictor.clones[0].num_runs, 1)
+
+    def test_empty_calibration(self):
+        self.task._config = "config"
+        with self.assertRaises(ValueError):
+            self.task.quantize([])
+        # The task does not run the predictor.
+        self.task._run_model = lambda inputs: []
+        with self.assertRaises(ValueError):
+            self.task.quantize(["ab"])
+
+
+class TestPredictorPool(CpuCommonTest):
+    def setUp(self):
+        self.task = StaticTask()
+
+    def run_in_threads(self, num_threads, fn):
+        results = [None] * num_threads
+
+        def run(i):
+            results[i] = fn()
+
+        threads = [
+            threading.Thread(
+                target=run, args=(i, )) for i in range(num_threads)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def test_owner_thread(self):
+        predictor = self.task.predictor
+        self.assertEqual(self.task((["ab", "c"], )), [195, 99])
+        self.assertIs(self.task.predictor, predictor)
+        self.assertEqual(predictor.num_runs, 1)
+        self.assertEqual(predictor.clones, [])
+
+    def test_other_threads(self):
+        predictor = self.task.predictor
+
+        def run():
+            results = [self.task((["ab"], )), self.task((["c"], ))]
+            return self.task.predictor, results
+
+        outputs = self.run_in_threads(3, run)
+        # Each thread runs its own clone, created once.
+        self.assertEqual(len(predictor.clones), 3)
+        self.assertEqual(predictor.num_runs, 0)
+        self.assertEqual(
+            set(id(clone) for clone, _ in outputs),
+            set(id(clone) for clone in predictor.clones))
+        for clone, results in outputs:
+            self.assertEqual(results, [[195], [99]])
+            self.assertEqual(clone.num_runs, 2)
+
+    def test_reassign_predictor(self):
+        def run():
+            self.task((["ab"], ))
+            return self.task.predictor
+
+        # The same worker thread runs before and after the reassignment.
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            old_clone = executor.submit(run).result()
+            self.assertIs(executor.submit(run).result(), old_clone)
+            new_predictor = StandInPredictor()
+            self.task.set_predictor(new_predictor)
+            # The clone of the previous predictor is dropped.
+            new_clone = executor.submit(run).result()
+        self.assertIsNot(new_clone, old_clone)
+        self.assertEqual(new_predictor.clones, [new_clone])
+        self.assertEqual(new_clone.num_runs, 1)
+        self.assertIs(self.task.predictor, new_predictor)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,264 @@
+# Copyright (c) 2022 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import os
+import tempfile
+import threading
+import unittest
+
+import numpy as np
+import paddle
+import paddle.nn as nn
+
+from paddlenlp.trainer.trainer_base import Trainer
+from paddlenlp.trainer.trainer_utils import get_last_checkpoint
+from paddlenlp.trainer.training_args import TrainingArguments
+from paddlenlp.trainer.utils.checkpoint import (
+    COMMIT_MARKER_NAME, AsyncCheckpointWriter, is_checkpoint_committed,
+    load_state_dict, mark_checkpoint_committed, save_state_dict,
+    state_dict_exists)
+
+from common_test import CpuCommonTest
+
+
+class TestStateDict(CpuCommonTest):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, "model_state.pdparams")
+        rng = np.random.RandomState(0)
+        # 4 entries of 4000 bytes each.
+        self.state_dict = {
+            f"linear_{i}.weight": rng.rand(1000).astype("float32")
+            for i in range(4)
+        }
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def assert_state_dict_equal(self, state_dict):
+        self.assertEqual(list(state_dict), list(self.state_dict))
+        for key, value in self.state_dict.items():
+            np.testing.assert_array_equal(np.asarray(state_dict[key]), value)
+
+    def test_single_file(self):
+        save_state_dict(self.state_dict, self.path)
+        self.assertEqual(
+            os.listdir(self.tmp_dir.name), ["model_state.pdparams"])
+        self.assertTrue(state_dict_exists(self.path))
+        self.assert_state_dict_equal(load_state_dict(self.path))
+
+    def test_shards(self):
+        save_state_dict(self.state_dict, self.path, max_shard_size=9000)
+        self.assertEqual(
+            sorted(os.listdir(self.tmp_dir.name)), [
+                "model_state-00001-of-00002.pdparams",
+                "model_state-00002-of-00002.pdparams",
+                "model_state.pdparams.index.json"
+            ])
+        with open(self.path + ".index.json", encoding="utf-8") as f:
+            index = json.load(f)
+        self.assertEqual(index["metadata"]["total_size"], 16000)
+        self.assertEqual(
+            list(index["weight_map"].values()),
+            ["model_state-00001-of-00002.pdparams"] * 2 +
+            ["model_state-00002-of-00002.pdparams"] * 2)
+        self.assertTrue(state_dict_exists(self.path))
+        self.assert_state_dict_equal(load_state_dict(self.path))
+        self.assert_state_dict_equal(
+            load_state_dict(
+                self.path, num_workers=1))
+
+    def test_overwrite_shards(self):
+        save_state_dict(self.state_dict, self.path, max_shard_size=9000)
+        save_state_dict(self.state_dict, self.path)
+        self.assertFalse(os.path.isfile(self.path + ".index.json"))
+        self.assert_state_dict_equal(load_state_dict(self.path))
+
+    def test_atomic(self):
+        save_state_dict(self.state_dict, self.path)
+        # A failed save keeps the previous file.
+        with self.assertRaises(Exception):
+            save_state_dict({"weight": lambda: None}, self.path)
+        self.assert_state_dict_equal(load_state_dict(self.path))
+
+    def test_commit_marker(self):
+        self.assertFalse(is_checkpoint_committed(self.tmp_dir.name))
+        mark_checkpoint_committed(self.tmp_dir.name)
+        self.assertTrue(is_checkpoint_committed(self.tmp_dir.name))
+        self.assertEqual(os.listdir(self.tmp_dir.name), [COMMIT_MARKER_NAME])
+
+
+class TestAsyncCheckpointWriter(CpuCommonTest):
+    def test_submit(self):
+        writer = AsyncCheckpointWriter()
+        started, release = threading.Event(), threading.Event()
+        saved = []
+
+        def save():
+            started.set()
+            release.wait()
+            saved.append(1)
+
+        writer.submit(save)
+        started.wait()
+        self.assertTrue(writer.pending)
+        release.set()
+        writer.wait()
+        self.assertFalse(writer.pending)
+        self.assertEqual(saved, [1])
+
+    def test_error(self):
+        writer = AsyncCheckpointWriter()
+
+        def save():
+            raise OSError("No space left on device")
+
+        writer.submit(save)
+        with self.assertRaisesRegex(OSError, "No space left"):
+            writer.wait()
+        # The error is raised once.
+        writer.wait()
+        writer.submit(save)
+        with self.assertRaisesRegex(OSError, "No space left"):
+            writer.submit(lambda: None)
+
+
+class TestGetLastCheckpoint(CpuCommonTest):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def make_checkpoint(self, step, committed):
+        path = os.path.join(self.tmp_dir.name, f"checkpoint-{step}")
+        os.makedirs(path)
+        if committed:
+            mark_checkpoint_committed(path)
+        return path
+
+    def test_skip_uncommitted(self):
+        self.make_checkpoint(2, committed=True)
+        last = self.make_checkpoint(4, committed=True)
+        self.make_checkpoint(6, committed=False)
+        self.assertEqual(get_last_checkpoint(self.tmp_dir.name), last)
+
+    def test_legacy(self):
+        # The checkpoints saved before the commit markers have none.
+        self.make_checkpoint(2, committed=False)
+        last = self.make_checkpoint(10, committed=False)
+        self.assertEqual(get_last_checkpoint(self.tmp_dir.name), last)
+
+    def test_empty(self):
+        self.assertIsNone(get_last_checkpoint(self.tmp_dir.name))
+
+
+class LinearModel(nn.Layer):
+    def __init__(self):
+        super(LinearModel, self).__init__()
+        # About 1 MB of weights.
+        self.linear1 = nn.Linear(16, 16384)
+        self.linear2 = nn.Linear(16384, 2)
+
+    def forward(self, x):
+        return self.linear2(self.linear1(x))
+
+
+class TestTrainerCheckpoint(CpuCommonTest):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.output_dir = self.tmp_dir.name
+        rng = np.random.RandomState(0)
+        self.dataset = [{
+            "x": rng.rand(16).astype("float32"),
+            "labels": np.array(
+                rng.randint(2), dtype="int64")
+        } for _ in range(16)]
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def get_trainer(self, **kwargs):
+        args = TrainingArguments(
+            output_dir=self.output_dir,
+            per_device_train_batch_size=2,
+            max_steps=6,
+            save_steps=2,
+            logging_steps=2,
+            **kwargs)
+        return Trainer(
+            model=LinearModel(),
+            criterion=nn.CrossEntropyLoss(),
+            args=args,
+            train_dataset=self.dataset)
+
+    def train(self, resume_from_checkpoint=None):
+        # Every run names the parameters and optimizer states the same, as
+        # the optimizer states are saved by name.
+        with paddle.utils.unique_name.guard():
+            trainer = self.get_trainer(
+                save_async=True, save_shard_size=1, save_total_limit=2)
+            trainer.train(resume_from_checkpoint=resume_from_checkpoint)
+        return trainer
+
+    def test_rotate_skips_uncommitted(self):
+        trainer = self.get_trainer(save_total_limit=1)
+        for step in [2, 4, 6]:
+            path = os.path.join(self.output_dir, f"checkpoint-{step}")
+            os.makedirs(path)
+            if step < 6:
+                mark_checkpoint_committed(path)
+        trainer._rotate_checkpoints(output_dir=self.output_dir)
+        # The checkpoint being saved is neither deleted nor counted.
+        self.assertEqual(
+            sorted(os.listdir(self.output_dir)),
+            ["checkpoint-4", "checkpoint-6"])
+
+    def test_save_async_shards(self):
+        trainer = self.train()
+        checkpoints = sorted(
+            f for f in os.listdir(self.output_dir)
+            if f.startswith("checkpoint-"))
+        self.assertEqual(checkpoints, ["checkpoint-4", "checkpoint-6"])
+        checkpoint = os.path.join(self.output_dir, "checkpoint-6")
+        self.assertTrue(is_checkpoint_committed(checkpoint))
+        self.assertEqual(get_last_checkpoint(self.output_dir), checkpoint)
+        files = os.listdir(checkpoint)
+        self.assertIn("model_state.pdparams.index.json", files)
+        self.assertIn("optimizer.pdopt.index.json", files)
+        self.assertNotIn("model_state.pdparams", files)
+        self.assertFalse([f for f in files if f.endswith(".tmp")])
+
+        # The weights saved are those of the model at the last step.
+        state_dict = load_state_dict(
+            os.path.join(checkpoint, "model_state.pdparams"))
+        for key, value in trainer.model.state_dict().items():
+            np.testing.assert_array_equal(
+                np.asarray(state_dict[key]), value.numpy())
+
+        # Resuming from the sharded weights and optimizer states ends with
+        # the same weights.
+        paddle.seed(1)
+        trainer = self.train(
+            resume_from_checkpoint=os.path.join(self.output_dir,
+                                                "checkpoint-4"))
+        self.assertEqual(trainer.state.global_step, 6)
+        for key, value in trainer.model.state_dict().items():
+            np.testing.assert_allclose(
+                np.asarray(state_dict[key]), value.numpy(), rtol=1e-5)
+
+
+if __name__ == "__main__":
+    unittest.main()
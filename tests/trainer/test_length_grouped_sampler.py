@@ -0,0 +1,103 @@
+# Copyright (c) 2022 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+
+import numpy as np
+
+from paddlenlp.trainer.utils.helper import LengthGroupedBatchSampler
+
+from common_test import CpuCommonTest
+
+
+class TestLengthGroupedBatchSampler(CpuCommonTest):
+    def setUp(self):
+        rng = np.random.RandomState(0)
+        self.lengths = rng.randint(1, 100, size=103).tolist()
+        self.dataset = [{"input_ids": [0] * n} for n in self.lengths]
+
+    def test_fixed_size(self):
+        sampler = LengthGroupedBatchSampler(
+            self.dataset, batch_size=8, megabatch_mult=2)
+        batches = list(sampler)
+        self.assertEqual(len(batches), len(sampler))
+        self.assertEqual(sorted(sum(batches, [])), list(range(103)))
+        self.assertEqual(sorted(len(batch) for batch in batches)[1:],
+                         [8] * (len(batches) - 1))
+        # The samples of a batch are sorted by length within a mega-batch.
+        for batch in batches:
+            batch_lengths = [self.lengths[i] for i in batch]
+            self.assertEqual(batch_lengths, sorted(batch_lengths, reverse=True))
+
+    def test_fixed_size_drop_last(self):
+        sampler = LengthGroupedBatchSampler(
+            self.dataset, batch_size=8, drop_last=True)
+        self.assertEqual([len(batch) for batch in sampler], [8] * 12)
+
+    def test_empty_dataset(self):
+        for max_tokens_per_batch in [None, 64]:
+            sampler = LengthGroupedBatchSampler(
+                [],
+                batch_size=8,
+                lengths=[],
+                max_tokens_per_batch=max_tokens_per_batch,
+                drop_last=True)
+            self.assertEqual(list(sampler), [])
+
+    def test_token_budget(self):
+        sampler = LengthGroupedBatchSampler(
+            self.dataset,
+            batch_size=16,
+            lengths=self.lengths,
+            max_tokens_per_batch=256)
+        batches = list(sampler)
+        self.assertEqual(sorted(sum(batches, [])), list(range(103)))
+        for batch in batches:
+            padded_len = max(self.lengths[i] for i in batch)
+            self.assertLessEqual(len(batch), 16)
+            self.assertTrue(len(batch) == 1 or
+                            len(batch) * padded_len <= 256)
+
+    def test_rank_sharding(self):
+        all_batches = []
+        for rank in range(3):
+            sampler = LengthGroupedBatchSampler(
+                self.dataset,
+                batch_size=8,
+                num_replicas=3,
+                rank=rank,
+                drop_last=True)
+            all_batches.append(list(sampler))
+        # Every rank runs the same number of steps on different samples.
+        self.assertEqual(len(set(len(batches) for batches in all_batches)), 1)
+        indices = [
+            i for batches in all_batches for batch in batches for i in batch
+        ]
+        self.assertEqual(len(indices), len(set(indices)))
+
+    def test_set_epoch(self):
+        sampler = LengthGroupedBatchSampler(self.dataset, batch_size=8)
+        other = LengthGroupedBatchSampler(self.dataset, batch_size=8)
+        sampler.set_epoch(1)
+        other.set_epoch(1)
+        epoch_1 = list(sampler)
+        self.assertEqual(epoch_1, list(other))
+        sampler.set_epoch(2)
+        self.assertNotEqual(list(sampler), epoch_1)
+        sampler.set_epoch(1)
+        self.assertEqual(list(sampler), epoch_1)
+
+
+if __name__ == "__main__":
+    unittest.main()
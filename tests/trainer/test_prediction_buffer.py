@@ -0,0 +1,176 @@
+# Copyright (c) 2022 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import tempfile
+import unittest
+
+import numpy as np
+import paddle
+import paddle.nn as nn
+
+from paddlenlp.trainer.trainer_base import Trainer
+from paddlenlp.trainer.training_args import TrainingArguments
+from paddlenlp.trainer.utils.helper import PredictionBuffer
+
+from common_test import CpuCommonTest
+
+
+class TestPredictionBuffer(CpuCommonTest):
+    def test_grow_second_axis(self):
+        buffer = PredictionBuffer(5, padding_index=-100)
+        buffer.add(np.ones([2, 3], dtype="int64"))
+        buffer.add(np.full([2, 7], 2, dtype="int64"))
+        buffer.add(np.full([1, 2], 3, dtype="int64"))
+        result = buffer.get()
+        self.assertEqual(result.shape, (5, 7))
+        np.testing.assert_array_equal(result[:2, :3], 1)
+        np.testing.assert_array_equal(result[:2, 3:], -100)
+        np.testing.assert_array_equal(result[2:4], 2)
+        np.testing.assert_array_equal(result[4, :2], 3)
+        np.testing.assert_array_equal(result[4, 2:], -100)
+
+    def test_nested(self):
+        buffer = PredictionBuffer(4)
+        buffer.add((np.zeros([2, 2]), np.arange(2)))
+        buffer.add((np.ones([2, 3]), np.arange(2, 4)))
+        start_logits, ids = buffer.get()
+        self.assertEqual(start_logits.shape, (4, 3))
+        np.testing.assert_array_equal(ids, np.arange(4))
+
+    def test_truncate_distributed_padding(self):
+        # The distributed sampler pads the last batch up to `batch_size x
+        # world_size` samples, which are dropped.
+        buffer = PredictionBuffer(5)
+        buffer.add(np.arange(4))
+        buffer.add(np.arange(4, 8))
+        buffer.add(np.arange(8, 12))
+        self.assertEqual(buffer.num_added, 5)
+        np.testing.assert_array_equal(buffer.get(), np.arange(5))
+
+    def test_empty(self):
+        self.assertIsNone(PredictionBuffer(3).get())
+
+    def test_memmap(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            memmap_dir = os.path.join(tmp_dir, "predictions")
+            buffer = PredictionBuffer(4, memmap_dir=memmap_dir)
+            buffer.add(np.ones([2, 2], dtype="float32"))
+            buffer.add(np.zeros([2, 5], dtype="float32"))
+            result = buffer.get()
+            self.assertIsInstance(result, np.memmap)
+            self.assertEqual(result.shape, (4, 5))
+            np.testing.assert_array_equal(result[:2, 2:], -100)
+            # The array of the first batches is replaced when it grows.
+            self.assertEqual(os.listdir(memmap_dir), ["array_1.npy"])
+            np.testing.assert_array_equal(
+                np.load(os.path.join(memmap_dir, "array_1.npy")), result)
+            del buffer, result
+
+
+class LinearModel(nn.Layer):
+    def __init__(self):
+        super(LinearModel, self).__init__()
+        self.linear = nn.Linear(4, 3)
+
+    def forward(self, x):
+        return self.linear(x)
+
+
+class Accuracy(object):
+    # An incremental `compute_metrics`.
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.num_correct = 0
+        self.num_samples = 0
+
+    def update(self, eval_pred):
+        preds = eval_pred.predictions.argmax(axis=-1)
+        self.num_correct += int((preds == eval_pred.label_ids).sum())
+        self.num_samples += len(preds)
+
+    def accumulate(self):
+        return {"accuracy": self.num_correct / self.num_samples}
+
+
+def accuracy(eval_pred):
+    preds = eval_pred.predictions.argmax(axis=-1)
+    return {"accuracy": float((preds == eval_pred.label_ids).mean())}
+
+
+class TestStreamingEvaluation(CpuCommonTest):
+    def setUp(self):
+        paddle.seed(0)
+        rng = np.random.RandomState(0)
+        self.dataset = [{
+            "x": rng.rand(4).astype("float32"),
+            "labels": np.array(
+                rng.randint(3), dtype="int64")
+        } for _ in range(11)]
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.memmap_dir = os.path.join(self.tmp_dir.name, "memmap")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def get_trainer(self, compute_metrics, streaming_eval=True):
+        args = TrainingArguments(
+            output_dir=self.tmp_dir.name,
+            per_device_eval_batch_size=4,
+            streaming_eval=streaming_eval,
+            eval_memmap_dir=self.memmap_dir if streaming_eval else None)
+        return Trainer(
+            model=LinearModel(),
+            criterion=nn.CrossEntropyLoss(),
+            args=args,
+            eval_dataset=self.dataset,
+            compute_metrics=compute_metrics)
+
+    def expected_metrics(self):
+        metrics = self.get_trainer(accuracy, streaming_eval=False).evaluate()
+        return metrics["eval_accuracy"], metrics["eval_loss"]
+
+    def test_incremental_metrics(self):
+        metrics = self.get_trainer(Accuracy()).evaluate()
+        paddle.seed(0)
+        accuracy_, loss = self.expected_metrics()
+        self.assertAlmostEqual(metrics["eval_accuracy"], accuracy_)
+        self.assertAlmostEqual(metrics["eval_loss"], loss, places=5)
+        self.assertEqual(os.listdir(self.memmap_dir), [])
+
+    def test_function_metrics(self):
+        # A plain function needs all the predictions, which are removed once
+        # the metrics are computed.
+        trainer = self.get_trainer(accuracy)
+        metrics = trainer.evaluate()
+        metrics = trainer.evaluate()
+        paddle.seed(0)
+        accuracy_, _ = self.expected_metrics()
+        self.assertAlmostEqual(metrics["eval_accuracy"], accuracy_)
+        self.assertEqual(os.listdir(self.memmap_dir), [])
+
+    def test_predict(self):
+        trainer = self.get_trainer(Accuracy())
+        output = trainer.predict(self.dataset)
+        self.assertEqual(output.predictions.shape, (11, 3))
+        np.testing.assert_array_equal(
+            output.label_ids, [data["labels"] for data in self.dataset])
+        self.assertIn("test_accuracy", output.metrics)
+        self.assertEqual(len(os.listdir(self.memmap_dir)), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -175,6 +175,15 @@ class TestBertTokenizer(CpuCommonTest):
         self.check_output_equal(result['special_tokens_mask'],
                                 expected_tokens_mask)
 
+    def test_get_offset_mapping(self):
+        # Accents and control characters are dropped when aligning the
+        # tokens, and unknown tokens keep their original text.
+        expected_offset_mapping = [(0, 2), (2, 4), (7, 9), (10, 11), (12, 18),
+                                   (19, 23), (24, 28)]
+        offset_mapping = self.tokenizer.get_offset_mapping(
+            "This \x00 is ä SImple text Café")
+        self.check_output_equal(offset_mapping, expected_offset_mapping)
+
     def test_call_pair(self):
         expected_input_ids = [1, 3, 4, 5, 8, 6, 7, 2, 12, 5, 11, 10, 13, 2]
         expected_token_type_ids = [0, 0, 0, 0, 0, 0, 0, 0, 1, 1, 1, 1, 1, 1]
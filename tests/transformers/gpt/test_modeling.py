@@ -15,7 +15,10 @@
 import copy
 import numpy as np
 import paddle
-from paddlenlp.transformers import GPTForSequenceClassification, GPTForTokenClassification, GPTModel
+from paddlenlp.transformers import GPTForSequenceClassification, GPTForTokenClassification, GPTLMHeadModel, GPTModel
+from paddlenlp.transformers.generation_engine import ContinuousBatchingEngine
+from paddlenlp.transformers.generation_prefix_cache import PrefixCacheStore
+from paddlenlp.transformers.generation_streamer import stream_generate
 import random
 from common_test import CommonTest
 import unittest
@@ -103,5 +106,139 @@ class TestGPTForTokenClassification(TestElectraForSequenceClassification):
         self.check_testcase()
 
 
+class TestGPTLMHeadModelGenerate(CommonTest):
+    def setUp(self):
+        self.config = copy.deepcopy(GPTModel.pretrained_init_configuration[
+            'gpt2-medium-en'])
+        self.config['num_hidden_layers'] = 2
+        self.config['hidden_size'] = 64
+        self.config['intermediate_size'] = 128
+        self.config['num_attention_heads'] = 4
+        self.config['vocab_size'] = 512
+        self.config['eos_token_id'] = 511
+        self.config['attention_probs_dropout_prob'] = 0.0
+        self.config['hidden_dropout_prob'] = 0.0
+        self.config['seq_len'] = 8
+        self.config['batch_size'] = 2
+        self.input_ids = create_input_data(self.config, seed=100)
+
+    def test_preallocated_cache(self):
+        config = copy.deepcopy(self.config)
+        del config['batch_size']
+        del config['seq_len']
+
+        model = GPTLMHeadModel(GPTModel(**config))
+        model.eval()
+        input_ids = paddle.to_tensor(self.input_ids, dtype="int64")
+        for kwargs in [{
+                'decode_strategy': 'greedy_search'
+        }, {
+                'decode_strategy': 'beam_search',
+                'num_beams': 3
+        }]:
+            ids, scores = model.generate(input_ids, max_length=10, **kwargs)
+            preallocated_ids, preallocated_scores = model.generate(
+                input_ids, max_length=10, use_preallocated_cache=True, **kwargs)
+            self.check_output_equal(ids.numpy(), preallocated_ids.numpy())
+            self.check_output_equal(scores.numpy(), preallocated_scores.numpy())
+
+    def test_continuous_batching(self):
+        config = copy.deepcopy(self.config)
+        del config['batch_size']
+        del config['seq_len']
+
+        model = GPTLMHeadModel(GPTModel(**config))
+        model.eval()
+        # More requests than slots, thus some requests wait for free slots.
+        engine = ContinuousBatchingEngine(
+            model, max_batch_size=1, max_length=16)
+        max_new_tokens = [6, 3]
+        requests = [
+            engine.submit(
+                input_ids.tolist(), max_new_tokens=max_new_tokens[i])
+            for i, input_ids in enumerate(self.input_ids)
+        ]
+        for i, request in enumerate(requests):
+            streamed_ids = list(request)
+            ids, score = request.result()
+            expected_ids, expected_scores = model.generate(
+                paddle.to_tensor(
+                    self.input_ids[i:i + 1], dtype="int64"),
+                max_length=max_new_tokens[i])
+            expected_ids = expected_ids.numpy()[0][:len(ids)]
+            self.check_output_equal(np.array(streamed_ids), np.array(ids))
+            self.check_output_equal(np.array(ids), expected_ids)
+            self.assertAlmostEqual(
+                score, expected_scores.numpy()[0][0], places=5)
+        engine.close()
+
+    def test_stream_generate(self):
+        config = copy.deepcopy(self.config)
+        del config['batch_size']
+        del config['seq_len']
+
+        model = GPTLMHeadModel(GPTModel(**config))
+        model.eval()
+        input_ids = paddle.to_tensor(self.input_ids, dtype="int64")
+        ids, _ = model.generate(input_ids, max_length=10)
+        streamed_ids = np.stack(
+            list(stream_generate(
+                model, input_ids=input_ids, max_length=10)),
+            axis=1)
+        self.check_output_equal(streamed_ids, ids.numpy())
+
+    def test_prefix_cache(self):
+        config = copy.deepcopy(self.config)
+        del config['batch_size']
+        del config['seq_len']
+
+        model = GPTLMHeadModel(GPTModel(**config))
+        model.eval()
+        input_ids = paddle.to_tensor(self.input_ids, dtype="int64")
+        ids, _ = model.generate(input_ids, max_length=10)
+        prefix_cache = model.build_prefix_cache(input_ids[:1, :5])
+        shared_ids = paddle.concat(
+            [paddle.expand(input_ids[:1, :5], [2, 5]), input_ids[:, 5:]],
+            axis=-1)
+        shared_output_ids, _ = model.generate(shared_ids, max_length=10)
+        output_ids, _ = model.generate(
+            shared_ids, max_length=10, prefix_cache=prefix_cache)
+        self.check_output_equal(output_ids.numpy(),
+                                shared_output_ids.numpy())
+
+        store = PrefixCacheStore()
+        for i in range(2):
+            output_ids, _ = model.generate(
+                input_ids[:1], max_length=10, prefix_cache_store=store)
+            self.check_output_equal(output_ids.numpy(), ids[:1].numpy())
+        self.assertEqual(store.hits, 1)
+
+    def test_speculative_decoding(self):
+        config = copy.deepcopy(self.config)
+        del config['batch_size']
+        del config['seq_len']
+
+        model = GPTLMHeadModel(GPTModel(**config))
+        model.eval()
+        config['num_hidden_layers'] = 1
+        draft_model = GPTLMHeadModel(GPTModel(**config))
+        draft_model.eval()
+        input_ids = paddle.to_tensor(self.input_ids, dtype="int64")
+        ids, scores = model.generate(input_ids, max_length=10)
+        # With `top_k` 1, the tokens are the same as the ones of greedy
+        # search however many draft tokens are accepted.
+        for num_speculative_tokens in [1, 3]:
+            speculative_ids, speculative_scores = model.generate(
+                input_ids,
+                max_length=10,
+                decode_strategy="speculative",
+                draft_model=draft_model,
+                num_speculative_tokens=num_speculative_tokens,
+                top_k=1)
+            self.check_output_equal(speculative_ids.numpy(), ids.numpy())
+            self.check_output_equal(
+                speculative_scores.numpy(), scores.numpy(), atol=1e-5)
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,106 @@
+# Copyright (c) 2022 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+
+import numpy as np
+import paddle
+
+from paddlenlp.ops.optimizer import ExponentialMovingAverage
+
+from common_test import CpuCommonTest
+
+
+class TestExponentialMovingAverage(CpuCommonTest):
+    def setUp(self):
+        paddle.seed(0)
+        self.model = paddle.nn.Linear(4, 3)
+        self.decay = 0.9
+
+    def get_params(self):
+        return [p.numpy().copy() for p in self.model.parameters()]
+
+    def set_params(self, values):
+        for param, value in zip(self.model.parameters(), values):
+            param.set_value(value)
+
+    def test_update(self):
+        ema = ExponentialMovingAverage(self.model, decay=self.decay)
+        ema.register()
+        expected = self.get_params()
+        for step in range(3):
+            values = [np.full_like(v, step + 1.0) for v in expected]
+            self.set_params(values)
+            ema.update()
+            expected = [
+                self.decay * e + (1 - self.decay) * v
+                for e, v in zip(expected, values)
+            ]
+        for shadow, value in zip(ema.state_dict().values(), expected):
+            np.testing.assert_allclose(shadow.numpy(), value, rtol=1e-6)
+
+    def test_update_every(self):
+        ema = ExponentialMovingAverage(
+            self.model, decay=self.decay, update_every=2)
+        ema.register()
+        initial = self.get_params()
+        self.set_params([np.ones_like(v) for v in initial])
+        ema.update()
+        for value, shadow in zip(initial, ema.state_dict().values()):
+            np.testing.assert_allclose(shadow.numpy(), value)
+        ema.update()
+        for value, shadow in zip(initial, ema.state_dict().values()):
+            np.testing.assert_allclose(
+                shadow.numpy(),
+                self.decay**2 * value + 1 - self.decay**2,
+                rtol=1e-6)
+
+    def test_apply_shadow_and_restore(self):
+        ema = ExponentialMovingAverage(self.model, decay=self.decay)
+        ema.register()
+        averaged = self.get_params()
+        trained = [v + 1.0 for v in averaged]
+        self.set_params(trained)
+
+        ema.apply_shadow()
+        self.assertTrue(ema.applied)
+        for param, value in zip(self.model.parameters(), averaged):
+            np.testing.assert_allclose(param.numpy(), value)
+        x = paddle.randn([2, 4])
+        np.testing.assert_allclose(
+            self.model(x).numpy(),
+            x.numpy() @ averaged[0] + averaged[1],
+            rtol=1e-5)
+
+        ema.restore()
+        self.assertFalse(ema.applied)
+        for param, value in zip(self.model.parameters(), trained):
+            np.testing.assert_allclose(param.numpy(), value)
+
+    def test_set_state_dict(self):
+        ema = ExponentialMovingAverage(self.model, decay=self.decay)
+        ema.register()
+        state_dict = {
+            name: np.full(value.shape, 2.0, dtype="float32")
+            for name, value in ema.state_dict().items()
+        }
+        other = ExponentialMovingAverage(self.model, decay=self.decay)
+        other.set_state_dict(state_dict)
+        other.apply_shadow(backup=False)
+        for param in self.model.parameters():
+            np.testing.assert_allclose(param.numpy(), 2.0)
+
+
+if __name__ == "__main__":
+    unittest.main()